@@ -3,28 +3,21 @@ from pathlib import Path
 import gi
 gi.require_version('Gst', '1.0')
 from gi.repository import Gst
-import numpy as np
 import hailo
 from hailo_apps.hailo_app_python.core.gstreamer.gstreamer_app import app_callback_class
 from hailo_apps.hailo_app_python.apps.depth.depth_pipeline import GStreamerDepthApp
+from depth_stats import trimmed_mean_depth
 
 # User-defined class to be used in the callback function: Inheritance from the app_callback_class
 class user_app_callback_class(app_callback_class):
 
     def __init__(self):
         super().__init__()
+        self.max_depth_samples = None  # Exact value; set a sample count to subsample large depth masks (approximate)
 
     def calculate_average_depth(self, depth_mat):
-        depth_values = np.array(depth_mat).flatten()  # Flatten the array and filter out outlier pixels
-        try:
-            m_depth_values = depth_values[depth_values <= np.percentile(depth_values, 95)]  # drop 5% of highest values (outliers)          
-        except Exception as e:
-            m_depth_values = np.array([])
-        if len(m_depth_values) > 0:
-            average_depth = np.mean(m_depth_values)  # Calculate the average depth of the pixels
-        else:
-            average_depth = 0  # Default value if no valid pixels are found
-        return average_depth
+        # Mean of the pixels after dropping the 5% highest values (outliers)
+        return trimmed_mean_depth(depth_mat, upper_percentile=95, max_samples=self.max_depth_samples)
 
 # User-defined callback function: This is the callback function that will be called when data is available from the pipeline
 def app_callback(pad, info, user_data):
@@ -0,0 +1,88 @@
+from collections import OrderedDict
+import numpy as np
+
+# -----------------------------------------------------------------------------------------------
+# Depth statistics
+# -----------------------------------------------------------------------------------------------
+# Robust average depth of a HAILO_DEPTH_MASK: the mean of the pixels after dropping the highest
+# values (outliers). The percentile threshold is found with np.partition (O(n)) instead of the full
+# sort done by np.percentile. Optionally, large masks can be subsampled before they are converted.
+
+def get_depth_values(depth_data, max_samples=None):
+    """
+    Return the depth values as a flat float32 array, reading at most about max_samples values.
+    depth_data may be a NumPy array (used as is), any object exporting a float32 buffer (wrapped
+    without a copy) or a Python list as returned by mask.get_data() (subsampled before conversion).
+    """
+    if isinstance(depth_data, list):
+        stride = _stride(len(depth_data), max_samples)
+        return np.asarray(depth_data[::stride], dtype=np.float32)
+    if isinstance(depth_data, np.ndarray):
+        values = depth_data.reshape(-1)
+    else:
+        values = np.frombuffer(depth_data, dtype=np.float32)
+    return values[::_stride(values.size, max_samples)]
+
+
+def _stride(count, max_samples):
+    return -(-count // max_samples) if max_samples and count > max_samples else 1
+
+
+def trimmed_mean_depth(depth_data, upper_percentile=95, max_samples=None):
+    """
+    Mean depth of the values at or below the upper_percentile percentile (linear interpolation, as in
+    np.percentile). Returns 0 if there are no values.
+    With max_samples, a strided subset of about max_samples values is used and the result is only an
+    approximation; how close it is depends on the depth map (tests/benchmark_depth_stats.py reports it).
+    """
+    values = get_depth_values(depth_data, max_samples)
+    count = values.size
+    if count == 0:
+        return 0
+    position = upper_percentile / 100 * (count - 1)
+    low = int(position)
+    high = min(low + 1, count - 1)
+    partitioned = np.partition(values, (low, high))
+    threshold = partitioned[low] + (partitioned[high] - partitioned[low]) * (position - low)
+    # Everything up to low is <= threshold, later values are kept only if they tie with it
+    rest = partitioned[low + 1:]
+    rest = rest[rest <= threshold]
+    total = partitioned[:low + 1].sum(dtype=np.float64) + rest.sum(dtype=np.float64)
+    return float(total / (low + 1 + rest.size))
+
+
+class TrackDepthEstimator:
+    """
+    Per-track average depth, smoothed with an exponential moving average.
+    A tracked object is only recomputed every refresh_interval calls; in between the cached value is
+    returned and its depth mask is not read at all.
+    """
+
+    def __init__(self, alpha=0.5, refresh_interval=3, upper_percentile=95, max_samples=None, max_tracks=256):
+        self.alpha = alpha
+        self.refresh_interval = refresh_interval
+        self.upper_percentile = upper_percentile
+        self.max_samples = max_samples
+        self.max_tracks = max_tracks
+        self._tracks = OrderedDict()  # track id -> [ema depth, calls since last refresh]
+
+    def average_depth(self, depth_mask, track_id=0):
+        """depth_mask is a HAILO_DEPTH_MASK object (anything with get_data()). Track id 0 means untracked."""
+        state = self._tracks.get(track_id) if track_id else None
+        if state is not None:
+            self._tracks.move_to_end(track_id)
+            state[1] += 1
+            if state[1] < self.refresh_interval:
+                return state[0]
+
+        depth = trimmed_mean_depth(depth_mask.get_data(), self.upper_percentile, self.max_samples)
+        if not track_id:
+            return depth
+        if state is None:
+            self._tracks[track_id] = [depth, 0]
+            if len(self._tracks) > self.max_tracks:
+                self._tracks.popitem(last=False)
+            return depth
+        state[0] = self.alpha * depth + (1 - self.alpha) * state[0]
+        state[1] = 0
+        return state[0]
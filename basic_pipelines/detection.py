@@ -10,12 +10,14 @@ import hailo
 from hailo_apps.hailo_app_python.core.common.buffer_utils import get_caps_from_pad, get_numpy_from_buffer
 from hailo_apps.hailo_app_python.core.gstreamer.gstreamer_app import app_callback_class
 from hailo_apps.hailo_app_python.apps.detection.detection_pipeline import GStreamerDetectionApp
+from frame_sink import SharedFrameMixin
+from detection_snapshot import DetectionSnapshot
 
 # -----------------------------------------------------------------------------------------------
 # User-defined class to be used in the callback function
 # -----------------------------------------------------------------------------------------------
 # Inheritance from the app_callback_class
-class user_app_callback_class(app_callback_class):
+class user_app_callback_class(SharedFrameMixin, app_callback_class):
     def __init__(self):
         super().__init__()
         self.new_variable = 42  # New variable example
@@ -45,27 +47,18 @@ def app_callback(pad, info, user_data):
     # If the user_data.use_frame is set to True, we can get the video frame from the buffer
     frame = None
     if user_data.use_frame and format is not None and width is not None and height is not None:
-        # Get video frame
-        frame = get_numpy_from_buffer(buffer, format, width, height)
+        # Get video frame, converted to BGR straight into a shared display slot so it can be drawn on in place
+        frame = user_data.frame_sink.write_bgr(get_numpy_from_buffer(buffer, format, width, height))
 
-    # Get the detections from the buffer
+    # Get the detections from the buffer as NumPy arrays (boxes, scores, track IDs, ...)
+    # Only "person" detections are kept; the other detections are skipped after reading their label
     roi = hailo.get_roi_from_buffer(buffer)
-    detections = roi.get_objects_typed(hailo.HAILO_DETECTION)
+    persons = DetectionSnapshot.from_roi(roi, labels=("person",))
 
     # Parse the detections
-    detection_count = 0
-    for detection in detections:
-        label = detection.get_label()
-        bbox = detection.get_bbox()
-        confidence = detection.get_confidence()
-        if label == "person":
-            # Get track ID
-            track_id = 0
-            track = detection.get_objects_typed(hailo.HAILO_UNIQUE_ID)
-            if len(track) == 1:
-                track_id = track[0].get_id()
-            string_to_print += (f"Detection: ID: {track_id} Label: {label} Confidence: {confidence:.2f}\n")
-            detection_count += 1
+    for track_id, confidence in zip(persons.track_ids, persons.scores):
+        string_to_print += (f"Detection: ID: {track_id} Label: person Confidence: {confidence:.2f}\n")
+    detection_count = len(persons)
     if user_data.use_frame:
         # Note: using imshow will not work here, as the callback function is not running in the main thread
         # Let's print the detection count to the frame
@@ -73,8 +66,6 @@ def app_callback(pad, info, user_data):
         # Example of how to use the new_variable and new_function from the user_data
         # Let's print the new_variable and the result of the new_function to the frame
         cv2.putText(frame, f"{user_data.new_function()} {user_data.new_variable}", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-        # Convert the frame to BGR
-        frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
         user_data.set_frame(frame)
 
     print(string_to_print)
@@ -0,0 +1,132 @@
+from dataclasses import dataclass
+from typing import Optional
+import numpy as np
+
+try:
+    import hailo
+    HAILO_DETECTION = hailo.HAILO_DETECTION
+    HAILO_UNIQUE_ID = hailo.HAILO_UNIQUE_ID
+    HAILO_LANDMARKS = hailo.HAILO_LANDMARKS
+except ImportError:
+    # Without the hailo runtime, snapshots can still be taken from the stand-ins of tests/fake_roi.py
+    HAILO_DETECTION = "HAILO_DETECTION"
+    HAILO_UNIQUE_ID = "HAILO_UNIQUE_ID"
+    HAILO_LANDMARKS = "HAILO_LANDMARKS"
+
+# -----------------------------------------------------------------------------------------------
+# Detection snapshot
+# -----------------------------------------------------------------------------------------------
+# A struct-of-arrays copy of the detections attached to a buffer ROI.
+# Every getter of every detection is called exactly once while taking the snapshot; filtering and
+# geometry afterwards are plain NumPy operations instead of repeated calls into the hailo bindings.
+@dataclass
+class DetectionSnapshot:
+    boxes: np.ndarray                       # (N, 4) float64 normalized xmin, ymin, xmax, ymax
+    scores: np.ndarray                      # (N,) float32 confidence
+    class_ids: np.ndarray                   # (N,) int32
+    track_ids: np.ndarray                   # (N,) int64, 0 for untracked detections
+    labels: np.ndarray                      # (N,) label strings
+    landmarks: Optional[np.ndarray] = None  # (N, K, 3) bbox relative x, y and confidence, NaN if missing
+    detections: Optional[np.ndarray] = None # (N,) the original detection objects
+
+    @classmethod
+    def from_roi(cls, roi, with_landmarks=False, labels=None, landmark_indices=None):
+        """
+        Take a snapshot of roi.get_objects_typed(HAILO_DETECTION).
+        If labels is given, only detections with these labels are kept and the remaining getters are
+        not called at all for the others.
+        If landmark_indices is given, only these landmark points are read (in that order).
+        """
+        return cls.from_detections(roi.get_objects_typed(HAILO_DETECTION), with_landmarks, labels, landmark_indices)
+
+    @classmethod
+    def from_detections(cls, detections, with_landmarks=False, labels=None, landmark_indices=None):
+        keep_labels = labels
+        boxes, scores, class_ids, track_ids, labels, points, objects = [], [], [], [], [], [], []
+        for detection in detections:
+            label = detection.get_label()
+            if keep_labels is not None and label not in keep_labels:
+                continue
+            labels.append(label)
+            objects.append(detection)
+            bbox = detection.get_bbox()
+            xmin, ymin = bbox.xmin(), bbox.ymin()
+            boxes.append((xmin, ymin, xmin + bbox.width(), ymin + bbox.height()))
+            scores.append(detection.get_confidence())
+            class_ids.append(detection.get_class_id())
+            track = detection.get_objects_typed(HAILO_UNIQUE_ID)
+            track_ids.append(track[0].get_id() if len(track) == 1 else 0)
+            if with_landmarks:
+                landmarks = detection.get_objects_typed(HAILO_LANDMARKS)
+                if len(landmarks) == 0:
+                    points.append(None)
+                    continue
+                person_points = landmarks[0].get_points()
+                if landmark_indices is not None:
+                    person_points = [person_points[i] for i in landmark_indices]
+                points.append([(p.x(), p.y(), p.confidence()) for p in person_points])
+
+        detections = np.empty(len(objects), dtype=object)
+        for i, detection in enumerate(objects):
+            detections[i] = detection
+
+        landmarks = None
+        if with_landmarks:
+            num_points = len(landmark_indices) if landmark_indices is not None else max((len(p) for p in points if p is not None), default=0)
+            landmarks = np.full((len(points), num_points, 3), np.nan, dtype=np.float32)
+            for i, person_points in enumerate(points):
+                if person_points:
+                    landmarks[i, :len(person_points)] = person_points
+
+        return cls(
+            boxes=np.array(boxes, dtype=np.float64).reshape(-1, 4),  # Keeps xmax - xmin equal to the bbox width
+            scores=np.array(scores, dtype=np.float32),
+            class_ids=np.array(class_ids, dtype=np.int32),
+            track_ids=np.array(track_ids, dtype=np.int64),
+            labels=np.array(labels, dtype=str),
+            landmarks=landmarks,
+            detections=detections,
+        )
+
+    def __len__(self):
+        return len(self.scores)
+
+    def select(self, mask):
+        """Return a new snapshot with the detections selected by a boolean mask or an index array."""
+        return DetectionSnapshot(
+            boxes=self.boxes[mask],
+            scores=self.scores[mask],
+            class_ids=self.class_ids[mask],
+            track_ids=self.track_ids[mask],
+            labels=self.labels[mask],
+            landmarks=None if self.landmarks is None else self.landmarks[mask],
+            detections=None if self.detections is None else self.detections[mask],
+        )
+
+    def filter_by_label(self, *labels):
+        return self.select(np.isin(self.labels, labels))
+
+    def filter_by_confidence(self, min_confidence):
+        return self.select(self.scores >= min_confidence)
+
+    def filter_by_region(self, xmin, ymin, xmax, ymax, use_center=True):
+        """
+        Keep detections inside a normalized region.
+        With use_center the box center must be in the region, otherwise the whole box must be.
+        """
+        low = np.array([xmin, ymin], dtype=np.float32)
+        high = np.array([xmax, ymax], dtype=np.float32)
+        if use_center:
+            centers = self.centers()
+            inside = ((centers >= low) & (centers <= high)).all(axis=1)
+        else:
+            inside = ((self.boxes[:, :2] >= low) & (self.boxes[:, 2:] <= high)).all(axis=1)
+        return self.select(inside)
+
+    def centers(self):
+        """(N, 2) normalized box centers."""
+        return (self.boxes[:, :2] + self.boxes[:, 2:]) / 2
+
+    def to_pixels(self, width, height):
+        """(N, 4) integer boxes in frame pixels."""
+        return (self.boxes * np.array([width, height, width, height], dtype=np.float32)).astype(np.int32)
@@ -0,0 +1,160 @@
+import atexit
+import multiprocessing
+import os
+import secrets
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+import cv2
+
+# Indices into the shared control block
+_GENERATION = 0   # Bumped every time the ring is (re)allocated for a new frame shape
+_HEIGHT = 1
+_WIDTH = 2
+_CHANNELS = 3
+_LATEST_SLOT = 4  # Slot holding the newest published frame (-1 if none)
+_LATEST_SEQ = 5   # Sequence number of the newest published frame
+_READING_SLOT = 6 # Slot currently held by the consumer (-1 if none), never overwritten by the producer
+_READ_SEQ = 7     # Sequence number of the last frame handed to the consumer
+_DROPPED = 8      # Frames overwritten before the consumer read them
+
+# -----------------------------------------------------------------------------------------------
+# Shared frame ring
+# -----------------------------------------------------------------------------------------------
+# A ring of preallocated shared-memory frames used to hand frames from app_callback to the display
+# process without pickling them through a multiprocessing.Queue.
+# The producer (the pipeline callback) converts the frame straight into a free slot, draws on it in
+# place and publishes the slot index. The consumer (the display process) reads the newest slot.
+# When the consumer falls behind, older frames are overwritten (dropped) instead of queued.
+# The object must be created before the display process is started (as part of user_data), the
+# shared memory itself is allocated lazily once the frame size is known.
+class SharedFrameRing:
+    def __init__(self, slots=3):
+        if slots < 3:
+            raise ValueError("SharedFrameRing needs at least 3 slots (latest, reading and writing)")
+        self.slots = slots
+        self._owner_pid = os.getpid()
+        self._token = secrets.token_hex(4)
+        self._control = multiprocessing.Array('q', [0, 0, 0, 0, -1, 0, -1, 0, 0])
+        self._published = multiprocessing.Event()  # Set on publish(), lets the consumer sleep in wait()
+        self._shm = None
+        self._frames = None
+        self._generation = 0  # Generation currently mapped by this process
+        self._write_slot = -1
+        atexit.register(self.close)
+
+    def _name(self, generation):
+        return f"hailo_frames_{self._owner_pid}_{self._token}_{generation}"
+
+    def _release(self, unlink):
+        shm, self._shm, self._frames = self._shm, None, None
+        if unlink:
+            resource_tracker.register(shm._name, "shared_memory")  # unlink() unregisters it again
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                resource_tracker.unregister(shm._name, "shared_memory")
+        try:
+            shm.close()
+        except BufferError:
+            pass  # A frame view is still alive; the mapping goes away together with it
+
+    def _map(self, generation, height, width, channels, create):
+        if self._shm is not None:
+            self._release(unlink=create)
+        size = self.slots * height * width * channels
+        self._shm = shared_memory.SharedMemory(name=self._name(generation), create=create, size=size)
+        # The segment lifetime is handled by close() in the owner process. Left registered, the resource
+        # tracker (which may or may not be shared with the display process) unlinks or warns about it twice.
+        resource_tracker.unregister(self._shm._name, "shared_memory")
+        self._frames = np.ndarray((self.slots, height, width, channels), dtype=np.uint8, buffer=self._shm.buf)
+        self._generation = generation
+
+    def acquire(self, height, width, channels=3):
+        """Return a writable view of a free slot. Nothing is visible to the consumer until publish()."""
+        control = self._control
+        with control.get_lock():
+            if (control[_HEIGHT], control[_WIDTH], control[_CHANNELS]) != (height, width, channels) or self._shm is None:
+                self._map(control[_GENERATION] + 1, height, width, channels, create=True)
+                control[_GENERATION] = self._generation
+                control[_HEIGHT], control[_WIDTH], control[_CHANNELS] = height, width, channels
+                control[_LATEST_SLOT] = control[_READING_SLOT] = -1
+            busy = (control[_LATEST_SLOT], control[_READING_SLOT])
+        slot = (self._write_slot + 1) % self.slots
+        while slot in busy:
+            slot = (slot + 1) % self.slots
+        self._write_slot = slot
+        return self._frames[slot]
+
+    def write_bgr(self, rgb_frame):
+        """Convert an RGB frame into a free slot (the only full-frame pass) and return the slot for drawing."""
+        height, width, channels = rgb_frame.shape
+        slot_frame = self.acquire(height, width, channels)
+        cv2.cvtColor(rgb_frame, cv2.COLOR_RGB2BGR, dst=slot_frame)
+        return slot_frame
+
+    def publish(self, frame=None):
+        """
+        Make the last acquired slot the newest frame.
+        A frame that was not obtained from acquire()/write_bgr() is copied into a free slot first.
+        """
+        if frame is not None and (self._frames is None or not np.may_share_memory(frame, self._frames[self._write_slot])):
+            np.copyto(self.acquire(*frame.shape), frame)
+        control = self._control
+        with control.get_lock():
+            if control[_LATEST_SEQ] > control[_READ_SEQ]:
+                control[_DROPPED] += 1
+            control[_LATEST_SLOT] = self._write_slot
+            control[_LATEST_SEQ] += 1
+        self._published.set()
+
+    def wait(self, timeout=None):
+        """
+        Block until a frame was published since the last wait(), instead of polling read().
+        Returns False on timeout. A wakeup may still find no unread frame, read() then returns (None, None).
+        """
+        if not self._published.wait(timeout):
+            return False
+        self._published.clear()
+        return True
+
+    def read(self):
+        """
+        Return (sequence number, frame) of the newest unread frame, or (None, None) if there is none.
+        The frame is a view into shared memory that stays untouched until the next read() call.
+        """
+        control = self._control
+        with control.get_lock():
+            if control[_LATEST_SLOT] < 0 or control[_LATEST_SEQ] == control[_READ_SEQ]:
+                return None, None
+            if control[_GENERATION] != self._generation:
+                self._map(control[_GENERATION], control[_HEIGHT], control[_WIDTH], control[_CHANNELS], create=False)
+            slot = control[_LATEST_SLOT]
+            control[_READING_SLOT] = slot
+            control[_READ_SEQ] = control[_LATEST_SEQ]
+            return control[_READ_SEQ], self._frames[slot]
+
+    def get_dropped(self):
+        return self._control[_DROPPED]
+
+    def close(self):
+        if self._shm is not None:
+            self._release(unlink=os.getpid() == self._owner_pid)
+
+
+# -----------------------------------------------------------------------------------------------
+# Callback class mixin
+# -----------------------------------------------------------------------------------------------
+# Hands the frames of an app_callback_class over through a SharedFrameRing instead of its queue.
+# List it before app_callback_class: class user_app_callback_class(SharedFrameMixin, app_callback_class)
+# The callback writes the frame into the ring with frame_sink.write_bgr() and draws on it in place,
+# set_frame() then only publishes the slot.
+class SharedFrameMixin:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.frame_sink = SharedFrameRing()  # Shared-memory frames read by the display process
+
+    def set_frame(self, frame):
+        self.frame_sink.publish(frame)
+
+    def get_frame(self):
+        return self.frame_sink.read()[1]
@@ -9,29 +9,18 @@ import hailo
 from hailo_apps.hailo_app_python.core.common.buffer_utils import get_caps_from_pad, get_numpy_from_buffer
 from hailo_apps.hailo_app_python.core.gstreamer.gstreamer_app import app_callback_class
 from hailo_apps.hailo_app_python.apps.instance_segmentation.instance_segmentation_pipeline import GStreamerInstanceSegmentationApp
+from frame_sink import SharedFrameMixin
+from mask_compositor import MaskCompositor
 
 # -----------------------------------------------------------------------------------------------
 # User-defined class to be used in the callback function
 # -----------------------------------------------------------------------------------------------
 # Inheritance from the app_callback_class
-class user_app_callback_class(app_callback_class):
+class user_app_callback_class(SharedFrameMixin, app_callback_class):
     def __init__(self):
         super().__init__()
         self.frame_skip = 2  # Process every 2nd frame to reduce compute
-
-# Predefined colors (BGR format)
-COLORS = [
-    (255, 0, 0),    # Red
-    (0, 255, 0),    # Green
-    (0, 0, 255),    # Blue
-    (255, 255, 0),  # Cyan
-    (255, 0, 255),  # Magenta
-    (0, 255, 255),  # Yellow
-    (128, 0, 128),  # Purple
-    (255, 165, 0),  # Orange
-    (0, 128, 128),  # Teal
-    (128, 128, 0)   # Olive
-]
+        self.mask_compositor = MaskCompositor()  # Reuses overlay buffers and blends all masks in one pass
 
 # -----------------------------------------------------------------------------------------------
 # User-defined callback function
@@ -66,6 +55,7 @@ def app_callback(pad, info, user_data):
         # Get video frame
         frame = get_numpy_from_buffer(buffer, format, width, height)
         reduced_frame = cv2.resize(frame, (reduced_width, reduced_height), interpolation=cv2.INTER_AREA)
+        user_data.mask_compositor.begin(reduced_frame)
 
     # Get the detections from the buffer
     roi = hailo.get_roi_from_buffer(buffer)
@@ -85,44 +75,22 @@ def app_callback(pad, info, user_data):
 
             string_to_print += (f"Detection: ID: {track_id} Label: {label} Confidence: {confidence:.2f}\n")
             # Instance segmentation mask from detection (if available)
-            if user_data.use_frame:
+            if user_data.use_frame and reduced_frame is not None:
                 masks = detection.get_objects_typed(hailo.HAILO_CONF_CLASS_MASK)
                 if len(masks) != 0:
                     mask = masks[0]
-                    # Note that the mask is a 1D array, you need to reshape it to get the original shape
-                    mask_height = mask.get_height()
-                    mask_width = mask.get_width()
-                    data = np.array(mask.get_data())
-                    data = data.reshape((mask_height, mask_width))
-                    # Resize the mask to the ROI size
-                    roi_width = int(bbox.width() * reduced_width)
-                    roi_height = int(bbox.height() * reduced_height)
-                    resized_mask_data = cv2.resize(data, (roi_width, roi_height), interpolation=cv2.INTER_LINEAR)
-
-                    # Calculate the ROI coordinates
-                    x_min, y_min = int(bbox.xmin() * reduced_width), int(bbox.ymin() * reduced_height)
-                    x_max, y_max = x_min + roi_width, y_min + roi_height
-
-                    # Ensure the ROI dimensions are within the frame boundaries and handle negative values
-                    y_min = max(y_min, 0)
-                    x_min = max(x_min, 0)
-                    y_max = min(y_max, reduced_frame.shape[0])
-                    x_max = min(x_max, reduced_frame.shape[1])
-
-                    # Ensure ROI dimensions are valid
-                    if x_max > x_min and y_max > y_min:
-                        # Add mask overlay to the frame
-                        mask_overlay = np.zeros_like(reduced_frame)
-                        color = COLORS[track_id % len(COLORS)]  # Get color based on track_id
-                        mask_overlay[y_min:y_max, x_min:x_max] = (resized_mask_data[:y_max-y_min, :x_max-x_min, np.newaxis] > 0.5) * color
-                        reduced_frame = cv2.addWeighted(reduced_frame, 1, mask_overlay, 0.5, 0)
+                    # The compositor reshapes the mask, resizes it to the ROI and clips it to the frame
+                    user_data.mask_compositor.add_mask(mask.get_data(), mask.get_width(), mask.get_height(), bbox, track_id)
+
+    if reduced_frame is not None:
+        # Add all mask overlays to the frame in a single blend pass
+        reduced_frame = user_data.mask_compositor.composite(reduced_frame)
 
     print(string_to_print)
 
-    if user_data.use_frame:
-        # Convert the frame to BGR
-        reduced_frame = cv2.cvtColor(reduced_frame, cv2.COLOR_RGB2BGR)
-        user_data.set_frame(reduced_frame)
+    if reduced_frame is not None:
+        # Convert the frame to BGR straight into a shared display slot
+        user_data.set_frame(user_data.frame_sink.write_bgr(reduced_frame))
 
     return Gst.PadProbeReturn.OK
 
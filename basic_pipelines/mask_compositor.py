@@ -0,0 +1,95 @@
+import numpy as np
+import cv2
+
+# Predefined colors (BGR format)
+COLORS = [
+    (255, 0, 0),    # Red
+    (0, 255, 0),    # Green
+    (0, 0, 255),    # Blue
+    (255, 255, 0),  # Cyan
+    (255, 0, 255),  # Magenta
+    (0, 255, 255),  # Yellow
+    (128, 0, 128),  # Purple
+    (255, 165, 0),  # Orange
+    (0, 128, 128),  # Teal
+    (128, 128, 0)   # Olive
+]
+
+# -----------------------------------------------------------------------------------------------
+# Mask compositor
+# -----------------------------------------------------------------------------------------------
+# Collects instance masks for a frame into a reusable overlay buffer and blends them onto the
+# frame in a single pass. Only the region actually covered by masks is touched, so the cost grows
+# with the mask area instead of (number of instances x frame size).
+class MaskCompositor:
+    def __init__(self, colors=COLORS, alpha=0.5, threshold=0.5):
+        self.colors = colors
+        self.alpha = alpha
+        self.threshold = threshold
+        self._overlays = {}      # frame shape -> preallocated overlay buffer
+        self._color_cache = {}   # track id -> color as a uint8 array
+        self._overlay = None
+        self._dirty = None       # (x_min, y_min, x_max, y_max) covered by masks in this frame
+
+    def get_color(self, track_id):
+        """Return the overlay color for a track id, cached as a uint8 array."""
+        color = self._color_cache.get(track_id)
+        if color is None:
+            color = np.array(self.colors[track_id % len(self.colors)], dtype=np.uint8)
+            self._color_cache[track_id] = color
+        return color
+
+    def begin(self, frame):
+        """Select (or allocate) the overlay buffer matching the frame shape."""
+        overlay = self._overlays.get(frame.shape)
+        if overlay is None:
+            overlay = np.zeros(frame.shape, dtype=np.uint8)
+            self._overlays[frame.shape] = overlay
+        self._overlay = overlay
+        self._dirty = None
+
+    def add_mask(self, mask_data, mask_width, mask_height, bbox, track_id=0):
+        """
+        Paint a mask into the overlay.
+        mask_data is the flat mask returned by mask.get_data(), bbox holds normalized
+        (xmin, ymin, width, height) coordinates as returned by detection.get_bbox().
+        """
+        frame_height, frame_width = self._overlay.shape[:2]
+        roi_width = int(bbox.width() * frame_width)
+        roi_height = int(bbox.height() * frame_height)
+        if roi_width <= 0 or roi_height <= 0:
+            return
+
+        # Calculate the ROI coordinates and clip them to the frame boundaries
+        x_min, y_min = int(bbox.xmin() * frame_width), int(bbox.ymin() * frame_height)
+        x_max, y_max = x_min + roi_width, y_min + roi_height
+        clip_x_min, clip_y_min = max(x_min, 0), max(y_min, 0)
+        clip_x_max, clip_y_max = min(x_max, frame_width), min(y_max, frame_height)
+        if clip_x_max <= clip_x_min or clip_y_max <= clip_y_min:
+            return
+
+        # Note that the mask is a 1D array, reshape it to get the original shape
+        data = np.asarray(mask_data, dtype=np.float32).reshape((mask_height, mask_width))
+        resized = cv2.resize(data, (roi_width, roi_height), interpolation=cv2.INTER_LINEAR)
+        resized = resized[clip_y_min - y_min:clip_y_max - y_min, clip_x_min - x_min:clip_x_max - x_min]
+
+        overlay_roi = self._overlay[clip_y_min:clip_y_max, clip_x_min:clip_x_max]
+        np.copyto(overlay_roi, self.get_color(track_id), where=(resized > self.threshold)[..., np.newaxis])
+
+        if self._dirty is None:
+            self._dirty = (clip_x_min, clip_y_min, clip_x_max, clip_y_max)
+        else:
+            self._dirty = (min(self._dirty[0], clip_x_min), min(self._dirty[1], clip_y_min),
+                           max(self._dirty[2], clip_x_max), max(self._dirty[3], clip_y_max))
+
+    def composite(self, frame):
+        """Blend the collected masks onto the frame in place and reset the overlay."""
+        if self._dirty is None:
+            return frame
+        x_min, y_min, x_max, y_max = self._dirty
+        overlay_roi = self._overlay[y_min:y_max, x_min:x_max]
+        frame[y_min:y_max, x_min:x_max] = cv2.addWeighted(frame[y_min:y_max, x_min:x_max], 1, overlay_roi, self.alpha, 0)
+        # Only the dirty region was written, so only that region needs clearing
+        overlay_roi[...] = 0
+        self._dirty = None
+        return frame
@@ -10,12 +10,14 @@ import hailo
 from hailo_apps.hailo_app_python.core.common.buffer_utils import get_caps_from_pad, get_numpy_from_buffer
 from hailo_apps.hailo_app_python.core.gstreamer.gstreamer_app import app_callback_class
 from hailo_apps.hailo_app_python.apps.pose_estimation.pose_estimation_pipeline import GStreamerPoseEstimationApp
+from frame_sink import SharedFrameMixin
+from pose_geometry import PoseBatch
 
 # -----------------------------------------------------------------------------------------------
 # User-defined class to be used in the callback function
 # -----------------------------------------------------------------------------------------------
 # Inheritance from the app_callback_class
-class user_app_callback_class(app_callback_class):
+class user_app_callback_class(SharedFrameMixin, app_callback_class):
     def __init__(self):
         super().__init__()
 
@@ -41,75 +43,32 @@ def app_callback(pad, info, user_data):
     # If the user_data.use_frame is set to True, we can get the video frame from the buffer
     frame = None
     if user_data.use_frame and format is not None and width is not None and height is not None:
-        # Get video frame
-        frame = get_numpy_from_buffer(buffer, format, width, height)
+        # Get video frame, converted to BGR straight into a shared display slot so it can be drawn on in place
+        frame = user_data.frame_sink.write_bgr(get_numpy_from_buffer(buffer, format, width, height))
 
-    # Get the detections from the buffer
+    # Get the persons from the buffer, with their eye keypoints projected to frame pixels in one step
     roi = hailo.get_roi_from_buffer(buffer)
-    detections = roi.get_objects_typed(hailo.HAILO_DETECTION)
-
-    # Get the keypoints
-    keypoints = get_keypoints()
+    poses = PoseBatch.from_roi(roi, width, height, keypoint_names=['left_eye', 'right_eye'])
+    eyes = poses.to_int()
 
     # Parse the detections
-    for detection in detections:
-        label = detection.get_label()
-        bbox = detection.get_bbox()
-        confidence = detection.get_confidence()
-        if label == "person":
-            # Get track ID
-            track_id = 0
-            track = detection.get_objects_typed(hailo.HAILO_UNIQUE_ID)
-            if len(track) == 1:
-                track_id = track[0].get_id()
-            string_to_print += (f"Detection: ID: {track_id} Label: {label} Confidence: {confidence:.2f}\n")
+    for person, (track_id, confidence) in enumerate(zip(poses.track_ids, poses.snapshot.scores)):
+        string_to_print += (f"Detection: ID: {track_id} Label: person Confidence: {confidence:.2f}\n")
 
-            # Pose estimation landmarks from detection (if available)
-            landmarks = detection.get_objects_typed(hailo.HAILO_LANDMARKS)
-            if len(landmarks) != 0:
-                points = landmarks[0].get_points()
-                for eye in ['left_eye', 'right_eye']:
-                    keypoint_index = keypoints[eye]
-                    point = points[keypoint_index]
-                    x = int((point.x() * bbox.width() + bbox.xmin()) * width)
-                    y = int((point.y() * bbox.height() + bbox.ymin()) * height)
-                    string_to_print += f"{eye}: x: {x:.2f} y: {y:.2f}\n"
-                    if user_data.use_frame:
-                        cv2.circle(frame, (x, y), 5, (0, 255, 0), -1)
+        # Pose estimation landmarks from detection (if available)
+        if poses.has_landmarks[person]:
+            for column, eye in enumerate(poses.keypoint_names):
+                x, y = eyes[person, column]
+                string_to_print += f"{eye}: x: {x:.2f} y: {y:.2f}\n"
+                if user_data.use_frame:
+                    cv2.circle(frame, (int(x), int(y)), 5, (0, 255, 0), -1)
 
     if user_data.use_frame:
-        # Convert the frame to BGR
-        frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
         user_data.set_frame(frame)
 
     print(string_to_print)
     return Gst.PadProbeReturn.OK
 
-# This function can be used to get the COCO keypoints coorespondence map
-def get_keypoints():
-    """Get the COCO keypoints and their left/right flip coorespondence map."""
-    keypoints = {
-        'nose': 0,
-        'left_eye': 1,
-        'right_eye': 2,
-        'left_ear': 3,
-        'right_ear': 4,
-        'left_shoulder': 5,
-        'right_shoulder': 6,
-        'left_elbow': 7,
-        'right_elbow': 8,
-        'left_wrist': 9,
-        'right_wrist': 10,
-        'left_hip': 11,
-        'right_hip': 12,
-        'left_knee': 13,
-        'right_knee': 14,
-        'left_ankle': 15,
-        'right_ankle': 16,
-    }
-
-    return keypoints
-
 if __name__ == "__main__":
     project_root = Path(__file__).resolve().parent.parent
     env_file     = project_root / ".env"
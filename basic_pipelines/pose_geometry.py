@@ -0,0 +1,83 @@
+import numpy as np
+
+from detection_snapshot import DetectionSnapshot
+
+# This function can be used to get the COCO keypoints coorespondence map
+def get_keypoints():
+    """Get the COCO keypoints and their left/right flip coorespondence map."""
+    keypoints = {
+        'nose': 0,
+        'left_eye': 1,
+        'right_eye': 2,
+        'left_ear': 3,
+        'right_ear': 4,
+        'left_shoulder': 5,
+        'right_shoulder': 6,
+        'left_elbow': 7,
+        'right_elbow': 8,
+        'left_wrist': 9,
+        'right_wrist': 10,
+        'left_hip': 11,
+        'right_hip': 12,
+        'left_knee': 13,
+        'right_knee': 14,
+        'left_ankle': 15,
+        'right_ankle': 16,
+    }
+
+    return keypoints
+
+
+def project_keypoints(landmarks, boxes, width, height):
+    """
+    Convert bbox-relative landmarks to frame pixels for all persons at once.
+    landmarks: (P, K, 2+) bbox-relative x, y; boxes: (P, 4) normalized xmin, ymin, xmax, ymax.
+    Returns (P, K, 2) float64 pixel coordinates, computed in the same order and precision as
+    (point.x() * bbox.width() + bbox.xmin()) * width, so truncating them gives the same pixels.
+    """
+    origin = boxes[:, np.newaxis, :2].astype(np.float64)
+    size = boxes[:, np.newaxis, 2:] - origin
+    return (landmarks[..., :2].astype(np.float64) * size + origin) * np.array([width, height], dtype=np.float64)
+
+# -----------------------------------------------------------------------------------------------
+# Pose batch
+# -----------------------------------------------------------------------------------------------
+# The keypoints of all persons in a frame, projected to frame pixels in one vectorized operation.
+# Columns follow keypoint_names (all COCO keypoints by default) and can be accessed by name.
+class PoseBatch:
+    def __init__(self, snapshot, width, height, keypoint_names=None, min_confidence=0.5):
+        self.snapshot = snapshot
+        self.keypoint_names = list(keypoint_names or get_keypoints())
+        self._columns = {name: i for i, name in enumerate(self.keypoint_names)}
+        self.track_ids = snapshot.track_ids
+        self.points = project_keypoints(snapshot.landmarks, snapshot.boxes, width, height)  # (P, K, 2)
+        self.confidence = snapshot.landmarks[..., 2]                                         # (P, K), NaN if missing
+        self.visible = self.confidence >= min_confidence                                     # (P, K)
+        self.has_landmarks = ~np.isnan(self.confidence).all(axis=1)                          # (P,)
+
+    @classmethod
+    def from_roi(cls, roi, width, height, keypoint_names=None, min_confidence=0.5, labels=("person",)):
+        """Snapshot the persons of a ROI, reading only the requested keypoints, and project them."""
+        keypoints = get_keypoints()
+        names = list(keypoint_names or keypoints)
+        snapshot = DetectionSnapshot.from_roi(roi, with_landmarks=True, labels=labels,
+                                              landmark_indices=[keypoints[name] for name in names])
+        return cls(snapshot, width, height, names, min_confidence)
+
+    def __len__(self):
+        return len(self.track_ids)
+
+    def columns(self, names):
+        return [self._columns[name] for name in names]
+
+    def keypoint(self, name):
+        """(P, 2) pixel coordinates of a single keypoint for every person."""
+        return self.points[:, self._columns[name]]
+
+    def keypoints(self, names):
+        """(P, len(names), 2) pixel coordinates of the named keypoints."""
+        return self.points[:, self.columns(names)]
+
+    def to_int(self):
+        """(P, K, 2) int32 pixel coordinates (truncated like int()), -1 for missing keypoints."""
+        return np.where(np.isnan(self.points), -1, self.points).astype(np.int32)
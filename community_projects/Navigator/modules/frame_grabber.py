@@ -1,17 +1,40 @@
 import cv2
 import numpy as np
 import threading
-from time import time, sleep
+from collections import namedtuple
+from time import monotonic, sleep
+
+# A captured frame: the image (read-only), its sequence number (counts from 0 per grabber)
+# and the time.monotonic() time at which the capture returned it
+CapturedFrame = namedtuple('CapturedFrame', ['image', 'sequence', 'timestamp'])
 
 
 class FrameGrabber(threading.Thread):
-    def __init__(self, cap, width, height):
-        super().__init__()
+    """
+    Captures frames from a cv2.VideoCapture on a background thread into preallocated buffers.
+
+    cap.read() writes straight into a free buffer, frames of another size are resized into it, and the
+    buffers are handed out as read-only arrays without copies. get_frame() and wait_frame() lease the
+    buffer of the frame they return: it is not overwritten until the consumer passes the frame to
+    release(). Capture waits while all the other buffers are leased, so a consumer holding n frames at a
+    time needs n + 2 buffers. get_last_frame() returns a copy and needs no release. Consumers can block
+    until a new frame arrives with wait_frame().
+
+    With realtime=True (for video files) frames are paced at the file's frame rate, like a camera.
+    When capture stops (end of a video file, or stop()) `ended` is set and waiting consumers are woken up.
+    """
+
+    def __init__(self, cap, width, height, realtime=False, buffers=3):
+        super().__init__(daemon=True)
+        if buffers < 3:
+            raise ValueError("FrameGrabber needs at least 3 buffers (latest, leased, being captured)")
         self.cap = cap
-        _, self.frame = self.cap.read()
+        self.is_file = self.cap.get(cv2.CAP_PROP_FRAME_COUNT) > 0
         self.running = False
+        self.ended = False
         self.width = width
         self.height = height
+        self.realtime = realtime
         self.fps = int(self.cap.get(cv2.CAP_PROP_FPS)) or 30
         self.fourcc = cv2.VideoWriter_fourcc(*"X264")
         self.hls_directory = "./test"
@@ -23,23 +46,117 @@ class FrameGrabber(threading.Thread):
         #     f"hlssink location={self.hls_directory}/segment_%05d.ts playlist-location={self.hls_directory}/playlist.m3u8 target-duration=5 max-files=5"
         # )
 
+        self._buffers = [np.zeros((height, width, 3), dtype=np.uint8) for _ in range(buffers)]
+        self._views = []
+        for buffer in self._buffers:
+            view = buffer.view()
+            view.flags.writeable = False
+            self._views.append(view)
+        self._condition = threading.Condition()
+        self._latest = None       # CapturedFrame
+        self._latest_index = None  # Buffer of the latest frame
+        self._leases = [0] * buffers  # Number of unreleased frames handed out from each buffer
+        self._sequence = 0
+        self._capture()  # The first frame is available right away
+
+    def _free_buffer(self):
+        """A buffer that is neither the latest frame nor leased, waits for a release (None once stopped)."""
+        with self._condition:
+            while True:
+                for i, leases in enumerate(self._leases):
+                    if not leases and i != self._latest_index:
+                        return i
+                if self.ended or (self._latest is not None and not self.running):
+                    return None
+                self._condition.wait()
+
+    def _capture(self):
+        """Read one frame into a free buffer and publish it. Returns False if there was no frame."""
+        index = self._free_buffer()
+        if index is None:
+            return False
+        buffer = self._buffers[index]
+        ret, frame = self.cap.read(buffer)
+        timestamp = monotonic()
+        if not ret or frame is None:
+            return False
+        if frame is not buffer:  # Another size than the buffer, OpenCV allocated a new array
+            if frame.ndim == 2:
+                frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+            cv2.resize(frame, (self.width, self.height), dst=buffer)
+        with self._condition:
+            self._latest = CapturedFrame(self._views[index], self._sequence, timestamp)
+            self._latest_index = index
+            self._sequence += 1
+            self._condition.notify_all()
+        return True
+
     def run(self):
         self.running = True
+        start = monotonic()
+        frames = 0
         while self.running:
-            ret, frame = self.cap.read()
-            if not ret:
+            if self.realtime:
+                delay = start + frames / self.fps - monotonic()
+                if delay > 0:
+                    sleep(delay)
+            if self._capture():
+                frames += 1
+                continue
+            if not self.running:
+                break
+            if self.is_file or not self.cap.isOpened():
                 print("Can't receive frame (stream ended?).")
-            if (frame is None) or (self.frame is None):
-                print("BADDDDD")
-    
-            self.frame = frame
+                break
+            print("Can't receive frame, retrying.")
             sleep(0.05)
+        with self._condition:
+            self.running = False
+            self.ended = True
+            self._condition.notify_all()
 
     def stop(self):
-        self.running = False
+        with self._condition:
+            self.running = False
+            self._condition.notify_all()  # Capture may be waiting for a released buffer
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout=1.0)
         self.cap.release()
 
-    def get_last_frame(self):
-        self.frame = np.resize(self.frame, (self.height, self.width, 3))
-        return self.frame
+    def _lend(self, captured):
+        if captured is not None:
+            self._leases[self._latest_index] += 1
+        return captured
+
+    def release(self, captured):
+        """Give back the buffer of a CapturedFrame from get_frame() or wait_frame(), it may be overwritten."""
+        index = next(i for i, view in enumerate(self._views) if captured.image is view)
+        with self._condition:
+            if self._leases[index] == 0:
+                raise ValueError("Frame released more often than it was handed out")
+            self._leases[index] -= 1
+            self._condition.notify_all()
 
+    def get_frame(self):
+        """The latest CapturedFrame, without waiting (None before the first frame). Release it after use."""
+        with self._condition:
+            return self._lend(self._latest)
+
+    def wait_frame(self, last_sequence=-1, timeout=None):
+        """
+        Block until there is a frame newer than last_sequence and return it as a CapturedFrame, to release
+        after use. Returns None on timeout, or when the stream ended and no newer frame will come.
+        """
+        with self._condition:
+            newer = lambda: self._latest is not None and self._latest.sequence > last_sequence
+            self._condition.wait_for(lambda: newer() or self.ended, timeout)
+            return self._lend(self._latest) if newer() else None
+
+    def get_last_frame(self):
+        """A copy of the image of the latest frame (None before the first frame)."""
+        captured = self.get_frame()
+        if captured is None:
+            return None
+        image = captured.image.copy()
+        self.release(captured)
+        return image
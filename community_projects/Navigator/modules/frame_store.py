@@ -0,0 +1,194 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import cv2
+import numpy as np
+
+CODECS = {'png': '.png', 'jpeg': '.jpg', 'npy': '.npy'}
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.npy')
+MANIFEST_NAME = 'manifest.txt'
+
+
+def write_frame(path, frame, jpeg_quality=95):
+    """Encode a frame by the extension of path (.png, .jpg or raw .npy)."""
+    if path.endswith('.npy'):
+        np.save(path, frame)
+    elif path.endswith('.jpg'):
+        cv2.imwrite(path, frame, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+    else:
+        cv2.imwrite(path, frame)
+
+
+def read_frame(path):
+    """Decode a frame written by write_frame, None if it can not be read."""
+    if path.endswith('.npy'):
+        try:
+            return np.load(path)
+        except (OSError, ValueError):
+            return None
+    return cv2.imread(path)
+
+
+class FrameStore:
+    """
+    The recorded frames of a route: image files in storage_dir, listed in an append-only manifest.
+
+    add() returns the frame's name right away and encodes it on a thread pool with the selected codec
+    (png, jpeg or npy, which is raw and the fastest to write and read). A frame is added to the manifest
+    once its file is complete, so after a crash the manifest only lists readable frames. Names are
+    capture timestamps, so sorting them gives the capture order.
+
+    Playback reads frames by position or name with an LRU cache of decoded frames, so stepping back
+    and forth along the route does not decode or list the directory again.
+    """
+
+    def __init__(self, storage_dir, codec='png', writers=2, max_pending=8, cache_size=32):
+        if codec not in CODECS:
+            raise ValueError(f"Unknown codec {codec}, expected one of {list(CODECS)}")
+        self.storage_dir = storage_dir
+        self.codec = codec
+        self.cache_size = cache_size
+        self.manifest_path = os.path.join(storage_dir, MANIFEST_NAME)
+        os.makedirs(storage_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._names = self._load_manifest()
+        self._manifest = open(self.manifest_path, 'a')
+        self._sorted = True
+        self._positions = None
+        self._cache = OrderedDict()
+        self._pool = ThreadPoolExecutor(max_workers=writers, thread_name_prefix='frame-writer')
+        self._pending = threading.BoundedSemaphore(max_pending)
+        self._futures = set()
+        self._last_stamp = None
+        self._same_stamp = 0
+
+    def _load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            # Frames recorded before the manifest: list the directory once
+            names = sorted(name for name in os.listdir(self.storage_dir) if name.lower().endswith(IMAGE_EXTENSIONS))
+            with open(self.manifest_path, 'w') as f:
+                f.writelines(f"{name}\n" for name in names)
+            return names
+        with open(self.manifest_path) as f:
+            lines = f.read().split('\n')
+        # The last line is empty, or a partial entry from an interrupted write
+        names = [name for name in lines[:-1] if name]
+        return sorted(set(names))
+
+    def __len__(self):
+        return len(self._names)
+
+    def _ensure_sorted(self):
+        # Writers may finish out of order, the manifest is sorted when it is read
+        if not self._sorted:
+            self._names.sort()
+            self._sorted = True
+            self._positions = None
+
+    @property
+    def names(self):
+        """Frame names in capture order."""
+        with self._lock:
+            self._ensure_sorted()
+            return list(self._names)
+
+    def _new_name(self):
+        stamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S%f')
+        if stamp == self._last_stamp:  # Frames within the clock resolution
+            self._same_stamp += 1
+            return f"image_{stamp}_{self._same_stamp}{CODECS[self.codec]}"
+        self._last_stamp, self._same_stamp = stamp, 0
+        return f"image_{stamp}{CODECS[self.codec]}"
+
+    def add(self, frame):
+        """Queue a frame for writing and return its name. Blocks while max_pending frames are being written."""
+        name = self._new_name()
+        frame = np.array(frame)  # FrameGrabber buffers are reused, the writer needs its own copy
+        self._pending.acquire()
+        future = self._pool.submit(self._write, name, frame)
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(self._written)
+        return name
+
+    def _write(self, name, frame):
+        write_frame(os.path.join(self.storage_dir, name), frame)
+        with self._lock:
+            self._manifest.write(f"{name}\n")
+            self._manifest.flush()
+            if self._names and name < self._names[-1]:
+                self._sorted = False
+            self._names.append(name)
+            self._positions = None
+
+    def _written(self, future):
+        with self._lock:
+            self._futures.discard(future)
+        self._pending.release()
+        if future.exception() is not None:
+            print(f"Failed to write frame: {future.exception()}")
+
+    def flush(self):
+        """Wait until all added frames are written."""
+        with self._lock:
+            futures = list(self._futures)
+        for future in futures:
+            future.exception()  # Waits, errors are reported by _written
+
+    def name_at(self, position):
+        with self._lock:
+            self._ensure_sorted()
+            return self._names[position]
+
+    def index_of(self, name):
+        """Position of a frame in the route."""
+        with self._lock:
+            self._ensure_sorted()
+            if self._positions is None:
+                self._positions = {n: i for i, n in enumerate(self._names)}
+            return self._positions[name]
+
+    def load(self, key):
+        """Decoded frame by position in the route or by name (None if it can not be read)."""
+        name = self.name_at(key) if isinstance(key, int) else key
+        with self._lock:
+            frame = self._cache.get(name)
+            if frame is not None:
+                self._cache.move_to_end(name)
+                return frame
+        frame = read_frame(os.path.join(self.storage_dir, name))
+        if frame is None:
+            return None
+        frame.flags.writeable = False  # Shared with later callers through the cache
+        if self.cache_size:
+            with self._lock:
+                self._cache[name] = frame
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return frame
+
+    def clear(self):
+        """Delete all frames and the manifest."""
+        self.flush()
+        with self._lock:
+            for name in os.listdir(self.storage_dir):
+                file_path = os.path.join(self.storage_dir, name)
+                try:
+                    os.remove(file_path)
+                    print(f"Deleted image: {file_path}")
+                except Exception as e:
+                    print(f"Failed to delete {file_path}: {e}")
+            self._names = []
+            self._sorted = True
+            self._positions = None
+            self._cache.clear()
+            self._manifest.close()
+            self._manifest = open(self.manifest_path, 'w')
+
+    def close(self):
+        self.flush()
+        self._pool.shutdown()
+        self._manifest.close()
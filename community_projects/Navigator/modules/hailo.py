@@ -1,7 +1,14 @@
 import onnxruntime as ort
-from hailo_platform import (HEF, VDevice, HailoStreamInterface, InferVStreams, ConfigureParams,
-    InputVStreamParams, OutputVStreamParams, InputVStreams, OutputVStreams, FormatType)
+try:
+    from hailo_platform import (HEF, VDevice, HailoStreamInterface, InferVStreams, ConfigureParams,
+        InputVStreamParams, OutputVStreamParams, InputVStreams, OutputVStreams, FormatType)
+except ImportError:
+    # FakeHailo and InferencePipeline run without the Hailo runtime
+    HEF = None
+import queue
+import threading
 import time
+from concurrent.futures import Future
 class SingletonMeta(type):
     """
     This is a thread-safe implementation of Singleton.
@@ -65,3 +72,125 @@ class Hailo():
             self.infer_gen.send(None)
 
 
+class FakeHailo():
+    """
+    CPU stand-in for Hailo with the same infer() interface, for testing scheduling and throughput
+    without the device. infer_fn computes the output dict from the input frame, and each call takes at
+    least `latency` seconds, spent sleeping (like waiting for the device, the GIL is released).
+    """
+
+    def __init__(self, infer_fn, latency=0.0):
+        self.infer_fn = infer_fn
+        self.latency = latency
+        self.running = True
+        self.calls = 0
+
+    def infer(self, input_frame):
+        start = time.perf_counter()
+        results = self.infer_fn(input_frame)
+        self.calls += 1
+        remaining = self.latency - (time.perf_counter() - start)
+        if remaining > 0:
+            time.sleep(remaining)
+        return results
+
+    def deactivate_network(self):
+        self.running = False
+
+
+class StageTimer():
+    """
+    Thread-safe counters of the time spent in one pipeline stage.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    def mean(self):
+        with self._lock:
+            return self.total / self.count if self.count else 0.0
+
+
+class InferencePipeline():
+    """
+    Runs preprocess -> infer -> postprocess on one thread per stage, so the pre-processing of frame N+1
+    and the post-processing of frame N-1 overlap the device inference of frame N.
+
+    submit() returns a concurrent.futures.Future for the result of a frame. At most max_in_flight frames
+    are between submit() and their result, submit() blocks until one completes, which bounds the memory
+    and latency when frames come faster than the device. Results complete in submission order.
+    The infer function is only ever called from the inference thread (Hailo.infer drives a generator).
+    """
+
+    STAGES = ('preprocess', 'infer', 'postprocess')
+
+    def __init__(self, preprocess, infer, postprocess, max_in_flight=3):
+        self.functions = dict(zip(self.STAGES, (preprocess, infer, postprocess)))
+        self.timers = {stage: StageTimer() for stage in self.STAGES + ('latency',)}
+        self.max_in_flight = max_in_flight
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._queues = [queue.Queue() for _ in self.STAGES]
+        self._threads = [threading.Thread(target=self._run_stage, args=(i,), daemon=True, name=f'{stage}-stage')
+                         for i, stage in enumerate(self.STAGES)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, *args):
+        """Queue a frame. args are passed to the preprocess function, its return value to infer, and so on."""
+        self._slots.acquire()
+        future = Future()
+        future.add_done_callback(lambda _: self._slots.release())
+        self._queues[0].put((future, time.perf_counter(), args))
+        return future
+
+    def infer(self, *args):
+        """Synchronous inference of one frame through the pipeline."""
+        return self.submit(*args).result()
+
+    def _run_stage(self, index):
+        stage = self.STAGES[index]
+        function = self.functions[stage]
+        timer = self.timers[stage]
+        last = index == len(self.STAGES) - 1
+        while True:
+            item = self._queues[index].get()
+            if item is None:
+                if not last:
+                    self._queues[index + 1].put(None)
+                return
+            future, submitted, args = item
+            if index == 0 and not future.set_running_or_notify_cancel():
+                continue  # Cancelled before it started
+            start = time.perf_counter()
+            try:
+                result = function(*args)
+            except BaseException as e:
+                future.set_exception(e)
+                continue
+            timer.add(time.perf_counter() - start)
+            if last:
+                self.timers['latency'].add(time.perf_counter() - submitted)
+                future.set_result(result)
+            else:
+                self._queues[index + 1].put((future, submitted, (result,)))
+
+    def stats(self):
+        """Mean and max time per stage and of the whole pipeline ('latency'), in milliseconds."""
+        return {stage: {'count': timer.count, 'mean_ms': timer.mean() * 1000, 'max_ms': timer.max * 1000}
+                for stage, timer in self.timers.items()}
+
+    def close(self):
+        """Finish the queued frames and stop the stage threads."""
+        self._queues[0].put(None)
+        for thread in self._threads:
+            thread.join()
+
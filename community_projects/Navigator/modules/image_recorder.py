@@ -1,27 +1,37 @@
 import threading
 import time
-import os
-import cv2
-from datetime import datetime   
+from modules.frame_store import FrameStore
+from modules.route_store import RouteStore, RoutePlayer
+from modules.place_index import PlaceIndex
 class ImageRecorder(threading.Thread):
-    def __init__(self, frame_grabber, storage_dir):
+    def __init__(self, frame_grabber, storage_dir, route_dir=None, feature_extractor=None, prefetch=4,
+                 codec='png', cache_size=32):
         """
         Initialize the ImageRecorder class.
 
         Args:
             frame_grabber (FrameGrabber): Instance of an existing FrameGrabber.
             storage_dir (str): Directory to store recorded images.
+            route_dir (str): Directory of the RouteStore holding the features of the recorded images (optional).
+            feature_extractor (callable): frame -> {'keypoints', 'descriptors'}, required with route_dir.
+            prefetch (int): Number of waypoints loaded ahead during playback.
+            codec (str): Format of recorded images: 'png', 'jpeg' or 'npy' (see FrameStore).
+            cache_size (int): Number of decoded images kept for playback.
         """
         super().__init__()
         self.frame_grabber = frame_grabber
         self.storage_dir = storage_dir
+        self.frames = FrameStore(storage_dir, codec=codec, cache_size=cache_size)
         self.running = False
         self.mode = "playback"  # Modes: 'record' or 'playback'
         self.output_queue = []
         self.current_image_index = 0
-
-        # Ensure the storage directory exists
-        os.makedirs(storage_dir, exist_ok=True)
+        self.route_store = RouteStore(route_dir) if route_dir else None
+        self.feature_extractor = feature_extractor
+        self.prefetch = prefetch
+        self.route_player = None
+        self.route_names = None
+        self.place_index = None
 
     def run(self):
         self.running = True
@@ -36,6 +46,10 @@ class ImageRecorder(threading.Thread):
         Stop the thread and release resources.
         """
         self.running = False
+        if self.is_alive() and self is not threading.current_thread():
+            self.join()  # The recording loop may still be adding a frame
+        self.frames.close()
+        self.stop_route_player()
 
     def switch_to_record(self):
         """
@@ -49,19 +63,42 @@ class ImageRecorder(threading.Thread):
         """
         self.mode = "playback"
         self.current_image_index = 0
+        self.frames.flush()
+        self.stop_route_player()
+        self.route_names = None
+        self.place_index = None
+
+    def stop_route_player(self):
+        if self.route_player is not None:
+            self.route_player.stop()
+            self.route_player = None
+
+    def load_route(self):
+        """
+        List the recorded waypoints and index them for relocalization (see nearest_waypoints).
+        Images recorded without the route store get their features now, before the control loop starts.
+        """
+        if self.route_names is not None:
+            return
+        self.route_names = self.frames.names
+        if self.route_store is not None:
+            self.route_store.sync(self.frames.load, self.route_names, self.feature_extractor)
+            self.place_index = PlaceIndex.from_route_store(self.route_store, self.route_names)
 
     def record_images(self):
         """
-        Continuously capture and save images every 0.5 seconds in sequential order using the frame grabber.
+        Continuously capture and save images every 0.3 seconds in sequential order using the frame grabber.
+        Images are encoded on the FrameStore writer threads.
         """
         while self.mode == "record" and self.running:
             frame = self.frame_grabber.get_last_frame()
 
             if frame is not None:
-                timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S%f")
-                filename = os.path.join(self.storage_dir, f"image_{timestamp}.png")
-                cv2.imwrite(filename, frame)
-                print(f"Image saved: {filename}")
+                name = self.frames.add(frame)
+                if self.route_store is not None:
+                    features = self.feature_extractor(frame)
+                    self.route_store.append(name, features['keypoints'], features['descriptors'])
+                print(f"Image saved: {name}")
                 time.sleep(0.3)
             else:
                 print("No frame available from frame grabber.")
@@ -74,22 +111,71 @@ class ImageRecorder(threading.Thread):
             frame (numpy array): The next image frame, or None if no more images are available.
         """
         if self.mode == "playback":
-            image_files = sorted(os.listdir(self.storage_dir))
-            print(len(image_files),"images found")
-            if self.current_image_index < len(image_files):
-                image_file = image_files[self.current_image_index]
-                image_path = os.path.join(self.storage_dir, image_file)
-                frame = cv2.imread(image_path)
+            if self.current_image_index < len(self.frames):
+                image_file = self.frames.name_at(self.current_image_index)
+                frame = self.frames.load(image_file)
                 if frame is not None:
                     self.current_image_index += 1
-                    print(f"Sent image: {image_path}")
+                    print(f"Sent image: {image_file}")
                     return frame
                 else:
-                    print(f"Failed to load image: {image_path}")
+                    print(f"Failed to load image: {image_file}")
             else:
                 print("No more images to display.")
         return None
 
+    def get_next_waypoint(self):
+        """
+        Get the next image and its features in playback mode.
+        With a route store, both come from the prefetching RoutePlayer and the features are the ones
+        stored at record time. Otherwise the image is read from disk and its features are computed.
+
+        Returns:
+            (frame, features): The next waypoint, or (None, None) if no more images are available.
+        """
+        if self.mode != "playback":
+            return None, None
+        if self.route_store is None:
+            frame = self.get_next_image()
+            return (frame, self.feature_extractor(frame)) if frame is not None else (None, None)
+
+        if self.route_player is None:
+            self.load_route()
+            self.route_player = RoutePlayer(self.route_store, self.frames.load,
+                                            self.route_names[self.current_image_index:], self.prefetch)
+        waypoint = self.route_player.next_waypoint()
+        if waypoint is None:
+            print("No more images to display.")
+            return None, None
+        name, frame, features = waypoint
+        self.current_image_index = self.frames.index_of(name) + 1
+        print(f"Sent image: {name}")
+        return frame, features
+
+    def nearest_waypoints(self, descriptors, k=5):
+        """
+        Find the recorded waypoints that look most like an image, by global descriptor similarity.
+
+        Args:
+            descriptors: Local descriptors of the image (N, 64).
+            k (int): Number of candidates.
+
+        Returns:
+            List of (image name, cosine similarity), best first. Empty without a route store.
+        """
+        if self.route_store is None:
+            return []
+        self.load_route()
+        return self.place_index.search(descriptors, k)
+
+    def seek_waypoint(self, name):
+        """
+        Continue playback from a recorded waypoint, the next get_next_waypoint returns it.
+        """
+        self.load_route()
+        self.stop_route_player()
+        self.current_image_index = self.frames.index_of(name)
+
     def get_previous_image(self):
         """
         Get the previous image in playback mode.
@@ -98,17 +184,15 @@ class ImageRecorder(threading.Thread):
             frame (numpy array): The previous image frame, or None if no more images are available.
         """
         if self.mode == "playback":
-            image_files = sorted(os.listdir(self.storage_dir))
             if self.current_image_index > 0:
                 self.current_image_index -= 1
-                image_file = image_files[self.current_image_index]
-                image_path = os.path.join(self.storage_dir, image_file)
-                frame = cv2.imread(image_path)
+                image_file = self.frames.name_at(self.current_image_index)
+                frame = self.frames.load(image_file)
                 if frame is not None:
                     print(f"Sent image: {image_file}")
                     return frame
                 else:
-                    print(f"Failed to load image: {image_path}")
+                    print(f"Failed to load image: {image_file}")
             else:
                 print("Already at the first image.")
         return None
@@ -117,12 +201,7 @@ class ImageRecorder(threading.Thread):
         """
         Remove all images from the storage directory.
         """
-        image_files = os.listdir(self.storage_dir)
-        for image_file in image_files:
-            file_path = os.path.join(self.storage_dir, image_file)
-            try:
-                os.remove(file_path)
-                print(f"Deleted image: {file_path}")
-            except Exception as e:
-                print(f"Failed to delete {file_path}: {e}")
+        self.frames.clear()
+        if self.route_store is not None:
+            self.route_store.clear()
 
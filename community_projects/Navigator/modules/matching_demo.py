@@ -2,10 +2,9 @@ import cv2
 import numpy as np
 from modules.frame_grabber import FrameGrabber
 from modules.image_recorder import ImageRecorder
-from time import sleep, time
+from time import sleep, time, monotonic
 from modules.xfeat import XFeat
 from modules.method import Method, CVWrapper
-import os
 import server.external.McLumk_Wheel_Sports as mclumk
 
 
@@ -28,14 +27,11 @@ class MatchingDemo:
         self.H = None
         self.setup_camera()
 
-        #Init frame grabber thread
-        self.frame_grabber = FrameGrabber(self.cap, self.width, self.height)
+        #Init frame grabber thread, with buffers for the frame being matched, the next one being extracted,
+        #the one copied by get_last_frame, the latest one and the one being captured
+        self.frame_grabber = FrameGrabber(self.cap, self.width, self.height, realtime=args.video != "", buffers=5)
         self.frame_grabber.start()
-
-        #recorder
-        if args.navigate:
-            self.recorder = ImageRecorder(frame_grabber=self.frame_grabber, storage_dir="resources/recorded_images")
-            self.recorder.start()
+        self.frame_sequence = -1
 
         #Homography params
         self.min_inliers = 50
@@ -43,13 +39,33 @@ class MatchingDemo:
 
         self.win = False
 
+        #Relocalization: after this many frames without a homography, look for the nearest recorded waypoint
+        self.relocalize_after = 30
+        self.relocalize_candidates = 5
+        self.lost_frames = 0
+        self.current_precomp = None
+        self.moved = False  # Set when the robot moved, frames captured before are stale
+
         #FPS check
         self.FPS = 0
         self.time_list = []
         self.max_cnt = 30 #avg FPS over this number of frames
+        #Capture to result latency, avg over max_cnt frames
+        self.latency = 0
+        self.latency_list = []
 
         #Set local feature method here -- we expect cv2 or Kornia convention
         self.method = init_method(max_kpts=args.max_kpts, width= self.width, height=self.height)
+        #The features of the next frame are extracted while the current one is matched (see frames()).
+        #Started before the recorder thread, whose detectAndCompute calls then wait for their turn in it
+        self.method.descriptor.mtd.start_pipeline()
+
+        #recorder, features of the recorded images are stored with them for playback
+        if args.navigate:
+            self.recorder = ImageRecorder(frame_grabber=self.frame_grabber, storage_dir="resources/recorded_images",
+                                          route_dir="resources/recorded_route",
+                                          feature_extractor=lambda frame: self.method.descriptor.detectAndCompute(frame, None))
+            self.recorder.start()
         
         # Setting up font for captions
         self.font = cv2.FONT_HERSHEY_SIMPLEX
@@ -79,6 +95,54 @@ class MatchingDemo:
             print("Cannot open camera")
             exit()
 
+    def next_frame(self):
+        """
+        Wait for a frame newer than the last one processed, so no frame is processed twice.
+        Returns the leased CapturedFrame, to release with the frame grabber, or None when the capture ended.
+        """
+        captured = self.frame_grabber.wait_frame(self.frame_sequence)
+        if captured is not None:
+            self.frame_sequence = captured.sequence
+        return captured
+
+    def extract(self, captured):
+        return self.method.descriptor.detectAndComputeAsync(captured.image) if captured is not None else None
+
+    def frames(self):
+        """
+        Yield (frame, capture time, features) for every new frame, until the capture ends.
+        The features of the next frame are extracted on the XFeat pipeline while the caller processes
+        the current one. If the robot moved meanwhile, the next frame is dropped for a newer one.
+        A frame is released to the frame grabber when the caller asks for the next one.
+        """
+        captured = self.next_frame()
+        pending = self.extract(captured)
+        next_captured = None
+        try:
+            while captured is not None:
+                features = pending.result()
+                next_captured = self.next_frame()
+                pending = self.extract(next_captured)
+                yield captured.image, captured.timestamp, features
+                if self.moved and next_captured is not None:
+                    self.moved = False
+                    pending.result()  # Captured before the move, wait for a frame after it
+                    self.frame_grabber.release(next_captured)
+                    next_captured = self.next_frame()
+                    pending = self.extract(next_captured)
+                self.frame_grabber.release(captured)
+                captured, next_captured = next_captured, None
+        finally:  # Also when the caller stops early
+            for held in (captured, next_captured):
+                if held is not None:
+                    self.frame_grabber.release(held)
+
+    def measure_latency(self, timestamp):
+        self.latency_list.append(monotonic() - timestamp)
+        if len(self.latency_list) > self.max_cnt:
+            self.latency_list.pop(0)
+        self.latency = np.array(self.latency_list).mean()
+
     def draw_quad(self, frame, point_list):
         if len(self.corners) > 1:
             for i in range(len(self.corners) - 1):
@@ -156,42 +220,45 @@ class MatchingDemo:
         if ((1 - midx_threshold) < abs(midx / ref_midx) < (1 + midx_threshold)):
             if ((1 - area_threshold) < abs(area / ref_area) < (1 + area_threshold)):
                 # Robot is in the right spot, next image
-                self.ref_frame = self.recorder.get_next_image()
+                self.ref_frame, self.ref_precomp = self.recorder.get_next_waypoint()
                 if self.ref_frame is None:
                     print("Reached destination")
                     self.win = True
                     return
-                self.ref_precomp = self.method.descriptor.detectAndCompute(self.ref_frame, None)
             elif area < ref_area:
                 if self.args.run_with_car:
                     mclumk.move_forward(speed_default)
                 sleep(1)
+                self.moved = True
                 print("Forward")
             else:
                 if self.args.run_with_car:
                     mclumk.move_backward(speed_default)
                 sleep(1)
+                self.moved = True
                 print("Backward")
         elif midx < ref_midx:
             if self.args.run_with_car:
                 mclumk.rotate_left(3)
             sleep(0.5)
+            self.moved = True
             print("Left")
         else:
             if self.args.run_with_car:
                 mclumk.rotate_right(3)
             sleep(0.5)
+            self.moved = True
             print("Right")
 
         if self.args.run_with_car:
             mclumk.stop_robot()
 
-    def process(self):
+    def process(self, current):
         # Create a blank canvas for the top frame
         top_frame_canvas = self.create_top_frame()
 
         # Match features and draw matches on the bottom frame
-        bottom_frame = self.match_and_draw(self.ref_frame, self.current_frame)
+        bottom_frame = self.match_and_draw(self.ref_frame, self.current_frame, current)
         # Draw warped corners
         if self.H is not None and len(self.corners) > 1:
             if self.args.navigate:
@@ -201,6 +268,11 @@ class MatchingDemo:
             if self.args.run_with_car:
                 mclumk.stop_robot()
             print("No box!!!!")
+            self.lost_frames += 1
+            if self.lost_frames >= self.relocalize_after:
+                self.relocalize()
+        if self.H is not None:
+            self.lost_frames = 0
 
         key = cv2.waitKey(1)
 
@@ -209,7 +281,7 @@ class MatchingDemo:
 
         cv2.imshow(self.window_name, canvas)
 
-    def match_and_draw(self, ref_frame, current_frame):
+    def match_and_draw(self, ref_frame, current_frame, current):
         bad_threshold = 10
         if self.args.navigate:
             bad_threshold = 60
@@ -217,8 +289,7 @@ class MatchingDemo:
         kp1, kp2 = [], []
         points1, points2 = [], []
 
-
-        current = self.method.descriptor.detectAndCompute(current_frame)
+        self.current_precomp = current
         # end = time()
         # print(end-start)
         kpts1, descs1 = self.ref_precomp['keypoints'], self.ref_precomp['descriptors']
@@ -265,27 +336,45 @@ class MatchingDemo:
 
         return matched_frame
     
+    def relocalize(self):
+        """
+        Jump to the recorded waypoint the robot is nearest to: the global descriptor index proposes a few
+        candidates and the one with the most local feature matches becomes the reference.
+        """
+        self.lost_frames = 0
+        if self.current_precomp is None or len(self.current_precomp['descriptors']) == 0:
+            return
+        best_name, best_matches = None, 0
+        for name, _ in self.recorder.nearest_waypoints(self.current_precomp['descriptors'], self.relocalize_candidates):
+            candidate = self.recorder.route_store.get(name)
+            idx0, _ = self.method.matcher.match(candidate['descriptors'], self.current_precomp['descriptors'], 0.82)
+            if len(idx0) > best_matches:
+                best_name, best_matches = name, len(idx0)
+        if best_name is None:
+            return
+        print(f"Relocalized to {best_name} ({best_matches} matches)")
+        self.recorder.seek_waypoint(best_name)
+        ref_frame, ref_precomp = self.recorder.get_next_waypoint()
+        if ref_frame is not None:
+            self.ref_frame, self.ref_precomp = ref_frame, ref_precomp
+
     """main API functions: start_playback, start_recording, stop recording"""
     def start_playback(self):
         self.recorder.switch_to_playback()
-        self.ref_frame = self.recorder.get_next_image()
-        self.ref_precomp = self.method.descriptor.detectAndCompute(self.ref_frame, None)
+        self.ref_frame, self.ref_precomp = self.recorder.get_next_waypoint()
 
-        while not self.win:
-            self.current_frame = self.frame_grabber.get_last_frame()
-            if self.current_frame is None:
-                print("frame is none, bye")
+        for self.current_frame, timestamp, current in self.frames():
+            self.process(current)
+            self.measure_latency(timestamp)
+            if self.win:
                 break
+        else:
+            print("frame is none, bye")
 
-            self.process()
-            
         self.cleanup()
 
-    def is_folder_empty(self, folder_path):
-        return len(os.listdir(folder_path)) == 0
-
     def start_recording(self):
-        if not self.is_folder_empty('resources/recorded_images'):
+        if len(self.recorder.frames) > 0:
             print("Warning - The recorded images folder is not empty. The recorded images will be added to the older once.")
         self.recorder.switch_to_record()
         
@@ -293,25 +382,21 @@ class MatchingDemo:
         self.recorder.switch_to_playback()
 
     def main_loop(self):
-        self.current_frame = self.frame_grabber.get_last_frame()
-        self.ref_frame = self.current_frame.copy()
-        self.ref_precomp = self.method.descriptor.detectAndCompute(self.ref_frame, None) #Cache ref features
-
-        while True:
-            if self.current_frame is None:
-                break
+        for self.current_frame, timestamp, current in self.frames():
+            if self.ref_frame is None:
+                self.ref_frame = self.current_frame.copy()
+                self.ref_precomp = current #Cache ref features
 
             t0 = time()
-            self.process()
+            self.process(current)
+            self.measure_latency(timestamp)
             # self.match_and_draw_visual_flow(self.current_frame)
             key = cv2.waitKey(1)
             if key == ord('q'):
                 break
             elif key == ord('s'):
                 self.ref_frame = self.current_frame.copy()  # Update reference frame
-                self.ref_precomp = self.method.descriptor.detectAndCompute(self.ref_frame, None) #Cache ref features
-
-            self.current_frame = self.frame_grabber.get_last_frame()
+                self.ref_precomp = current #Cache ref features
 
             #Measure avg. FPS
             self.time_list.append(time()-t0)
@@ -323,6 +408,7 @@ class MatchingDemo:
 
     def cleanup(self):
         self.recorder.stop()
+        self.method.descriptor.close()
         self.frame_grabber.stop()
         self.cap.release()
         cv2.destroyAllWindows()
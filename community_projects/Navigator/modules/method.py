@@ -1,4 +1,5 @@
 import torch
+from concurrent.futures import Future
 
 class Method:
     def __init__(self, descriptor, matcher):
@@ -9,4 +10,18 @@ class CVWrapper():
     def __init__(self, mtd):
         self.mtd = mtd
     def detectAndCompute(self, x, mask=None):
-        return self.mtd.detectAndCompute(torch.tensor(x).permute(2,0,1).float()[None])[0]
+        return self.mtd.detectAndCompute(self.to_tensor(x))[0]
+    def detectAndComputeAsync(self, x, mask=None):
+        """Future of detectAndCompute(x), extracted on the pipeline of the wrapped method."""
+        result = Future()
+        def done(future):
+            if future.exception() is not None:
+                result.set_exception(future.exception())
+            else:
+                result.set_result(future.result()[0])
+        self.mtd.detectAndComputeAsync(self.to_tensor(x)).add_done_callback(done)
+        return result
+    def to_tensor(self, x):
+        return torch.tensor(x).permute(2,0,1).float()[None]
+    def close(self):
+        self.mtd.close()
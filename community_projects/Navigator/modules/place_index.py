@@ -0,0 +1,124 @@
+import numpy as np
+import torch
+
+
+def _as_numpy(descriptors):
+    if isinstance(descriptors, torch.Tensor):
+        descriptors = descriptors.cpu().numpy()
+    return np.asarray(descriptors, dtype=np.float32)
+
+
+def _normalize(x, axis=-1):
+    norm = np.linalg.norm(x, axis=axis, keepdims=True)
+    return x / np.maximum(norm, 1e-12)
+
+
+def train_codebook(descriptors, size=16, iterations=10, seed=0):
+    """
+    Spherical k-means over local descriptors (N, D), for VLAD aggregation.
+
+    Returns:
+        (size, D) float32 array of unit-norm cluster centers.
+    """
+    descriptors = _normalize(_as_numpy(descriptors))
+    rng = np.random.default_rng(seed)
+    centers = descriptors[rng.choice(len(descriptors), size, replace=len(descriptors) < size)].copy()
+    for _ in range(iterations):
+        members = np.zeros((size, len(descriptors)), dtype=np.float32)
+        members[np.argmax(descriptors @ centers.T, axis=1), np.arange(len(descriptors))] = 1
+        sums = members @ descriptors
+        empty = ~sums.any(axis=1)
+        sums[empty] = centers[empty]  # Keep the old center of a cluster that lost all its members
+        centers = _normalize(sums)
+    return centers
+
+
+def global_descriptor(descriptors, codebook=None):
+    """
+    Aggregate the local descriptors (N, D) of an image into one unit-norm global descriptor.
+
+    Without a codebook the descriptors are mean pooled (D values). With a codebook (K, D) they are
+    VLAD aggregated (K * D values): residuals to the nearest center are summed per center, each block is
+    normalized, then the whole vector is power and L2 normalized.
+    """
+    descriptors = _as_numpy(descriptors)
+    if codebook is None:
+        if len(descriptors) == 0:
+            return np.zeros(descriptors.shape[1], dtype=np.float32)
+        return _normalize(descriptors.mean(axis=0))
+
+    # Sum of the descriptors assigned to each center, as one (K, N) @ (N, D) product
+    members = np.zeros((len(codebook), len(descriptors)), dtype=np.float32)
+    members[np.argmax(descriptors @ codebook.T, axis=1), np.arange(len(descriptors))] = 1
+    vlad = members @ descriptors - members.sum(axis=1, keepdims=True) * codebook
+    vlad = _normalize(vlad).ravel()
+    vlad = np.sign(vlad) * np.sqrt(np.abs(vlad))
+    return _normalize(vlad)
+
+
+class PlaceIndex:
+    """
+    Global descriptors of the recorded waypoints in one contiguous (N, D) float32 matrix, searched by
+    cosine similarity. Used to find the waypoints nearest to the live frame when the robot is lost, before
+    matching the local features of those few candidates.
+    """
+
+    def __init__(self, codebook=None, initial_capacity=256):
+        self.codebook = codebook
+        self.dim = None if codebook is None else codebook.size
+        self.names = []
+        self._vectors = None
+        self._initial_capacity = initial_capacity
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def vectors(self):
+        return self._vectors[:len(self.names)] if self._vectors is not None else np.zeros((0, self.dim or 0), np.float32)
+
+    def describe(self, descriptors):
+        """Global descriptor of an image's local descriptors, with the codebook of this index."""
+        return global_descriptor(descriptors, self.codebook)
+
+    def add(self, name, descriptors):
+        """Add a waypoint from its local descriptors (N, D), numpy or torch."""
+        vector = self.describe(descriptors)
+        if self._vectors is None:
+            self.dim = len(vector)
+            self._vectors = np.zeros((self._initial_capacity, self.dim), dtype=np.float32)
+        elif len(self.names) == len(self._vectors):
+            grown = np.zeros((2 * len(self._vectors), self.dim), dtype=np.float32)
+            grown[:len(self.names)] = self._vectors
+            self._vectors = grown
+        self._vectors[len(self.names)] = vector
+        self.names.append(name)
+
+    def search(self, descriptors, k=5):
+        """
+        Return the k waypoints most similar to an image, as a list of (name, cosine similarity) pairs,
+        best first.
+        """
+        if not self.names:
+            return []
+        scores = self.vectors @ self.describe(descriptors)
+        k = min(k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        best = best[np.argsort(-scores[best])]
+        return [(self.names[i], float(scores[i])) for i in best]
+
+    @classmethod
+    def from_route_store(cls, store, names=None, codebook_size=0):
+        """
+        Index the waypoints of a RouteStore (all of them, or `names` in that order). With codebook_size > 0,
+        a VLAD codebook of that size is trained on the stored descriptors first.
+        """
+        names = [name for name in (store.index['name'] if names is None else names) if name in store]
+        codebook = None
+        if codebook_size and names:
+            codebook = train_codebook(np.concatenate([store.get(name)['descriptors'].numpy() for name in names]),
+                                      codebook_size)
+        index = cls(codebook, initial_capacity=max(len(names), 1))
+        for name in names:
+            index.add(name, store.get(name)['descriptors'])
+        return index
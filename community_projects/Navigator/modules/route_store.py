@@ -0,0 +1,172 @@
+import os
+import queue
+import threading
+import numpy as np
+import torch
+
+DESCRIPTOR_SIZE = 64
+FEATURE_DTYPE = np.dtype([('keypoint', np.float32, 2), ('descriptor', np.float32, DESCRIPTOR_SIZE)])
+INDEX_DTYPE = np.dtype([('name', 'U64'), ('start', np.int64), ('count', np.int64)])
+
+
+class RouteStore:
+    """
+    Keypoints and descriptors of the recorded waypoints, written at record time so playback does not
+    have to run the model on the reference images again.
+
+    All features live in one memory-mapped features.npy (a structured array that is preallocated and
+    doubled when full), index.npy maps each waypoint image name to its rows. Features are flushed before
+    the index is atomically replaced, so a recording that is killed at any point leaves a valid store
+    (holding the waypoints whose index was written).
+    """
+
+    def __init__(self, path, initial_capacity=1 << 16):
+        self.path = path
+        self.initial_capacity = initial_capacity
+        self.features_path = os.path.join(path, 'features.npy')
+        self.index_path = os.path.join(path, 'index.npy')
+        os.makedirs(path, exist_ok=True)
+        self._open()
+
+    def _open(self):
+        if os.path.exists(self.index_path) and os.path.exists(self.features_path):
+            self.index = np.load(self.index_path)
+            self._features = np.load(self.features_path, mmap_mode='r+')
+        else:
+            self.index = np.zeros(0, dtype=INDEX_DTYPE)
+            self._features = np.lib.format.open_memmap(self.features_path, mode='w+', dtype=FEATURE_DTYPE,
+                                                       shape=(self.initial_capacity,))
+        self._rows = {name: i for i, name in enumerate(self.index['name'])}
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, name):
+        return name in self._rows
+
+    def _used(self):
+        return int(self.index['start'][-1] + self.index['count'][-1]) if len(self.index) else 0
+
+    def _reserve(self, rows):
+        capacity = len(self._features)
+        if rows <= capacity:
+            return
+        while capacity < rows:
+            capacity *= 2
+        grown_path = self.features_path + '.tmp'
+        grown = np.lib.format.open_memmap(grown_path, mode='w+', dtype=FEATURE_DTYPE, shape=(capacity,))
+        used = self._used()
+        grown[:used] = self._features[:used]
+        grown.flush()
+        del self._features
+        os.replace(grown_path, self.features_path)
+        self._features = grown
+
+    def append(self, name, keypoints, descriptors):
+        """Add the features of a waypoint image. keypoints: (N, 2), descriptors: (N, 64), numpy or torch."""
+        keypoints = keypoints.cpu().numpy() if isinstance(keypoints, torch.Tensor) else np.asarray(keypoints)
+        descriptors = descriptors.cpu().numpy() if isinstance(descriptors, torch.Tensor) else np.asarray(descriptors)
+        start = self._used()
+        self._reserve(start + len(keypoints))
+        rows = self._features[start:start + len(keypoints)]
+        rows['keypoint'] = keypoints
+        rows['descriptor'] = descriptors
+        self._features.flush()
+
+        self.index = np.append(self.index, np.array([(name, start, len(keypoints))], dtype=INDEX_DTYPE))
+        self._rows[name] = len(self.index) - 1
+        with open(self.index_path + '.tmp', 'wb') as f:
+            np.save(f, self.index)
+        os.replace(self.index_path + '.tmp', self.index_path)
+
+    def get(self, name):
+        """Return the features of a waypoint as XFeat.detectAndCompute does ('keypoints', 'descriptors' tensors)."""
+        _, start, count = self.index[self._rows[name]]
+        rows = np.array(self._features[start:start + count])  # Copy out of the memory map
+        return {'keypoints': torch.from_numpy(np.ascontiguousarray(rows['keypoint'])),
+                'descriptors': torch.from_numpy(np.ascontiguousarray(rows['descriptor']))}
+
+    def sync(self, load_frame, image_names, extractor):
+        """
+        Compute and store the features of waypoint images recorded without a store (older recordings).
+        load_frame(name) returns the decoded image (e.g. FrameStore.load).
+        """
+        for name in image_names:
+            if name not in self:
+                frame = load_frame(name)
+                if frame is not None:
+                    features = extractor(frame)
+                    self.append(name, features['keypoints'], features['descriptors'])
+
+    def clear(self):
+        """Remove all waypoints."""
+        del self._features
+        for path in (self.index_path, self.features_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self._open()
+
+
+class RoutePlayer(threading.Thread):
+    """
+    Loads the waypoints of a route in order on a background thread: the reference image is decoded
+    (with load_frame(name), e.g. FrameStore.load) and its features copied out of the RouteStore up to
+    `prefetch` waypoints ahead of the control loop.
+    """
+
+    def __init__(self, store, load_frame, image_names, prefetch=4):
+        super().__init__(daemon=True)
+        self.store = store
+        self.load_frame = load_frame
+        self.image_names = [name for name in image_names if name in store]
+        self._waypoints = queue.Queue(maxsize=prefetch)
+        self._stop_event = threading.Event()
+        self._ended = False
+        self.start()
+
+    def run(self):
+        try:
+            for name in self.image_names:
+                frame = self.load_frame(name)
+                if frame is None:
+                    print(f"Failed to load image: {name}")
+                    continue
+                waypoint = (name, frame, self.store.get(name))
+                while not self._stop_event.is_set():
+                    try:
+                        self._waypoints.put(waypoint, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if self._stop_event.is_set():
+                    return
+        except Exception as e:
+            print(f"Failed to load the route: {e}")
+        finally:
+            try:
+                self._waypoints.put_nowait(None)  # End of the route
+            except queue.Full:
+                pass  # Stopped with a full queue, next_waypoint sees that the thread ended
+
+    def next_waypoint(self):
+        """
+        Return (image name, frame, features) of the next waypoint, or None at the end of the route
+        (also on every later call, after stop() and after a loading error).
+        """
+        while not self._ended:
+            try:
+                waypoint = self._waypoints.get(timeout=0.1)
+            except queue.Empty:
+                if self.is_alive():
+                    continue
+                try:
+                    waypoint = self._waypoints.get_nowait()
+                except queue.Empty:
+                    waypoint = None
+            if waypoint is None:
+                self._ended = True
+            return waypoint
+        return None
+
+    def stop(self):
+        self._stop_event.set()
@@ -10,10 +10,15 @@ import torch
 import torch.nn.functional as F
 import time
 import onnxruntime as ort
-from modules.hailo import Hailo
-from hailo_platform import (FormatType)
+from modules.hailo import Hailo, FakeHailo, InferencePipeline
+try:
+	from hailo_platform import (FormatType)
+except ImportError:
+	# device='torch', 'onnx' and 'fake' run without the Hailo runtime
+	FormatType = None
 from modules.model import *
 from modules.interpolator import InterpolateSparse2d
+from modules.xfeat_postprocess import XFeatPostprocess
 
 class XFeat(nn.Module):
 	""" 
@@ -21,7 +26,7 @@ class XFeat(nn.Module):
 		It supports inference for both sparse and semi-dense feature extraction & matching.
 	"""
 
-	def __init__(self, weights = os.path.abspath(os.path.dirname(__file__)) + '/../resources/xfeat.pt', top_k = 4096, width= 640,height=480, device= 'hailo'):
+	def __init__(self, weights = os.path.abspath(os.path.dirname(__file__)) + '/../resources/xfeat.pt', top_k = 4096, width= 640,height=480, device= 'hailo', fake_latency = 0.0):
 		super().__init__()
 		self.dev = torch.device('cpu')
 		self.net = XFeatModel().to(self.dev).eval()
@@ -44,7 +49,12 @@ class XFeat(nn.Module):
 			self.hef_path = hailo_model_name_224_320_path
 		else:
 			raise Exception("Sorry, wrong dimentions")
-		self.hailo_model = Hailo(hef_path = f'{self.hef_path}{self.model_name}sim.hef',input_dtype=FormatType.FLOAT32, output_dtype=FormatType.FLOAT32)
+		if self.device == 'hailo':
+			self.hailo_model = Hailo(hef_path = f'{self.hef_path}{self.model_name}sim.hef',input_dtype=FormatType.FLOAT32, output_dtype=FormatType.FLOAT32)
+		elif self.device == 'fake':
+			# The Hailo code path with the torch network on the CPU, taking at least fake_latency seconds per frame
+			self.hailo_model = FakeHailo(self.fake_hailo_infer, latency=fake_latency)
+		self.pipeline = None
 		
 		self.width = width
 		self.height = height
@@ -54,8 +64,7 @@ class XFeat(nn.Module):
 			self.session = ort.InferenceSession(f'{self.hef_path}{self.model_name}only_head.onnx')
 			self.onnx_input_names = [input.name for input in self.session.get_inputs()]
 			self.onnx_output_names = [output.name for output in self.session.get_outputs()]
-		self._nearest = InterpolateSparse2d('nearest')
-		self._bilinear = InterpolateSparse2d('bilinear')
+		self.postprocess = XFeatPostprocess(threshold=0.05, kernel_size=5)
 		if weights is not None:
 			if isinstance(weights, str):
 				print('loading weights from: ' + weights)
@@ -96,13 +105,71 @@ class XFeat(nn.Module):
 			x = onnx_output[0]
 		else:
 			x = x.mean(dim=1, keepdim = True)
-			x = nn.InstanceNorm2d(1)(x).numpy()
-		infer_results = self.hailo_model.infer(np.transpose(x,(0, 2, 3, 1)))
+			x = F.instance_norm(x).numpy()
+		return self.hailo_outputs(self.hailo_model.infer(np.transpose(x,(0, 2, 3, 1))))
+
+
+	def hailo_outputs(self, infer_results):
 		OUTPUT_1 = infer_results[f'{self.model_name}sim/slice1']
 		OUTPUT_2 = infer_results[f'{self.model_name}sim/ew_mult1']
 		OUTPUT_3 = infer_results[f'{self.model_name}sim/conv27']
-		return torch.Tensor(np.transpose(OUTPUT_2,(0,3,1,2))), OUTPUT_1, torch.Tensor(np.transpose(OUTPUT_3,(0,3,1,2)))
+		# NHWC -> NCHW views of the output buffers, without copies
+		return torch.from_numpy(OUTPUT_2).permute(0, 3, 1, 2), OUTPUT_1, torch.from_numpy(OUTPUT_3).permute(0, 3, 1, 2)
 
+	@torch.inference_mode()
+	def fake_hailo_infer(self, input_frame):
+		""" Hailo outputs (NHWC, named as in the HEF) of the torch network, for device='fake'. """
+		M1, K1, H1 = self.net(torch.from_numpy(input_frame).permute(0, 3, 1, 2))
+		# Keypoint channels in the order the HEF outputs them (see postprocess_stage)
+		B, _, H, W = K1.shape
+		K1 = self.get_kpts_heatmap(K1).reshape(B, 8, H, 8, W).permute(0, 2, 4, 1, 3).reshape(B, H, W, 64)
+		return {f'{self.model_name}sim/slice1': K1.contiguous().numpy(),
+				f'{self.model_name}sim/ew_mult1': M1.permute(0, 2, 3, 1).contiguous().numpy(),
+				f'{self.model_name}sim/conv27': H1.permute(0, 2, 3, 1).contiguous().numpy()}
+
+	@torch.inference_mode()
+	def preprocess_stage(self, x, top_k = None):
+		""" CPU pre-processing: resize, and for the Hailo the gray NHWC normalized input. """
+		if top_k is None: top_k = self.top_k
+		x, rh1, rw1 = self.preprocess_tensor(x)
+		_, _, _H1, _W1 = x.shape
+		if x.shape[2] != self.height or x.shape[3] != self.width:
+			raise Exception("Error: retreat model size must be the same as record model size")
+		if self.device in ('hailo', 'fake') and not self.preprocess_onnx:
+			x = np.ascontiguousarray(np.transpose(F.instance_norm(x.mean(dim=1, keepdim = True)).numpy(), (0, 2, 3, 1)))
+		return x, (top_k, _H1, _W1, rh1, rw1)
+
+	@torch.inference_mode()
+	def infer_stage(self, staged):
+		""" Network inference on the (input, meta) output of preprocess_stage. """
+		x, meta = staged
+		# self.convert_to_onnx(x)
+		if self.device == 'torch':
+			outputs = self.net(x)
+		elif self.device in ('hailo', 'fake'):
+			if self.preprocess_onnx:
+				outputs = self.hailo_infer_per(x)
+			else:
+				outputs = self.hailo_outputs(self.hailo_model.infer(x))
+		elif self.device == 'onnx':
+			outputs = self.infer_onnx(x)
+		return outputs, meta
+
+	@torch.inference_mode()
+	def postprocess_stage(self, inferred):
+		""" Sparse keypoints & descriptors from the (outputs, meta) of infer_stage. """
+		(M1, K1, H1), (top_k, _H1, _W1, rh1, rw1) = inferred
+		start = time.perf_counter()
+		if self.device in ('hailo', 'fake'):
+			B, H, W, _= K1.shape
+			K1h = torch.from_numpy(K1.reshape(B, H, W, 8, 8).transpose(0, 3, 1, 4, 2).reshape(B, 1, H * 8, W * 8))
+		else:
+			K1h = self.get_kpts_heatmap(K1)
+		output = self.postprocess(M1, K1h, H1, top_k, _H1, _W1, rh1, rw1)
+
+		self.frames_num = self.frames_num + 1
+		self.sum = self.sum + time.perf_counter() - start
+		return output
 
 	@torch.inference_mode()
 	def detectAndCompute(self, x, top_k = None):
@@ -117,69 +184,41 @@ class XFeat(nn.Module):
 					'keypoints'    ->   torch.Tensor(N, 2): keypoints (x,y)
 					'scores'       ->   torch.Tensor(N,): keypoint scores
 					'descriptors'  ->   torch.Tensor(N, 64): local features
-		"""
-		if top_k is None: top_k = self.top_k
-		x, rh1, rw1 = self.preprocess_tensor(x)
-		
-		B, _, _H1, _W1 = x.shape
-
-		if x.shape[2] != self.height or x.shape[3] != self.width:
-			raise Exception("Error: retreat model size must be the same as record model size")
-		# self.convert_to_onnx(x)
-		if self.device == 'torch':
-			M1, K1, H1 = self.net(x)
-		elif self.device == 'hailo':
-			# start = time.time()
-			M1, K1, H1 = self.hailo_infer_per(x)
-			# end = time.time()
-			# print("preprocess+hailo ",end-start)
-		elif self.device == 'onnx':
-			M1, K1, H1 = self.infer_onnx(x)
-
-
-		start = time.time()
-		if self.device == 'hailo':
-			B, H, W, _= K1.shape
-			K1h = K1.reshape(B, H, W, 8, 8).transpose(0, 3, 1, 4, 2).reshape(B, 1, H * 8, W * 8)
-		elif self.device == 'torch':
-			K1h = self.get_kpts_heatmap(K1)
-		elif self.device == 'onnx':
-			K1h = self.get_kpts_heatmap(K1)
-		K1h = torch.Tensor(K1h)
-		mkpts = self.NMS(K1h, threshold=0.05, kernel_size=5)
-		#Compute reliability scores
 
-		scores = (self._nearest(K1h, mkpts, _H1, _W1) * self._bilinear(H1, mkpts, _H1, _W1)).squeeze(-1)
-		scores[torch.all(mkpts == 0, dim=-1)] = -1
+			Once detectAndComputeAsync has started the pipeline, the call goes through it and waits for its
+			turn: the stages share the Hailo generator and the post-processing scratch buffers, so they must
+			never run for two frames at once.
+		"""
+		if self.pipeline is not None:
+			return self.pipeline.infer(x, top_k)
+		return self.postprocess_stage(self.infer_stage(self.preprocess_stage(x, top_k)))
 
-		#Select top-k features
-		idxs = torch.argsort(-scores)
-		mkpts_x  = torch.gather(mkpts[...,0], -1, idxs)[:, :top_k]
-		mkpts_y  = torch.gather(mkpts[...,1], -1, idxs)[:, :top_k]
-		mkpts = torch.cat([mkpts_x[...,None], mkpts_y[...,None]], dim=-1)
-		scores = torch.gather(scores, -1, idxs)[:, :top_k]
+	def detectAndComputeAsync(self, x, top_k = None, max_in_flight = 3):
+		"""
+			Pipelined detectAndCompute: returns a concurrent.futures.Future of its result right away.
+			Pre-processing, inference and post-processing of consecutive frames run concurrently
+			(see InferencePipeline), with at most max_in_flight frames queued.
+		"""
+		self.start_pipeline(max_in_flight)
+		return self.pipeline.submit(x, top_k)
 
-		#Interpolate descriptors at kpts positions
-		feats = self.interpolator(M1, mkpts, H = _H1, W = _W1)
-		#L2-Normalize
-		feats = F.normalize(feats, dim=-1)
+	def start_pipeline(self, max_in_flight = 3):
+		""" Start the pipeline of detectAndComputeAsync now, before other threads call detectAndCompute. """
+		if self.pipeline is None:
+			self.pipeline = InferencePipeline(self.preprocess_stage, self.infer_stage, self.postprocess_stage, max_in_flight)
 
-		#Correct kpt scale
-		mkpts = mkpts * torch.tensor([rw1,rh1], device=mkpts.device).view(1, 1, -1)
+	def pipeline_stats(self):
+		""" Per-stage timing of detectAndComputeAsync, in milliseconds (see InferencePipeline.stats). """
+		return self.pipeline.stats() if self.pipeline is not None else {}
 
-		valid = scores > 0
+	def close(self):
+		if self.pipeline is not None:
+			self.pipeline.close()
+			self.pipeline = None
 
-		end = time.time()
-		self.frames_num = self.frames_num + 1
-		self.sum = self.sum + end-start
-		# print(self.sum)
-		# print(self.frames_num)
-		print("post process ",self.sum/self.frames_num)
-		return [  
-				   {'keypoints': mkpts[b][valid[b]],
-					'scores': scores[b][valid[b]],
-					'descriptors': feats[b][valid[b]]} for b in range(B) 
-			   ]
+	def average_postprocess_time(self):
+		""" Average post-processing time per detectAndCompute call, in seconds. """
+		return self.sum / self.frames_num if self.frames_num else 0.0
 
 	@torch.inference_mode()
 	def detectAndComputeDense(self, x, top_k = None, multiscale = True):
@@ -281,22 +320,7 @@ class XFeat(nn.Module):
 		return heatmap
 	
 	def NMS(self, x, threshold = 0.05, kernel_size = 5):
-		B = x.shape[0]
-		pad=kernel_size//2
-		local_max = nn.MaxPool2d(kernel_size=kernel_size, stride=1, padding=pad)(x)
-		
-		pos = np.logical_and(x == local_max, x > threshold)
-
-		pos_batched = [k.nonzero()[..., 1:].flip(-1) for k in pos]
-
-		pad_val = max([len(x) for x in pos_batched])
-		pos = torch.zeros((B, pad_val, 2), dtype=torch.long, device=x.device)
-
-		#Pad kpts and build (B, N, 2) tensor
-		for b in range(len(pos_batched)):
-			pos[b, :len(pos_batched[b]), :] = pos_batched[b]
-
-		return pos
+		return XFeatPostprocess(threshold, kernel_size).nms(x)
 
 	@torch.inference_mode()
 	def batch_match(self, feats1, feats2, min_cossim = -1):
@@ -0,0 +1,82 @@
+"""
+CPU benchmark for recording and playing back a route with FrameStore (modules/frame_store.py).
+Records a directory of frames (10k by default) with the original ImageRecorder approach (cv2.imwrite on
+the recording thread, timestamp names) and with FrameStore for each codec, then plays the route back:
+the original get_next_image (sorted os.listdir + cv2.imread per step) against FrameStore.load, and
+random access back and forth along the route, which is served by the LRU cache.
+
+Usage: python tests/benchmark_frame_store.py [frames]
+"""
+import os
+import sys
+import shutil
+import tempfile
+import time
+from datetime import datetime
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.frame_store import FrameStore
+from navigator_helpers import HEIGHT, WIDTH, make_frames
+
+LEGACY_PLAYBACK_STEPS = 200  # Each legacy step lists the whole directory, so only a prefix is timed
+
+
+def legacy_record(storage_dir, frames):
+    for frame in frames:
+        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S%f")
+        cv2.imwrite(os.path.join(storage_dir, f"image_{timestamp}.png"), frame)
+
+
+def legacy_get_next_image(storage_dir, index):
+    image_files = sorted(os.listdir(storage_dir))
+    return cv2.imread(os.path.join(storage_dir, image_files[index]))
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    frames = make_frames(count)
+    root = tempfile.mkdtemp(prefix='frame_store_benchmark_')
+    try:
+        legacy_dir = os.path.join(root, 'legacy')
+        os.makedirs(legacy_dir)
+        record = timed(legacy_record, legacy_dir, frames)
+        steps = min(LEGACY_PLAYBACK_STEPS, count)
+        playback = timed(lambda: [legacy_get_next_image(legacy_dir, i) for i in range(steps)])
+        print(f"{count} frames of {WIDTH}x{HEIGHT}")
+        print(f"{'':14s} {'record fps':>10s} {'(recorder thread)':>17s} {'playback fps':>12s} {'back & forth fps':>16s}")
+        print(f"{'legacy png':14s} {count / record:10.0f} {count / record:17.0f} {steps / playback:12.0f} {'':>16s}")
+
+        for codec in ('png', 'jpeg', 'npy'):
+            storage_dir = os.path.join(root, codec)
+            store = FrameStore(storage_dir, codec=codec)
+            start = time.perf_counter()
+            for frame in frames:
+                store.add(frame)
+            submitted = time.perf_counter() - start
+            store.flush()
+            record = time.perf_counter() - start
+            store.close()
+
+            store = FrameStore(storage_dir, codec=codec)  # Playback reads the manifest
+            assert len(store) == count
+            playback = timed(lambda: [store.load(i) for i in range(count)])
+            # Look back at the two previous waypoints at each step, as when the robot is relocalized
+            positions = [max(0, i - back) for i in range(count) for back in (0, 2, 1)]
+            back_and_forth = timed(lambda: [store.load(i) for i in positions])
+            store.close()
+            print(f"{codec:14s} {count / record:10.0f} {count / submitted:17.0f} {count / playback:12.0f} "
+                  f"{len(positions) / back_and_forth:16.0f}")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+CPU benchmark for pipelined XFeat inference (InferencePipeline in modules/hailo.py).
+Runs XFeat with device='fake' (the Hailo code path on the CPU). The fake device returns network outputs
+computed once up front and takes a fixed simulated device time per frame, so the CPU only does the work
+it does with a real Hailo. Compares detectAndCompute frame by frame with detectAndComputeAsync, where the
+pre-processing and post-processing of neighbouring frames overlap the inference, and prints the
+per-stage timing counters. Random network weights are used, so no resources or Hailo device are needed.
+
+Usage: python tests/benchmark_hailo_pipeline.py [device latency in ms, default 20]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from navigator_helpers import make_fake_xfeat, make_image
+
+FRAMES = 40
+SIZES = [(320, 224), (640, 480)]
+
+
+def run_sync(xfeat, images):
+    start = time.perf_counter()
+    results = [xfeat.detectAndCompute(image) for image in images]
+    return time.perf_counter() - start, results
+
+
+def run_async(xfeat, images):
+    start = time.perf_counter()
+    futures = [xfeat.detectAndComputeAsync(image) for image in images]
+    results = [future.result() for future in futures]
+    return time.perf_counter() - start, results
+
+
+def main():
+    latency = float(sys.argv[1]) / 1000 if len(sys.argv) > 1 else 0.02
+    print(f"simulated device time {latency * 1000:.0f} ms, {FRAMES} frames")
+    for width, height in SIZES:
+        xfeat = make_fake_xfeat(width, height, latency)
+        images = [make_image(width, height, seed) for seed in range(FRAMES)]
+        run_sync(xfeat, images[:2])  # Warm up
+        sync_time, _ = run_sync(xfeat, images)
+        async_time, _ = run_async(xfeat, images)
+        print(f"{width}x{height}: sequential {FRAMES / sync_time:6.1f} fps, pipelined {FRAMES / async_time:6.1f} fps "
+              f"({sync_time / async_time:.2f}x)")
+        for stage, stats in xfeat.pipeline_stats().items():
+            print(f"    {stage:12s} mean {stats['mean_ms']:7.2f} ms  max {stats['max_ms']:7.2f} ms")
+        xfeat.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""
+CPU benchmark for the place-recognition index (modules/place_index.py).
+Builds a synthetic route: a corridor of landmarks with random unit-norm 64-d descriptors, where each
+waypoint sees a sliding window of them. Queries are views between waypoints, with some landmarks missing,
+descriptor noise and clutter. Reports recall@1 and recall@5 (a neighbouring waypoint counts as correct) and
+the query latency (global descriptor + search) for mean pooling and VLAD.
+
+Usage: python tests/benchmark_place_index.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from navigator_helpers import FEATURES_PER_VIEW, QUERIES, WAYPOINTS, build_index, evaluate, make_route
+
+
+def main():
+    waypoint_descriptors, query_descriptors, query_positions = make_route()
+    print(f"{WAYPOINTS} waypoints, {QUERIES} queries, {FEATURES_PER_VIEW} descriptors per image")
+    for name, codebook_size in [('mean pooling', 0), ('VLAD, 16 centers', 16)]:
+        index = build_index(waypoint_descriptors, codebook_size)
+        recall1, recall5, latency = evaluate(index, query_descriptors, query_positions)
+        print(f"{name:18s} dim {index.dim:5d}: recall@1 {recall1:.2f}  recall@5 {recall5:.2f}  query {latency:.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
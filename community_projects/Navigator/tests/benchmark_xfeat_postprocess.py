@@ -0,0 +1,45 @@
+"""
+CPU benchmark for the XFeat sparse post-processing (modules/xfeat_postprocess.py).
+Runs XFeat.detectAndCompute in device='torch' mode at 320x224 and 640x480 and compares the original
+post-processing (per-call MaxPool2d module, numpy logical_and, Python padding loop, full argsort) with
+XFeatPostprocess on the same network outputs, after checking that both return the same features.
+Random network weights are used, so no resources need to be downloaded and no Hailo device is needed.
+
+Usage: python tests/benchmark_xfeat_postprocess.py
+"""
+import os
+import sys
+import time
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from navigator_helpers import TOP_K, legacy_postprocess, make_image, make_xfeat, network_outputs, same_features
+
+ITERATIONS = 20
+SIZES = [(320, 224), (640, 480)]
+
+
+def time_it(function, *args):
+    function(*args)  # Warm up
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        result = function(*args)
+    return (time.perf_counter() - start) / ITERATIONS * 1000, result
+
+
+def main():
+    print(f"{'size':>8} {'keypoints':>9} {'legacy post ms':>15} {'new post ms':>12} {'speedup':>8} {'detectAndCompute ms':>20}")
+    for width, height in SIZES:
+        xfeat = make_xfeat(width, height)
+        image = make_image(width, height)
+        M1, K1h, H1, H, W, rh, rw = network_outputs(xfeat, image)
+        legacy_ms, legacy = time_it(legacy_postprocess, M1, K1h, H1, TOP_K, H, W, rh, rw)
+        new_ms, new = time_it(torch.inference_mode()(xfeat.postprocess), M1, K1h, H1, TOP_K, H, W, rh, rw)
+        assert same_features(legacy[0], new[0]), "post-processing results differ"
+        total_ms, _ = time_it(xfeat.detectAndCompute, image)
+        print(f"{width}x{height:<4} {len(new[0]['keypoints']):>9} {legacy_ms:>15.2f} {new_ms:>12.2f} {legacy_ms / new_ms:>7.1f}x {total_ms:>20.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+XFeat networks with random weights (torch or the fake Hailo device), textured frames and synthetic routes
+of global descriptors for the Navigator tests. legacy_postprocess is the torch NMS and top-k selection of
+XFeat.detectAndCompute that the NumPy post-processing must match, compared with same_features().
+"""
+import os
+import sys
+import time
+import cv2
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.xfeat import XFeat
+from modules.hailo import FakeHailo
+from modules.interpolator import InterpolateSparse2d
+from modules.place_index import PlaceIndex, train_codebook
+
+WIDTH, HEIGHT = 320, 224
+TOP_K = 4096
+WAYPOINTS = 500
+QUERIES = 200
+FEATURES_PER_VIEW = 500
+LANDMARKS_PER_WAYPOINT = 100  # New landmarks per step, each view sees 5 steps worth
+DIM = 64
+
+_nearest = InterpolateSparse2d('nearest')
+_bilinear = InterpolateSparse2d('bilinear')
+
+
+def make_frames(count, seed=0):
+    """A few smooth textured frames, cycled (encoding cost depends on the content, not on its identity)."""
+    rng = np.random.default_rng(seed)
+    frames = [cv2.resize(rng.integers(0, 256, (HEIGHT // 8, WIDTH // 8, 3), dtype=np.uint8), (WIDTH, HEIGHT))
+              for _ in range(16)]
+    return [frames[i % len(frames)] for i in range(count)]
+
+
+def legacy_nms(x, threshold=0.05, kernel_size=5):
+    B = x.shape[0]
+    pad = kernel_size // 2
+    local_max = nn.MaxPool2d(kernel_size=kernel_size, stride=1, padding=pad)(x)
+    pos = np.logical_and(x == local_max, x > threshold)
+    pos_batched = [k.nonzero()[..., 1:].flip(-1) for k in pos]
+    pad_val = max([len(x) for x in pos_batched])
+    pos = torch.zeros((B, pad_val, 2), dtype=torch.long, device=x.device)
+    for b in range(len(pos_batched)):
+        pos[b, :len(pos_batched[b]), :] = pos_batched[b]
+    return pos
+
+
+@torch.inference_mode()
+def legacy_postprocess(M1, K1h, H1, top_k, _H1, _W1, rh1, rw1):
+    K1h = torch.Tensor(K1h)
+    mkpts = legacy_nms(K1h, threshold=0.05, kernel_size=5)
+    scores = (_nearest(K1h, mkpts, _H1, _W1) * _bilinear(H1, mkpts, _H1, _W1)).squeeze(-1)
+    scores[torch.all(mkpts == 0, dim=-1)] = -1
+    idxs = torch.argsort(-scores)
+    mkpts_x = torch.gather(mkpts[..., 0], -1, idxs)[:, :top_k]
+    mkpts_y = torch.gather(mkpts[..., 1], -1, idxs)[:, :top_k]
+    mkpts = torch.cat([mkpts_x[..., None], mkpts_y[..., None]], dim=-1)
+    scores = torch.gather(scores, -1, idxs)[:, :top_k]
+    feats = _bilinear(M1, mkpts, H=_H1, W=_W1)
+    feats = F.normalize(feats, dim=-1)
+    mkpts = mkpts * torch.tensor([rw1, rh1], device=mkpts.device).view(1, 1, -1)
+    valid = scores > 0
+    return [{'keypoints': mkpts[b][valid[b]], 'scores': scores[b][valid[b]], 'descriptors': feats[b][valid[b]]}
+            for b in range(K1h.shape[0])]
+
+
+def make_xfeat(width, height):
+    torch.manual_seed(0)
+    xfeat = XFeat(weights=None, top_k=TOP_K, width=width, height=height, device='torch')
+    with torch.no_grad():
+        # Sharpen the keypoint logits, so the untrained network has confident peaks like the trained one
+        xfeat.net.keypoint_head[-1].weight.mul_(30)
+    return xfeat
+
+
+def make_image(width, height, seed=0):
+    """Smoothed noise as a textured scene."""
+    rng = np.random.default_rng(seed)
+    image = torch.from_numpy(rng.random((1, 3, height // 4, width // 4), dtype=np.float32))
+    return F.interpolate(image, (height, width), mode='bilinear', align_corners=False)
+
+
+@torch.inference_mode()
+def network_outputs(xfeat, image):
+    x, rh, rw = xfeat.preprocess_tensor(image)
+    M1, K1, H1 = xfeat.net(x)
+    return M1, xfeat.get_kpts_heatmap(K1), H1, x.shape[2], x.shape[3], rh, rw
+
+
+def same_features(a, b):
+    """Same keypoints and scores as sets (ties may be ordered differently), matching descriptors."""
+    order_a = np.lexsort(a['keypoints'].numpy().T)
+    order_b = np.lexsort(b['keypoints'].numpy().T)
+    return (torch.equal(a['keypoints'][order_a], b['keypoints'][order_b])
+            and torch.allclose(a['scores'][order_a], b['scores'][order_b])
+            and torch.allclose(a['descriptors'][order_a], b['descriptors'][order_b], atol=1e-6))
+
+
+def make_fake_xfeat(width, height, latency):
+    torch.manual_seed(0)
+    xfeat = XFeat(weights=None, width=width, height=height, device='fake')
+    with torch.no_grad():
+        xfeat.net.keypoint_head[-1].weight.mul_(30)  # Confident keypoints, as in make_xfeat
+    net_input, _ = xfeat.preprocess_stage(make_image(width, height))
+    outputs = xfeat.fake_hailo_infer(net_input)
+    xfeat.hailo_model = FakeHailo(lambda frame: outputs, latency=latency)
+    return xfeat
+
+
+def normalize(x):
+    return x / np.linalg.norm(x, axis=-1, keepdims=True)
+
+
+def make_route(waypoints=WAYPOINTS, queries=QUERIES, seed=0):
+    """
+    Returns:
+        waypoint_descriptors (list of (FEATURES_PER_VIEW, DIM) arrays),
+        query_descriptors (list of arrays), query_positions (float waypoint position of each query)
+    """
+    rng = np.random.default_rng(seed)
+    window = 5 * LANDMARKS_PER_WAYPOINT
+    # Landmarks come from a few appearance clusters (walls, floor, ...), like real local descriptors
+    prototypes = normalize(rng.standard_normal((32, DIM)))
+    count = (waypoints + 5) * LANDMARKS_PER_WAYPOINT
+    landmarks = normalize(prototypes[rng.integers(0, 32, count)] + 2.4 * rng.standard_normal((count, DIM)) / np.sqrt(DIM))
+
+    def view(position, noise, clutter):
+        start = int(position * LANDMARKS_PER_WAYPOINT)
+        visible = start + rng.choice(window, int(FEATURES_PER_VIEW * (1 - clutter)), replace=False)
+        descriptors = landmarks[visible] + noise * rng.standard_normal((len(visible), DIM)) / np.sqrt(DIM)
+        others = normalize(prototypes[rng.integers(0, 32, FEATURES_PER_VIEW - len(visible))]
+                           + 2.4 * rng.standard_normal((FEATURES_PER_VIEW - len(visible), DIM)) / np.sqrt(DIM))
+        return normalize(np.concatenate([descriptors, others])).astype(np.float32)
+
+    waypoint_descriptors = [view(i, 0.1, 0.0) for i in range(waypoints)]
+    query_positions = rng.uniform(0, waypoints - 1, queries)
+    query_descriptors = [view(p, 0.5, 0.3) for p in query_positions]
+    return waypoint_descriptors, query_descriptors, query_positions
+
+
+def build_index(waypoint_descriptors, codebook_size=0):
+    codebook = None
+    if codebook_size:
+        codebook = train_codebook(np.concatenate(waypoint_descriptors[::5]), codebook_size)
+    index = PlaceIndex(codebook)
+    for i, descriptors in enumerate(waypoint_descriptors):
+        index.add(i, descriptors)
+    return index
+
+
+def evaluate(index, query_descriptors, query_positions, k=5):
+    """Returns (recall@1, recall@k, mean query latency in ms)."""
+    hits1 = hitsk = 0
+    start = time.perf_counter()
+    results = [index.search(descriptors, k) for descriptors in query_descriptors]
+    latency = (time.perf_counter() - start) / len(query_descriptors) * 1000
+    for result, position in zip(results, query_positions):
+        correct = [abs(waypoint - position) <= 1 for waypoint, _ in result]
+        hits1 += correct[0]
+        hitsk += any(correct)
+    return hits1 / len(results), hitsk / len(results), latency
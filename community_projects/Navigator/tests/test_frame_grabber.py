@@ -0,0 +1,175 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+from modules.frame_grabber import FrameGrabber
+
+
+def write_video(path, frames=10, width=64, height=48, fps=30):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'MJPG'), fps, (width, height))
+    for i in range(frames):
+        writer.write(np.full((height, width, 3), 20 * i, dtype=np.uint8))
+    writer.release()
+    return str(path)
+
+
+def brightness(image):
+    return round(float(image.mean()) / 20)
+
+
+class FastCapture:
+    """A camera that returns a new frame, numbered in every pixel, as fast as it is read."""
+
+    def __init__(self, width, height):
+        self.shape = (height, width, 3)
+        self.count = 0
+        self.opened = True
+
+    def read(self, image=None):
+        if image is None or image.shape != self.shape:
+            image = np.empty(self.shape, dtype=np.uint8)
+        image[:] = self.count % 256
+        self.count += 1
+        return True, image
+
+    def get(self, prop):
+        return 0
+
+    def isOpened(self):
+        return self.opened
+
+    def release(self):
+        self.opened = False
+
+
+def test_video_file_frames_in_order_then_end(tmp_path):
+    grabber = FrameGrabber(cv2.VideoCapture(write_video(tmp_path / 'route.avi')), 64, 48, realtime=True)
+    first = grabber.get_frame()
+    assert first.sequence == 0 and brightness(first.image) == 0
+    grabber.release(first)
+    start = time.monotonic()
+    grabber.start()
+    sequence, frames, timestamps = first.sequence, [], []
+    while (captured := grabber.wait_frame(sequence, timeout=2)) is not None:
+        assert captured.sequence == sequence + 1  # Paced at 30 fps, no frame is missed
+        sequence = captured.sequence
+        frames.append(brightness(captured.image))
+        timestamps.append(captured.timestamp)
+        grabber.release(captured)
+    assert frames == list(range(1, 10))
+    assert timestamps == sorted(timestamps)
+    assert time.monotonic() - start == pytest.approx(9 / 30, abs=0.1)
+    assert grabber.ended
+    assert grabber.wait_frame(sequence, timeout=2) is None
+    grabber.stop()
+
+
+def test_frames_are_resized_into_preallocated_read_only_buffers(tmp_path):
+    grabber = FrameGrabber(cv2.VideoCapture(write_video(tmp_path / 'route.avi', frames=3)), 32, 24)
+    grabber.start()
+    grabber.join(timeout=2)
+    captured = grabber.get_frame()
+    assert captured.image.shape == (24, 32, 3)
+    assert brightness(captured.image) == 2
+    assert not captured.image.flags.writeable
+    assert any(captured.image.base is buffer for buffer in grabber._buffers)
+    grabber.release(captured)
+    copy = grabber.get_last_frame()
+    assert brightness(copy) == 2 and copy.flags.writeable
+    assert not any(copy.base is buffer for buffer in grabber._buffers)
+    grabber.stop()
+
+
+def test_handed_out_frame_is_not_overwritten():
+    grabber = FrameGrabber(FastCapture(16, 8), 16, 8)
+    grabber.start()
+    try:
+        sequence = -1
+        for _ in range(20):
+            captured = grabber.wait_frame(sequence, timeout=1)
+            assert captured.sequence > sequence
+            sequence = captured.sequence
+            value = captured.image[0, 0, 0]
+            time.sleep(0.005)  # The grabber captures many newer frames meanwhile
+            assert (captured.image == value).all()
+            latest = grabber.get_frame()
+            assert latest.sequence >= sequence
+            grabber.release(latest)
+            grabber.release(captured)
+    finally:
+        grabber.stop()
+    assert not grabber.is_alive()
+
+
+def test_wait_frame_blocks_until_a_new_frame():
+    capture = FastCapture(4, 4)
+    grabber = FrameGrabber(capture, 4, 4)
+    assert grabber.wait_frame(0, timeout=0.05) is None  # Not capturing yet
+    waiter = threading.Thread(target=lambda: results.append(grabber.wait_frame(0)))
+    results = []
+    waiter.start()
+    time.sleep(0.05)
+    assert not results
+    grabber.start()
+    waiter.join(timeout=1)
+    assert results and results[0].sequence >= 1
+    grabber.release(results[0])
+    grabber.stop()
+
+
+def test_consumers_holding_frames_while_capturing():
+    grabber = FrameGrabber(FastCapture(16, 8), 16, 8, buffers=5)
+    grabber.start()
+    held = []
+    stop = threading.Event()
+
+    def copier():  # Like the recorder, copies the latest frame now and then
+        while not stop.is_set():
+            grabber.get_last_frame()
+            time.sleep(0.001)
+
+    thread = threading.Thread(target=copier)
+    thread.start()
+    try:
+        sequence = -1
+        for _ in range(30):
+            # Like MatchingDemo.frames(): the current frame and the next one are held at the same time
+            captured = grabber.wait_frame(sequence, timeout=1)
+            sequence = captured.sequence
+            held.append((captured, captured.image[0, 0, 0]))
+            other = grabber.get_frame()  # A second consumer
+            held.append((other, other.image[0, 0, 0]))
+            time.sleep(0.003)  # The grabber keeps capturing meanwhile
+            for frame, value in held:
+                assert (frame.image == value).all()
+            while len(held) > 2:
+                grabber.release(held.pop(0)[0])
+        assert grabber.get_frame().sequence > 30  # Capture went on with the free buffers
+    finally:
+        stop.set()
+        thread.join()
+        grabber.stop()
+    assert not grabber.is_alive()
+
+
+def test_capture_waits_for_a_released_buffer():
+    grabber = FrameGrabber(FastCapture(4, 4), 4, 4)
+    grabber.start()
+    first = grabber.wait_frame(0, timeout=1)
+    second = grabber.wait_frame(first.sequence, timeout=1)
+    time.sleep(0.02)
+    stalled = grabber.get_frame()
+    assert stalled.sequence == second.sequence + 1  # Only the third buffer was left for capturing
+    assert (first.image == first.image[0, 0, 0]).all() and (second.image == second.image[0, 0, 0]).all()
+    for captured in (first, second, stalled):
+        grabber.release(captured)
+    time.sleep(0.02)
+    latest = grabber.get_frame()
+    assert latest.sequence > stalled.sequence + 1
+    grabber.release(latest)
+    with pytest.raises(ValueError):
+        grabber.release(latest)
+    grabber.stop()
+    assert not grabber.is_alive()
@@ -0,0 +1,116 @@
+import os
+import time
+
+import cv2
+import numpy as np
+import pytest
+from modules.frame_store import FrameStore, MANIFEST_NAME
+from modules.image_recorder import ImageRecorder
+from navigator_helpers import make_frames
+
+
+@pytest.mark.parametrize('codec', ['png', 'jpeg', 'npy'])
+def test_codecs_round_trip_and_manifest_order(tmp_path, codec):
+    frames = make_frames(12)
+    store = FrameStore(str(tmp_path), codec=codec, writers=3)
+    names = [store.add(frame) for frame in frames]
+    store.flush()
+    assert len(set(names)) == 12
+    assert store.names == sorted(names) == names  # Timestamp names sort in capture order
+    store.close()
+
+    reopened = FrameStore(str(tmp_path), codec=codec)
+    assert reopened.names == names
+    for i, frame in enumerate(frames):
+        decoded = reopened.load(i)
+        assert decoded.shape == frame.shape
+        if codec == 'jpeg':
+            assert np.abs(decoded.astype(int) - frame).mean() < 3
+        else:
+            assert np.array_equal(decoded, frame)
+    assert reopened.index_of(names[5]) == 5
+    reopened.close()
+
+
+def test_add_copies_the_frame(tmp_path):
+    store = FrameStore(str(tmp_path), codec='npy')
+    frame = np.zeros((4, 4, 3), dtype=np.uint8)
+    name = store.add(frame)
+    frame[:] = 255  # e.g. a FrameGrabber buffer reused for the next capture
+    store.flush()
+    assert not store.load(name).any()
+    store.close()
+
+
+def test_manifest_ignores_partial_entry_and_migrates_old_recordings(tmp_path):
+    old = tmp_path / 'old'
+    old.mkdir()
+    for name in ('image_2.png', 'image_1.png'):
+        cv2.imwrite(str(old / name), np.zeros((4, 4, 3), dtype=np.uint8))
+    (old / 'notes.txt').write_text('')
+    assert FrameStore(str(old)).names == ['image_1.png', 'image_2.png']
+    assert (old / MANIFEST_NAME).read_text() == 'image_1.png\nimage_2.png\n'
+
+    with open(old / MANIFEST_NAME, 'a') as f:
+        f.write('image_3.p')  # Killed while appending
+    store = FrameStore(str(old))
+    assert store.names == ['image_1.png', 'image_2.png']
+    store.clear()
+    assert len(store) == 0 and os.listdir(old) == [MANIFEST_NAME]
+
+
+def test_lru_cache(tmp_path):
+    store = FrameStore(str(tmp_path), codec='npy', cache_size=2)
+    for frame in make_frames(3):
+        store.add(frame)
+    store.flush()
+    first = store.load(0)
+    assert store.load(0) is first
+    assert not first.flags.writeable
+    store.load(1)
+    store.load(0)  # 0 is now the most recently used, 1 is evicted by 2
+    store.load(2)
+    assert store.load(0) is first
+    assert list(store._cache) == [store.name_at(2), store.name_at(0)]
+    store.close()
+
+
+class StillCamera:
+    def __init__(self, frame):
+        self.frame = frame
+
+    def get_last_frame(self):
+        return self.frame
+
+
+def test_recorder_records_and_plays_back(tmp_path):
+    frame = make_frames(1)[0]
+    recorder = ImageRecorder(StillCamera(frame), str(tmp_path), codec='npy')
+    recorder.start()
+    recorder.switch_to_record()
+    deadline = time.monotonic() + 5
+    while len(recorder.frames) < 2 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    recorder.switch_to_playback()
+    recorder.stop()
+    recorder.join(timeout=2)
+
+    count = len(recorder.frames)
+    assert count >= 2
+    assert all(np.array_equal(recorder.get_next_image(), frame) for _ in range(count))
+    assert recorder.get_next_image() is None
+    assert np.array_equal(recorder.get_previous_image(), frame)
+    assert recorder.current_image_index == count - 1
+
+
+def test_recorder_stop_while_recording_closes_the_store(tmp_path):
+    recorder = ImageRecorder(StillCamera(make_frames(1)[0]), str(tmp_path), codec='npy')
+    recorder.start()
+    recorder.switch_to_record()
+    deadline = time.monotonic() + 5
+    while len(recorder.frames) < 1 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    recorder.stop()  # Without switching back to playback first
+    assert not recorder.is_alive()
+    assert recorder.frames._manifest.closed
+    assert FrameStore(str(tmp_path)).names == recorder.frames.names
@@ -0,0 +1,121 @@
+import threading
+import time
+
+import pytest
+import torch
+from modules.hailo import FakeHailo, InferencePipeline
+from modules.method import CVWrapper
+from navigator_helpers import make_fake_xfeat, make_image, same_features
+
+
+def sleeping(seconds, function=lambda x: x):
+    def stage(x):
+        time.sleep(seconds)
+        return function(x)
+    return stage
+
+
+def test_results_in_order_and_stages_overlap():
+    pipeline = InferencePipeline(sleeping(0.01, lambda x: x + 1), sleeping(0.02, lambda x: x * 10), sleeping(0.01))
+    start = time.perf_counter()
+    futures = [pipeline.submit(i) for i in range(20)]
+    assert [future.result() for future in futures] == [(i + 1) * 10 for i in range(20)]
+    elapsed = time.perf_counter() - start
+    assert elapsed < 0.7 * 20 * 0.04  # Sequential: 0.8 s, pipelined: about 20 * 0.02 s
+    stats = pipeline.stats()
+    assert stats['infer']['count'] == 20
+    assert stats['infer']['mean_ms'] == pytest.approx(20, abs=10)
+    assert stats['latency']['mean_ms'] >= stats['preprocess']['mean_ms'] + stats['infer']['mean_ms']
+    pipeline.close()
+
+
+def test_in_flight_frames_are_bounded():
+    in_flight, peak = 0, 0
+    lock = threading.Lock()
+
+    def preprocess(x):
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        return x
+
+    def postprocess(x):
+        nonlocal in_flight
+        time.sleep(0.005)
+        with lock:
+            in_flight -= 1
+        return x
+
+    pipeline = InferencePipeline(preprocess, FakeHailo(lambda x: x, latency=0.005).infer, postprocess, max_in_flight=2)
+    futures = [pipeline.submit(i) for i in range(30)]  # submit blocks while 2 frames are in flight
+    assert [future.result() for future in futures] == list(range(30))
+    assert peak <= 2
+    pipeline.close()
+
+
+def test_errors_are_raised_from_the_future():
+    def infer(x):
+        if x == 3:
+            raise ValueError("bad frame")
+        return x
+
+    pipeline = InferencePipeline(lambda x: x, infer, lambda x: x, max_in_flight=2)
+    futures = [pipeline.submit(i) for i in range(6)]
+    with pytest.raises(ValueError):
+        futures[3].result()
+    assert [futures[i].result() for i in (0, 1, 2, 4, 5)] == [0, 1, 2, 4, 5]
+    pipeline.close()
+
+
+def test_fake_hailo_latency():
+    fake = FakeHailo(lambda x: {'out': x}, latency=0.02)
+    start = time.perf_counter()
+    assert fake.infer(1) == {'out': 1}
+    assert time.perf_counter() - start >= 0.02
+    assert fake.calls == 1
+
+
+def test_xfeat_async_matches_sync():
+    xfeat = make_fake_xfeat(320, 224, latency=0.0)
+    xfeat.hailo_model = FakeHailo(xfeat.fake_hailo_infer)  # Outputs of each frame, not a fixed one
+    images = [make_image(320, 224, seed) for seed in range(4)]
+    expected = [xfeat.detectAndCompute(image)[0] for image in images]
+    futures = [xfeat.detectAndComputeAsync(image) for image in images]
+    for future, features in zip(futures, expected):
+        assert len(features['keypoints']) > 0
+        assert same_features(future.result()[0], features)
+    assert xfeat.pipeline_stats()['postprocess']['count'] == 4
+    xfeat.close()
+    assert xfeat.pipeline_stats() == {}
+
+
+def test_xfeat_sync_calls_go_through_the_running_pipeline():
+    xfeat = make_fake_xfeat(320, 224, latency=0.0)
+    xfeat.hailo_model = FakeHailo(xfeat.fake_hailo_infer)
+    images = [make_image(320, 224, seed) for seed in range(6)]
+    expected = [xfeat.detectAndCompute(image)[0] for image in images]
+    xfeat.start_pipeline()
+    futures = [xfeat.detectAndComputeAsync(image) for image in images[:3]]
+    # Another thread, like the recorder, calls detectAndCompute meanwhile
+    results = {}
+    thread = threading.Thread(target=lambda: results.update(
+        (i, xfeat.detectAndCompute(images[i])[0]) for i in range(3, 6)))
+    thread.start()
+    thread.join()
+    for i, future in enumerate(futures):
+        assert same_features(future.result()[0], expected[i])
+    for i in range(3, 6):
+        assert same_features(results[i], expected[i])
+    assert xfeat.pipeline_stats()['postprocess']['count'] == 6
+    xfeat.close()
+
+
+def test_cv_wrapper_async_matches_sync():
+    xfeat = make_fake_xfeat(320, 224, latency=0.0)
+    xfeat.hailo_model = FakeHailo(xfeat.fake_hailo_infer)
+    wrapper = CVWrapper(xfeat)
+    image = (make_image(320, 224)[0].permute(1, 2, 0).numpy() * 255).astype('uint8')
+    expected = wrapper.detectAndCompute(image)
+    assert same_features(wrapper.detectAndComputeAsync(image).result(), expected)
+    wrapper.close()
@@ -0,0 +1,89 @@
+import cv2
+import numpy as np
+import torch
+from modules.place_index import PlaceIndex, global_descriptor, train_codebook
+from modules.route_store import RouteStore
+from modules.image_recorder import ImageRecorder
+from navigator_helpers import make_route, build_index, evaluate
+
+
+def random_descriptors(rng, count, dim=64):
+    x = rng.standard_normal((count, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def test_vlad_matches_reference():
+    rng = np.random.default_rng(0)
+    descriptors = random_descriptors(rng, 200)
+    codebook = train_codebook(descriptors, 8)
+    assert codebook.shape == (8, 64)
+    assert np.allclose(np.linalg.norm(codebook, axis=1), 1)
+
+    vlad = np.zeros((8, 64))
+    for d in descriptors:
+        c = np.argmax(codebook @ d)
+        vlad[c] += d - codebook[c]
+    vlad /= np.maximum(np.linalg.norm(vlad, axis=1, keepdims=True), 1e-12)
+    vlad = np.sign(vlad.ravel()) * np.sqrt(np.abs(vlad.ravel()))
+    vlad /= np.linalg.norm(vlad)
+    assert np.allclose(global_descriptor(torch.from_numpy(descriptors), codebook), vlad, atol=1e-5)
+
+    mean = global_descriptor(descriptors)
+    assert mean.shape == (64,) and np.isclose(np.linalg.norm(mean), 1)
+
+
+def test_search_matches_brute_force():
+    rng = np.random.default_rng(1)
+    index = PlaceIndex(initial_capacity=4)  # Grows several times
+    views = [random_descriptors(rng, 50) for _ in range(40)]
+    for i, descriptors in enumerate(views):
+        index.add(f'image_{i}', descriptors)
+    assert len(index) == 40 and index.vectors.shape == (40, 64)
+
+    query = random_descriptors(rng, 50)
+    scores = np.array([global_descriptor(v) @ global_descriptor(query) for v in views])
+    expected = [f'image_{i}' for i in np.argsort(-scores)[:5]]
+    result = index.search(query, k=5)
+    assert [name for name, _ in result] == expected
+    assert np.allclose([score for _, score in result], np.sort(scores)[::-1][:5], atol=1e-5)
+    assert len(index.search(query, k=100)) == 40
+    assert PlaceIndex().search(query) == []
+
+
+def test_synthetic_route_recall():
+    waypoints, queries, positions = make_route(waypoints=100, queries=50)
+    for codebook_size in (0, 16):
+        recall1, recall5, _ = evaluate(build_index(waypoints, codebook_size), queries, positions)
+        assert recall1 >= 0.8 and recall5 >= 0.95
+
+
+def test_recorder_relocalizes_to_nearest_waypoint(tmp_path):
+    waypoints, queries, positions = make_route(waypoints=20, queries=1)
+    image_dir = tmp_path / 'images'
+    image_dir.mkdir()
+    for i in range(len(waypoints)):
+        cv2.imwrite(str(image_dir / f'image_{i:04d}.png'), np.full((8, 8, 3), i, dtype=np.uint8))
+    recorder = ImageRecorder(None, str(image_dir), route_dir=str(tmp_path / 'route'))
+    for i, descriptors in enumerate(waypoints):
+        recorder.route_store.append(f'image_{i:04d}.png', np.zeros((len(descriptors), 2)), descriptors)
+
+    nearest, _ = recorder.nearest_waypoints(queries[0], k=1)[0]
+    assert abs(int(nearest[6:10]) - positions[0]) <= 2
+    recorder.seek_waypoint(nearest)
+    frame, features = recorder.get_next_waypoint()
+    assert frame[0, 0, 0] == int(nearest[6:10])
+    assert torch.equal(features['descriptors'], recorder.route_store.get(nearest)['descriptors'])
+    frame, _ = recorder.get_next_waypoint()
+    assert frame[0, 0, 0] == int(nearest[6:10]) + 1
+    recorder.stop_route_player()
+
+
+def test_from_route_store_with_codebook(tmp_path):
+    rng = np.random.default_rng(2)
+    store = RouteStore(str(tmp_path / 'route'))
+    for i in range(5):
+        store.append(f'image_{i}.png', np.zeros((30, 2)), random_descriptors(rng, 30))
+    index = PlaceIndex.from_route_store(store, codebook_size=4)
+    assert index.names == [f'image_{i}.png' for i in range(5)]
+    assert index.dim == 4 * 64
+    assert index.search(store.get('image_3.png')['descriptors'], k=1)[0][0] == 'image_3.png'
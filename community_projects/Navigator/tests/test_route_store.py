@@ -0,0 +1,137 @@
+import os
+import time
+
+import cv2
+import numpy as np
+import torch
+from modules.route_store import RouteStore, RoutePlayer
+
+
+def features(seed, count):
+    rng = np.random.default_rng(seed)
+    return {'keypoints': torch.from_numpy(rng.uniform(0, 640, (count, 2)).astype(np.float32)),
+            'descriptors': torch.from_numpy(rng.standard_normal((count, 64)).astype(np.float32))}
+
+
+def assert_same_features(a, b):
+    assert torch.equal(a['keypoints'], b['keypoints'])
+    assert torch.equal(a['descriptors'], b['descriptors'])
+
+
+def write_route(path, count):
+    names = []
+    for i in range(count):
+        name = f'image_{i:04d}.png'
+        cv2.imwrite(os.path.join(path, name), np.full((8, 8, 3), i, dtype=np.uint8))
+        names.append(name)
+    return names
+
+
+def test_append_get_and_reopen(tmp_path):
+    store = RouteStore(str(tmp_path / 'route'), initial_capacity=16)
+    expected = {f'image_{i}.png': features(i, 5 + 3 * i) for i in range(10)}  # Grows the store 16 -> 256 rows
+    for name, f in expected.items():
+        store.append(name, f['keypoints'], f['descriptors'].numpy())
+    assert len(store) == 10 and 'image_3.png' in store and 'image_10.png' not in store
+
+    reopened = RouteStore(str(tmp_path / 'route'))
+    assert len(reopened) == 10
+    for name, f in expected.items():
+        assert_same_features(reopened.get(name), f)
+    reopened.append('image_10.png', **features(10, 7))
+    assert_same_features(reopened.get('image_0.png'), expected['image_0.png'])
+
+
+def test_index_written_last_keeps_store_consistent(tmp_path):
+    store = RouteStore(str(tmp_path / 'route'), initial_capacity=4)
+    store.append('image_0.png', **features(0, 3))
+    index = np.load(store.index_path)
+    # A recording killed after writing the features of the next waypoint, before its index
+    store.append('image_1.png', **features(1, 30))
+    np.save(store.index_path, index)
+
+    reopened = RouteStore(str(tmp_path / 'route'))
+    assert len(reopened) == 1
+    assert_same_features(reopened.get('image_0.png'), features(0, 3))
+    reopened.append('image_1.png', **features(2, 2))
+    assert_same_features(reopened.get('image_1.png'), features(2, 2))
+
+
+def test_sync_and_clear(tmp_path):
+    names = write_route(str(tmp_path), 4)
+    store = RouteStore(str(tmp_path / 'route'))
+    store.append(names[0], **features(0, 3))
+    calls = []
+
+    def extractor(frame):
+        calls.append(int(frame[0, 0, 0]))
+        return features(int(frame[0, 0, 0]), 4)
+
+    store.sync(lambda name: cv2.imread(str(tmp_path / name)), names, extractor)
+    assert calls == [1, 2, 3]
+    assert_same_features(store.get(names[2]), features(2, 4))
+    store.clear()
+    assert len(store) == 0 and len(RouteStore(str(tmp_path / 'route'))) == 0
+
+
+def test_player_prefetches_in_order(tmp_path):
+    names = write_route(str(tmp_path), 6)
+    store = RouteStore(str(tmp_path / 'route'))
+    for i, name in enumerate(names[:5]):  # The last image has no features and is skipped
+        store.append(name, **features(i, 4))
+
+    player = RoutePlayer(store, lambda name: cv2.imread(str(tmp_path / name)), names, prefetch=2)
+    deadline = time.monotonic() + 2
+    while not player._waypoints.full() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert player._waypoints.qsize() == 2
+
+    played = []
+    while (waypoint := player.next_waypoint()) is not None:
+        name, frame, f = waypoint
+        assert frame[0, 0, 0] == names.index(name)
+        assert_same_features(f, features(names.index(name), 4))
+        played.append(name)
+    assert played == names[:5]
+    player.join(timeout=1)
+    assert not player.is_alive()
+
+
+def test_player_stop(tmp_path):
+    names = write_route(str(tmp_path), 5)
+    store = RouteStore(str(tmp_path / 'route'))
+    for i, name in enumerate(names):
+        store.append(name, **features(i, 4))
+    player = RoutePlayer(store, lambda name: cv2.imread(str(tmp_path / name)), names, prefetch=1)
+    assert player.next_waypoint()[0] == names[0]
+    player.stop()
+    player.join(timeout=1)
+    assert not player.is_alive()
+
+
+def test_player_keeps_returning_none(tmp_path):
+    names = write_route(str(tmp_path), 3)
+    store = RouteStore(str(tmp_path / 'route'))
+    for i, name in enumerate(names):
+        store.append(name, **features(i, 4))
+    load = lambda name: cv2.imread(str(tmp_path / name))
+    player = RoutePlayer(store, load, names, prefetch=1)
+    assert [player.next_waypoint()[0] for _ in names] == names
+    assert player.next_waypoint() is None
+    assert player.next_waypoint() is None  # Called again after the end
+
+    stopped = RoutePlayer(store, load, names, prefetch=1)
+    stopped.stop()
+    stopped.join(timeout=1)
+    remaining = [stopped.next_waypoint() for _ in range(3)]  # At most the prefetched waypoint, then the end
+    assert remaining[-2:] == [None, None]
+
+    def failing_load(name):
+        if name == names[1]:
+            raise OSError("unreadable")
+        return load(name)
+
+    failing = RoutePlayer(store, failing_load, names, prefetch=1)
+    assert failing.next_waypoint()[0] == names[0]
+    assert failing.next_waypoint() is None
+    assert failing.next_waypoint() is None
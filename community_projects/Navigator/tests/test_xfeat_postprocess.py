@@ -0,0 +1,34 @@
+import torch
+import torch.nn.functional as F
+from modules.xfeat_postprocess import XFeatPostprocess, max_pool_same
+from navigator_helpers import legacy_nms, legacy_postprocess, make_xfeat, make_image, network_outputs, same_features
+
+
+def test_max_pool_same_matches_max_pool2d():
+    x = torch.rand(2, 1, 37, 53)
+    for kernel_size in (3, 5, 7):
+        assert torch.equal(max_pool_same(x, kernel_size), F.max_pool2d(x, kernel_size, stride=1, padding=kernel_size // 2))
+
+
+def test_nms_matches_legacy_with_padding():
+    torch.manual_seed(0)
+    heatmap = torch.rand(3, 1, 48, 64) * 0.1
+    heatmap[1] *= 0.3  # Fewer maxima above the threshold, so this batch element is zero padded
+    postprocess = XFeatPostprocess()
+    assert torch.equal(postprocess.nms(heatmap), legacy_nms(heatmap))
+    # The reused buffer must not leak positions from a previous, larger frame
+    assert torch.equal(postprocess.nms(heatmap[1:2]), legacy_nms(heatmap[1:2]))
+    assert torch.equal(postprocess.nms(heatmap * 0), legacy_nms(heatmap * 0))
+
+
+def test_detect_and_compute_matches_legacy():
+    xfeat = make_xfeat(320, 224)
+    image = torch.cat([make_image(320, 224, seed) for seed in range(2)])
+    M1, K1h, H1, H, W, rh, rw = network_outputs(xfeat, image)
+    expected = legacy_postprocess(M1, K1h, H1, 1000, H, W, rh, rw)
+    output = xfeat.detectAndCompute(image, top_k=1000)
+    assert len(output) == 2
+    for a, b in zip(expected, output):
+        assert len(b['keypoints']) > 0
+        assert same_features(a, b)
+    assert xfeat.average_postprocess_time() > 0
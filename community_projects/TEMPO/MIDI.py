@@ -121,6 +121,8 @@ event, with a duration:
 
 import sys, struct, copy
 
+import midi_codec
+
 # sys.stdout = os.fdopen(sys.stdout.fileno(), 'wb')
 Version = '6.7'
 VersionDate = '20201120'
@@ -206,18 +208,8 @@ sys.stdout.buffer.write(my_midi)
 '''
     if len(opus) < 2:
         opus = [1000, [], ]
-    tracks = copy.deepcopy(opus)
-    ticks = int(tracks.pop(0))
-    ntracks = len(tracks)
-    if ntracks == 1:
-        format = 0
-    else:
-        format = 1
-
-    my_midi = b"MThd\x00\x00\x00\x06" + struct.pack('>HHH', format, ntracks, ticks)
-    for track in tracks:
-        events = _encode(track)
-        my_midi += b'MTrk' + struct.pack('>I', len(events)) + events
+    # The tracks may also be midi_codec.EventTracks
+    my_midi = midi_codec.opus2midi(opus, warn=_warn)
     _clean_up_warnings()
     return my_midi
 
@@ -245,6 +237,8 @@ my_score = [
 ]
 my_opus = score2opus(my_score)
 '''
+    if any(isinstance(track, midi_codec.EventTrack) for track in score[1:]):
+        return midi_codec.score2opus(score)
     if len(score) < 2:
         score = [1000, [], ]
     tracks = copy.deepcopy(score)
@@ -305,48 +299,17 @@ def midi2opus(midi=b''):
     r'''Translates MIDI into a "opus".  For a description of the
 "opus" format, see opus2midi()
 '''
-    my_midi = bytearray(midi)
-    if len(my_midi) < 4:
-        _clean_up_warnings()
-        return [1000, [], ]
-    id = bytes(my_midi[0:4])
-    if id != b'MThd':
-        _warn("midi2opus: midi starts with " + str(id) + " instead of 'MThd'")
-        _clean_up_warnings()
-        return [1000, [], ]
-    [length, format, tracks_expected, ticks] = struct.unpack(
-        '>IHHH', bytes(my_midi[4:14]))
-    if length != 6:
-        _warn("midi2opus: midi header length was " + str(length) + " instead of 6")
-        _clean_up_warnings()
-        return [1000, [], ]
-    my_opus = [ticks, ]
-    my_midi = my_midi[14:]
-    track_num = 1  # 5.1
-    while len(my_midi) >= 8:
-        track_type = bytes(my_midi[0:4])
-        if track_type != b'MTrk':
-            _warn(
-                'midi2opus: Warning: track #' + str(track_num) + ' type is ' + str(track_type) + " instead of b'MTrk'")
-        [track_length] = struct.unpack('>I', my_midi[4:8])
-        my_midi = my_midi[8:]
-        if track_length > len(my_midi):
-            _warn('midi2opus: track #' + str(track_num) + ' length ' + str(track_length) + ' is too large')
-            _clean_up_warnings()
-            return my_opus  # 5.0
-        my_midi_track = my_midi[0:track_length]
-        my_track = _decode(my_midi_track)
-        my_opus.append(my_track)
-        my_midi = my_midi[track_length:]
-        track_num += 1  # 5.1
+    my_opus = midi_codec.midi2opus(midi, warn=_warn)
     _clean_up_warnings()
-    return my_opus
+    return my_opus[:1] + [track.to_list() for track in my_opus[1:]]
 
 
 def opus2score(opus=[]):
     r'''For a description of the "opus" and "score" formats,
 see opus2midi() and score2opus().
 '''
+    if any(isinstance(track, midi_codec.EventTrack) for track in opus[1:]):
+        return midi_codec.opus2score(opus)
     if len(opus) < 2:
         _clean_up_warnings()
         return [1000, [], ]
@@ -399,7 +362,9 @@ def midi2score(midi=b''):
     r'''
 Translates MIDI into a "score", using midi2opus() then opus2score()
 '''
-    return opus2score(midi2opus(midi))
+    my_score = midi_codec.midi2score(midi, warn=_warn)
+    _clean_up_warnings()
+    return my_score[:1] + [track.to_list() for track in my_score[1:]]
 
 
 def midi2ms_score(midi=b''):
@@ -1168,15 +1133,7 @@ details).  Its bytes represent an unsigned integer in base 128,
 most significant digit first, with as few digits as possible.
 Bit eight (the high bit) is set on each byte except the last.
 '''
-    ber = bytearray(b'')
-    seven_bits = 0x7F & integer
-    ber.insert(0, seven_bits)  # XXX surely should convert to a char ?
-    integer >>= 7
-    while integer > 0:
-        seven_bits = 0x7F & integer
-        ber.insert(0, 0x80 | seven_bits)  # XXX surely should convert to a char ?
-        integer >>= 7
-    return ber
+    return bytearray(midi_codec.varlen(integer))
 
 
 def _unshift_ber_int(ba):
@@ -1186,19 +1143,13 @@ start, and the remainder of the bytearray).
     if not len(ba):  # 6.7
         _warn('_unshift_ber_int: no integer found')
         return ((0, b""))
-    byte = ba[0]
-    ba = ba[1:]
     integer = 0
-    while True:
-        integer += (byte & 0x7F)
+    for position, byte in enumerate(ba):
+        integer = (integer << 7) | (byte & 0x7F)
         if not (byte & 0x80):
-            return ((integer, ba))
-        if not len(ba):
-            _warn('_unshift_ber_int: no end-of-integer found')
-            return ((0, ba))
-        byte = ba[0]
-        ba = ba[1:]
-        integer <<= 7
+            return ((integer, ba[position + 1:]))
+    _warn('_unshift_ber_int: no end-of-integer found')
+    return ((0, ba[len(ba):]))
 
 
 def _clean_up_warnings():  # 5.4
@@ -1274,289 +1225,22 @@ The options:
        of all possible events, /minus/ what include specifies
   'event_callback' is a coderef
   'exclusive_event_callback' is a coderef
+The decoding itself is done by midi_codec.decode_track().
 '''
-    trackdata = bytearray(trackdata)
     if exclude == None:
         exclude = []
     if include == None:
         include = []
     if include and not exclude:
         exclude = All_events
-    include = set(include)
     exclude = set(exclude)
-
-    # Pointer = 0;  not used here; we eat through the bytearray instead.
-    event_code = -1;  # used for running status
-    event_count = 0;
-    events = []
-
-    while (len(trackdata)):
-        # loop while there's anything to analyze ...
-        eot = False  # When True, the event registrar aborts this loop
-        event_count += 1
-
-        E = []
-        # E for events - we'll feed it to the event registrar at the end.
-
-        # Slice off the delta time code, and analyze it
-        [time, trackdata] = _unshift_ber_int(trackdata)
-
-        # Now let's see what we can make of the command
-        first_byte = trackdata[0] & 0xFF
-        trackdata = trackdata[1:]
-        if (first_byte < 0xF0):  # It's a MIDI event
-            if (first_byte & 0x80):
-                event_code = first_byte
-            else:
-                # It wants running status; use last event_code value
-                trackdata.insert(0, first_byte)
-                if (event_code == -1):
-                    _warn("Running status not set; Aborting track.")
-                    return []
-
-            command = event_code & 0xF0
-            channel = event_code & 0x0F
-
-            if (command == 0xF6):  # 0-byte argument
-                pass
-            elif (command == 0xC0 or command == 0xD0):  # 1-byte argument
-                parameter = trackdata[0]  # could be B
-                trackdata = trackdata[1:]
-            else:  # 2-byte argument could be BB or 14-bit
-                parameter = (trackdata[0], trackdata[1])
-                trackdata = trackdata[2:]
-
-            #################################################################
-            # MIDI events
-
-            if (command == 0x80):
-                if 'note_off' in exclude:
-                    continue
-                E = ['note_off', time, channel, parameter[0], parameter[1]]
-            elif (command == 0x90):
-                if 'note_on' in exclude:
-                    continue
-                E = ['note_on', time, channel, parameter[0], parameter[1]]
-            elif (command == 0xA0):
-                if 'key_after_touch' in exclude:
-                    continue
-                E = ['key_after_touch', time, channel, parameter[0], parameter[1]]
-            elif (command == 0xB0):
-                if 'control_change' in exclude:
-                    continue
-                E = ['control_change', time, channel, parameter[0], parameter[1]]
-            elif (command == 0xC0):
-                if 'patch_change' in exclude:
-                    continue
-                E = ['patch_change', time, channel, parameter]
-            elif (command == 0xD0):
-                if 'channel_after_touch' in exclude:
-                    continue
-                E = ['channel_after_touch', time, channel, parameter]
-            elif (command == 0xE0):
-                if 'pitch_wheel_change' in exclude:
-                    continue
-                E = ['pitch_wheel_change', time, channel,
-                     _read_14_bit(parameter) - 0x2000]
-            else:
-                _warn("Shouldn't get here; command=" + hex(command))
-
-        elif (first_byte == 0xFF):  # It's a Meta-Event! ##################
-            # [command, length, remainder] =
-            #    unpack("xCwa*", substr(trackdata, $Pointer, 6));
-            # Pointer += 6 - len(remainder);
-            #    # Move past JUST the length-encoded.
-            command = trackdata[0] & 0xFF
-            trackdata = trackdata[1:]
-            [length, trackdata] = _unshift_ber_int(trackdata)
-            if (command == 0x00):
-                if (length == 2):
-                    E = ['set_sequence_number', time, _twobytes2int(trackdata)]
-                else:
-                    _warn('set_sequence_number: length must be 2, not ' + str(length))
-                    E = ['set_sequence_number', time, 0]
-
-            elif command >= 0x01 and command <= 0x0f:  # Text events
-                # 6.2 take it in bytes; let the user get the right encoding.
-                # text_str = trackdata[0:length].decode('ascii','ignore')
-                # text_str = trackdata[0:length].decode('ISO-8859-1')
-                # 6.4 take it in bytes; let the user get the right encoding.
-                text_data = bytes(trackdata[0:length])  # 6.4
-                # Defined text events
-                if (command == 0x01):
-                    E = ['text_event', time, text_data]
-                elif (command == 0x02):
-                    E = ['copyright_text_event', time, text_data]
-                elif (command == 0x03):
-                    E = ['track_name', time, text_data]
-                elif (command == 0x04):
-                    E = ['instrument_name', time, text_data]
-                elif (command == 0x05):
-                    E = ['lyric', time, text_data]
-                elif (command == 0x06):
-                    E = ['marker', time, text_data]
-                elif (command == 0x07):
-                    E = ['cue_point', time, text_data]
-                # Reserved but apparently unassigned text events
-                elif (command == 0x08):
-                    E = ['text_event_08', time, text_data]
-                elif (command == 0x09):
-                    E = ['text_event_09', time, text_data]
-                elif (command == 0x0a):
-                    E = ['text_event_0a', time, text_data]
-                elif (command == 0x0b):
-                    E = ['text_event_0b', time, text_data]
-                elif (command == 0x0c):
-                    E = ['text_event_0c', time, text_data]
-                elif (command == 0x0d):
-                    E = ['text_event_0d', time, text_data]
-                elif (command == 0x0e):
-                    E = ['text_event_0e', time, text_data]
-                elif (command == 0x0f):
-                    E = ['text_event_0f', time, text_data]
-
-            # Now the sticky events -------------------------------------
-            elif (command == 0x2F):
-                E = ['end_track', time]
-                # The code for handling this, oddly, comes LATER,
-                # in the event registrar.
-            elif (command == 0x51):  # DTime, Microseconds/Crochet
-                if length != 3:
-                    _warn('set_tempo event, but length=' + str(length))
-                E = ['set_tempo', time,
-                     struct.unpack(">I", b'\x00' + trackdata[0:3])[0]]
-            elif (command == 0x54):
-                if length != 5:  # DTime, HR, MN, SE, FR, FF
-                    _warn('smpte_offset event, but length=' + str(length))
-                E = ['smpte_offset', time] + list(struct.unpack(">BBBBB", trackdata[0:5]))
-            elif (command == 0x58):
-                if length != 4:  # DTime, NN, DD, CC, BB
-                    _warn('time_signature event, but length=' + str(length))
-                E = ['time_signature', time] + list(trackdata[0:4])
-            elif (command == 0x59):
-                if length != 2:  # DTime, SF(signed), MI
-                    _warn('key_signature event, but length=' + str(length))
-                E = ['key_signature', time] + list(struct.unpack(">bB", trackdata[0:2]))
-            elif (command == 0x7F):  # 6.4
-                E = ['sequencer_specific', time, bytes(trackdata[0:length])]
-            else:
-                E = ['raw_meta_event', time, command,
-                     bytes(trackdata[0:length])]  # 6.0
-                # "[uninterpretable meta-event command of length length]"
-                # DTime, Command, Binary Data
-                # It's uninterpretable; record it as raw_data.
-
-            # Pointer += length; #  Now move Pointer
-            trackdata = trackdata[length:]
-
-        ######################################################################
-        elif (first_byte == 0xF0 or first_byte == 0xF7):
-            # Note that sysexes in MIDI /files/ are different than sysexes
-            # in MIDI transmissions!! The vast majority of system exclusive
-            # messages will just use the F0 format. For instance, the
-            # transmitted message F0 43 12 00 07 F7 would be stored in a
-            # MIDI file as F0 05 43 12 00 07 F7. As mentioned above, it is
-            # required to include the F7 at the end so that the reader of the
-            # MIDI file knows that it has read the entire message. (But the F7
-            # is omitted if this is a non-final block in a multiblock sysex;
-            # but the F7 (if there) is counted in the message's declared
-            # length, so we don't have to think about it anyway.)
-            # command = trackdata.pop(0)
-            [length, trackdata] = _unshift_ber_int(trackdata)
-            if first_byte == 0xF0:
-                # 20091008 added ISO-8859-1 to get an 8-bit str
-                # 6.4 return bytes instead
-                E = ['sysex_f0', time, bytes(trackdata[0:length])]
-            else:
-                E = ['sysex_f7', time, bytes(trackdata[0:length])]
-            trackdata = trackdata[length:]
-
-        ######################################################################
-        # Now, the MIDI file spec says:
-        #  <track data> = <MTrk event>+
-        #  <MTrk event> = <delta-time> <event>
-        #  <event> = <MIDI event> | <sysex event> | <meta-event>
-        # I know that, on the wire, <MIDI event> can include note_on,
-        # note_off, and all the other 8x to Ex events, AND Fx events
-        # other than F0, F7, and FF -- namely, <song position msg>,
-        # <song select msg>, and <tune request>.
-        #
-        # Whether these can occur in MIDI files is not clear specified
-        # from the MIDI file spec.  So, I'm going to assume that
-        # they CAN, in practice, occur.  I don't know whether it's
-        # proper for you to actually emit these into a MIDI file.
-
-        elif (first_byte == 0xF2):  # DTime, Beats
-            #  <song position msg> ::=     F2 <data pair>
-            E = ['song_position', time, _read_14_bit(trackdata[:2])]
-            trackdata = trackdata[2:]
-
-        elif (first_byte == 0xF3):  # <song select msg> ::= F3 <data singlet>
-            # E = ['song_select', time, struct.unpack('>B',trackdata.pop(0))[0]]
-            E = ['song_select', time, trackdata[0]]
-            trackdata = trackdata[1:]
-            # DTime, Thing (what?! song number?  whatever ...)
-
-        elif (first_byte == 0xF6):  # DTime
-            E = ['tune_request', time]
-            # What would a tune request be doing in a MIDI /file/?
-
-            #########################################################
-            # ADD MORE META-EVENTS HERE.  TODO:
-            # f1 -- MTC Quarter Frame Message. One data byte follows
-            #     the Status; it's the time code value, from 0 to 127.
-            # f8 -- MIDI clock.    no data.
-            # fa -- MIDI start.    no data.
-            # fb -- MIDI continue. no data.
-            # fc -- MIDI stop.     no data.
-            # fe -- Active sense.  no data.
-            # f4 f5 f9 fd -- unallocated
-
-            r'''
-        elif (first_byte > 0xF0) { # Some unknown kinda F-series event ####
-            # Here we only produce a one-byte piece of raw data.
-            # But the encoder for 'raw_data' accepts any length of it.
-            E = [ 'raw_data',
-                         time, substr(trackdata,Pointer,1) ]
-            # DTime and the Data (in this case, the one Event-byte)
-            ++Pointer;  # itself
-
-'''
-        elif first_byte > 0xF0:  # Some unknown F-series event
-            # Here we only produce a one-byte piece of raw data.
-            # E = ['raw_data', time, bytest(trackdata[0])]   # 6.4
-            E = ['raw_data', time, trackdata[0]]  # 6.4 6.7
-            trackdata = trackdata[1:]
-        else:  # Fallthru.
-            _warn("Aborting track.  Command-byte first_byte=" + hex(first_byte))
-            break
-        # End of the big if-group
-
-        ######################################################################
-        #  THE EVENT REGISTRAR...
-        if E and (E[0] == 'end_track'):
-            # This is the code for exceptional handling of the EOT event.
-            eot = True
-            if not no_eot_magic:
-                if E[1] > 0:  # a null text-event to carry the delta-time
-                    E = ['text_event', E[1], '']
-                else:
-                    E = []  # EOT with a delta-time of 0; ignore it.
-
-        if E and not (E[0] in exclude):
-            # if ( $exclusive_event_callback ):
-            #    &{ $exclusive_event_callback }( @E );
-            # else:
-            #    &{ $event_callback }( @E ) if $event_callback;
-            events.append(E)
-        if eot:
-            break
-
-    # End of the big "Event" while-block
-
+    events = midi_codec.decode_track(trackdata, no_eot_magic=no_eot_magic, warn=_warn).to_list()
+    if exclude:
+        events = [E for E in events if E[0] not in exclude]
     return events
 
 
+
 ###########################################################################
 def _encode(events_lol, unknown_callback=None, never_add_eot=False,
             no_eot_magic=False, no_running_status=False):
@@ -1573,200 +1257,13 @@ def _encode(events_lol, unknown_callback=None, never_add_eot=False,
     # If you're doing this, consider the never_add_eot track option, as in
     #   print MIDI ${ encode( [ $event], { 'never_add_eot' => 1} ) };
 
-    data = []  # what I'll store the chunks of byte-data in
-
-    # This is so my end_track magic won't corrupt the original
-    events = copy.deepcopy(events_lol)
-
-    if not never_add_eot:
-        # One way or another, tack on an 'end_track'
-        if events:
-            last = events[-1]
-            if not (last[0] == 'end_track'):  # no end_track already
-                if (last[0] == 'text_event' and len(last[2]) == 0):
-                    # 0-length text event at track-end.
-                    if no_eot_magic:
-                        # Exceptional case: don't mess with track-final
-                        # 0-length text_events; just peg on an end_track
-                        events.append(['end_track', 0])
-                    else:
-                        # NORMAL CASE: replace with an end_track, leaving DTime
-                        last[0] = 'end_track'
-                else:
-                    # last event was neither 0-length text_event nor end_track
-                    events.append(['end_track', 0])
-        else:  # an eventless track!
-            events = [['end_track', 0], ]
-
-    # maybe_running_status = not no_running_status # unused? 4.7
-    last_status = -1
-
-    for event_r in (events):
-        E = copy.deepcopy(event_r)
-        # otherwise the shifting'd corrupt the original
-        if not E:
-            continue
-
-        event = E.pop(0)
-        if not len(event):
-            continue
-
-        dtime = int(E.pop(0))
-        # print('event='+str(event)+' dtime='+str(dtime))
-
-        event_data = ''
-
-        if (  # MIDI events -- eligible for running status
-                event == 'note_on'
-                or event == 'note_off'
-                or event == 'control_change'
-                or event == 'key_after_touch'
-                or event == 'patch_change'
-                or event == 'channel_after_touch'
-                or event == 'pitch_wheel_change'):
-
-            # This block is where we spend most of the time.  Gotta be tight.
-            if (event == 'note_off'):
-                status = 0x80 | (int(E[0]) & 0x0F)
-                parameters = struct.pack('>BB', int(E[1]) & 0x7F, int(E[2]) & 0x7F)
-            elif (event == 'note_on'):
-                status = 0x90 | (int(E[0]) & 0x0F)
-                parameters = struct.pack('>BB', int(E[1]) & 0x7F, int(E[2]) & 0x7F)
-            elif (event == 'key_after_touch'):
-                status = 0xA0 | (int(E[0]) & 0x0F)
-                parameters = struct.pack('>BB', int(E[1]) & 0x7F, int(E[2]) & 0x7F)
-            elif (event == 'control_change'):
-                status = 0xB0 | (int(E[0]) & 0x0F)
-                parameters = struct.pack('>BB', int(E[1]) & 0xFF, int(E[2]) & 0xFF)
-            elif (event == 'patch_change'):
-                status = 0xC0 | (int(E[0]) & 0x0F)
-                parameters = struct.pack('>B', int(E[1]) & 0xFF)
-            elif (event == 'channel_after_touch'):
-                status = 0xD0 | (int(E[0]) & 0x0F)
-                parameters = struct.pack('>B', int(E[1]) & 0xFF)
-            elif (event == 'pitch_wheel_change'):
-                status = 0xE0 | (int(E[0]) & 0x0F)
-                parameters = _write_14_bit(int(E[1]) + 0x2000)
-            else:
-                _warn("BADASS FREAKOUT ERROR 31415!")
-
-            # And now the encoding
-            # w = BER compressed integer (not ASN.1 BER, see perlpacktut for
-            # details).  Its bytes represent an unsigned integer in base 128,
-            # most significant digit first, with as few digits as possible.
-            # Bit eight (the high bit) is set on each byte except the last.
-
-            data.append(_ber_compressed_int(dtime))
-            if (status != last_status) or no_running_status:
-                data.append(struct.pack('>B', status))
-            data.append(parameters)
-
-            last_status = status
-            continue
-        else:
-            # Not a MIDI event.
-            # All the code in this block could be more efficient,
-            # but this is not where the code needs to be tight.
-            # print "zaz $event\n";
-            last_status = -1
-
-            if event == 'raw_meta_event':
-                event_data = _some_text_event(int(E[0]), E[1])
-            elif (event == 'set_sequence_number'):  # 3.9
-                event_data = b'\xFF\x00\x02' + _int2twobytes(E[0])
-
-            # Text meta-events...
-            # a case for a dict, I think (pjb) ...
-            elif (event == 'text_event'):
-                event_data = _some_text_event(0x01, E[0])
-            elif (event == 'copyright_text_event'):
-                event_data = _some_text_event(0x02, E[0])
-            elif (event == 'track_name'):
-                event_data = _some_text_event(0x03, E[0])
-            elif (event == 'instrument_name'):
-                event_data = _some_text_event(0x04, E[0])
-            elif (event == 'lyric'):
-                event_data = _some_text_event(0x05, E[0])
-            elif (event == 'marker'):
-                event_data = _some_text_event(0x06, E[0])
-            elif (event == 'cue_point'):
-                event_data = _some_text_event(0x07, E[0])
-            elif (event == 'text_event_08'):
-                event_data = _some_text_event(0x08, E[0])
-            elif (event == 'text_event_09'):
-                event_data = _some_text_event(0x09, E[0])
-            elif (event == 'text_event_0a'):
-                event_data = _some_text_event(0x0A, E[0])
-            elif (event == 'text_event_0b'):
-                event_data = _some_text_event(0x0B, E[0])
-            elif (event == 'text_event_0c'):
-                event_data = _some_text_event(0x0C, E[0])
-            elif (event == 'text_event_0d'):
-                event_data = _some_text_event(0x0D, E[0])
-            elif (event == 'text_event_0e'):
-                event_data = _some_text_event(0x0E, E[0])
-            elif (event == 'text_event_0f'):
-                event_data = _some_text_event(0x0F, E[0])
-            # End of text meta-events
-
-            elif (event == 'end_track'):
-                event_data = b"\xFF\x2F\x00"
-
-            elif (event == 'set_tempo'):
-                # event_data = struct.pack(">BBwa*", 0xFF, 0x51, 3,
-                #              substr( struct.pack('>I', E[0]), 1, 3))
-                event_data = b'\xFF\x51\x03' + struct.pack('>I', E[0])[1:]
-            elif (event == 'smpte_offset'):
-                # event_data = struct.pack(">BBwBBBBB", 0xFF, 0x54, 5, E[0:5] )
-                event_data = struct.pack(">BBBbBBBB", 0xFF, 0x54, 0x05, E[0], E[1], E[2], E[3], E[4])
-            elif (event == 'time_signature'):
-                # event_data = struct.pack(">BBwBBBB",  0xFF, 0x58, 4, E[0:4] )
-                event_data = struct.pack(">BBBbBBB", 0xFF, 0x58, 0x04, E[0], E[1], E[2], E[3])
-            elif (event == 'key_signature'):
-                event_data = struct.pack(">BBBbB", 0xFF, 0x59, 0x02, E[0], E[1])
-            elif (event == 'sequencer_specific'):
-                # event_data = struct.pack(">BBwa*", 0xFF,0x7F, len(E[0]), E[0])
-                event_data = _some_text_event(0x7F, E[0])
-            # End of Meta-events
-
-            # Other Things...
-            elif (event == 'sysex_f0'):
-                # event_data = struct.pack(">Bwa*", 0xF0, len(E[0]), E[0])
-                # B=bitstring w=BER-compressed-integer a=null-padded-ascii-str
-                event_data = bytearray(b'\xF0') + _ber_compressed_int(len(E[0])) + bytearray(E[0])
-            elif (event == 'sysex_f7'):
-                # event_data = struct.pack(">Bwa*", 0xF7, len(E[0]), E[0])
-                event_data = bytearray(b'\xF7') + _ber_compressed_int(len(E[0])) + bytearray(E[0])
-
-            elif (event == 'song_position'):
-                event_data = b"\xF2" + _write_14_bit(E[0])
-            elif (event == 'song_select'):
-                event_data = struct.pack('>BB', 0xF3, E[0])
-            elif (event == 'tune_request'):
-                event_data = b"\xF6"
-            elif (event == 'raw_data'):
-                _warn("_encode: raw_data event not supported")
-                # event_data = E[0]
-                continue
-            # End of Other Stuff
-
-            else:
-                # The Big Fallthru
-                if unknown_callback:
-                    # push(@data, &{ $unknown_callback }( @$event_r ))
-                    pass
-                else:
-                    _warn("Unknown event: " + str(event))
-                    # To surpress complaint here, just set
-                    #  'unknown_callback' => sub { return () }
-                continue
+    # The encoding itself is done by midi_codec.encode_track(), which also
+    # takes a midi_codec.EventTrack; raw_data and unknown events are skipped
+    # with a warning (none for unknown events with an unknown_callback).
+    def warn(message):
+        if not (unknown_callback and message.startswith('Unknown event')):
+            _warn(message)
 
-            # print "Event $event encoded part 2\n"
-            if str(type(event_data)).find("'str'") >= 0:
-                event_data = bytearray(event_data.encode('Latin1', 'ignore'))
-            if len(event_data):  # how could $event_data be empty
-                # data.append(struct.pack('>wa*', dtime, event_data))
-                # print(' event_data='+str(event_data))
-                data.append(_ber_compressed_int(dtime) + event_data)
+    return midi_codec.encode_track(events_lol, never_add_eot=never_add_eot, no_eot_magic=no_eot_magic,
+                                   no_running_status=no_running_status, warn=warn)
 
-    return b''.join(data)
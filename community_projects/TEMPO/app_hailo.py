@@ -14,6 +14,7 @@ import struct
 import tqdm
 
 import MIDI
+import midi_codec
 from midi_model import MIDIModel
 from midi_synthesizer import MidiSynthesizer
 from midi_tokenizer import MIDITokenizerV1, MIDITokenizerV2
@@ -100,7 +101,7 @@ def run(tab, mid_seq, continuation_state, continuation_select, instruments, drum
             disable_channels = [i for i in range(16) if i not in patches]
     elif tab == 1 and mid is not None:
         eps = 4 if reduce_cc_st else 0
-        mid = tokenizer.tokenize(MIDI.midi2score(mid), cc_eps=eps, tempo_eps=eps,
+        mid = tokenizer.tokenize(midi_codec.midi2score(mid), cc_eps=eps, tempo_eps=eps,
                                  remap_track_channel=remap_track_channel,
                                  add_default_instr=add_default_instr,
                                  remove_empty_channels=remove_empty_channels)
@@ -9,9 +9,10 @@ import requests
 import tqdm
 
 import MIDI
+import midi_codec
 from midi_model import MIDIModel
 from midi_synthesizer import MidiSynthesizer
-from sound_stream import generate_wav, play_wav
+from sound_stream import AudioStream, PipeSink
 
 MAX_SEED = np.iinfo(np.int32).max
 OUTPUT_BATCH_SIZE = 1
@@ -78,7 +79,7 @@ def run(model, tokenizer, tab, mid_seq, continuation_state, continuation_select,
             disable_channels = [i for i in range(16) if i not in patches]
     elif tab == 1 and mid is not None:
         eps = 4 if reduce_cc_st else 0
-        mid = tokenizer.tokenize(MIDI.midi2score(mid), cc_eps=eps, tempo_eps=eps,
+        mid = tokenizer.tokenize(midi_codec.midi2score(mid), cc_eps=eps, tempo_eps=eps,
                                  remap_track_channel=remap_track_channel,
                                  add_default_instr=add_default_instr,
                                  remove_empty_channels=remove_empty_channels)
@@ -129,27 +130,15 @@ def finish_run(mid_seq, tokenizer):
     return outputs
 
 
-def synthesis_task(mid, synthesizer, is_first_batch):
-    return synthesizer.synthesis(MIDI.score2opus(mid), is_first_batch, is_stream=True)
+def stream_task(mid, synthesizer, audio_stream):
+    # Chunks are played while the rest of the piece is rendered
+    audio_stream.write_chunks(synthesizer.synthesis_chunks(MIDI.score2opus(mid), is_first_batch=True))
 
 
-def render_audio(mid_seq, should_render_audio, tokenizer, thread_pool, synthesizer):
-    if (not should_render_audio) or mid_seq is None:
-        outputs = [None] * OUTPUT_BATCH_SIZE
-        return tuple(outputs)
-    outputs = []
-    if not os.path.exists("outputs"):
-        os.mkdir("outputs")
-    audio_futures = []
-    for i in range(OUTPUT_BATCH_SIZE):
-        mid = tokenizer.detokenize(mid_seq[i])
-        audio_future = thread_pool.submit(synthesis_task, mid, synthesizer, is_first_batch=True)
-        audio_futures.append(audio_future)
-    for future in audio_futures:
-        outputs.append(future.result())
-    if OUTPUT_BATCH_SIZE == 1:
-        return outputs[0]
-    return tuple(outputs)
+def stream_audio(mid_seq, tokenizer, thread_pool, synthesizer, audio_stream):
+    """Render the first output into the audio stream on the thread pool, returns the future of the rendering."""
+    mid = tokenizer.detokenize(mid_seq[0])
+    return thread_pool.submit(stream_task, mid, synthesizer, audio_stream)
 
 
 def load_model():
@@ -210,18 +199,26 @@ def main():
     thread_pool = ThreadPoolExecutor(max_workers=OUTPUT_BATCH_SIZE)
     model, tokenizer = load_model()
     
+    audio_stream = AudioStream(PipeSink())
+    
     continuation_state = [0]
     tab = 0
+    playing = None
     
-    while True:
-        bpm = bpm_measurement.get_bpm()
-        instruments, drum_set = get_instruments(bpm)
-        output_midi_seq, continuation_state, input_seed = run(model, tokenizer, tab, None, continuation_state, 0, instruments, drum_set, bpm, "auto", 0, None, None,  None, None, None, None, None, True, 128, 1.0, 0.94, 20, True)
-        midi_outputs = finish_run(output_midi_seq, tokenizer)
-        audio_outputs = render_audio(output_midi_seq, True, tokenizer, thread_pool, synthesizer)
-        tab = 0
-        path = generate_wav(audio_outputs)
-        play_wav(path)
+    try:
+        while True:
+            bpm = bpm_measurement.get_bpm()
+            instruments, drum_set = get_instruments(bpm)
+            output_midi_seq, continuation_state, input_seed = run(model, tokenizer, tab, None, continuation_state, 0, instruments, drum_set, bpm, "auto", 0, None, None,  None, None, None, None, None, True, 128, 1.0, 0.94, 20, True)
+            midi_outputs = finish_run(output_midi_seq, tokenizer)
+            tab = 0
+            # The next piece is generated while this one plays; it is queued once the previous one is
+            # rendered into the stream, so the pieces play back to back
+            if playing is not None:
+                playing.result()
+            playing = stream_audio(output_midi_seq, tokenizer, thread_pool, synthesizer, audio_stream)
+    finally:
+        audio_stream.close()
 
 
 if __name__ == '__main__':
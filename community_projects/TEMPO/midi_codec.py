@@ -0,0 +1,631 @@
+"""
+Fast MIDI file codec, and a structured-array form of the opus and score formats of MIDI.py.
+
+An EventTrack holds the events of one track in a NumPy array of EVENT_DTYPE: time, type, channel and up to
+four integer parameters. The events that do not fit these columns (text, sysex, ...) are kept as MIDI.py
+event lists in `extras`, their rows store the index in params[0]. In an opus track the times are delta
+times, in a score track absolute times, like in the event lists of MIDI.py.
+
+decode_track() walks the track data with an offset instead of slicing it after every byte, and
+encode_track() encodes the channel events of an EventTrack with array operations. The results are the
+same as MIDI._decode() and MIDI._encode() of MIDI.py 6.7, which now use them.
+"""
+import struct
+import numpy as np
+
+NOTE_OFF, NOTE_ON, KEY_AFTER_TOUCH, CONTROL_CHANGE, PATCH_CHANGE, CHANNEL_AFTER_TOUCH, PITCH_WHEEL_CHANGE = range(7)
+SET_TEMPO, TIME_SIGNATURE, KEY_SIGNATURE = 7, 8, 9
+NOTE = 10  # Score notes, params are pitch, velocity and duration
+OTHER = 11  # params[0] is the index of the event in EventTrack.extras
+
+EVENT_NAMES = ('note_off', 'note_on', 'key_after_touch', 'control_change', 'patch_change', 'channel_after_touch',
+               'pitch_wheel_change', 'set_tempo', 'time_signature', 'key_signature', 'note')
+EVENT_TYPES = {name: kind for kind, name in enumerate(EVENT_NAMES)}
+PARAM_COUNTS = (2, 2, 2, 2, 1, 1, 1, 1, 4, 2, 3)
+
+EVENT_DTYPE = np.dtype([('time', np.int64), ('type', np.uint8), ('channel', np.uint8), ('params', np.int32, (4,))])
+
+# Status byte of the channel events, without the channel
+_STATUS = np.array([0x80, 0x90, 0xA0, 0xB0, 0xC0, 0xD0, 0xE0] + [0] * 5, dtype=np.int16)
+_TEXT_EVENTS = ('text_event', 'copyright_text_event', 'track_name', 'instrument_name', 'lyric', 'marker',
+                'cue_point', 'text_event_08', 'text_event_09', 'text_event_0a', 'text_event_0b', 'text_event_0c',
+                'text_event_0d', 'text_event_0e', 'text_event_0f')
+_TEXT_EVENT_CODES = {name: code for code, name in enumerate(_TEXT_EVENTS, start=1)}
+_VARLEN_BYTES = 9  # Enough for 63 bits
+# Number of data bytes after each channel status byte
+_DATA_SIZES = bytes(2 if 0x80 <= status < 0xC0 or 0xE0 <= status < 0xF0 else 1 for status in range(256))
+_INT32 = np.iinfo(np.int32)
+# Data length of the meta events that MIDI._decode() warns about when it differs
+_META_LENGTHS = {0x00: ('set_sequence_number', 2), 0x51: ('set_tempo', 3), 0x54: ('smpte_offset', 5),
+                 0x58: ('time_signature', 4), 0x59: ('key_signature', 2)}
+
+
+def varlen(value):
+    """The variable-length quantity (MIDI.py's BER compressed integer) of value, as bytes."""
+    if 0 <= value < 0x80:
+        return bytes((value,))
+    result = [value & 0x7F]
+    value >>= 7
+    while value > 0:
+        result.append(0x80 | (value & 0x7F))
+        value >>= 7
+    return bytes(reversed(result))
+
+
+def _read_varlen(data, position):
+    """(value, position after it) of the variable-length quantity at position, (0, end) if it is truncated."""
+    value = 0
+    end = len(data)
+    while position < end:
+        byte = data[position]
+        position += 1
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            return value, position
+    return 0, end
+
+
+def _is_int(value):
+    return isinstance(value, (int, np.integer))
+
+
+def _fits(params):
+    """Whether the parameters can be stored in the int32 params column."""
+    return all(_is_int(value) and _INT32.min <= value <= _INT32.max for value in params)
+
+
+class EventTrack:
+    """
+    The events of one opus or score track, as an EVENT_DTYPE array and the list of events stored as lists.
+    Iterating it yields MIDI.py event lists, so code written for lists can also read an EventTrack.
+    """
+
+    def __init__(self, events=None, extras=None):
+        self.events = np.zeros(0, dtype=EVENT_DTYPE) if events is None else events
+        self.extras = [] if extras is None else extras
+
+    def __len__(self):
+        return len(self.events)
+
+    def __iter__(self):
+        return iter(self.to_list())
+
+    @classmethod
+    def from_list(cls, events):
+        """
+        EventTrack of opus or score event lists. Channel events and notes must have integer values and a
+        channel from 0 to 255, the other events that do not fit the columns are kept as lists.
+        """
+        rows = []
+        extras = []
+        for event in events:
+            kind = EVENT_TYPES.get(event[0])
+            if not _is_int(event[1]):
+                raise ValueError(f"Cannot store {event} in an EventTrack, its time is not an integer")
+            if kind is not None and (kind <= PITCH_WHEEL_CHANGE or kind == NOTE):
+                if len(event) != 3 + PARAM_COUNTS[kind]:
+                    raise ValueError(f"Cannot store {event} in an EventTrack")
+                if kind == NOTE:
+                    _, _, duration, channel, *params = event
+                    params.append(duration)
+                else:
+                    _, _, channel, *params = event
+                if not (_is_int(channel) and 0 <= channel <= 255 and _fits(params)):
+                    raise ValueError(f"Cannot store {event} in an EventTrack")
+                rows.append((event[1], kind, channel, *params, *(0,) * (4 - len(params))))
+            elif kind is not None and len(event) == 2 + PARAM_COUNTS[kind] and _fits(event[2:]):
+                rows.append((event[1], kind, 0, *event[2:], *(0,) * (4 - PARAM_COUNTS[kind])))
+            else:
+                rows.append((event[1], OTHER, 0, len(extras), 0, 0, 0))
+                extras.append(list(event))
+        return cls(_rows_to_events(rows), extras)
+
+    def _name(self, index):
+        kind = int(self.events['type'][index])
+        if kind == OTHER:
+            return self.extras[self.events['params'][index, 0]][0]
+        return EVENT_NAMES[kind]
+
+    def to_list(self, names=None):
+        """The events as MIDI.py event lists, only those named in names if it is given."""
+        events = self.events
+        if names is not None:
+            kinds = [EVENT_TYPES[name] for name in names if name in EVENT_TYPES]
+            events = events[np.isin(events['type'], kinds + [OTHER])]
+        result = [None] * len(events)
+        types = events['type']
+        # The events of each type are made at once, then put in place
+        for kind in np.unique(types).tolist():
+            rows = np.flatnonzero(types == kind)
+            times = events['time'][rows].tolist()
+            channels = events['channel'][rows].tolist()
+            params = [column.tolist() for column in events['params'][rows].T]
+            if kind == OTHER:
+                made = []
+                for time, index in zip(times, params[0]):
+                    event = list(self.extras[index])
+                    event[1] = time
+                    made.append(event)
+            elif kind == NOTE:
+                made = [['note', *event] for event in zip(times, params[2], channels, params[0], params[1])]
+            elif kind <= PITCH_WHEEL_CHANGE:
+                made = [[EVENT_NAMES[kind], *event] for event in zip(times, channels, *params[:PARAM_COUNTS[kind]])]
+            else:
+                made = [[EVENT_NAMES[kind], *event] for event in zip(times, *params[:PARAM_COUNTS[kind]])]
+            for row, event in zip(rows.tolist(), made):
+                result[row] = event
+        if names is not None:
+            result = [event for event in result if event[0] in names]
+        return result
+
+    def to_score(self):
+        """
+        Score track of this opus track, like MIDI.opus2score(): note_on and note_off events are paired into
+        notes (first in, first out for each channel and pitch), events come in the same order.
+        """
+        events = self.events
+        times = np.cumsum(events['time'])
+        kinds = events['type']
+        is_note = (kinds == NOTE_ON) | (kinds == NOTE_OFF)
+        note_rows = np.flatnonzero(is_note)
+        is_off = (kinds[note_rows] == NOTE_OFF) | (events['params'][note_rows, 1] == 0)
+        # A note goes to the score where it ends, the other events stay where they are
+        sources, positions = [], []
+        pending = {}
+        for row, off, channel, pitch in zip(note_rows.tolist(), is_off.tolist(),
+                                            events['channel'][note_rows].tolist(),
+                                            events['params'][note_rows, 0].tolist()):
+            key = channel * 128 + pitch
+            if off:
+                started = pending.get(key)
+                if started:
+                    sources.append(started.pop(0))
+                    positions.append(row)
+            else:
+                pending.setdefault(key, []).append(row)
+        ends = list(positions)
+        for started in pending.values():  # Unterminated notes end with the track
+            for row in started:
+                sources.append(row)
+                positions.append(len(events) + len(positions))
+                ends.append(len(events) - 1)
+        other_rows = np.flatnonzero(~is_note)
+        sources = np.concatenate([other_rows, np.array(sources, dtype=np.int64)])
+        order = np.argsort(np.concatenate([other_rows, np.array(positions, dtype=np.int64)]), kind='stable')
+        score = events[sources]
+        score['time'] = times[sources]
+        notes = slice(len(other_rows), None)
+        score['type'][notes] = NOTE
+        if len(ends):
+            score['params'][notes, 2] = times[np.array(ends)] - times[sources[notes]]
+        return EventTrack(score[order], list(self.extras))
+
+    def to_opus(self):
+        """
+        Opus track of this score track, like MIDI.score2opus(): notes become a note_on and a note_off
+        event, and events are sorted by time, keeping their order at equal times.
+        """
+        events = self.events
+        is_note = events['type'] == NOTE
+        counts = np.where(is_note, 2, 1)
+        expanded = np.repeat(events, counts)
+        note_on = (np.cumsum(counts) - counts)[is_note]
+        expanded['type'][note_on] = NOTE_ON
+        expanded['type'][note_on + 1] = NOTE_OFF
+        expanded['time'][note_on + 1] += events['params'][is_note, 2]
+        expanded['params'][note_on, 2] = 0
+        expanded['params'][note_on + 1, 2] = 0
+        opus = expanded[np.argsort(expanded['time'], kind='stable')]
+        opus['time'] = np.diff(opus['time'], prepend=0)
+        return EventTrack(opus, list(self.extras))
+
+
+def _rows_to_events(rows):
+    """EVENT_DTYPE array of (time, type, channel, param 0-3) tuples, or of those values one after the other."""
+    if rows and isinstance(rows[0], tuple):
+        rows = [value for row in rows for value in row]
+    array = np.array(rows, dtype=np.int64).reshape(-1, 7)
+    events = np.zeros(len(array), dtype=EVENT_DTYPE)
+    events['time'] = array[:, 0]
+    events['type'] = array[:, 1]
+    events['channel'] = array[:, 2]
+    events['params'] = array[:, 3:]
+    return events
+
+
+def _meta_event(command, length, data, start):
+    """Event list, with time 0, of the meta event that is not a column event."""
+    if command == 0x00:
+        return ['set_sequence_number', 0, (data[start] << 8) | data[start + 1] if length == 2 else 0]
+    if 0x01 <= command <= 0x0F:
+        return [_TEXT_EVENTS[command - 1], 0, data[start:start + length]]
+    if command == 0x54:
+        return ['smpte_offset', 0, *struct.unpack('>BBBBB', data[start:start + 5])]
+    if command == 0x58:
+        return ['time_signature', 0, *data[start:start + 4]]
+    if command == 0x7F:
+        return ['sequencer_specific', 0, data[start:start + length]]
+    return ['raw_meta_event', 0, command, data[start:start + length]]
+
+
+def _decode_varlens(buffer, starts):
+    """
+    Values of the variable-length quantities starting at the given positions of a uint8 array, and the
+    positions after them: one array operation per byte of the longest one.
+    """
+    values = np.zeros(len(starts), dtype=np.int64)
+    positions = starts.copy()
+    active = np.arange(len(starts))
+    while len(active):
+        byte = buffer[positions[active]].astype(np.int64)
+        values[active] = (values[active] << 7) | (byte & 0x7F)
+        positions[active] += 1
+        active = active[byte >= 0x80]
+    return values, positions
+
+
+def _meta_length_warning(command, length):
+    name, expected = _META_LENGTHS[command]
+    if command == 0x00:
+        return name + ': length must be ' + str(expected) + ', not ' + str(length)
+    return name + ' event, but length=' + str(length)
+
+
+def decode_track(data, no_eot_magic=False, warn=None):
+    """
+    Opus EventTrack of the data of one track (the bytes after the MTrk chunk header), like MIDI._decode():
+    an end_track event with a delta time becomes an empty text_event, unless no_eot_magic is set.
+    warn is called with the warnings of MIDI._decode(): meta events of the wrong length, no running status.
+
+    The loop over the events only finds where each one starts and its status byte (running status
+    included). Delta times and channel event parameters are then read for all events at once.
+    """
+    warn = warn or (lambda message: None)
+    data = bytes(data)
+    end = len(data)
+    sizes = _DATA_SIZES
+    starts = []
+    statuses = []  # Status bytes of channel events, 0x100 + index in others for the other events
+    others = []  # (type, param 0-3) of the other events
+    extras = []
+    status = -1  # Running status
+    end_of_track = False
+    position = 0
+    while position < end:
+        starts.append(position)
+        byte = data[position]
+        position += 1
+        while byte & 0x80:
+            byte = data[position]
+            position += 1
+        first = data[position]
+        if first < 0x80:
+            if status == -1:
+                warn("Running status not set; Aborting track.")  # MIDI.py drops the track
+                return EventTrack()
+            statuses.append(status)
+            position += sizes[status]
+            continue
+        if first < 0xF0:
+            status = first
+            statuses.append(status)
+            position += 1 + sizes[status]
+            continue
+        position += 1
+        statuses.append(0x100 + len(others))
+        if first == 0xFF:  # Meta event
+            command = data[position]
+            length, start = _read_varlen(data, position + 1)
+            position = start + length
+            if command in _META_LENGTHS and length != _META_LENGTHS[command][1]:
+                warn(_meta_length_warning(command, length))
+            if command == 0x2F:
+                if no_eot_magic:
+                    event = ['end_track', 0]
+                else:
+                    event = ['text_event', 0, '']  # Carries the delta time, dropped if it is 0
+                    end_of_track = True
+                others.append((OTHER, len(extras), 0, 0, 0))
+                extras.append(event)
+                break
+            if command == 0x51:
+                others.append((SET_TEMPO, struct.unpack('>I', b'\x00' + data[start:start + 3])[0], 0, 0, 0))
+                continue
+            if command == 0x58 and end - start >= 4:
+                others.append((TIME_SIGNATURE, *data[start:start + 4]))
+                continue
+            if command == 0x59:
+                others.append((KEY_SIGNATURE, *struct.unpack('>bB', data[start:start + 2]), 0, 0))
+                continue
+            event = _meta_event(command, length, data, start)
+        elif first == 0xF0 or first == 0xF7:
+            length, start = _read_varlen(data, position)
+            position = start + length
+            event = ['sysex_f0' if first == 0xF0 else 'sysex_f7', 0, data[start:start + length]]
+        elif first == 0xF2:
+            event = ['song_position', 0, data[position] | (data[position + 1] << 7)]
+            position += 2
+        elif first == 0xF3:
+            event = ['song_select', 0, data[position]]
+            position += 1
+        elif first == 0xF6:
+            event = ['tune_request', 0]
+        else:
+            event = ['raw_data', 0, data[position]]
+            position += 1
+        others.append((OTHER, len(extras), 0, 0, 0))
+        extras.append(event)
+    if position > end and statuses[-1] < 0x100:
+        raise IndexError("Truncated channel event")  # Like MIDI._decode()
+
+    buffer = np.frombuffer(data + b'\x00\x00', dtype=np.uint8)
+    statuses = np.array(statuses, dtype=np.int64)
+    deltas, positions = _decode_varlens(buffer, np.array(starts, dtype=np.int64))
+    events = np.zeros(len(statuses), dtype=EVENT_DTYPE)
+    events['time'] = deltas
+
+    channel = np.flatnonzero(statuses < 0x100)
+    status = statuses[channel]
+    kinds = (status >> 4) - 8
+    params = positions[channel] + (buffer[positions[channel]] >= 0x80)  # Unless running status
+    first = buffer[params].astype(np.int32)
+    second = buffer[params + 1].astype(np.int32)
+    pitch_wheel = kinds == PITCH_WHEEL_CHANGE
+    two_params = (kinds != PATCH_CHANGE) & (kinds != CHANNEL_AFTER_TOUCH) & ~pitch_wheel
+    events['type'][channel] = kinds
+    events['channel'][channel] = status & 0x0F
+    events['params'][channel, 0] = np.where(pitch_wheel, (first | (second << 7)) - 0x2000, first)
+    events['params'][channel, 1] = np.where(two_params, second, 0)
+
+    if others:
+        other = np.flatnonzero(statuses >= 0x100)
+        values = np.array(others, dtype=np.int64)
+        events['type'][other] = values[:, 0]
+        events['params'][other] = values[:, 1:]
+    if end_of_track and deltas[-1] == 0:
+        events = events[:-1]  # An end_track with no delta time is dropped
+        extras.pop()
+    return EventTrack(events, extras)
+
+
+def _text_event(code, text):
+    data = bytes(text, encoding='ISO-8859-1') if isinstance(text, str) else bytes(text)
+    return b'\xFF' + bytes((code,)) + varlen(len(data)) + data
+
+
+def _event_bytes(event):
+    """
+    (status, data) of an opus event list, without its delta time: for channel events the status byte and
+    the parameter bytes, for the other events -1 and the whole event (None if it is not encoded).
+    """
+    name = event[0]
+    kind = EVENT_TYPES.get(name)
+    if kind is not None and kind <= PITCH_WHEEL_CHANGE:
+        status = int(_STATUS[kind]) | (int(event[2]) & 0x0F)
+        if kind == PITCH_WHEEL_CHANGE:
+            value = int(event[3]) + 0x2000
+            return status, bytes((value & 0x7F, (value >> 7) & 0x7F))
+        if kind == PATCH_CHANGE or kind == CHANNEL_AFTER_TOUCH:
+            return status, bytes((int(event[3]) & 0xFF,))
+        mask = 0xFF if kind == CONTROL_CHANGE else 0x7F
+        return status, bytes((int(event[3]) & mask, int(event[4]) & mask))
+    if name in _TEXT_EVENT_CODES:
+        return -1, _text_event(_TEXT_EVENT_CODES[name], event[2])
+    if name == 'set_tempo':
+        return -1, b'\xFF\x51\x03' + struct.pack('>I', event[2])[1:]
+    if name == 'time_signature':
+        return -1, struct.pack('>BBBbBBB', 0xFF, 0x58, 0x04, event[2], event[3], event[4], event[5])
+    if name == 'key_signature':
+        return -1, struct.pack('>BBBbB', 0xFF, 0x59, 0x02, event[2], event[3])
+    if name == 'end_track':
+        return -1, b'\xFF\x2F\x00'
+    if name == 'raw_meta_event':
+        return -1, _text_event(int(event[2]), event[3])
+    if name == 'set_sequence_number':
+        return -1, b'\xFF\x00\x02' + bytes(((event[2] >> 8) & 0xFF, event[2] & 0xFF))
+    if name == 'smpte_offset':
+        return -1, struct.pack('>BBBbBBBB', 0xFF, 0x54, 0x05, event[2], event[3], event[4], event[5], event[6])
+    if name == 'sequencer_specific':
+        return -1, _text_event(0x7F, event[2])
+    if name == 'sysex_f0' or name == 'sysex_f7':
+        return -1, (b'\xF0' if name == 'sysex_f0' else b'\xF7') + varlen(len(event[2])) + bytes(event[2])
+    if name == 'song_position':
+        return -1, b'\xF2' + bytes((event[2] & 0x7F, (event[2] >> 7) & 0x7F))
+    if name == 'song_select':
+        return -1, struct.pack('>BB', 0xF3, event[2])
+    if name == 'tune_request':
+        return -1, b'\xF6'
+    return -1, None  # raw_data and unknown events are skipped
+
+
+def _skipped(event, warn):
+    """Warn about an event that is not encoded, like MIDI._encode()."""
+    if event[0] == 'raw_data':
+        warn("_encode: raw_data event not supported")
+    else:
+        warn("Unknown event: " + str(event[0]))
+
+
+def _add_end_track(events, no_eot_magic):
+    """The event lists with an end_track event at the end, the way MIDI._encode() adds it."""
+    if not events:
+        return [['end_track', 0]]
+    last = events[-1]
+    if last[0] == 'end_track':
+        return events
+    if last[0] == 'text_event' and len(last[2]) == 0 and not no_eot_magic:
+        return events[:-1] + [['end_track', *last[1:]]]
+    return events + [['end_track', 0]]
+
+
+def _add_end_track_row(track, no_eot_magic):
+    """The EventTrack with an end_track event at the end, like _add_end_track()."""
+    events = track.events
+    extras = list(track.extras)
+    if len(events):
+        last = track._name(-1)
+        if last == 'end_track':
+            return track
+        if last == 'text_event' and len(extras[events['params'][-1, 0]][2]) == 0 and not no_eot_magic:
+            extras[events['params'][-1, 0]] = ['end_track', 0]
+            return EventTrack(events, extras)
+    end = _rows_to_events([(0, OTHER, 0, len(extras), 0, 0, 0)])
+    return EventTrack(np.concatenate([events, end]), extras + [['end_track', 0]])
+
+
+def _encode_list(events, no_running_status, warn):
+    data = []
+    last_status = -1
+    for event in events:
+        if not event or not len(event[0]):
+            continue
+        delta = int(event[1])
+        status, event_data = _event_bytes(event)
+        if status >= 0:
+            data.append(varlen(delta))
+            if status != last_status or no_running_status:
+                data.append(bytes((status,)))
+            data.append(event_data)
+        elif event_data is not None:
+            data.append(varlen(delta) + event_data)
+        else:
+            _skipped(event, warn)
+        last_status = status
+    return b''.join(data)
+
+
+def _encode_array(track, no_running_status, warn):
+    """Track data of an opus EventTrack: the channel events are encoded at once, the others one by one."""
+    events = track.events
+    kinds = events['type'].astype(np.int64)
+    deltas = events['time']
+    params = events['params'].astype(np.int64)
+    is_channel = kinds <= PITCH_WHEEL_CHANGE
+    status = np.where(is_channel, _STATUS[kinds] | (events['channel'] & 0x0F), -1)
+    previous = np.concatenate([[-1], status[:-1]])
+
+    # Delta times, most significant 7 bits first, right aligned in _VARLEN_BYTES columns
+    shifts = 7 * np.arange(_VARLEN_BYTES - 1, -1, -1)
+    groups = (deltas[:, None] >> shifts) & 0x7F
+    groups[:, :-1] |= 0x80
+    length = 1 + np.sum(deltas[:, None] >= (1 << shifts[:-1]), axis=1)
+    varlen_mask = np.arange(_VARLEN_BYTES)[None, :] >= _VARLEN_BYTES - length[:, None]
+
+    pitch_wheel = params[:, 0] + 0x2000
+    first = np.select([kinds == PITCH_WHEEL_CHANGE, kinds == CONTROL_CHANGE, kinds >= PATCH_CHANGE],
+                      [pitch_wheel & 0x7F, params[:, 0] & 0xFF, params[:, 0] & 0xFF], params[:, 0] & 0x7F)
+    second = np.select([kinds == PITCH_WHEEL_CHANGE, kinds == CONTROL_CHANGE],
+                       [(pitch_wheel >> 7) & 0x7F, params[:, 1] & 0xFF], params[:, 1] & 0x7F)
+    one_parameter = (kinds == PATCH_CHANGE) | (kinds == CHANNEL_AFTER_TOUCH)
+
+    matrix = np.column_stack([groups, status, first, second])
+    mask = np.column_stack([varlen_mask, (status != previous) | no_running_status, np.ones_like(is_channel),
+                            ~one_parameter]) & is_channel[:, None]
+    channel_data = matrix[mask].astype(np.uint8).tobytes()
+    ends = np.cumsum(mask.sum(axis=1)).tolist()
+
+    pieces = []
+    written = 0
+    others = np.flatnonzero(~is_channel).tolist()
+    event_lists = EventTrack(events[others], track.extras).to_list() if others else []
+    for row, event in zip(others, event_lists):
+        pieces.append(channel_data[written:ends[row]])
+        written = ends[row]
+        _, event_data = _event_bytes(event)
+        if event_data is not None:
+            pieces.append(varlen(event[1]) + event_data)
+        else:
+            _skipped(event, warn)
+    pieces.append(channel_data[written:])
+    return b''.join(pieces)
+
+
+def encode_track(track, never_add_eot=False, no_eot_magic=False, no_running_status=False, warn=None):
+    """
+    Track data of an opus track, an EventTrack or a list of event lists, like MIDI._encode(): an end_track
+    event is added unless never_add_eot is set, replacing a final empty text_event unless no_eot_magic is set.
+    raw_data and unknown events are skipped, warn is called with a message about each of them.
+    """
+    warn = warn or (lambda message: None)
+    if isinstance(track, EventTrack):
+        if not never_add_eot:
+            track = _add_end_track_row(track, no_eot_magic)
+        return _encode_array(track, no_running_status, warn)
+    events = list(track)
+    if not never_add_eot:
+        events = _add_end_track(events, no_eot_magic)
+    return _encode_list(events, no_running_status, warn)
+
+
+def _tracks(tracks):
+    return [track if isinstance(track, EventTrack) else EventTrack.from_list(track) for track in tracks]
+
+
+def midi2opus(midi, warn=None):
+    """Opus of MIDI file data, [ticks, EventTrack...]. warn is called with a message about a malformed file."""
+    warn = warn or (lambda message: None)
+    midi = bytes(midi)
+    if len(midi) < 4:
+        return [1000, EventTrack()]
+    if midi[0:4] != b'MThd':
+        warn("midi2opus: midi starts with " + str(midi[0:4]) + " instead of 'MThd'")
+        return [1000, EventTrack()]
+    length, _, _, ticks = struct.unpack('>IHHH', midi[4:14])
+    if length != 6:
+        warn("midi2opus: midi header length was " + str(length) + " instead of 6")
+        return [1000, EventTrack()]
+    opus = [ticks]
+    view = memoryview(midi)
+    position = 14
+    track_num = 1
+    while len(midi) - position >= 8:
+        track_type = midi[position:position + 4]
+        if track_type != b'MTrk':
+            warn('midi2opus: Warning: track #' + str(track_num) + ' type is ' + str(track_type) + " instead of b'MTrk'")
+        track_length = struct.unpack('>I', midi[position + 4:position + 8])[0]
+        position += 8
+        if track_length > len(midi) - position:
+            warn('midi2opus: track #' + str(track_num) + ' length ' + str(track_length) + ' is too large')
+            return opus
+        opus.append(decode_track(view[position:position + track_length], warn=warn))
+        position += track_length
+        track_num += 1
+    return opus
+
+
+def opus2midi(opus, warn=None):
+    """
+    MIDI file data of an opus whose tracks are EventTracks or lists of event lists. warn is called with a
+    message about each event that is not encoded.
+    """
+    if len(opus) < 2:
+        opus = [1000, []]
+    ticks = int(opus[0])
+    tracks = opus[1:]
+    data = [b"MThd\x00\x00\x00\x06" + struct.pack('>HHH', 0 if len(tracks) == 1 else 1, len(tracks), ticks)]
+    for track in tracks:
+        events = encode_track(track, warn=warn)
+        data.append(b'MTrk' + struct.pack('>I', len(events)) + events)
+    return b''.join(data)
+
+
+def opus2score(opus):
+    """Score, [ticks, EventTrack...], of an opus whose tracks are EventTracks or lists of event lists."""
+    if len(opus) < 2:
+        return [1000, EventTrack()]
+    return [int(opus[0])] + [track.to_score() for track in _tracks(opus[1:])]
+
+
+def score2opus(score):
+    """Opus, [ticks, EventTrack...], of a score whose tracks are EventTracks or lists of event lists."""
+    if len(score) < 2:
+        score = [1000, []]
+    return [int(score[0])] + [track.to_opus() for track in _tracks(score[1:])]
+
+
+def midi2score(midi, warn=None):
+    return opus2score(midi2opus(midi, warn))
+
+
+def score2midi(score):
+    return opus2midi(score2opus(score))
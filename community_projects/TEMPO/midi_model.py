@@ -1,23 +1,69 @@
+from contextlib import contextmanager
+
 from midi_tokenizer import MIDITokenizer
 
 import numpy as np
 import tqdm
 
-from hailo_platform import (
-    ConfigureParams,
-    FormatType,
-    HailoSchedulingAlgorithm,
-    HailoStreamInterface,
-    HEF,
-    InferVStreams,
-    InputVStreamParams,
-    OutputVStreamParams,
-    VDevice, 
-)
+try:
+    from hailo_platform import (
+        ConfigureParams,
+        FormatType,
+        HailoSchedulingAlgorithm,
+        HailoStreamInterface,
+        HEF,
+        InferVStreams,
+        InputVStreamParams,
+        OutputVStreamParams,
+        VDevice, 
+    )
+except ImportError:
+    # CPUMIDIModel runs without the Hailo runtime
+    HEF = None
 
 timeout_ms = 1000
 
 
+class EventSequence:
+    """
+    The summed token embeddings of the events of a generation, (batch_size, length, n_embd), as the base
+    network takes them.
+
+    Rows are appended to a preallocated buffer of twice the network's window, whose unused rows hold the
+    embedding of a padding event, so window() is the network input without padding or re-summing the
+    earlier events. When the buffer is full, the last window of rows is moved to its start, once every
+    `window` events.
+    """
+
+    def __init__(self, net_emb, pad_event, batch_size, window):
+        self.net_emb = net_emb
+        self.window_size = window
+        self.length = 0  # Rows in the buffer
+        self._buffer = np.empty((batch_size, 2 * window, net_emb.shape[-1]), dtype=net_emb.dtype)
+        self._buffer[:] = np.sum(net_emb[pad_event], axis=-2)
+
+    def append(self, events):
+        """Append events (batch_size, events, token_sequence_length) of token ids."""
+        events = events[:, -self.window_size:]
+        count = events.shape[1]
+        if self.length + count > len(self._buffer[0]):
+            # Move the rows that stay in the window to the start of the buffer
+            keep = self.window_size - count
+            self._buffer[:, :keep] = self._buffer[:, self.length - keep:self.length]
+            self.length = keep
+        self._buffer[:, self.length:self.length + count] = np.sum(self.net_emb[events], axis=-2)
+        self.length += count
+
+    def window(self):
+        """(batch_size, window, n_embd): the last `window` events, followed by padding events if there are fewer."""
+        start = max(0, self.length - self.window_size)
+        return self._buffer[:, start:start + self.window_size]
+
+    def last_index(self):
+        """Position of the last event in window()."""
+        return min(self.length, self.window_size) - 1
+
+
 class MIDIModel:
     MAX_MIDI_SEQUENCE_LENGTH = 512
 
@@ -29,9 +75,16 @@ class MIDIModel:
 
         self.net_emb = np.load(model_base_emb)
         self.net_token_emb = np.load(model_token_emb)
+        self._init_templates()
         
         self._init_hefs(model_base, model_token)
 
+    def _init_templates(self):
+        # Padding, built once for all generation steps
+        self.pad_event = np.full(self.tokenizer.max_token_seq, self.tokenizer.pad_id, dtype=np.int64)
+        self.pad_token_embedding = self.net_token_emb[self.tokenizer.pad_id]
+        self._sampler_scratch = {}  # Buffers of sample_top_p_k by shape
+
     def _init_hefs(self, model_base, model_token):
         params = VDevice.create_params()
         params.scheduling_algorithm = HailoSchedulingAlgorithm.ROUND_ROBIN
@@ -55,6 +108,13 @@ class MIDIModel:
         self.input_vstreams_token_params["model_token/input_layer1"].user_buffer_format.type = FormatType.FLOAT32
         self.output_vstreams_token_params = OutputVStreamParams.make(self.net_token, format_type=FormatType.FLOAT32)
 
+    @contextmanager
+    def pipelines(self):
+        """The inference pipelines of the base and token networks, open for one generation."""
+        with InferVStreams(self.net, self.input_vstreams_params, self.output_vstreams_params) as infer_pipeline:
+            with InferVStreams(self.net_token, self.input_vstreams_token_params, self.output_vstreams_token_params) as infer_pipeline_token:
+                yield infer_pipeline, infer_pipeline_token
+
     def forward_token(self, infer_pipeline_token, hidden_state, x=None):
         """
         :param hidden_state: (batch_size, n_embd)
@@ -96,117 +156,258 @@ class MIDIModel:
         hidden_state = list(hidden_state.values())[0]
         return hidden_state[:, 0, :return_indexs]
 
+    def forward_incremental(self, infer_pipeline, events):
+        """
+        :param events: EventSequence of the events so far
+        :return: hidden of the last event (batch_size, n_embd)
+        """
+        x = events.window()
+        # No copy with batch size 1, the window of a larger batch is not contiguous
+        x = x.reshape(x.shape[0], -1, 8, x.shape[-1])
+        hidden_state = infer_pipeline.infer(x)
+        hidden_state = list(hidden_state.values())[0]
+        return hidden_state[:, 0, events.last_index()]
+
+    def forward_token_incremental(self, infer_pipeline_token, token_input, index):
+        """
+        :param token_input: (batch_size, 1, max_token_seq, n_embd): the hidden state of the event, the
+            embeddings of its first `index` tokens, then padding
+        :return: logits of token `index` (batch_size, 1, vocab_size)
+        """
+        logits = infer_pipeline_token.infer(token_input)
+        logits = list(logits.values())[0]
+        return logits[:, 0, index:index + 1]
+
     def softmax(self, x, axis):
         x_max = np.amax(x, axis=axis, keepdims=True)
         exp_x_shifted = np.exp(x - x_max)
         return exp_x_shifted / np.sum(exp_x_shifted, axis=axis, keepdims=True)
 
+    def _sampler_buffers(self, rows, vocab_size, k):
+        buffers = self._sampler_scratch.get((rows, vocab_size, k))
+        if buffers is None:
+            buffers = {
+                "negated": np.empty((rows, vocab_size), dtype=np.float64),
+                "cdf": np.empty((rows, k), dtype=np.float64),
+                "rows": np.arange(rows),
+            }
+            self._sampler_scratch[(rows, vocab_size, k)] = buffers
+        return buffers
+
     def sample_top_p_k(self, probs, p, k, generator=None):
+        """
+        Sample one token per row of probs (..., vocab_size): among the k most likely tokens, from the most
+        likely ones up to a cumulative probability of p. The k most likely tokens are found with a partition
+        and only those are sorted; each row takes one uniform draw, looked up in the cumulative
+        probabilities of all rows with one searchsorted.
+        """
         if generator is None:
             generator = np.random
-        probs_idx = np.argsort(-probs, axis=-1)
-        probs_sort = np.take_along_axis(probs, probs_idx, -1)
-        probs_sum = np.cumsum(probs_sort, axis=-1)
-        mask = probs_sum - probs_sort > p
-        probs_sort[mask] = 0.0
-        mask = np.zeros(probs_sort.shape[-1])
-        mask[:k] = 1
-        probs_sort = probs_sort * mask
-        probs_sort /= np.sum(probs_sort, axis=-1, keepdims=True)
-        shape = probs_sort.shape
-        probs_sort_flat = probs_sort.reshape(-1, shape[-1])
-        probs_idx_flat = probs_idx.reshape(-1, shape[-1])
-        next_token = np.stack([generator.choice(idxs, p=pvals) for pvals, idxs in zip(probs_sort_flat, probs_idx_flat)])
-        next_token = next_token.reshape(*shape[:-1])
-        return next_token
+        shape = probs.shape
+        probs = probs.reshape(-1, shape[-1])
+        rows, vocab_size = probs.shape
+        k = min(k, vocab_size)
+        buffers = self._sampler_buffers(rows, vocab_size, k)
+        negated = np.negative(probs, out=buffers["negated"])
+        if k < vocab_size:
+            top = np.argpartition(negated, k - 1, axis=-1)[:, :k]
+            top = np.take_along_axis(top, np.argsort(np.take_along_axis(negated, top, -1), axis=-1), -1)
+        else:
+            top = np.argsort(negated, axis=-1)
+        probs_sort = np.take_along_axis(probs, top, -1)
+        cdf = np.cumsum(probs_sort, axis=-1, out=buffers["cdf"])
+        probs_sort[cdf - probs_sort > p] = 0.0
+        np.cumsum(probs_sort, axis=-1, out=cdf)
+        total = cdf[:, -1].copy()
+        # Rows are laid end to end in one increasing array: row r is offset by r * step
+        step = total.max() + 1
+        offsets = buffers["rows"] * step
+        cdf += offsets[:, None]
+        draws = (1.0 - generator.random(rows)) * total  # In (0, total], never a token of probability 0
+        positions = np.searchsorted(cdf.ravel(), draws + offsets, side="left") - buffers["rows"] * k
+        next_token = top[buffers["rows"], positions]
+        return next_token.reshape(*shape[:-1])
 
     def generate(self, prompt=None, batch_size=1, max_len=512, temp=1.0, top_p=0.98, top_k=20,
-                 disable_patch_change=False, disable_control_change=False, disable_channels=None, generator=None):
-        with InferVStreams(self.net, self.input_vstreams_params, self.output_vstreams_params) as infer_pipeline:
-            with InferVStreams(self.net_token, self.input_vstreams_token_params, self.output_vstreams_token_params) as infer_pipeline_token:
-                tokenizer = self.tokenizer
-                if disable_channels is not None:
-                    disable_channels = [tokenizer.parameter_ids["channel"][c] for c in disable_channels]
-                else:
-                    disable_channels = []
-                max_token_seq = tokenizer.max_token_seq
-                if prompt is None:
-                    input_tensor = np.full((1, 1, max_token_seq), tokenizer.pad_id, dtype=np.int64)
-                    input_tensor[0, 0, 0] = tokenizer.bos_id  # bos
-                    input_tensor = np.repeat(input_tensor, repeats=batch_size, axis=0)
-                else:
-                    if len(prompt.shape) == 2:
-                        prompt = prompt[None, :]
-                        prompt = np.repeat(prompt, repeats=batch_size, axis=0)
-                    elif prompt.shape[0] == 1:
-                        prompt = np.repeat(prompt, repeats=batch_size, axis=0)
-                    elif len(prompt.shape) != 3 or prompt.shape[0] != batch_size:
-                        raise ValueError(f"invalid shape for prompt, {prompt.shape}")
-                    prompt = prompt[..., :max_token_seq]
-                    if prompt.shape[-1] < max_token_seq:
-                        prompt = np.pad(prompt, ((0, 0), (0, 0), (0, max_token_seq - prompt.shape[-1])),
-                                        mode="constant", constant_values=tokenizer.pad_id)
-                    input_tensor = prompt
-
-                cur_len = input_tensor.shape[1]
-                bar = tqdm.tqdm(desc="generating", total=max_len - cur_len)
-                with bar:
-                    while cur_len < max_len:
-                        end = [False] * batch_size
+                 disable_patch_change=False, disable_control_change=False, disable_channels=None, generator=None,
+                 incremental=True):
+        """
+        Yield the generated events, (batch_size, max_token_seq) token ids each.
+
+        With incremental=True the summed embeddings of the events are kept in an EventSequence and the
+        token network input in one buffer, so each new event and token only embeds itself. With
+        incremental=False the whole sequence is embedded again for every event, as before.
+        """
+        with self.pipelines() as (infer_pipeline, infer_pipeline_token):
+            tokenizer = self.tokenizer
+            if disable_channels is not None:
+                disable_channels = [tokenizer.parameter_ids["channel"][c] for c in disable_channels]
+            else:
+                disable_channels = []
+            max_token_seq = tokenizer.max_token_seq
+            if prompt is None:
+                input_tensor = np.full((1, 1, max_token_seq), tokenizer.pad_id, dtype=np.int64)
+                input_tensor[0, 0, 0] = tokenizer.bos_id  # bos
+                input_tensor = np.repeat(input_tensor, repeats=batch_size, axis=0)
+            else:
+                if len(prompt.shape) == 2:
+                    prompt = prompt[None, :]
+                    prompt = np.repeat(prompt, repeats=batch_size, axis=0)
+                elif prompt.shape[0] == 1:
+                    prompt = np.repeat(prompt, repeats=batch_size, axis=0)
+                elif len(prompt.shape) != 3 or prompt.shape[0] != batch_size:
+                    raise ValueError(f"invalid shape for prompt, {prompt.shape}")
+                prompt = prompt[..., :max_token_seq]
+                if prompt.shape[-1] < max_token_seq:
+                    prompt = np.pad(prompt, ((0, 0), (0, 0), (0, max_token_seq - prompt.shape[-1])),
+                                    mode="constant", constant_values=tokenizer.pad_id)
+                input_tensor = prompt
+
+            cur_len = input_tensor.shape[1]
+            if incremental:
+                events = EventSequence(self.net_emb, self.pad_event, batch_size, self.MAX_MIDI_SEQUENCE_LENGTH)
+                events.append(input_tensor)
+                token_input = np.empty((batch_size, 1, max_token_seq, self.net_token_emb.shape[-1]),
+                                       dtype=self.net_token_emb.dtype)
+                next_event = np.empty((batch_size, max_token_seq), dtype=np.int64)
+            bar = tqdm.tqdm(desc="generating", total=max_len - cur_len)
+            with bar:
+                while cur_len < max_len:
+                    end = [False] * batch_size
+                    if incremental:
+                        hidden = self.forward_incremental(infer_pipeline, events)
+                        token_input[:, 0, 0] = hidden
+                        token_input[:, 0, 1:] = self.pad_token_embedding
+                    else:
                         hidden = self.forward(infer_pipeline, input_tensor)[:, -1]
-                        next_token_seq = None
-                        event_names = [""] * batch_size
-                        for i in range(max_token_seq):
-                            mask = np.zeros((batch_size, tokenizer.vocab_size), dtype=np.int64)
-                            for b in range(batch_size):
-                                if end[b]:
+                    next_token_seq = None
+                    event_names = [""] * batch_size
+                    for i in range(max_token_seq):
+                        mask = np.zeros((batch_size, tokenizer.vocab_size), dtype=np.int64)
+                        for b in range(batch_size):
+                            if end[b]:
+                                mask[b, tokenizer.pad_id] = 1
+                                continue
+                            if i == 0:
+                                mask_ids = list(tokenizer.event_ids.values()) + [tokenizer.eos_id]
+                                if disable_patch_change:
+                                    mask_ids.remove(tokenizer.event_ids["patch_change"])
+                                if disable_control_change:
+                                    mask_ids.remove(tokenizer.event_ids["control_change"])
+                                mask[b, mask_ids] = 1
+                            else:
+                                param_names = tokenizer.events[event_names[b]]
+                                if i > len(param_names):
                                     mask[b, tokenizer.pad_id] = 1
                                     continue
-                                if i == 0:
-                                    mask_ids = list(tokenizer.event_ids.values()) + [tokenizer.eos_id]
-                                    if disable_patch_change:
-                                        mask_ids.remove(tokenizer.event_ids["patch_change"])
-                                    if disable_control_change:
-                                        mask_ids.remove(tokenizer.event_ids["control_change"])
-                                    mask[b, mask_ids] = 1
-                                else:
-                                    param_names = tokenizer.events[event_names[b]]
-                                    if i > len(param_names):
-                                        mask[b, tokenizer.pad_id] = 1
-                                        continue
-                                    param_name = param_names[i - 1]
-                                    mask_ids = tokenizer.parameter_ids[param_name]
-                                    if param_name == "channel":
-                                        mask_ids = [i for i in mask_ids if i not in disable_channels]
-                                    mask[b, mask_ids] = 1
-                            mask = np.expand_dims(mask, 1)
+                                param_name = param_names[i - 1]
+                                mask_ids = tokenizer.parameter_ids[param_name]
+                                if param_name == "channel":
+                                    mask_ids = [i for i in mask_ids if i not in disable_channels]
+                                mask[b, mask_ids] = 1
+                        mask = np.expand_dims(mask, 1)
+                        if incremental:
+                            logits = self.forward_token_incremental(infer_pipeline_token, token_input, i)
+                        else:
                             x = next_token_seq
                             logits = self.forward_token(infer_pipeline_token, hidden, x)[:, -1:]
-                            scores = self.softmax(logits / temp, axis=-1) * mask
-                            samples = self.sample_top_p_k(scores, top_p, top_k, generator=generator)
-                            if i == 0:
-                                next_token_seq = samples
-                                for b in range(batch_size):
-                                    if end[b]:
-                                        continue
-                                    eid = samples[b].item()
-                                    if eid == tokenizer.eos_id:
-                                        end[b] = True
-                                    else:
-                                        event_names[b] = tokenizer.id_events[eid]
-                            else:
-                                next_token_seq = np.concatenate([next_token_seq, samples], axis=1)
-                                if all([len(tokenizer.events[event_names[b]]) == i for b in range(batch_size) if not end[b]]):
-                                    break
+                        scores = self.softmax(logits / temp, axis=-1) * mask
+                        samples = self.sample_top_p_k(scores, top_p, top_k, generator=generator)
+                        if incremental and i + 1 < max_token_seq:
+                            token_input[:, 0, i + 1] = self.net_token_emb[samples[:, 0]]
+                        if i == 0:
+                            next_token_seq = samples
+                            for b in range(batch_size):
+                                if end[b]:
+                                    continue
+                                eid = samples[b].item()
+                                if eid == tokenizer.eos_id:
+                                    end[b] = True
+                                else:
+                                    event_names[b] = tokenizer.id_events[eid]
+                        else:
+                            next_token_seq = np.concatenate([next_token_seq, samples], axis=1)
+                            if all([len(tokenizer.events[event_names[b]]) == i for b in range(batch_size) if not end[b]]):
+                                break
  
+                    if incremental:
+                        next_event.fill(tokenizer.pad_id)
+                        next_event[:, :next_token_seq.shape[1]] = next_token_seq
+                        events.append(next_event[:, None])
+                        next_token_seq = next_event.copy()[:, None]
+                    else:
                         if next_token_seq.shape[1] < max_token_seq:
                             next_token_seq = np.pad(next_token_seq,
                                                     ((0, 0), (0, max_token_seq - next_token_seq.shape[-1])),
                                                     mode="constant", constant_values=tokenizer.pad_id)
                         next_token_seq = next_token_seq[:, None, :]
                         input_tensor = np.concatenate([input_tensor, next_token_seq], axis=1)
-                        cur_len += 1
-                        bar.update(1)
-                        yield next_token_seq[:, 0]
-                        if all(end):
-                            break
+                    cur_len += 1
+                    bar.update(1)
+                    yield next_token_seq[:, 0]
+                    if all(end):
+                        break
+
+
+class CPUNetwork:
+    """
+    CPU stand-in for a Hailo network, with the infer() of an InferVStreams pipeline: a causal running mean
+    of the input rows and one random projection, so each output row depends on all rows before it.
+    With output_emb the output is projected to logits over its rows (as the token network's vocabulary),
+    plus output_bias if given.
+    """
+
+    def __init__(self, name, n_embd, output_emb=None, output_bias=None, seed=0):
+        rng = np.random.default_rng(seed)
+        self.name = name
+        self.weight = (rng.standard_normal((n_embd, n_embd)) / np.sqrt(n_embd)).astype(np.float32)
+        self.output_emb = output_emb
+        self.output_bias = output_bias
+        self.calls = 0
+
+    def infer(self, x):
+        """
+        :param x: (batch_size, ..., n_embd), the rows in order
+        :return: {output name: (batch_size, 1, rows, n_embd or vocab_size)}
+        """
+        self.calls += 1
+        x = x.reshape(x.shape[0], -1, x.shape[-1])
+        x = np.cumsum(x, axis=1) / np.arange(1, x.shape[1] + 1, dtype=np.float32)[:, None]
+        y = np.tanh(x @ self.weight)
+        if self.output_emb is not None:
+            y = y @ self.output_emb.T
+            if self.output_bias is not None:
+                y += self.output_bias
+        return {f"{self.name}/output_layer1": y[:, None]}
+
+
+class CPUMIDIModel(MIDIModel):
+    """MIDIModel with CPU stand-ins for the base and token networks, to run generation without a Hailo device."""
+
+    def __init__(self, net_emb, net_token_emb, seed=0, token_bias=None):
+        self.tokenizer = MIDITokenizer()
+        self.tokenizer.set_optimise_midi()
+        self.net_emb = net_emb
+        self.net_token_emb = net_token_emb
+        self._init_templates()
+        self.net = CPUNetwork("model_base", net_emb.shape[-1], seed=seed)
+        self.net_token = CPUNetwork("model_token", net_token_emb.shape[-1], output_emb=net_token_emb,
+                                    output_bias=token_bias, seed=seed + 1)
+
+    @classmethod
+    def random(cls, n_embd=1024, seed=0):
+        """
+        A stand-in with random embeddings for the tokenizer's vocabulary. It never ends the song (eos),
+        so generation runs to max_len.
+        """
+        tokenizer = MIDITokenizer()
+        rng = np.random.default_rng(seed)
+        net_emb = (rng.standard_normal((tokenizer.vocab_size, n_embd)) * 0.1).astype(np.float32)
+        net_token_emb = (rng.standard_normal((tokenizer.vocab_size, n_embd)) * 0.1).astype(np.float32)
+        token_bias = np.zeros(tokenizer.vocab_size, dtype=np.float32)
+        token_bias[tokenizer.eos_id] = -100
+        return cls(net_emb, net_token_emb, seed, token_bias)
+
+    @contextmanager
+    def pipelines(self):
+        yield self.net, self.net_token
@@ -1,15 +1,59 @@
+import heapq
 from threading import Lock
 
-import fluidsynth
+try:
+    import fluidsynth
+except ImportError:
+    # SawtoothSynth can stand in for fluidsynth.Synth
+    fluidsynth = None
 import numpy as np
-import struct
+
+DEFAULT_CHUNK_SAMPLES = 8192  # About 0.19 seconds at 44.1 kHz
+
+
+class SawtoothSynth:
+    """
+    CPU stand-in for fluidsynth.Synth, for tests and benchmarks without fluidsynth: the subset of its
+    interface used by MidiSynthesizer, rendering a stereo sawtooth whose pitch follows the sounding notes.
+    """
+
+    def __init__(self, samplerate=44100.0):
+        self.samplerate = samplerate
+        self.notes = {}
+        self.position = 0
+
+    def sfload(self, path):
+        return 1
+
+    def program_select(self, channel, sfid, bank, preset):
+        pass
+
+    def cc(self, channel, control, value):
+        pass
+
+    def noteon(self, channel, pitch, velocity):
+        self.notes[(channel, pitch)] = velocity
+
+    def noteoff(self, channel, pitch):
+        self.notes.pop((channel, pitch), None)
+
+    def system_reset(self):
+        self.notes.clear()
+
+    def get_samples(self, length):
+        """Interleaved stereo int16 samples, (2 * length,) like fluidsynth.Synth.get_samples."""
+        period = 50 + 7 * (sum(pitch for _, pitch in self.notes) % 64)
+        wave = (np.arange(self.position, self.position + length) % period) * (30000 // period) - 15000
+        self.position += length
+        return np.repeat(wave.astype(np.int16), 2)
 
 
 class MidiSynthesizer:
-    def __init__(self, soundfont_path, sample_rate=44100):
+    def __init__(self, soundfont_path, sample_rate=44100, synth_class=None):
         self.soundfont_path = soundfont_path
         self.sample_rate = sample_rate
-        self.fl = fluidsynth.Synth(samplerate=float(sample_rate))
+        self.synth_class = synth_class or fluidsynth.Synth
+        self.fl = self.synth_class(samplerate=float(sample_rate))
         self.sfid = self.fl.sfload(soundfont_path)
         self.devices = [[self.fl, self.sfid, False]]
         self.devices_lock = Lock()
@@ -23,7 +67,7 @@ class MidiSynthesizer:
                 if not device[2]:
                     device[2] = True
                     return device
-            fl = fluidsynth.Synth(samplerate=float(self.sample_rate))
+            fl = self.synth_class(samplerate=float(self.sample_rate))
             sfid = fl.sfload(self.soundfont_path)
             device = [fl, sfid, True]
             self.devices.append(device)
@@ -34,8 +78,45 @@ class MidiSynthesizer:
         device[0].get_samples(self.sample_rate*5) # wait for silence
         device[2] = False
 
-    def synthesis(self, midi_opus, is_first_batch, is_stream):
-        event_list = []
+    def _sample_position(self, ticks, tempo):
+        return int(((ticks / self.ticks_per_beat) * tempo / (10 ** 6)) * self.sample_rate)
+
+    def _timeline(self, midi_opus):
+        """
+        The events of all tracks in time order, with absolute times, and the number of samples rendered
+        before each of them, following the tempo changes.
+        """
+        tracks = []
+        for track in midi_opus:
+            abs_t = 0
+            events = []
+            for event in track:
+                abs_t += event[1]
+                event_new = [*event]
+                event_new[1] = abs_t
+                events.append(event_new)
+            tracks.append(events)
+        # Each track is in time order, merging them keeps the order of sorting all events (ties by track)
+        event_list = list(heapq.merge(*tracks, key=lambda e: e[1]))
+
+        sample_lens = []
+        tempo, last_t = self.tempo, self.last_t
+        for event in event_list:
+            sample_lens.append(self._sample_position(event[1], tempo) - self._sample_position(last_t, tempo))
+            last_t = event[1]
+            if event[0] == "set_tempo":
+                tempo = event[2]
+        return event_list, sample_lens
+
+    def synthesis_chunks(self, midi_opus, is_first_batch, chunk_samples=DEFAULT_CHUNK_SAMPLES):
+        """
+        Render midi_opus, yielding the audio as it is rendered: (chunk_samples, 2) int16 arrays (the last
+        one may be shorter), so playback can start before the whole piece is rendered.
+
+        The total length is computed from the tempo map first, and the synthesizer output is written into
+        one buffer of that size. The chunks are read-only views of it, and the generator returns the whole
+        buffer when it is done.
+        """
         if is_first_batch:
             if self.curr_device:
                 self.release_fluidsynth(self.curr_device)
@@ -47,26 +128,23 @@ class MidiSynthesizer:
             self.last_t = 0
             for c in range(16):
                 self.fl.program_select(c, self.sfid, 128 if c == 9 else 0, 0)
-        for track in midi_opus:
-            abs_t = 0
-            for event in track:
-                abs_t += event[1]
-                event_new = [*event]
-                event_new[1] = abs_t
-                event_list.append(event_new)
-        event_list = sorted(event_list, key=lambda e: e[1])
+        event_list, sample_lens = self._timeline(midi_opus)
 
-        pcm = b""
-        all_samples = np.empty((0, 2), dtype=np.int16)
-        for event in event_list:
+        total = sum(sample_len for sample_len in sample_lens if sample_len > 0)
+        buffer = np.empty((total, 2), dtype=np.int16)
+        samples = buffer.view()
+        samples.flags.writeable = False
+        position = 0
+        sent = 0
+        for event, sample_len in zip(event_list, sample_lens):
             name = event[0]
-            sample_len = int(((event[1] / self.ticks_per_beat) * self.tempo / (10 ** 6)) * self.sample_rate)
-            sample_len -= int(((self.last_t / self.ticks_per_beat) * self.tempo / (10 ** 6)) * self.sample_rate)
             self.last_t = event[1]
             if sample_len > 0:
-                samples = self.fl.get_samples(sample_len).reshape(sample_len, 2)
-                all_samples = np.concatenate([all_samples, samples])
-                pcm += b''.join([struct.pack('<hh', sample[0], sample[1]) for sample in samples])
+                buffer[position:position + sample_len] = self.fl.get_samples(sample_len).reshape(sample_len, 2)
+                position += sample_len
+                while position - sent >= chunk_samples:
+                    yield samples[sent:sent + chunk_samples]
+                    sent += chunk_samples
             if name == "set_tempo":
                 self.tempo = event[2]
             elif name == "patch_change":
@@ -81,8 +159,22 @@ class MidiSynthesizer:
             elif name == "note_off" or (name == "note_on" and event[3] == 0):
                 c, p = event[2:4]
                 self.fl.noteoff(c, p)
+        if position > sent:
+            yield samples[sent:position]
+        return buffer
+
+    def synthesis(self, midi_opus, is_first_batch, is_stream):
+        """
+        Render midi_opus: with is_stream, as little-endian 16-bit stereo PCM bytes, else as a
+        (samples, 2) int16 array.
+        """
+        chunks = self.synthesis_chunks(midi_opus, is_first_batch)
+        try:
+            while True:
+                next(chunks)
+        except StopIteration as done:
+            samples = done.value
         if is_stream:
-            return pcm
+            return samples.astype('<i2', copy=False).tobytes()
         else:
-            return all_samples
-
+            return samples
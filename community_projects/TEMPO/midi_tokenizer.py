@@ -4,6 +4,8 @@ from typing import Dict, Any
 import PIL.Image
 import numpy as np
 
+from midi_codec import EventTrack
+
 
 class MIDITokenizerV1:
     def __init__(self):
@@ -86,6 +88,8 @@ class MIDITokenizerV1:
             patch_dict = {}
             control_dict = {}
             last_tempo = 0
+            if isinstance(track, EventTrack):
+                track = track.to_list(self.events)  # Only the events tokenized
             for event in track:
                 if event[0] not in self.events:
                     continue
@@ -632,6 +636,8 @@ class MIDITokenizerV2:
             last_bpm = 0
             track_channels = []
             track_to_channels.setdefault(track_idx, track_channels)
+            if isinstance(track, EventTrack):
+                track = track.to_list(self.events)  # Only the events tokenized
             for event in track:
                 if event[0] not in self.events:
                     continue
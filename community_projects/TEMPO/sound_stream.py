@@ -1,64 +1,192 @@
-import uuid
 import wave
 import subprocess
+import threading
 
-import queue
-import subprocess
-import os
-import time
-
-# Job queue to store WAV file paths
-job_queue = queue.Queue()
-
-WAV_DIR = "/tmp"
-
-# Worker thread function that processes each file in the queue
-def worker():
-    while True:
-        # Wait for a new job (file path) from the queue
-        wav_file = job_queue.get()
-
-        if wav_file is None:
-            # If we get a 'None' value, it means we should stop the worker
-            print("Worker exiting.")
-            break
-
-        print(f"Worker is playing: {wav_file}")
-
-        # Play the WAV file using paplay
-        play_wav(wav_file)
-
-        # Indicate that the task is done
-        job_queue.task_done()
-
-# Producer thread function that waits for new WAV files and adds them to the queue
-def play_streams():
-    # Continuously check the directory for new WAV files
-    processed_files = set()  # Track files already added to the queue
-
-    while True:
-        # Get a list of all WAV files in the directory
-        wav_files = [f for f in os.listdir(WAV_DIR) if f.endswith(".wav")]
-        
-        # Add new files to the queue
-        for file in wav_files:
-            if file not in processed_files:
-                file_path = os.path.join(WAV_DIR, file)
-                print(f"Producer adding: {file_path}")
-                job_queue.put(file_path)
-                processed_files.add(file)
-
-        time.sleep(1)  # Wait a bit before checking again (to simulate real-time)
-
-def generate_wav(pcm_data, path=None, sample_rate=44100):
-    if not path:
-        path = os.path.join(WAV_DIR, str(uuid.uuid4())+".wav")
-    with wave.open(path, 'w') as wav_file:
-        wav_file.setnchannels(2)  # Stereo
-        wav_file.setsampwidth(2)  # 2 bytes per sample (16-bit)
-        wav_file.setframerate(sample_rate)  # Sample rate (44.1 kHz)
-        wav_file.writeframes(pcm_data)
-    return path
-
-def play_wav(path):
-    subprocess.run(["mplayer", "-ao", "pulse", path])
+import numpy as np
+
+SAMPLE_RATE = 44100
+CHANNELS = 2
+SAMPLE_WIDTH = 2  # 16-bit
+FRAME_BYTES = CHANNELS * SAMPLE_WIDTH
+
+
+class PCMRingBuffer:
+    """
+    Fixed-size ring buffer of PCM bytes between one producer and one consumer.
+
+    write() blocks while the buffer is full, so a producer that renders faster than playback waits for it
+    (backpressure). read() blocks until there is data, and returns b"" once the buffer is closed and empty.
+    """
+
+    def __init__(self, capacity):
+        self._buffer = np.empty(capacity, dtype=np.uint8)
+        self._condition = threading.Condition()
+        self._start = 0  # Position of the oldest byte
+        self._size = 0
+        self.closed = False
+        self.underruns = 0  # Reads that found the buffer empty
+
+    @property
+    def capacity(self):
+        return len(self._buffer)
+
+    def __len__(self):
+        with self._condition:
+            return self._size
+
+    def write(self, data):
+        """Append bytes (or any buffer, e.g. an int16 array), blocking until there is room for all of it."""
+        data = np.frombuffer(memoryview(data).cast('B'), dtype=np.uint8)
+        written = 0
+        with self._condition:
+            while written < len(data):
+                self._condition.wait_for(lambda: self._size < self.capacity or self.closed)
+                if self.closed:
+                    raise ValueError("write to a closed PCMRingBuffer")
+                count = min(len(data) - written, self.capacity - self._size)
+                end = (self._start + self._size) % self.capacity
+                first = min(count, self.capacity - end)
+                self._buffer[end:end + first] = data[written:written + first]
+                self._buffer[:count - first] = data[written + first:written + count]
+                self._size += count
+                written += count
+                self._condition.notify_all()
+
+    def read(self, max_bytes, multiple=1):
+        """
+        Remove and return up to max_bytes, a multiple of `multiple` bytes (e.g. whole frames) unless the
+        buffer is closed. Blocks until there is data, returns b"" once closed and empty.
+        """
+        with self._condition:
+            if self._size < multiple and not self.closed:
+                self.underruns += 1
+                self._condition.wait_for(lambda: self._size >= multiple or self.closed)
+            count = min(max_bytes, self._size)
+            if not self.closed:
+                count -= count % multiple
+            first = min(count, self.capacity - self._start)
+            data = self._buffer[self._start:self._start + first].tobytes()
+            if count > first:
+                data += self._buffer[:count - first].tobytes()
+            self._start = (self._start + count) % self.capacity
+            self._size -= count
+            self._condition.notify_all()
+            return data
+
+    def wait_empty(self, timeout=None):
+        with self._condition:
+            return self._condition.wait_for(lambda: self._size == 0, timeout)
+
+    def close(self):
+        """No more writes; readers get the remaining data, then b""."""
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+
+class NullSink:
+    """Discards the audio, counting the bytes. For tests and benchmarks."""
+
+    def __init__(self):
+        self.bytes_written = 0
+        self.closed = False
+
+    def write(self, data):
+        self.bytes_written += len(data)
+
+    def close(self):
+        self.closed = True
+
+
+class WavFileSink:
+    """Writes the audio to a WAV file."""
+
+    def __init__(self, path, sample_rate=SAMPLE_RATE):
+        self.path = path
+        self._wav = wave.open(path, 'wb')
+        self._wav.setnchannels(CHANNELS)
+        self._wav.setsampwidth(SAMPLE_WIDTH)
+        self._wav.setframerate(sample_rate)
+
+    def write(self, data):
+        self._wav.writeframesraw(data)
+
+    def close(self):
+        self._wav.close()
+
+
+class PipeSink:
+    """
+    Writes the audio to the standard input of a player process, by default paplay playing raw PCM.
+    """
+
+    def __init__(self, command=None, sample_rate=SAMPLE_RATE):
+        if command is None:
+            command = ["paplay", "--raw", "--format=s16le", f"--channels={CHANNELS}", f"--rate={sample_rate}"]
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+
+    def write(self, data):
+        self.process.stdin.write(data)
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait()
+
+
+class AudioStream:
+    """
+    In-process audio playback: PCM written with write() goes through a PCMRingBuffer of `buffer_seconds`
+    of audio to a consumer thread, which writes it to the sink in periods of `period_seconds`.
+    A producer can render the next segment while the current one plays, and is held back once the
+    buffer is full. Segments written back to back play without a gap.
+    """
+
+    def __init__(self, sink, sample_rate=SAMPLE_RATE, buffer_seconds=2.0, period_seconds=0.05):
+        self.sink = sink
+        self.sample_rate = sample_rate
+        self.period_bytes = max(1, int(period_seconds * sample_rate)) * FRAME_BYTES
+        self.buffer = PCMRingBuffer(max(1, int(buffer_seconds * sample_rate)) * FRAME_BYTES)
+        self.bytes_played = 0
+        self.error = None
+        self._thread = threading.Thread(target=self._play, daemon=True, name='audio-stream')
+        self._thread.start()
+
+    def _play(self):
+        try:
+            while True:
+                data = self.buffer.read(self.period_bytes, multiple=FRAME_BYTES)
+                if not data:
+                    break
+                self.sink.write(data)
+                self.bytes_played += len(data)
+        except Exception as e:
+            self.error = e
+            self.buffer.close()  # Unblocks the producer, its next write raises
+
+    def write(self, pcm):
+        """Queue PCM bytes or an int16 (samples, 2) array for playback, blocking while the buffer is full."""
+        try:
+            self.buffer.write(pcm)
+        except ValueError:
+            if self.error is not None:
+                raise RuntimeError(f"Audio sink failed: {self.error}") from self.error
+            raise
+
+    def write_chunks(self, chunks):
+        """Queue each chunk of an iterable, e.g. MidiSynthesizer.synthesis_chunks(), as it is produced."""
+        for chunk in chunks:
+            self.write(chunk)
+
+    @property
+    def seconds_buffered(self):
+        return len(self.buffer) / FRAME_BYTES / self.sample_rate
+
+    def drain(self, timeout=None):
+        """Wait until the buffered audio has been handed to the sink."""
+        return self.buffer.wait_empty(timeout)
+
+    def close(self):
+        """Play the buffered audio, then close the sink."""
+        self.buffer.close()
+        self._thread.join()
+        self.sink.close()
@@ -0,0 +1,77 @@
+"""
+CPU benchmark for the MIDI codec (midi_codec.py, used by MIDI.py) against the original byte-by-byte
+MIDI._decode() and MIDI._encode() (read from the git history: MIDI.py before midi_codec.py was added), on long synthetic MIDI files with every kind of
+event. Reports the time to decode a file into an opus (lists and EventTracks), to decode it into a score, and
+to encode an opus.
+
+Usage: python tests/benchmark_midi_codec.py [minutes...]
+"""
+import os
+import subprocess
+import sys
+import time
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import MIDI
+import midi_codec
+from tempo_helpers import make_opus
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def git(*args):
+    return subprocess.run(['git', *args], cwd=PROJECT_DIR, check=True, capture_output=True, text=True).stdout
+
+
+def load_original_midi():
+    """MIDI.py as it was before the commit that added midi_codec.py."""
+    commit = git('log', '--diff-filter=A', '--format=%H', '--', 'midi_codec.py').split()[-1]
+    module = types.ModuleType('original_MIDI')
+    exec(compile(git('show', f'{commit}^:./MIDI.py'), 'original MIDI.py', 'exec'), module.__dict__)
+    return module
+
+
+def timed(function, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def report(name, legacy_seconds, new_seconds):
+    print(f"    {name:28s} original {legacy_seconds * 1000:9.1f} ms   new {new_seconds * 1000:8.1f} ms   "
+          f"{legacy_seconds / new_seconds:6.1f}x")
+
+
+def main():
+    minutes = [float(m) for m in sys.argv[1:]] or [0.5, 2, 5]
+    original = load_original_midi()
+    for length in minutes:
+        opus = make_opus(int(length * 60))
+        midi = original.opus2midi(opus)
+        print(f"{length:g} minute piece, {sum(len(track) for track in opus[1:])} events, {len(midi)} bytes")
+        expected, legacy_seconds = timed(lambda: original.midi2opus(midi))
+        result, new_seconds = timed(lambda: MIDI.midi2opus(midi))
+        assert result == expected
+        report("midi2opus (lists)", legacy_seconds, new_seconds)
+        event_opus, new_seconds = timed(lambda: midi_codec.midi2opus(midi))
+        report("midi2opus (EventTracks)", legacy_seconds, new_seconds)
+        expected, legacy_seconds = timed(lambda: MIDI.opus2score(original.midi2opus(midi)))
+        result, new_seconds = timed(lambda: midi_codec.midi2score(midi))
+        assert [track.to_list() for track in result[1:]] == expected[1:]
+        report("midi2score (EventTracks)", legacy_seconds, new_seconds)
+        _, legacy_seconds = timed(lambda: original.opus2midi(opus))
+        result, new_seconds = timed(lambda: MIDI.opus2midi(opus))
+        assert result == midi
+        report("opus2midi (lists)", legacy_seconds, new_seconds)
+        result, new_seconds = timed(lambda: midi_codec.opus2midi(event_opus))
+        assert result == midi
+        report("opus2midi (EventTracks)", legacy_seconds, new_seconds)
+
+
+if __name__ == "__main__":
+    main()
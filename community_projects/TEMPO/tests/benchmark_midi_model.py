@@ -0,0 +1,68 @@
+"""
+CPU benchmark for MIDIModel.generate (midi_model.py) without the Hailo device, with the CPU stand-ins
+for the base and token networks (random weights, tv2o-medium embedding size 1024). Reports generated
+events per second of the original generation (the whole sequence embedded and padded again for every
+event) and of incremental generation, after prompts of several lengths, with:
+  - the CPUNetwork stand-ins, which cost about as much as a full 512 event network on the CPU,
+  - networks that do no work, to measure the host side of generation.
+
+Usage: python tests/benchmark_midi_model.py [events]
+"""
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from midi_model import CPUMIDIModel
+
+PROMPT_LENGTHS = (1, 256, 1024)
+
+
+class ConstantNetwork:
+    """A network that does no work: the same preallocated output for every input."""
+
+    def __init__(self, name, shape):
+        self.output = {f"{name}/output_layer1": np.random.default_rng(0).standard_normal(shape).astype(np.float32)}
+
+    def infer(self, x):
+        return self.output
+
+
+def make_prompt(model, length, seed=0):
+    """A prompt of `length` events from the model itself."""
+    generator = np.random.RandomState(seed)
+    prompt = np.array(list(model.generate(max_len=min(length, 64) + 1, generator=generator)))[:, 0]
+    return np.resize(prompt, (length, prompt.shape[-1]))[None]
+
+
+def events_per_second(model, prompt, events, incremental):
+    generator = np.random.RandomState(1)
+    start = time.perf_counter()
+    count = sum(1 for _ in model.generate(prompt, max_len=prompt.shape[1] + events, generator=generator,
+                                          incremental=incremental))
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    model = CPUMIDIModel.random()
+    vocab_size, n_embd = model.net_token_emb.shape
+    no_op = CPUMIDIModel(model.net_emb, model.net_token_emb, token_bias=model.net_token.output_bias)
+    no_op.net = ConstantNetwork("model_base", (1, 1, model.MAX_MIDI_SEQUENCE_LENGTH, n_embd))
+    logits = ConstantNetwork("model_token", (1, 1, model.tokenizer.max_token_seq, vocab_size))
+    logits.output["model_token/output_layer1"][..., model.tokenizer.eos_id] = -100
+    no_op.net_token = logits
+    prompts = {length: make_prompt(model, length) for length in PROMPT_LENGTHS}
+
+    for name, benchmarked in [('stand-in networks', model), ('no-op networks', no_op)]:
+        print(f"{name}, {events} events")
+        for length, prompt in prompts.items():
+            original = events_per_second(benchmarked, prompt, events, incremental=False)
+            incremental = events_per_second(benchmarked, prompt, events, incremental=True)
+            print(f"    prompt {length:5d} events: original {original:8.1f} events/s   incremental {incremental:8.1f} events/s")
+
+
+if __name__ == "__main__":
+    main()
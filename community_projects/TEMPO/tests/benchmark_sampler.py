@@ -0,0 +1,44 @@
+"""
+CPU benchmark for MIDIModel.sample_top_p_k (midi_model.py) against the original sampler (a full argsort
+of the vocabulary and one generator.choice per row), on token distributions like the token network's:
+softmax of random logits over the tokenizer vocabulary, masked to one parameter's ids. Reports the time
+per call for batch sizes 1 to 16.
+
+Usage: python tests/benchmark_sampler.py [calls]
+"""
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from midi_model import CPUMIDIModel
+from tempo_helpers import legacy_sample_top_p_k, make_probs
+
+BATCH_SIZES = (1, 2, 4, 8, 16)
+TOP_P = 0.98
+TOP_K = 20
+
+
+def microseconds_per_call(sample, probs, calls):
+    generator = np.random.RandomState(0)
+    start = time.perf_counter()
+    for _ in range(calls):
+        sample(probs, TOP_P, TOP_K, generator=generator)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    model = CPUMIDIModel.random(n_embd=8)
+    print(f"vocabulary {model.tokenizer.vocab_size}, top_p {TOP_P}, top_k {TOP_K}, {calls} calls")
+    for batch_size in BATCH_SIZES:
+        probs = make_probs(model.tokenizer, batch_size)
+        legacy = microseconds_per_call(legacy_sample_top_p_k, probs, calls)
+        batched = microseconds_per_call(model.sample_top_p_k, probs, calls)
+        print(f"    batch {batch_size:2d}: original {legacy:8.1f} us   batched {batched:8.1f} us   {legacy / batched:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+CPU benchmark for MidiSynthesizer.synthesis (midi_synthesizer.py) against the original rendering (the
+samples array grown with np.concatenate and the PCM bytes packed with struct per sample), on long
+synthetic MIDI pieces. Uses the SawtoothSynth stand-in for fluidsynth, so it measures the time spent
+around the synthesizer. Also reports how soon the first chunk of a streamed rendering is ready.
+
+Usage: python tests/benchmark_synthesizer.py [minutes...]
+"""
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import MIDI
+from midi_synthesizer import MidiSynthesizer, SawtoothSynth
+from tempo_helpers import LegacyMidiSynthesizer, make_score
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def main():
+    minutes = [float(m) for m in sys.argv[1:]] or [0.5, 1, 2]
+    for length in minutes:
+        opus = MIDI.score2opus(make_score(int(length * 60)))
+        events = sum(len(track) for track in opus[1:])
+        print(f"{length:g} minute piece, {events} events")
+        for is_stream in (False, True):
+            legacy, legacy_seconds = timed(lambda: LegacyMidiSynthesizer("", synth_class=SawtoothSynth).synthesis(opus, True, is_stream))
+            new, new_seconds = timed(lambda: MidiSynthesizer("", synth_class=SawtoothSynth).synthesis(opus, True, is_stream))
+            assert np.array_equal(np.asarray(legacy), np.asarray(new)) if not is_stream else legacy == new
+            print(f"    {'PCM bytes' if is_stream else 'samples  '}: original {legacy_seconds:8.3f} s   "
+                  f"preallocated {new_seconds:8.3f} s   {legacy_seconds / new_seconds:6.1f}x")
+        chunks = MidiSynthesizer("", synth_class=SawtoothSynth).synthesis_chunks(opus, True)
+        _, first_chunk = timed(lambda: next(chunks))
+        print(f"    first streamed chunk ready after {first_chunk * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
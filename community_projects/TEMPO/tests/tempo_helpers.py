@@ -0,0 +1,156 @@
+"""
+Random MIDI scores (make_score), opuses with every kind of event (make_opus) and token distributions
+(make_probs) for the TEMPO tests, with LegacyMidiSynthesizer and legacy_sample_top_p_k: the whole-piece
+synthesis() and the per-row sampler that the streaming synthesizer and the batched sampler must reproduce.
+"""
+import os
+import struct
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import MIDI
+from midi_synthesizer import MidiSynthesizer
+
+NOTES_PER_SECOND = 8
+TRACKS = 4
+
+
+class LegacyMidiSynthesizer(MidiSynthesizer):
+    """The original synthesis()."""
+
+    def synthesis(self, midi_opus, is_first_batch, is_stream):
+        event_list = []
+        if is_first_batch:
+            if self.curr_device:
+                self.release_fluidsynth(self.curr_device)
+            self.ticks_per_beat = midi_opus[0]
+            midi_opus = midi_opus[1:]
+
+            self.curr_device = self.get_fluidsynth()
+            self.fl, self.sfid = self.curr_device[:-1]
+            self.last_t = 0
+            for c in range(16):
+                self.fl.program_select(c, self.sfid, 128 if c == 9 else 0, 0)
+        for track in midi_opus:
+            abs_t = 0
+            for event in track:
+                abs_t += event[1]
+                event_new = [*event]
+                event_new[1] = abs_t
+                event_list.append(event_new)
+        event_list = sorted(event_list, key=lambda e: e[1])
+
+        pcm = b""
+        all_samples = np.empty((0, 2), dtype=np.int16)
+        for event in event_list:
+            name = event[0]
+            sample_len = int(((event[1] / self.ticks_per_beat) * self.tempo / (10 ** 6)) * self.sample_rate)
+            sample_len -= int(((self.last_t / self.ticks_per_beat) * self.tempo / (10 ** 6)) * self.sample_rate)
+            self.last_t = event[1]
+            if sample_len > 0:
+                samples = self.fl.get_samples(sample_len).reshape(sample_len, 2)
+                all_samples = np.concatenate([all_samples, samples])
+                pcm += b''.join([struct.pack('<hh', sample[0], sample[1]) for sample in samples])
+            if name == "set_tempo":
+                self.tempo = event[2]
+            elif name == "patch_change":
+                c, p = event[2:4]
+                self.fl.program_select(c, self.sfid, 128 if c == 9 else 0, p)
+            elif name == "control_change":
+                c, cc, v = event[2:5]
+                self.fl.cc(c, cc, v)
+            elif name == "note_on" and event[3] > 0:
+                c, p, v = event[2:5]
+                self.fl.noteon(c, p, v)
+            elif name == "note_off" or (name == "note_on" and event[3] == 0):
+                c, p = event[2:4]
+                self.fl.noteoff(c, p)
+        if is_stream:
+            return pcm
+        else:
+            return all_samples
+
+
+def make_score(seconds, ticks_per_beat=480, seed=0):
+    """A MIDI score of random notes on TRACKS tracks at 120 bpm, with a tempo change halfway."""
+    rng = np.random.default_rng(seed)
+    ticks_per_second = ticks_per_beat * 2
+    tracks = [[['set_tempo', 0, 500000], ['set_tempo', seconds * ticks_per_second // 2, 400000]]]
+    for track in range(TRACKS):
+        channel = 9 if track == TRACKS - 1 else track
+        events = [['patch_change', 0, channel, int(rng.integers(0, 128))]]
+        count = seconds * NOTES_PER_SECOND // TRACKS
+        starts = np.sort(rng.integers(0, seconds * ticks_per_second, count))
+        for start in starts:
+            events.append(['note', int(start), int(rng.integers(60, 960)), channel, int(rng.integers(30, 90)),
+                           int(rng.integers(40, 127))])
+        tracks.append(events)
+    return [ticks_per_beat, *tracks]
+
+
+def make_opus(seconds, seed=0):
+    """
+    Opus of make_score() with the other kinds of events added: meta events, sysex, controllers, pitch wheel,
+    aftertouch, note_on events with velocity 0 as note offs, an unterminated note and a final empty text_event.
+    """
+    rng = np.random.default_rng(seed)
+    score = make_score(seconds, seed=seed)
+    length = seconds * score[0] * 2
+    score[1] += [['track_name', 0, b'TEMPO'], ['time_signature', 0, 4, 2, 24, 8], ['key_signature', 0, -3, 1],
+                 ['smpte_offset', 0, 96, 0, 3, 0, 0], ['sysex_f0', 0, bytes([0x7E, 0x7F, 0x09, 0x01, 0xF7])],
+                 ['sequencer_specific', 0, bytes(200)], ['raw_meta_event', 0, 0x21, b'\x00'],
+                 ['set_sequence_number', 0, 258], ['marker', length // 2, 'Chorus'], ['lyric', length // 3, b'la']]
+    for track in score[2:]:
+        channel = track[0][2]
+        for start in np.sort(rng.integers(0, length, seconds * 2)).tolist():
+            kind = int(rng.integers(0, 4))
+            if kind == 0:
+                track.append(['control_change', start, channel, int(rng.integers(0, 128)), int(rng.integers(0, 128))])
+            elif kind == 1:
+                track.append(['pitch_wheel_change', start, channel, int(rng.integers(-8192, 8192))])
+            elif kind == 2:
+                track.append(['channel_after_touch', start, channel, int(rng.integers(0, 128))])
+            else:
+                track.append(['key_after_touch', start, channel, int(rng.integers(0, 128)), int(rng.integers(0, 128))])
+        track.sort(key=lambda event: event[1])
+    opus = MIDI.score2opus(score)
+    for track in opus[2:]:
+        for event in track[::3]:
+            if event[0] == 'note_off':
+                event[0], event[4] = 'note_on', 0
+    opus[2].append(['note_on', 10, opus[2][1][2], 64, 100])
+    opus[3].append(['text_event', 200, b''])
+    return opus
+
+
+def legacy_sample_top_p_k(probs, p, k, generator=None):
+    if generator is None:
+        generator = np.random
+    probs_idx = np.argsort(-probs, axis=-1)
+    probs_sort = np.take_along_axis(probs, probs_idx, -1)
+    probs_sum = np.cumsum(probs_sort, axis=-1)
+    mask = probs_sum - probs_sort > p
+    probs_sort[mask] = 0.0
+    mask = np.zeros(probs_sort.shape[-1])
+    mask[:k] = 1
+    probs_sort = probs_sort * mask
+    probs_sort /= np.sum(probs_sort, axis=-1, keepdims=True)
+    shape = probs_sort.shape
+    probs_sort_flat = probs_sort.reshape(-1, shape[-1])
+    probs_idx_flat = probs_idx.reshape(-1, shape[-1])
+    next_token = np.stack([generator.choice(idxs, p=pvals) for pvals, idxs in zip(probs_sort_flat, probs_idx_flat)])
+    next_token = next_token.reshape(*shape[:-1])
+    return next_token
+
+
+def make_probs(tokenizer, batch_size, parameter="pitch", seed=0):
+    """(batch_size, 1, vocab_size) probabilities of the token network, masked to one parameter."""
+    rng = np.random.default_rng(seed)
+    logits = rng.standard_normal((batch_size, 1, tokenizer.vocab_size)).astype(np.float32) * 3
+    probs = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    probs /= probs.sum(axis=-1, keepdims=True)
+    mask = np.zeros(tokenizer.vocab_size, dtype=np.int64)
+    mask[tokenizer.parameter_ids[parameter]] = 1
+    return probs * mask
@@ -0,0 +1,176 @@
+import ast
+import os
+import numpy as np
+import pytest
+import MIDI
+import midi_codec
+from midi_codec import EventTrack
+from midi_tokenizer import MIDITokenizerV1, MIDITokenizerV2
+from tempo_helpers import make_opus
+
+# The reference files were written with the original byte-by-byte MIDI.py, before it used midi_codec
+RESOURCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_resources')
+REFERENCES = ['reference_1s', 'reference_10s']
+CORPUS = [make_opus(seconds, seed=seed) for seconds, seed in [(1, 0), (10, 1), (30, 2), (60, 3)]]
+
+
+def read_reference(name):
+    path = os.path.join(RESOURCES, name)
+    if name.endswith('.mid'):
+        with open(path, 'rb') as f:
+            return f.read()
+    with open(path) as f:
+        return ast.literal_eval(f.read())
+
+
+def lists(opus):
+    return opus[:1] + [track.to_list() for track in opus[1:]]
+
+
+def test_varlen_matches_original():
+    values = [0, 1, 0x7F, 0x80, 0x3FFF, 0x4000, 2 ** 21, 2 ** 28 + 5, 2 ** 40, -1, -200]
+    expected = [b'\x00', b'\x01', b'\x7f', b'\x81\x00', b'\xff\x7f', b'\x81\x80\x00', b'\x81\x80\x80\x00',
+                b'\x81\x80\x80\x80\x05', b'\xa0\x80\x80\x80\x80\x00', b'\x7f', b'8']
+    for value, ber in zip(values, expected):
+        assert MIDI._ber_compressed_int(value) == ber
+        assert midi_codec.varlen(value) == ber
+        assert MIDI._unshift_ber_int(bytearray(ber) + b'\x90') == (value & 0x7F if value < 0 else value, b'\x90')
+    for data, expected in [(b'', (0, b'')), (b'\x81\x82', (0, b'')), (b'\x00\x01', (0, b'\x01'))]:
+        assert MIDI._unshift_ber_int(bytearray(data)) == expected
+
+
+def test_decode_matches_original():
+    for name in REFERENCES:
+        midi = read_reference(name + '.mid')
+        expected = read_reference(name + '_opus.txt')
+        assert MIDI.midi2opus(midi) == expected
+        assert lists(midi_codec.midi2opus(midi)) == expected
+
+
+def test_round_trip():
+    for name in REFERENCES:
+        midi = read_reference(name + '.mid')
+        assert MIDI.opus2midi(read_reference(name + '_opus.txt')) == midi
+        assert midi_codec.opus2midi(midi_codec.midi2opus(midi)) == midi
+    for opus in CORPUS:
+        midi = MIDI.opus2midi(opus)
+        assert MIDI.opus2midi(MIDI.midi2opus(midi)) == midi
+        assert midi_codec.opus2midi(midi_codec.midi2opus(midi)) == midi
+        assert midi_codec.score2midi(midi_codec.midi2score(midi)) == MIDI.score2midi(MIDI.midi2score(midi))
+
+
+def test_encode_options_match_original():
+    track = read_reference('reference_10s_opus.txt')[3]
+    options = [dict(never_add_eot=True), dict(no_eot_magic=True), dict(no_running_status=True), {}]
+    cases = [track, track[:-1], [], [['text_event', 5, b'']], track + [['raw_data', 3, 1], ['unknown', 2]]]
+    for events, encoded in zip(cases, read_reference('reference_encode.txt')):
+        for option, expected in zip(options, encoded):
+            assert MIDI._encode(events, **option) == expected
+            assert midi_codec.encode_track(EventTrack.from_list(events), **option) == expected
+
+
+def test_score_conversions_match_original():
+    for name in REFERENCES:
+        midi = read_reference(name + '.mid')
+        expected = read_reference(name + '_score.txt')
+        assert MIDI.midi2score(midi) == expected
+        assert lists(midi_codec.midi2score(midi)) == expected
+    for opus in CORPUS:
+        score = MIDI.opus2score(opus)
+        event_score = midi_codec.opus2score(opus)
+        assert lists(event_score) == score
+        assert lists(MIDI.opus2score(midi_codec.midi2opus(MIDI.opus2midi(opus)))) == MIDI.midi2score(MIDI.opus2midi(opus))
+        assert lists(MIDI.score2opus(event_score)) == MIDI.score2opus(score)
+
+
+def test_decode_edge_cases_match_original():
+    tracks = [
+        b'\x00\x40\x00',  # Running status not set
+        b'\x00\x90\x3c\x40\x10\x3c\x00\x00\xc1\x05\x00\x05\x81\x70\xe2\x00\x40\x00\xff\x2f\x00\x00\x90\x3c',
+        b'\x00\xff\x2f\x00\x00\x90\x3c\x40',  # Events after the end of track are ignored
+        b'\x83\x00\xff\x2f\x00',  # End of track with a delta time
+        b'\x00\xf2\x10\x20\x00\xf3\x05\x00\xf6\x00\xf1\x07\x00\xf7\x02\x01\x02',
+        b'\x00\xff\x58\x02\x04\x02',  # Short time signature
+        b'\x00\xff\x01\x10abc',  # Text longer than the track
+        b'\x00\xff\x00\x02\x01\x02\x00\xff\x00\x01\x05\x00\xff\x21\x01\x00\x00\xff\x54\x05\x60\x00\x03\x00\x00',
+    ]
+    notes = [['note_on', 0, 0, 60, 64], ['note_on', 16, 0, 60, 0], ['patch_change', 0, 1, 5],
+             ['patch_change', 0, 1, 5], ['pitch_wheel_change', 240, 2, 0]]
+    system = [['song_position', 0, 4112], ['song_select', 0, 5], ['tune_request', 0], ['raw_data', 0, 7],
+              ['sysex_f7', 0, b'\x01\x02']]
+    meta = [['set_sequence_number', 0, 258], ['set_sequence_number', 0, 0], ['raw_meta_event', 0, 33, b'\x00'],
+            ['smpte_offset', 0, 96, 0, 3, 0, 0]]
+    expected = [
+        ([], []),
+        (notes, notes + [['end_track', 0]]),
+        ([], [['end_track', 0]]),
+        ([['text_event', 384, '']], [['end_track', 384]]),
+        (system, system),
+        ([['time_signature', 0, 4, 2]], [['time_signature', 0, 4, 2]]),
+        ([['text_event', 0, b'abc']], [['text_event', 0, b'abc']]),
+        (meta, meta),
+    ]
+    for data, (events, no_eot_magic_events) in zip(tracks, expected):
+        assert MIDI._decode(data) == events
+        assert MIDI._decode(data, no_eot_magic=True) == no_eot_magic_events
+    assert MIDI._decode(tracks[1], exclude=['note_on']) == notes[2:]
+    for truncated in [b'\x00\x90\x3c', b'\x00\x90\x3c\x40\x00\x3c', b'\x81']:
+        with pytest.raises(IndexError):
+            MIDI._decode(truncated)
+
+
+def test_warnings_match_original(monkeypatch):
+    tracks = [
+        b'\x00\x40\x00',  # Running status not set
+        b'\x00\xff\x58\x02\x04\x02',
+        b'\x00\xff\x51\x02\x07\xa1\x00\xff\x59\x01\x00\x00\xff\x00\x01\x05\x00\x90\x3c\x40',
+        b'\x00\xff\x54\x04\x60\x00\x03\x00\x00\xff\x59\x02\x00\x00\x00\xff\x2f\x00',
+    ]
+    expected = [
+        ([], ["Running status not set; Aborting track."]),
+        ([['time_signature', 0, 4, 2]], ['time_signature event, but length=2']),
+        ([['set_tempo', 0, 499968], ['key_signature', 0, 0, 0], ['set_sequence_number', 0, 0],
+          ['note_on', 0, 0, 60, 64]],
+         ['set_tempo event, but length=2', 'key_signature event, but length=1',
+          'set_sequence_number: length must be 2, not 1']),
+        ([['smpte_offset', 0, 96, 0, 3, 0, 0], ['key_signature', 0, 0, 0]], ['smpte_offset event, but length=4']),
+    ]
+    for data, (events, messages) in zip(tracks, expected):
+        warnings = []
+        monkeypatch.setattr('MIDI._warn', warnings.append)
+        assert MIDI._decode(data) == events
+        assert warnings == messages
+        warnings = []
+        assert midi_codec.decode_track(data, warn=warnings.append).to_list() == events
+        assert warnings == messages
+
+    events = CORPUS[0][1] + [['raw_data', 3, 1], ['unknown', 2]]
+    expected = ["_encode: raw_data event not supported", "Unknown event: unknown"]
+    warnings = []
+    monkeypatch.setattr('MIDI._warn', warnings.append)
+    MIDI._encode(events)
+    assert warnings == expected
+    for track in [events, EventTrack.from_list(events)]:
+        warnings = []
+        midi_codec.encode_track(track, warn=warnings.append)
+        assert warnings == expected
+
+
+def test_event_track_columns():
+    track = EventTrack.from_list([['set_tempo', 0, 500000], ['note', 10, 20, 9, 36, 100],
+                                  ['time_signature', 0, 3, 2, 24, 8], ['track_name', 0, b'drums']])
+    assert track.events['type'].tolist() == [midi_codec.SET_TEMPO, midi_codec.NOTE, midi_codec.TIME_SIGNATURE,
+                                             midi_codec.OTHER]
+    assert track.events['params'][1].tolist() == [36, 100, 20, 0]
+    assert track.extras == [['track_name', 0, b'drums']]
+    assert track.to_list(['note', 'track_name']) == [['note', 10, 20, 9, 36, 100], ['track_name', 0, b'drums']]
+    with pytest.raises(ValueError):
+        EventTrack.from_list([['note_on', 0, 0, 60.5, 100]])
+
+
+def test_tokenizer_reads_event_tracks():
+    midi = MIDI.opus2midi(CORPUS[2])
+    for tokenizer in (MIDITokenizerV1(), MIDITokenizerV2()):
+        expected = tokenizer.tokenize(MIDI.midi2score(midi))
+        assert tokenizer.tokenize(midi_codec.midi2score(midi)) == expected
+        assert np.asarray(expected).shape[1] == tokenizer.max_token_seq
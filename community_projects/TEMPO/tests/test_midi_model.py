@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from midi_model import CPUMIDIModel, EventSequence
+
+
+@pytest.fixture(scope="module")
+def model():
+    return CPUMIDIModel.random(n_embd=32)
+
+
+def padded_window(net_emb, events, pad_event, window):
+    """The base network input of the original forward(): the last `window` events, padded and summed."""
+    events = events[:, -window:]
+    if events.shape[1] < window:
+        padding = np.broadcast_to(pad_event, (events.shape[0], window - events.shape[1], len(pad_event)))
+        events = np.concatenate([events, padding], axis=1)
+    return np.sum(net_emb[events], axis=-2)
+
+
+def test_event_sequence_matches_padded_sum():
+    rng = np.random.default_rng(0)
+    net_emb = rng.standard_normal((50, 16)).astype(np.float32)
+    pad_event = np.zeros(4, dtype=np.int64)
+    sequence = EventSequence(net_emb, pad_event, batch_size=2, window=8)
+    history = np.zeros((2, 0, 4), dtype=np.int64)
+    for count in [1, 3, 1, 5, 1, 1, 8, 2, 12, 1, 1, 1]:  # Grows past the window and wraps the buffer
+        events = rng.integers(0, 50, (2, count, 4))
+        sequence.append(events)
+        history = np.concatenate([history, events], axis=1)
+        assert np.array_equal(sequence.window(), padded_window(net_emb, history, pad_event, 8))
+        assert sequence.last_index() == min(history.shape[1], 8) - 1
+
+
+@pytest.mark.parametrize("prompt_length", [0, 505, 600])
+def test_incremental_generation_matches_original(model, prompt_length):
+    prompt = None
+    if prompt_length:
+        # Up to and past the 512 event window of the base network
+        prompt = np.array(list(model.generate(max_len=40, generator=np.random.RandomState(3))))[:, 0]
+        prompt = np.resize(prompt, (prompt_length, prompt.shape[-1]))
+    max_len = (prompt_length or 1) + 15
+    original = list(model.generate(prompt, max_len=max_len, generator=np.random.RandomState(0), incremental=False))
+    incremental = list(model.generate(prompt, max_len=max_len, generator=np.random.RandomState(0)))
+    assert len(original) == len(incremental) == 15
+    assert all(np.array_equal(a, b) for a, b in zip(original, incremental))
+
+
+def test_incremental_generation_with_batch(model):
+    kwargs = dict(batch_size=3, max_len=12, disable_patch_change=True, disable_channels=[9])
+    original = list(model.generate(generator=np.random.RandomState(5), incremental=False, **kwargs))
+    incremental = list(model.generate(generator=np.random.RandomState(5), **kwargs))
+    assert all(np.array_equal(a, b) for a, b in zip(original, incremental))
+    assert original[0].shape == (3, model.tokenizer.max_token_seq)
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from tempo_helpers import legacy_sample_top_p_k, make_probs
+from midi_model import CPUMIDIModel
+
+
+@pytest.fixture(scope="module")
+def model():
+    return CPUMIDIModel.random(n_embd=8)
+
+
+def expected_distribution(probs, p, k):
+    """Token probabilities of top-p/top-k sampling of one row, as the original sampler computes them."""
+    order = np.argsort(-probs, kind="stable")
+    probs_sort = probs[order]
+    probs_sort[np.cumsum(probs_sort) - probs_sort > p] = 0
+    probs_sort[k:] = 0
+    expected = np.zeros_like(probs)
+    expected[order] = probs_sort / probs_sort.sum()
+    return expected
+
+
+@pytest.mark.parametrize("p, k", [(0.98, 20), (0.5, 20), (1.0, 5), (0.9, 1)])
+def test_sampler_matches_distribution(model, p, k):
+    probs = make_probs(model.tokenizer, 4, parameter="velocity", seed=1)
+    draws = 4000
+    counts = np.zeros(probs.shape, dtype=np.int64)
+    generator = np.random.RandomState(0)
+    for _ in range(draws):
+        tokens = model.sample_top_p_k(probs, p, k, generator=generator)
+        assert tokens.shape == (4, 1)
+        np.add.at(counts, (np.arange(4), 0, tokens[:, 0]), 1)
+    for row in range(4):
+        expected = expected_distribution(probs[row, 0].astype(np.float64), p, k)
+        observed = counts[row, 0] / draws
+        assert observed[expected == 0].sum() == 0  # Never outside the top-p/top-k set
+        tolerance = 5 * np.sqrt(expected * (1 - expected) / draws) + 1e-9
+        assert np.all(np.abs(observed - expected) <= tolerance)
+
+
+def test_sampler_agrees_with_original(model):
+    probs = make_probs(model.tokenizer, 2, parameter="pitch", seed=2)
+    draws = 3000
+    generator = np.random.RandomState(1)
+    batched = np.concatenate([model.sample_top_p_k(probs, 0.98, 20, generator=generator) for _ in range(draws)], axis=1)
+    legacy = np.concatenate([legacy_sample_top_p_k(probs, 0.98, 20, generator=generator) for _ in range(draws)], axis=1)
+    for row in range(2):
+        tokens = np.union1d(batched[row], legacy[row])
+        batched_freq = np.array([(batched[row] == t).mean() for t in tokens])
+        legacy_freq = np.array([(legacy[row] == t).mean() for t in tokens])
+        pooled = (batched_freq + legacy_freq) / 2
+        assert np.all(np.abs(batched_freq - legacy_freq) <= 5 * np.sqrt(2 * pooled * (1 - pooled) / draws) + 1e-9)
+
+
+def test_sampler_handles_few_candidates(model):
+    probs = np.zeros((3, 1, 100), dtype=np.float32)
+    probs[0, 0, 7] = 1  # A single allowed token, e.g. padding after the event's parameters
+    probs[1, 0, [3, 50]] = 0.5
+    probs[2, 0, 99] = 0.2
+    generator = np.random.RandomState(0)
+    for _ in range(200):
+        tokens = model.sample_top_p_k(probs, 0.98, 20, generator=generator)[:, 0]
+        assert tokens[0] == 7 and tokens[1] in (3, 50) and tokens[2] == 99
+    assert model.sample_top_p_k(probs[:, 0], 0.98, 200, generator=generator).shape == (3,)
@@ -0,0 +1,117 @@
+import threading
+import time
+import wave
+import numpy as np
+import pytest
+from sound_stream import AudioStream, NullSink, PCMRingBuffer, PipeSink, WavFileSink
+
+
+class RecordingSink(NullSink):
+    def __init__(self, delay=0):
+        super().__init__()
+        self.data = bytearray()
+        self.delay = delay
+
+    def write(self, data):
+        super().write(data)
+        self.data += data
+        time.sleep(self.delay)
+
+
+def test_ring_buffer_keeps_order_across_wraps():
+    rng = np.random.default_rng(0)
+    data = rng.integers(0, 256, 100_000, dtype=np.uint8).tobytes()
+    ring = PCMRingBuffer(1000)
+    received = bytearray()
+
+    def consume():
+        while chunk := ring.read(int(rng.integers(1, 700))):
+            received.extend(chunk)
+
+    consumer = threading.Thread(target=consume)
+    consumer.start()
+    position = 0
+    while position < len(data):
+        size = int(rng.integers(1, 2500))  # Larger than the buffer too
+        ring.write(data[position:position + size])
+        position += size
+    ring.close()
+    consumer.join(timeout=10)
+    assert bytes(received) == data
+
+
+def test_write_blocks_while_full():
+    ring = PCMRingBuffer(8)
+    ring.write(b"12345678")
+    done = threading.Event()
+    writer = threading.Thread(target=lambda: (ring.write(b"abcd"), done.set()))
+    writer.start()
+    assert not done.wait(0.1)  # Backpressure: no room until the consumer reads
+    assert ring.read(4) == b"1234"
+    assert done.wait(1)
+    assert ring.read(100) == b"5678abcd"
+    writer.join()
+
+
+def test_read_whole_frames_and_close():
+    ring = PCMRingBuffer(16)
+    ring.write(b"abcdefg")
+    assert ring.read(16, multiple=4) == b"abcd"
+    ring.close()
+    assert ring.read(16, multiple=4) == b"efg"  # The rest once closed
+    assert ring.read(16) == b""
+    with pytest.raises(ValueError):
+        ring.write(b"x")
+
+
+def test_audio_stream_plays_segments_back_to_back():
+    sink = RecordingSink()
+    stream = AudioStream(sink, buffer_seconds=0.05, period_seconds=0.01)
+    segments = [np.random.default_rng(i).integers(-2 ** 15, 2 ** 15, (3000 + i * 7, 2), dtype=np.int16) for i in range(4)]
+    stream.write(segments[0])
+    stream.write_chunks(np.array_split(segments[1], 5))
+    stream.write(segments[2].tobytes())
+    stream.write(segments[3][::1])
+    stream.close()
+    assert sink.closed
+    assert bytes(sink.data) == np.concatenate(segments).tobytes()
+    assert stream.bytes_played == len(sink.data)
+
+
+def test_producer_is_paced_by_the_sink():
+    sink = RecordingSink(delay=0.01)  # 10 ms per 100 frame period: 10x faster than real time
+    stream = AudioStream(sink, sample_rate=10_000, buffer_seconds=0.05, period_seconds=0.01)
+    start = time.perf_counter()
+    stream.write(np.zeros((2000, 2), dtype=np.int16))  # 20 periods, 5 fit in the buffer
+    elapsed = time.perf_counter() - start
+    assert elapsed > 0.1
+    assert stream.seconds_buffered <= 0.05
+    stream.close()
+    assert sink.bytes_written == 2000 * 4
+
+
+def test_sink_errors_reach_the_producer():
+    class FailingSink(NullSink):
+        def write(self, data):
+            raise OSError("device gone")
+
+    stream = AudioStream(FailingSink(), buffer_seconds=0.01)
+    with pytest.raises(RuntimeError, match="device gone"):
+        for _ in range(100):
+            stream.write(np.zeros((441, 2), dtype=np.int16))
+    stream.close()
+
+
+def test_file_and_pipe_sinks(tmp_path):
+    pcm = np.random.default_rng(0).integers(-1000, 1000, (5000, 2), dtype=np.int16)
+    stream = AudioStream(WavFileSink(str(tmp_path / "out.wav")))
+    stream.write(pcm)
+    stream.close()
+    with wave.open(str(tmp_path / "out.wav")) as wav:
+        assert (wav.getnchannels(), wav.getsampwidth(), wav.getframerate()) == (2, 2, 44100)
+        assert wav.readframes(wav.getnframes()) == pcm.tobytes()
+
+    stream = AudioStream(PipeSink(["sh", "-c", f"cat > {tmp_path / 'out.raw'}"]))
+    stream.write(pcm)
+    stream.close()
+    assert (tmp_path / "out.raw").read_bytes() == pcm.tobytes()
@@ -0,0 +1,56 @@
+import numpy as np
+import MIDI
+from tempo_helpers import LegacyMidiSynthesizer, make_score
+from midi_synthesizer import MidiSynthesizer, SawtoothSynth
+
+
+def synthesizers():
+    return LegacyMidiSynthesizer("", synth_class=SawtoothSynth), MidiSynthesizer("", synth_class=SawtoothSynth)
+
+
+def test_synthesis_matches_original():
+    opus = MIDI.score2opus(make_score(10))
+    for is_stream in (False, True):
+        legacy, synthesizer = synthesizers()
+        expected = legacy.synthesis(opus, True, is_stream)
+        result = synthesizer.synthesis(opus, True, is_stream)
+        if is_stream:
+            assert isinstance(result, bytes) and result == expected
+        else:
+            assert result.dtype == np.int16 and result.shape == expected.shape
+            assert np.array_equal(result, expected)
+        assert synthesizer.tempo == legacy.tempo == 400000
+        assert synthesizer.last_t == legacy.last_t
+
+
+def test_continued_batches_match_original():
+    first = MIDI.score2opus(make_score(4, seed=1))
+    second = MIDI.score2opus(make_score(3, seed=2))[1:]  # Later batches have no ticks_per_beat
+    legacy, synthesizer = synthesizers()
+    for opus, is_first_batch in [(first, True), (second, False), (first, True)]:
+        assert synthesizer.synthesis(opus, is_first_batch, True) == legacy.synthesis(opus, is_first_batch, True)
+
+
+def test_chunks_cover_the_piece():
+    opus = MIDI.score2opus(make_score(5))
+    expected = MidiSynthesizer("", synth_class=SawtoothSynth).synthesis(opus, True, False)
+    chunks = list(MidiSynthesizer("", synth_class=SawtoothSynth).synthesis_chunks(opus, True, chunk_samples=1000))
+    assert all(len(chunk) == 1000 for chunk in chunks[:-1]) and 0 < len(chunks[-1]) <= 1000
+    assert not chunks[0].flags.writeable
+    assert np.array_equal(np.concatenate(chunks), expected)
+
+
+def test_first_chunk_before_rendering_ends():
+    rendered = []
+
+    class CountingSynth(SawtoothSynth):
+        def get_samples(self, length):
+            rendered.append(length)
+            return super().get_samples(length)
+
+    opus = MIDI.score2opus(make_score(20))
+    chunks = MidiSynthesizer("", synth_class=CountingSynth).synthesis_chunks(opus, True, chunk_samples=4096)
+    next(chunks)
+    partial = sum(rendered)
+    list(chunks)
+    assert 4096 <= partial < sum(rendered) / 10
@@ -1,26 +1,34 @@
 import gi
 gi.require_version('Gst', '1.0')
 from gi.repository import Gst
-import numpy as np
+import os
 import pathlib
+import sys
 import hailo
+from hailo_apps.hailo_app_python.core.common.core import get_default_parser
 from hailo_apps.hailo_app_python.core.gstreamer.gstreamer_app import app_callback_class
 from pipeline import GStreamerDetectionCropperApp
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'basic_pipelines'))
+from depth_stats import TrackDepthEstimator, trimmed_mean_depth
+
 # User-defined class to be used in the callback function: Inheritance from the app_callback_class
 class user_app_callback_class(app_callback_class):
 
+    def __init__(self, smooth_depth=False):
+        super().__init__()
+        # With smooth_depth, tracked detections reuse a smoothed depth and are only recomputed every few
+        # frames, so the reported depth can be up to 3 frames old
+        self.depth_estimator = TrackDepthEstimator(refresh_interval=3) if smooth_depth else None
+
     def calculate_average_depth(self, depth_mat):
-        depth_values = np.array(depth_mat).flatten()  # Flatten the array and filter out outlier pixels
-        try:
-            m_depth_values = depth_values[depth_values <= np.percentile(depth_values, 95)]  # drop 5% of highest values (outliers)          
-        except Exception as e:
-            m_depth_values = np.array([])
-        if len(m_depth_values) > 0:
-            average_depth = np.mean(m_depth_values)  # Calculate the average depth of the pixels
-        else:
-            average_depth = 0  # Default value if no valid pixels are found
-        return average_depth
+        # Mean of the pixels after dropping the 5% highest values (outliers)
+        return trimmed_mean_depth(depth_mat, upper_percentile=95)
+
+    def average_depth(self, depth_mask, track_id):
+        if self.depth_estimator is not None:
+            return self.depth_estimator.average_depth(depth_mask, track_id)
+        return self.calculate_average_depth(depth_mask.get_data())
 
 # User-defined callback function: This is the callback function that will be called when data is available from the pipeline
 def app_callback(pad, info, user_data):
@@ -41,7 +49,7 @@ def app_callback(pad, info, user_data):
             track_id = track[0].get_id()
         depth_mat = detection.get_objects_typed(hailo.HAILO_DEPTH_MASK)
         if len(depth_mat) > 0:  # since depth is only on detections
-            detection_average_depth = user_data.calculate_average_depth(depth_mat[0].get_data())
+            detection_average_depth = user_data.average_depth(depth_mat[0], track_id)
         else:
             detection_average_depth = 0
         print(f'Frame {user_data.frame_count}, Detection {detection.get_label()} ({track_id}) average depth: {detection_average_depth:.2f}')
@@ -49,6 +57,10 @@ def app_callback(pad, info, user_data):
     return Gst.PadProbeReturn.OK
 
 if __name__ == "__main__":
-    user_data = user_app_callback_class()
-    app = GStreamerDetectionCropperApp(app_callback, user_data, pathlib.Path(__file__).parent.resolve())
+    parser = get_default_parser()
+    parser.add_argument('--smooth-depth', action='store_true',
+                        help='Smooth the depth of tracked detections over frames and only recompute it every 3 frames.')
+    options, _ = parser.parse_known_args()
+    user_data = user_app_callback_class(smooth_depth=options.smooth_depth)
+    app = GStreamerDetectionCropperApp(app_callback, user_data, pathlib.Path(__file__).parent.resolve(), parser)
     app.run()
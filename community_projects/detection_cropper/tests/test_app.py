@@ -11,6 +11,14 @@ class TestUserAppCallbackClass(unittest.TestCase):
         average_depth = user_data.calculate_average_depth(depth_mat)
         self.assertAlmostEqual(average_depth, 3.0, places=1)
 
+    def test_depth_is_exact_unless_smoothed(self):
+        depth_mask = MagicMock()
+        depth_mask.get_data.return_value = [1, 2, 3, 4, 5, 100]
+        user_data = user_app_callback_class()
+        self.assertIsNone(user_data.depth_estimator)
+        self.assertAlmostEqual(user_data.average_depth(depth_mask, track_id=1), 3.0, places=1)
+        self.assertIsNotNone(user_app_callback_class(smooth_depth=True).depth_estimator)
+
 class TestAppCallback(unittest.TestCase):
 
     @patch('app.hailo.get_roi_from_buffer')
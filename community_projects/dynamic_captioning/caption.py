@@ -7,8 +7,17 @@ from tokenizers import Tokenizer as TokenizerFast
 from hailo_platform import VDevice, FormatType, HailoSchedulingAlgorithm
 import clip
 import torch
-from picamera2 import Picamera2
+try:
+    from picamera2 import Picamera2
+except ImportError:
+    # Only --input (a video or image directory) can be captioned without the camera
+    Picamera2 = None
 import argparse
+import queue
+from florence2 import Florence2Captioner, DECODER_ENCODER_INPUT, DECODER_EMBEDDING_INPUT
+from scene_change import SceneChangeGate, SCENE_CHANGE_THRESHOLD
+from text_embeddings import TextEmbeddingCache, KnownEvents
+from pipeline import StagedPipeline, CaptureThread, FileCapture
 
 
 CAPTION_EMBEDDING = "resources/embeddings/caption_embedding.npy"
@@ -16,39 +25,51 @@ WORD_EMBEDDING = "resources/embeddings/word_embedding.npy"
 ENCODER_PATH = "resources/models/florence2_transformer_encoder.hef"
 DECODER_PATH = "resources/models/florence2_transformer_decoder.hef"
 VISION_ENCODER_PATH = "resources/models/vision_encoder.onnx"
-DECODER_INPUT_SHAPE = (1, 1, 32, 768)
-ENCODER_OUTPUT_KEY = "resources/transformer_decoder/input_layer1"
-DECODER_INPUT_KEY = "resources/transformer_decoder/input_layer2"
 TOKENIZER_PATH = "resources/tokenizer/tokenizer.json"
-START_TOKEN = 2
-TIMEOUT_MS = 1000
 COSINE_SIMILARITY_THRESHOLD = 0.7
+IDLE_INTERVAL = 0.2  # Seconds between scene change checks while the scene is static
 
 def argparser():
     parser = argparse.ArgumentParser(description="Configurations for Flourence.")
     parser.add_argument('--no-speaker', action="store_true", help='Use this flag in case you did not connected a speaker')
+    parser.add_argument('--known-events', default=None,
+                        help='.npz file of known event captions (created if missing): alert on captions unlike any known event, instead of unlike the previous caption')
+    parser.add_argument('--change-threshold', type=float, default=SCENE_CHANGE_THRESHOLD,
+                        help='Scene difference (0-1) from the last captioned frame above which a new caption is generated')
+    parser.add_argument('--input', default=None,
+                        help='Caption a video file or a directory of images instead of the camera')
+    parser.add_argument('--preprocess-workers', type=int, default=2, help='Threads preprocessing captured images')
+    parser.add_argument('--vision-threads', type=int, default=max(1, (os.cpu_count() or 1) - 2),
+                        help='ONNX Runtime intra-op threads of the vision encoder')
+    parser.add_argument('--stats-every', type=int, default=20,
+                        help='Print the latency histograms of the pipeline stages every N captions (0 to disable)')
 
     return parser.parse_args()
 
-def match_texts(model, text1, text2):
-    # Load the CLIP model and preprocess function
-    device = "cpu"
-    #model, preprocess = clip.load("ViT-B/32", device)
-
-    # Tokenize the texts and encode them into embeddings
-    texts = [text1, text2]
-    text_inputs = clip.tokenize(texts)
-
-    # Get the text features (embeddings) from CLIP
-    text_features = model.encode_text(text_inputs)
-
-    # Normalize the features to unit vectors (important for similarity comparisons)
-    text_features /= text_features.norm(dim=-1, keepdim=True)
-
-    # Compute cosine similarity between the two text embeddings
-    similarity = torch.cosine_similarity(text_features[0], text_features[1], dim=0)
-    #print (f"similarity between '{text1}' and '{text2}' is: {similarity.item()}")
-    return similarity.item()
+def clip_text_encoder(model):
+    """Function encoding a list of texts with CLIP, for TextEmbeddingCache."""
+    def encode(texts):
+        with torch.no_grad():
+            return model.encode_text(clip.tokenize(texts)).float().numpy()
+    return encode
+
+def match_texts(text_cache, text1, text2):
+    """Cosine similarity of two texts, each text is encoded once while it stays in the cache."""
+    similarity = text_cache.similarity(text1, text2)
+    #print (f"similarity between '{text1}' and '{text2}' is: {similarity}")
+    return similarity
+
+def is_new_event(text_cache, known_events, last_caption, caption):
+    """Whether a caption is a new event: unlike every known event if there are known events, else unlike the last caption."""
+    if known_events is not None:
+        _, similarity = known_events.nearest(caption)
+        if similarity < COSINE_SIMILARITY_THRESHOLD:
+            known_events.add(caption)
+            if known_events.path:
+                known_events.save()
+            return True
+        return False
+    return last_caption is None or match_texts(text_cache, last_caption, caption) < COSINE_SIMILARITY_THRESHOLD
 
 
 
@@ -56,66 +77,32 @@ def create_processor():
     size={'height':384, 'width':384}
     return AutoProcessor.from_pretrained('microsoft/florence-2-base', trust_remote_code=True, size=size, crop_size=size)
 
-def infer_davit(inputs, processor, davit_session):
-    start = time.time()    
-    image_features = davit_session.run(None, {'pixel_values':inputs.pixel_values.numpy()})[0]
-    duration = time.time() - start
-    #print(f"Davit model on onnx took {duration} seconds")
-    return image_features
-
-def infer_encoder(encoder, image_text_embeddings):
-    start = time.time()
-    encoder_hidden_state = np.empty((1,153,768), dtype=np.float32)
-    bindings = encoder.create_bindings()
-    bindings.input().set_buffer(image_text_embeddings)
-    bindings.output().set_buffer(encoder_hidden_state)
-    job = encoder.run_async([bindings], lambda completion_info: None)
-    job.wait(TIMEOUT_MS)
-    end = time.time()
-    #print("Encoder model on h8 took %s seconds" % (end - start))
-    return encoder_hidden_state
-
-def infer_decoder(decoder, encoder_output, input_embeds):
-    start = time.time()
-    decoder_output = np.empty((32,51289), dtype=np.float32)
-    bindings = decoder.create_bindings()
-    bindings.input('florence2_transformer_decoder/input_layer1').set_buffer(encoder_output)
-    bindings.input('florence2_transformer_decoder/input_layer2').set_buffer(input_embeds)
-    bindings.output().set_buffer(decoder_output)
-    job = decoder.run_async([bindings], lambda completion_info: None)
-    job.wait(TIMEOUT_MS)
-    end = time.time()
-    #print("Decoder model on h8 took %s seconds" % (end - start))
-    return decoder_output
-
-def infer_florence2(image, processor, davit_session, encoder, decoder, tokenizer):
-    inputs = processor(text='<CAPTION>', images=image, return_tensors='pt')
-    image_features = infer_davit(inputs, processor, davit_session)
-    image_text_embeddings = np.concatenate([np.expand_dims(image_features, axis=0), np.load(CAPTION_EMBEDDING)], axis=2)
-    encoder_hidden_state = infer_encoder(encoder, image_text_embeddings)
-    
-    word_embedding = np.load(WORD_EMBEDDING)
-    decoder_input = np.insert(np.zeros(DECODER_INPUT_SHAPE).astype(np.float32), 0, word_embedding[START_TOKEN], axis=2)[:, :, :-1, :]
-    dataset = {
-        ENCODER_OUTPUT_KEY : encoder_hidden_state,
-        DECODER_INPUT_KEY : decoder_input
-    }
-    next_token_id = -1
-    token_index = 0
-    generated_ids = [START_TOKEN]
-    start = time.time()
-    while next_token_id != START_TOKEN and token_index < 32:
-        decoder_output = infer_decoder(decoder, dataset[ENCODER_OUTPUT_KEY], dataset[DECODER_INPUT_KEY])
-        res = decoder_output.squeeze()[token_index]
-        next_token_id = np.argmax(res)
-        token_index += 1
-        generated_ids.append(next_token_id)
-        decoder_input = np.insert(decoder_input, token_index, word_embedding[next_token_id], axis=2)[:, :, :-1, :]
-        dataset[DECODER_INPUT_KEY] = decoder_input
-    res = tokenizer.decode(np.array(generated_ids), skip_special_tokens=True)
-    end = time.time()
-    #print("third model h8 took %s seconds" % (end - start))
-    return res
+def create_vision_session(path, threads):
+    """
+    The DaViT ONNX session, created once. Its intra-op threads are set explicitly and do not spin while
+    idle, to leave CPU cores to the capture and preprocessing threads running alongside it.
+    """
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = threads
+    options.inter_op_num_threads = 1
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.add_session_config_entry("session.intra_op.allow_spinning", "0")
+    return ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+
+def preprocess_image(image, processor):
+    return processor(text='<CAPTION>', images=image, return_tensors='np').pixel_values.astype(np.float32)
+
+def infer_davit(pixel_values, davit_session):
+    return davit_session.run(None, {'pixel_values': pixel_values})[0]
+
+def create_pipeline(processor, davit_session, captioner, preprocess_workers):
+    """Capture -> preprocess (a pool of threads) -> DaViT (ONNX) -> Florence-2 encoder and decoder (Hailo)."""
+    return StagedPipeline([
+        ('preprocess', lambda image: preprocess_image(image, processor), preprocess_workers),
+        ('vision encoder', lambda pixel_values: infer_davit(pixel_values, davit_session), 1),
+        ('florence2', captioner.caption, 1),  # The captioner's buffers are bound once, one caption at a time
+    ])
 
 def picam_init():
     picam2 = Picamera2()
@@ -131,26 +118,73 @@ def picam_capture(picam2, capture_config, preview_config):
     picam2.switch_mode(preview_config)
     return array
 
-def caption_loop(picam2, capture_config, preview_config, processor, davit_session, encoder, decoder, tokenizer, clip_model, no_speaker):
+class PicameraCapture:
+    """The camera for CaptureThread: preview frames to check for scene changes, full resolution stills to caption."""
+
+    def __init__(self):
+        self.picam2, self.preview_config, self.capture_config = picam_init()
+
+    def preview(self):
+        return self.picam2.capture_array("main")
+
+    def capture(self):
+        return picam_capture(self.picam2, self.capture_config, self.preview_config)
+
+    def close(self):
+        self.picam2.stop()
+
+def caption_loop(capture, pipeline, text_cache, no_speaker, change_threshold=SCENE_CHANGE_THRESHOLD, known_events=None,
+                 stats_every=0):
+    """
+    Captions run in the pipeline while the capture thread keeps checking for scene changes; this loop
+    takes the captions in capture order and announces the new events.
+    """
     last_caption = None
-    while True:
-        start = time.time()
-        caption = infer_florence2(picam_capture(picam2, capture_config, preview_config), processor, davit_session, encoder, decoder, tokenizer)
-        if last_caption is None or match_texts(clip_model, last_caption, caption) < COSINE_SIMILARITY_THRESHOLD:
-            print(f"NEW EVENT ALERT!!!!! - {caption}")
-            if not no_speaker:
-                os.system(f'espeak "{caption}" -s 130')
-        end = time.time()
-        #print("took %s seconds" % (end - start))
-        last_caption = caption
+    results = queue.Queue(maxsize=4)
+    capture_thread = CaptureThread(capture, SceneChangeGate(change_threshold), pipeline, results, IDLE_INTERVAL)
+    capture_thread.start()
+    captions = 0
+    try:
+        while True:
+            result = results.get()
+            if result is None:
+                break
+            _, future = result
+            try:
+                caption = future.result()
+            except Exception as e:
+                print(f"Captioning failed: {e}")
+                continue
+            captions += 1
+            if is_new_event(text_cache, known_events, last_caption, caption):
+                print(f"NEW EVENT ALERT!!!!! - {caption}")
+                if not no_speaker:
+                    os.system(f'espeak "{caption}" -s 130')
+            last_caption = caption
+            if stats_every and captions % stats_every == 0:
+                print(pipeline.summary())
+    finally:
+        capture_thread.stop()
+        while capture_thread.is_alive():  # It may be waiting for room in the results queue
+            try:
+                results.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        pipeline.close()
+        capture.close()
+        print(pipeline.summary())
 
 def main():
     print("Initializing...")
     args = argparser()
+    if args.input is None and Picamera2 is None:
+        raise SystemExit("picamera2 is not installed, use --input to caption a video or a directory of images")
     processor = create_processor()
-    davit_session = ort.InferenceSession(VISION_ENCODER_PATH)
+    davit_session = create_vision_session(VISION_ENCODER_PATH, args.vision_threads)
     tokenizer = TokenizerFast.from_file(TOKENIZER_PATH)
     clip_model, _ = clip.load("ViT-B/32", "cpu")
+    text_cache = TextEmbeddingCache(clip_text_encoder(clip_model))
+    known_events = KnownEvents(text_cache, args.known_events) if args.known_events else None
     params = VDevice.create_params()
     params.scheduling_algorithm = HailoSchedulingAlgorithm.ROUND_ROBIN    
     with VDevice(params) as vd:
@@ -159,13 +193,17 @@ def main():
         encoder_infer_model.output().set_format_type(FormatType.FLOAT32)
         with encoder_infer_model.configure() as encoder:
             decoder_infer_model = vd.create_infer_model(DECODER_PATH)
-            decoder_infer_model.input('florence2_transformer_decoder/input_layer1').set_format_type(FormatType.FLOAT32)
-            decoder_infer_model.input('florence2_transformer_decoder/input_layer2').set_format_type(FormatType.FLOAT32)
+            decoder_infer_model.input(DECODER_ENCODER_INPUT).set_format_type(FormatType.FLOAT32)
+            decoder_infer_model.input(DECODER_EMBEDDING_INPUT).set_format_type(FormatType.FLOAT32)
             decoder_infer_model.output().set_format_type(FormatType.FLOAT32)
             with decoder_infer_model.configure() as decoder:
-                picam2, preview_config, capture_config = picam_init()
+                # Embeddings are loaded and buffers bound once, for all captions
+                captioner = Florence2Captioner(encoder, decoder, np.load(WORD_EMBEDDING), np.load(CAPTION_EMBEDDING), tokenizer)
+                capture = FileCapture(args.input) if args.input else PicameraCapture()
+                pipeline = create_pipeline(processor, davit_session, captioner, args.preprocess_workers)
                 print("Initialized succesfully")
-                caption_loop(picam2, capture_config, preview_config, processor, davit_session, encoder, decoder, tokenizer, clip_model, args.no_speaker)
+                caption_loop(capture, pipeline, text_cache, args.no_speaker, args.change_threshold, known_events,
+                             args.stats_every)
                     
 
 if __name__=="__main__":
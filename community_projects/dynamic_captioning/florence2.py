@@ -0,0 +1,206 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+ENCODER_OUTPUT_SHAPE = (1, 153, 768)
+DECODER_INPUT_SHAPE = (1, 1, 32, 768)
+DECODER_ENCODER_INPUT = 'florence2_transformer_decoder/input_layer1'
+DECODER_EMBEDDING_INPUT = 'florence2_transformer_decoder/input_layer2'
+START_TOKEN = 2
+TIMEOUT_MS = 1000
+
+
+class Florence2Captioner:
+    """
+    Caption generation with the Florence-2 transformer encoder and decoder (configured Hailo infer models,
+    or the CPU stand-ins below).
+
+    All buffers are allocated and bound once: the encoder writes its hidden state straight into the
+    decoder's input buffer, and each generated token only writes its embedding into the next position of
+    the decoder input, whose other positions are left as they are. Only the logits row of the current
+    position is read.
+
+    When the decoder supports incremental decoding (the CPU stand-in's start() and step()), each token only
+    runs the new position, with the keys and values of the previous positions cached.
+    """
+
+    def __init__(self, encoder, decoder, word_embedding, caption_embedding, tokenizer=None, incremental=None):
+        self.encoder = encoder
+        self.decoder = decoder
+        self.tokenizer = tokenizer
+        self.word_embedding = word_embedding
+        self.caption_embedding = caption_embedding
+        self.max_tokens = DECODER_INPUT_SHAPE[2]
+        self.incremental = hasattr(decoder, 'step') if incremental is None else incremental
+
+        self.image_text_embeddings = None  # Allocated on the first image, its size depends on the vision encoder
+        self.encoder_hidden_state = np.empty(ENCODER_OUTPUT_SHAPE, dtype=np.float32)
+        self.decoder_input = np.zeros(DECODER_INPUT_SHAPE, dtype=np.float32)
+        self.decoder_output = np.empty((self.max_tokens, len(word_embedding)), dtype=np.float32)
+        self.generated_ids = np.empty(self.max_tokens + 1, dtype=np.int64)
+
+        self.encoder_bindings = encoder.create_bindings()
+        self.encoder_bindings.output().set_buffer(self.encoder_hidden_state)
+        self.decoder_bindings = decoder.create_bindings()
+        self.decoder_bindings.input(DECODER_ENCODER_INPUT).set_buffer(self.encoder_hidden_state)
+        self.decoder_bindings.input(DECODER_EMBEDDING_INPUT).set_buffer(self.decoder_input)
+        self.decoder_bindings.output().set_buffer(self.decoder_output)
+
+    def encode(self, image_features):
+        """Run the transformer encoder on the vision encoder output and the caption prompt embedding."""
+        image_features = np.expand_dims(image_features, axis=0)
+        if self.image_text_embeddings is None:
+            shape = list(image_features.shape)
+            shape[2] += self.caption_embedding.shape[2]
+            self.image_text_embeddings = np.empty(shape, dtype=np.float32)
+            self.encoder_bindings.input().set_buffer(self.image_text_embeddings)
+        np.concatenate([image_features, self.caption_embedding], axis=2, out=self.image_text_embeddings)
+        self.encoder.run_async([self.encoder_bindings], lambda completion_info: None).wait(TIMEOUT_MS)
+        return self.encoder_hidden_state
+
+    def _next_token(self, token_index):
+        if self.incremental:
+            return int(np.argmax(self.decoder.step(token_index, self.decoder_input[0, 0, token_index])))
+        self.decoder.run_async([self.decoder_bindings], lambda completion_info: None).wait(TIMEOUT_MS)
+        return int(np.argmax(self.decoder_output[token_index]))
+
+    def generate(self, image_features):
+        """Return the generated token ids, starting with START_TOKEN."""
+        self.encode(image_features)
+        if self.incremental:
+            self.decoder.start(self.encoder_hidden_state)
+        self.decoder_input.fill(0)
+        self.decoder_input[0, 0, 0] = self.word_embedding[START_TOKEN]
+        self.generated_ids[0] = START_TOKEN
+        next_token_id = -1
+        token_index = 0
+        while next_token_id != START_TOKEN and token_index < self.max_tokens:
+            next_token_id = self._next_token(token_index)
+            token_index += 1
+            self.generated_ids[token_index] = next_token_id
+            if token_index < self.max_tokens:
+                self.decoder_input[0, 0, token_index] = self.word_embedding[next_token_id]
+        return self.generated_ids[:token_index + 1].copy()
+
+    def caption(self, image_features):
+        return self.tokenizer.decode(self.generate(image_features), skip_special_tokens=True)
+
+
+class CPUBindings:
+    """Named buffers of a CPU stand-in model, with the interface of Hailo infer model bindings."""
+
+    class Buffer:
+        def __init__(self):
+            self.buffer = None
+
+        def set_buffer(self, buffer):
+            self.buffer = buffer
+
+        def get_buffer(self):
+            return self.buffer
+
+    def __init__(self):
+        self.inputs = {}
+        self.outputs = {}
+
+    def input(self, name=None):
+        return self.inputs.setdefault(name, self.Buffer())
+
+    def output(self, name=None):
+        return self.outputs.setdefault(name, self.Buffer())
+
+
+class CPUJob:
+    def wait(self, timeout_ms):
+        pass
+
+
+class CPUInferModel(ABC):
+    """
+    Base of the CPU stand-ins for configured Hailo infer models: run_async() runs compute() on the bound
+    input buffers (in the order of input_names) synchronously and writes the single output buffer.
+    """
+
+    input_names = (None,)
+
+    def create_bindings(self):
+        return CPUBindings()
+
+    def run_async(self, bindings_list, callback):
+        for bindings in bindings_list:
+            inputs = [bindings.inputs[name].buffer for name in self.input_names]
+            np.copyto(bindings.outputs[None].buffer, self.compute(*inputs))
+        callback(None)
+        return CPUJob()
+
+    @abstractmethod
+    def compute(self, *inputs):
+        """The output array of one inference, given the input arrays."""
+
+
+class NumpyEncoder(CPUInferModel):
+    """CPU stand-in for the transformer encoder: one random projection of the image and prompt embeddings."""
+
+    def __init__(self, dim=768, seed=0):
+        rng = np.random.default_rng(seed)
+        self.weight = (rng.standard_normal((dim, dim)) / np.sqrt(dim)).astype(np.float32)
+
+    def compute(self, image_text_embeddings):
+        hidden = np.tanh(image_text_embeddings[0, 0] @ self.weight)
+        return hidden[:ENCODER_OUTPUT_SHAPE[1]][None]
+
+
+class NumpyDecoder(CPUInferModel):
+    """
+    CPU stand-in for the transformer decoder, with random weights: one causal self-attention layer, one
+    cross-attention layer over the encoder output and the output projection tied to the word embedding.
+
+    run_async() runs all 32 positions with a causal mask, like the fixed-shape HEF. start() and step()
+    decode one position at a time with a key/value cache, and give the same logits.
+    """
+
+    input_names = (DECODER_ENCODER_INPUT, DECODER_EMBEDDING_INPUT)
+
+    def __init__(self, word_embedding, seed=0):
+        dim = word_embedding.shape[1]
+        rng = np.random.default_rng(seed)
+        weight = lambda: (rng.standard_normal((dim, dim)) / np.sqrt(dim)).astype(np.float32)
+        self.wq, self.wk, self.wv, self.wo = weight(), weight(), weight(), weight()
+        self.cq, self.ck, self.cv, self.co = weight(), weight(), weight(), weight()
+        self.word_embedding = word_embedding
+        self.scale = np.float32(1 / np.sqrt(dim))
+        self._keys = np.empty((DECODER_INPUT_SHAPE[2], dim), dtype=np.float32)
+        self._values = np.empty_like(self._keys)
+
+    @staticmethod
+    def _softmax(x):
+        x = np.exp(x - x.max(axis=-1, keepdims=True))
+        return x / x.sum(axis=-1, keepdims=True)
+
+    def _cross_attention(self, h):
+        attention = self._softmax((h @ self.cq) @ self._cross_keys.T * self.scale)
+        return h + (attention @ self._cross_values) @ self.co
+
+    def _prepare_cross(self, encoder_output):
+        self._cross_keys = encoder_output[0] @ self.ck
+        self._cross_values = encoder_output[0] @ self.cv
+
+    def compute(self, encoder_output, decoder_input):
+        self._prepare_cross(encoder_output)
+        x = decoder_input[0, 0]
+        scores = (x @ self.wq) @ (x @ self.wk).T * self.scale
+        scores[np.triu_indices(len(x), 1)] = -np.inf
+        h = x + (self._softmax(scores) @ (x @ self.wv)) @ self.wo
+        return self._cross_attention(h) @ self.word_embedding.T
+
+    def start(self, encoder_output):
+        """Start incremental decoding of a new sequence."""
+        self._prepare_cross(encoder_output)
+
+    def step(self, position, x):
+        """Logits of one position, given the embedding x at that position; earlier positions come from the cache."""
+        self._keys[position] = x @ self.wk
+        self._values[position] = x @ self.wv
+        attention = self._softmax((x @ self.wq) @ self._keys[:position + 1].T * self.scale)
+        h = x + (attention @ self._values[:position + 1]) @ self.wo
+        return self._cross_attention(h) @ self.word_embedding.T
@@ -0,0 +1,236 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+
+class LatencyHistogram:
+    """
+    Thread-safe histogram of durations, with logarithmic bins from 0.1 ms to 100 s (10 bins per decade,
+    so percentiles are within about 26%) and one bin for longer durations.
+    """
+
+    BINS_PER_DECADE = 10
+    MIN_SECONDS = 1e-4
+    DECADES = 6
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = np.zeros(self.BINS_PER_DECADE * self.DECADES + 1, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def _bin(self, seconds):
+        position = np.log10(max(seconds, self.MIN_SECONDS) / self.MIN_SECONDS) * self.BINS_PER_DECADE
+        return min(int(position), len(self.counts) - 1)
+
+    def upper_bound(self, index):
+        """Upper edge of a bin, in seconds."""
+        if index == len(self.counts) - 1:
+            return float('inf')
+        return self.MIN_SECONDS * 10 ** ((index + 1) / self.BINS_PER_DECADE)
+
+    def add(self, seconds):
+        with self._lock:
+            self.counts[self._bin(seconds)] += 1
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    def mean(self):
+        with self._lock:
+            return self.total / self.count if self.count else 0.0
+
+    def percentile(self, percent):
+        """Upper edge of the bin holding the given percentile, in seconds (0 when empty)."""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            index = int(np.searchsorted(np.cumsum(self.counts), self.count * percent / 100))
+            return min(self.upper_bound(index), self.max)
+
+    def summary(self):
+        return (f"n={self.count} mean={self.mean() * 1000:.1f} ms p50={self.percentile(50) * 1000:.1f} ms "
+                f"p90={self.percentile(90) * 1000:.1f} ms p99={self.percentile(99) * 1000:.1f} ms max={self.max * 1000:.1f} ms")
+
+
+class StagedPipeline:
+    """
+    Runs a chain of stages, each on its own worker threads, connected by bounded queues, so the stages of
+    consecutive frames overlap (e.g. preprocessing the next capture while the Hailo device decodes the
+    current one).
+
+    stages is a list of (name, function, workers): each function gets the previous stage's result. A stage
+    with several workers (e.g. CPU preprocessing) may finish frames out of order, the futures returned by
+    submit() still tell the caller the result of each frame. At most max_in_flight frames are between
+    submit() and their result, submit() blocks until one completes. The time spent in each stage, waiting
+    in its input queue and from submit to result ('latency') is kept in LatencyHistograms.
+    """
+
+    def __init__(self, stages, queue_size=2, max_in_flight=4):
+        self.stages = [(name, function, workers) for name, function, workers in stages]
+        self.histograms = {}
+        for name, _, _ in self.stages:
+            self.histograms[name] = LatencyHistogram()
+            self.histograms[f"{name} queue"] = LatencyHistogram()
+        self.histograms['latency'] = LatencyHistogram()
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._queues = [queue.Queue(maxsize=queue_size) for _ in self.stages]
+        self._running_workers = [workers for _, _, workers in self.stages]
+        self._lock = threading.Lock()
+        self._threads = []
+        for index, (name, _, workers) in enumerate(self.stages):
+            for worker in range(workers):
+                thread = threading.Thread(target=self._run_stage, args=(index,), daemon=True, name=f'{name}-{worker}')
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, item):
+        """Queue a frame for the first stage and return a concurrent.futures.Future of the last stage's result."""
+        self._slots.acquire()
+        future = Future()
+        future.add_done_callback(lambda _: self._slots.release())
+        now = time.perf_counter()
+        self._queues[0].put((future, now, now, item))
+        return future
+
+    def _run_stage(self, index):
+        name, function, _ = self.stages[index]
+        last = index == len(self.stages) - 1
+        while True:
+            work = self._queues[index].get()
+            if work is None:
+                break
+            future, submitted, queued, item = work
+            if index == 0 and not future.set_running_or_notify_cancel():
+                continue  # Cancelled before it started
+            start = time.perf_counter()
+            self.histograms[f"{name} queue"].add(start - queued)
+            try:
+                result = function(item)
+            except BaseException as e:
+                future.set_exception(e)
+                continue
+            end = time.perf_counter()
+            self.histograms[name].add(end - start)
+            if last:
+                self.histograms['latency'].add(end - submitted)
+                future.set_result(result)
+            else:
+                self._queues[index + 1].put((future, submitted, end, result))
+        with self._lock:
+            self._running_workers[index] -= 1
+            stage_done = self._running_workers[index] == 0
+        if stage_done and not last:
+            for _ in range(self.stages[index + 1][2]):
+                self._queues[index + 1].put(None)
+
+    def stats(self):
+        return dict(self.histograms)
+
+    def summary(self):
+        return '\n'.join(f"{name:20s} {histogram.summary()}" for name, histogram in self.histograms.items())
+
+    def close(self):
+        """Finish the queued frames and stop the worker threads."""
+        for _ in range(self.stages[0][2]):
+            self._queues[0].put(None)
+        for thread in self._threads:
+            thread.join()
+
+
+class FileCapture:
+    """
+    Stand-in for the camera: frames from a video file, or the images of a directory in name order, as
+    RGB arrays. preview() returns the next frame and capture() the same frame (a file has one resolution).
+    Both return None once the frames ran out, unless loop is set.
+    """
+
+    def __init__(self, path, loop=False):
+        import cv2  # Only needed for the stand-in, not with the camera
+        self._cv2 = cv2
+        self.path = path
+        self.loop = loop
+        self._frame = None
+        if os.path.isdir(path):
+            self._images = sorted(os.path.join(path, name) for name in os.listdir(path)
+                                  if name.lower().endswith(IMAGE_EXTENSIONS))
+            self._position = 0
+            self._video = None
+        else:
+            self._images = None
+            self._video = cv2.VideoCapture(path)
+            if not self._video.isOpened():
+                raise ValueError(f"Could not open video {path}")
+
+    def _read(self):
+        if self._images is not None:
+            if self._position == len(self._images):
+                if not self.loop or not self._images:
+                    return None
+                self._position = 0
+            frame = self._cv2.imread(self._images[self._position])
+            self._position += 1
+        else:
+            ret, frame = self._video.read()
+            if not ret and self.loop:
+                self._video.set(self._cv2.CAP_PROP_POS_FRAMES, 0)
+                ret, frame = self._video.read()
+            if not ret:
+                return None
+        return self._cv2.cvtColor(frame, self._cv2.COLOR_BGR2RGB)
+
+    def preview(self):
+        self._frame = self._read()
+        return self._frame
+
+    def capture(self):
+        return self._frame
+
+    def close(self):
+        if self._video is not None:
+            self._video.release()
+
+
+class CaptureThread(threading.Thread):
+    """
+    Producer of the pipeline: polls capture.preview(), and when gate (a SceneChangeGate) reports a scene
+    change, submits capture.capture() to the pipeline and puts (frame, future) on `results`, a bounded
+    queue the consumer reads in capture order. Puts None on `results` when the capture ends or stop() is called.
+    """
+
+    def __init__(self, capture, gate, pipeline, results, idle_interval=0.2):
+        super().__init__(daemon=True, name='capture')
+        self.capture = capture
+        self.gate = gate
+        self.pipeline = pipeline
+        self.results = results
+        self.idle_interval = idle_interval
+        self.captures = 0
+        self.skipped = 0
+        self.running = True
+
+    def run(self):
+        try:
+            while self.running:
+                preview = self.capture.preview()
+                if preview is None:
+                    break
+                if not self.gate.changed(preview):
+                    self.skipped += 1
+                    time.sleep(self.idle_interval)
+                    continue
+                self.gate.update()
+                frame = self.capture.capture()
+                self.captures += 1
+                self.results.put((frame, self.pipeline.submit(frame)))
+        finally:
+            self.results.put(None)
+
+    def stop(self):
+        self.running = False
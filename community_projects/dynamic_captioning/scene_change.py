@@ -0,0 +1,66 @@
+import numpy as np
+
+THUMBNAIL_SIZE = (48, 64)  # (height, width)
+SCENE_CHANGE_THRESHOLD = 0.012
+
+
+def thumbnail(frame, size=THUMBNAIL_SIZE):
+    """
+    Small grayscale float32 version of an (H, W) or (H, W, C) uint8 frame, values 0..1.
+    Large frames are subsampled first, then each thumbnail pixel is the mean of a block of the frame.
+    """
+    frame = np.asarray(frame)
+    height, width = size
+    # Keep about 4 x 4 samples per thumbnail pixel, averaging every pixel of a full resolution still is slow
+    step = max(1, min(frame.shape[0] // (4 * height), frame.shape[1] // (4 * width)))
+    frame = frame[::step, ::step]
+    block_h, block_w = frame.shape[0] // height, frame.shape[1] // width
+    if block_h == 0 or block_w == 0:
+        raise ValueError(f"Frame of shape {frame.shape} is smaller than the thumbnail size {size}")
+    frame = frame[:block_h * height, :block_w * width]
+    if frame.ndim == 3:
+        frame = frame.mean(axis=2, dtype=np.float32)
+    blocks = frame.reshape(height, block_h, width, block_w)
+    return blocks.mean(axis=(1, 3), dtype=np.float32) / 255
+
+
+def scene_difference(a, b):
+    """
+    Difference of two thumbnails, 0 for the same scene. The mean brightness is removed first, so
+    exposure changes count less than objects moving in or out of view.
+    """
+    return float(np.abs((a - a.mean()) - (b - b.mean())).mean())
+
+
+class SceneChangeGate:
+    """
+    Cheap check, before running the captioning models, of whether the scene changed since the last
+    captioned frame: frames are compared as small grayscale thumbnails.
+
+    changed() compares a frame to the reference. update() makes the last checked frame (or a given one)
+    the reference, call it when that frame is captioned. Before the first update every frame is a change.
+    """
+
+    def __init__(self, threshold=SCENE_CHANGE_THRESHOLD, size=THUMBNAIL_SIZE):
+        self.threshold = threshold
+        self.size = size
+        self.reference = None
+        self.last_difference = None
+        self._last = None
+
+    def difference(self, frame):
+        self._last = thumbnail(frame, self.size)
+        if self.reference is None:
+            self.last_difference = float('inf')
+        else:
+            self.last_difference = scene_difference(self.reference, self._last)
+        return self.last_difference
+
+    def changed(self, frame):
+        return self.difference(frame) > self.threshold
+
+    def update(self, frame=None):
+        self.reference = self._last if frame is None else thumbnail(frame, self.size)
+
+    def reset(self):
+        self.reference = None
@@ -0,0 +1,57 @@
+"""
+CPU benchmark for Florence-2 caption generation (florence2.py), without the Hailo device.
+Uses the NumPy stand-ins for the transformer encoder and decoder with random weights and a random word
+embedding of the real size (51289 x 768), and compares tokens per second of:
+  - the original caption.py loop: embeddings loaded per caption, new bindings and a (32, 51289) output per
+    token, np.insert of the decoder input,
+  - Florence2Captioner running the full 32 position decoder per token, as with the HEF,
+  - Florence2Captioner with incremental (key/value cached) decoding,
+and the host overhead per token of the first two with a decoder that does no work.
+
+Usage: python tests/benchmark_florence2_decoder.py [captions]
+"""
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from florence2 import Florence2Captioner, NumpyEncoder, NumpyDecoder
+from captioning_helpers import VOCAB_SIZE, ConstantDecoder, legacy_generate, make_resources
+
+
+def tokens_per_second(generate, image_features, captions):
+    generate(image_features)  # Warm up
+    tokens = 0
+    start = time.perf_counter()
+    for _ in range(captions):
+        tokens += len(generate(image_features)) - 1
+    return tokens / (time.perf_counter() - start)
+
+
+def main():
+    captions = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    word_embedding, caption_embedding, image_features = make_resources()
+    encoder = NumpyEncoder()
+    with tempfile.TemporaryDirectory() as resources:
+        word_path = os.path.join(resources, 'word_embedding.npy')
+        caption_path = os.path.join(resources, 'caption_embedding.npy')
+        np.save(word_path, word_embedding)
+        np.save(caption_path, caption_embedding)
+
+        for name, decoder in [('stand-in decoder', NumpyDecoder(word_embedding)), ('no-op decoder', ConstantDecoder(VOCAB_SIZE))]:
+            legacy = lambda features: legacy_generate(features, encoder, decoder, word_path, caption_path)
+            full = Florence2Captioner(encoder, decoder, word_embedding, caption_embedding, incremental=False)
+            print(f"{name}, {captions} captions")
+            print(f"    original loop          {tokens_per_second(legacy, image_features, captions):8.1f} tokens/s")
+            print(f"    Florence2Captioner     {tokens_per_second(full.generate, image_features, captions):8.1f} tokens/s")
+            if hasattr(decoder, 'step'):
+                incremental = Florence2Captioner(encoder, decoder, word_embedding, caption_embedding)
+                assert np.array_equal(incremental.generate(image_features), full.generate(image_features))
+                print(f"    incremental decoding   {tokens_per_second(incremental.generate, image_features, captions):8.1f} tokens/s")
+
+
+if __name__ == "__main__":
+    main()
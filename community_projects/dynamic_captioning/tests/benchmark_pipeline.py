@@ -0,0 +1,86 @@
+"""
+Benchmark of the staged captioning pipeline (pipeline.py) against the sequential caption loop, with
+stand-in stages that sleep for typical Raspberry Pi 5 stage times (they release the GIL like the camera,
+ONNX Runtime and the Hailo device do): still capture with two mode switches, preprocessing, DaViT and the
+Florence-2 encoder and decoder. Reports captions per second and the per-stage latency histograms.
+
+Usage: python tests/benchmark_pipeline.py [frames] [time scale]
+"""
+import os
+import queue
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline import CaptureThread, StagedPipeline
+from scene_change import SceneChangeGate
+
+STAGE_SECONDS = {'capture': 0.12, 'preprocess': 0.15, 'vision encoder': 0.35, 'florence2': 0.3}
+
+
+def stand_in(name, scale):
+    def run(item):
+        time.sleep(STAGE_SECONDS[name] * scale)
+        return item
+    return run
+
+
+class StandInCapture:
+    """Every preview is a new scene, the still capture takes the time of the two mode switches."""
+
+    def __init__(self, frames, scale):
+        self.frames = frames
+        self.scale = scale
+        self.rng = np.random.default_rng(0)
+
+    def preview(self):
+        if self.frames == 0:
+            return None
+        self.frames -= 1
+        return self.rng.integers(0, 255, (96, 128), dtype=np.uint8)
+
+    def capture(self):
+        time.sleep(STAGE_SECONDS['capture'] * self.scale)
+        return self.frames
+
+
+def sequential(frames, scale):
+    capture = StandInCapture(frames, scale)
+    stages = [stand_in(name, scale) for name in ('preprocess', 'vision encoder', 'florence2')]
+    start = time.perf_counter()
+    while capture.preview() is not None:
+        item = capture.capture()
+        for stage in stages:
+            item = stage(item)
+    return frames / (time.perf_counter() - start)
+
+
+def pipelined(frames, scale, preprocess_workers=2):
+    pipeline = StagedPipeline([('preprocess', stand_in('preprocess', scale), preprocess_workers),
+                               ('vision encoder', stand_in('vision encoder', scale), 1),
+                               ('florence2', stand_in('florence2', scale), 1)])
+    results = queue.Queue(maxsize=4)
+    thread = CaptureThread(StandInCapture(frames, scale), SceneChangeGate(), pipeline, results, idle_interval=0)
+    start = time.perf_counter()
+    thread.start()
+    while (result := results.get()) is not None:
+        result[1].result()
+    rate = frames / (time.perf_counter() - start)
+    pipeline.close()
+    return rate, pipeline
+
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    scale = float(sys.argv[2]) if len(sys.argv) > 2 else 0.25
+    print(f"{frames} captions, stage times {', '.join(f'{k} {v * scale * 1000:.0f} ms' for k, v in STAGE_SECONDS.items())}")
+    print(f"sequential loop    {sequential(frames, scale):6.2f} captions/s")
+    rate, pipeline = pipelined(frames, scale)
+    print(f"staged pipeline    {rate:6.2f} captions/s")
+    print(pipeline.summary())
+
+
+if __name__ == '__main__':
+    main()
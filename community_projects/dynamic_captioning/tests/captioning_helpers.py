@@ -0,0 +1,80 @@
+"""
+Random word and caption embeddings (make_resources) and the caption.py generation loop that re-runs the
+decoder on the whole sequence for every token (legacy_generate), which the KV-cached Florence2Captioner
+must match token for token. ConstantDecoder returns fixed logits that never pick the start token.
+"""
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from florence2 import (CPUInferModel, DECODER_INPUT_SHAPE, DECODER_ENCODER_INPUT, DECODER_EMBEDDING_INPUT,
+                       START_TOKEN, TIMEOUT_MS)
+
+VOCAB_SIZE = 51289
+DIM = 768
+IMAGE_TOKENS = 145
+PROMPT_TOKENS = 8
+
+
+def legacy_infer_encoder(encoder, image_text_embeddings):
+    encoder_hidden_state = np.empty((1, 153, 768), dtype=np.float32)
+    bindings = encoder.create_bindings()
+    bindings.input().set_buffer(image_text_embeddings)
+    bindings.output().set_buffer(encoder_hidden_state)
+    job = encoder.run_async([bindings], lambda completion_info: None)
+    job.wait(TIMEOUT_MS)
+    return encoder_hidden_state
+
+
+def legacy_infer_decoder(decoder, encoder_output, input_embeds):
+    decoder_output = np.empty((32, VOCAB_SIZE), dtype=np.float32)
+    bindings = decoder.create_bindings()
+    bindings.input(DECODER_ENCODER_INPUT).set_buffer(encoder_output)
+    bindings.input(DECODER_EMBEDDING_INPUT).set_buffer(input_embeds)
+    bindings.output().set_buffer(decoder_output)
+    job = decoder.run_async([bindings], lambda completion_info: None)
+    job.wait(TIMEOUT_MS)
+    return decoder_output
+
+
+def legacy_generate(image_features, encoder, decoder, word_embedding_path, caption_embedding_path):
+    """The original infer_florence2 after the vision encoder, returning the token ids."""
+    image_text_embeddings = np.concatenate([np.expand_dims(image_features, axis=0), np.load(caption_embedding_path)], axis=2)
+    encoder_hidden_state = legacy_infer_encoder(encoder, image_text_embeddings)
+    word_embedding = np.load(word_embedding_path)
+    decoder_input = np.insert(np.zeros(DECODER_INPUT_SHAPE).astype(np.float32), 0, word_embedding[START_TOKEN], axis=2)[:, :, :-1, :]
+    next_token_id = -1
+    token_index = 0
+    generated_ids = [START_TOKEN]
+    while next_token_id != START_TOKEN and token_index < 32:
+        decoder_output = legacy_infer_decoder(decoder, encoder_hidden_state, decoder_input)
+        res = decoder_output.squeeze()[token_index]
+        next_token_id = np.argmax(res)
+        token_index += 1
+        generated_ids.append(next_token_id)
+        decoder_input = np.insert(decoder_input, token_index, word_embedding[next_token_id], axis=2)[:, :, :-1, :]
+    return np.array(generated_ids)
+
+
+class ConstantDecoder(CPUInferModel):
+    """A decoder that does no work, to measure the host side of the generation loop."""
+
+    input_names = (DECODER_ENCODER_INPUT, DECODER_EMBEDDING_INPUT)
+
+    def __init__(self, vocab_size):
+        self.logits = np.random.default_rng(0).standard_normal((32, vocab_size)).astype(np.float32)
+        self.logits[:, START_TOKEN] = -np.inf  # Never stops early, all captions are 32 tokens
+
+    def compute(self, encoder_output, decoder_input):
+        return self.logits
+
+
+def make_resources(vocab_size=VOCAB_SIZE, seed=0):
+    rng = np.random.default_rng(seed)
+    word_embedding = (rng.standard_normal((vocab_size, DIM), dtype=np.float32) * 0.05)
+    word_embedding[START_TOKEN] = 0  # Its logit is always 0, below the best one: all captions are 32 tokens
+    caption_embedding = rng.standard_normal((1, 1, PROMPT_TOKENS, DIM), dtype=np.float32)
+    image_features = rng.standard_normal((1, IMAGE_TOKENS, DIM), dtype=np.float32)
+    return word_embedding, caption_embedding, image_features
@@ -0,0 +1,76 @@
+import numpy as np
+from florence2 import Florence2Captioner, NumpyEncoder, NumpyDecoder, START_TOKEN
+import captioning_helpers
+from captioning_helpers import ConstantDecoder, legacy_generate, make_resources
+
+
+def test_incremental_step_matches_full_decoder():
+    word_embedding, _, _ = make_resources(vocab_size=500)
+    decoder = NumpyDecoder(word_embedding)
+    rng = np.random.default_rng(1)
+    encoder_output = rng.standard_normal((1, 153, 768), dtype=np.float32)
+    decoder_input = np.zeros((1, 1, 32, 768), dtype=np.float32)
+    decoder_input[0, 0, :5] = word_embedding[[2, 10, 20, 30, 40]]
+    full = decoder.compute(encoder_output, decoder_input)
+    decoder.start(encoder_output)
+    for position in range(5):
+        assert np.allclose(decoder.step(position, decoder_input[0, 0, position]), full[position], atol=1e-4)
+
+
+def test_generation_matches_original_loop(tmp_path, monkeypatch):
+    monkeypatch.setattr(captioning_helpers, 'VOCAB_SIZE', 500)  # The original loop has the size built in
+    word_embedding, caption_embedding, image_features = make_resources(vocab_size=500)
+    np.save(tmp_path / 'word.npy', word_embedding)
+    np.save(tmp_path / 'caption.npy', caption_embedding)
+    encoder, decoder = NumpyEncoder(), NumpyDecoder(word_embedding)
+    full = Florence2Captioner(encoder, decoder, word_embedding, caption_embedding, incremental=False)
+    incremental = Florence2Captioner(encoder, decoder, word_embedding, caption_embedding)
+    assert incremental.incremental and not full.incremental
+
+    for seed in range(3):
+        features = np.random.default_rng(seed).standard_normal(image_features.shape, dtype=np.float32)
+        expected = legacy_generate(features, encoder, decoder, str(tmp_path / 'word.npy'), str(tmp_path / 'caption.npy'))
+        assert expected[0] == START_TOKEN and len(expected) == 33
+        assert np.array_equal(full.generate(features), expected)
+        assert np.array_equal(incremental.generate(features), expected)
+
+
+def test_generation_stops_at_start_token(tmp_path, monkeypatch):
+    monkeypatch.setattr(captioning_helpers, 'VOCAB_SIZE', 500)
+    word_embedding, caption_embedding, image_features = make_resources(vocab_size=500)
+    np.save(tmp_path / 'word.npy', word_embedding)
+    np.save(tmp_path / 'caption.npy', caption_embedding)
+    decoder = ConstantDecoder(500)
+    decoder.logits[5, START_TOKEN] = np.inf
+    captioner = Florence2Captioner(NumpyEncoder(), decoder, word_embedding, caption_embedding)
+    assert not captioner.incremental
+    expected = legacy_generate(image_features, NumpyEncoder(), decoder, str(tmp_path / 'word.npy'),
+                               str(tmp_path / 'caption.npy'))
+    ids = captioner.generate(image_features)
+    assert np.array_equal(ids, expected)
+    assert len(ids) == 7 and ids[-1] == START_TOKEN
+
+
+def test_buffers_are_reused():
+    word_embedding, caption_embedding, image_features = make_resources(vocab_size=300)
+    captioner = Florence2Captioner(NumpyEncoder(), NumpyDecoder(word_embedding), word_embedding, caption_embedding,
+                                   incremental=False)
+    first = captioner.generate(image_features)
+    buffers = (captioner.image_text_embeddings, captioner.encoder_hidden_state, captioner.decoder_input,
+               captioner.decoder_output)
+    assert np.array_equal(captioner.generate(image_features), first)
+    assert all(a is b for a, b in zip(buffers, (captioner.image_text_embeddings, captioner.encoder_hidden_state,
+                                                  captioner.decoder_input, captioner.decoder_output)))
+    assert captioner.decoder_bindings.inputs['florence2_transformer_decoder/input_layer1'].buffer is captioner.encoder_hidden_state
+
+
+def test_caption_uses_tokenizer():
+    class Tokenizer:
+        def decode(self, ids, skip_special_tokens):
+            return ' '.join(str(i) for i in ids if not (skip_special_tokens and i == START_TOKEN))
+
+    word_embedding, caption_embedding, image_features = make_resources(vocab_size=300)
+    captioner = Florence2Captioner(NumpyEncoder(), NumpyDecoder(word_embedding), word_embedding, caption_embedding,
+                                   Tokenizer())
+    ids = captioner.generate(image_features)
+    assert captioner.caption(image_features) == ' '.join(str(i) for i in ids[1:] if i != START_TOKEN)
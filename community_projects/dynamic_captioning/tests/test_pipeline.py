@@ -0,0 +1,119 @@
+import queue
+import threading
+import time
+import numpy as np
+import pytest
+from pipeline import CaptureThread, FileCapture, LatencyHistogram, StagedPipeline
+from scene_change import SceneChangeGate
+
+
+def test_histogram_percentiles():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(50) == 0
+    for ms in range(1, 101):
+        histogram.add(ms / 1000)
+    assert histogram.count == 100
+    assert histogram.mean() == pytest.approx(0.0505)
+    assert histogram.percentile(50) == pytest.approx(0.050, rel=0.15)
+    assert histogram.percentile(90) == pytest.approx(0.090, rel=0.15)
+    assert histogram.percentile(100) == pytest.approx(0.1)
+    histogram.add(1000)  # Beyond the last bin
+    assert histogram.max == 1000 and histogram.percentile(100) == 1000
+
+
+def test_results_match_submissions_with_a_worker_pool():
+    def preprocess(x):
+        time.sleep(np.random.default_rng(x).uniform(0, 0.01))  # Workers finish out of order
+        return x * 2
+
+    pipeline = StagedPipeline([('preprocess', preprocess, 3), ('encode', lambda x: x + 1, 1),
+                               ('decode', str, 1)])
+    futures = [pipeline.submit(i) for i in range(30)]
+    assert [future.result() for future in futures] == [str(i * 2 + 1) for i in range(30)]
+    pipeline.close()
+    stats = pipeline.stats()
+    assert stats['preprocess'].count == stats['decode'].count == stats['latency'].count == 30
+    assert 'preprocess queue' in pipeline.summary()
+
+
+def test_stages_overlap_and_in_flight_is_bounded():
+    active = {'now': 0, 'max': 0}
+    lock = threading.Lock()
+
+    def slow(x):
+        with lock:
+            active['now'] += 1
+            active['max'] = max(active['max'], active['now'])
+        time.sleep(0.02)
+        with lock:
+            active['now'] -= 1
+        return x
+
+    pipeline = StagedPipeline([('a', slow, 1), ('b', slow, 1), ('c', slow, 1)], queue_size=1, max_in_flight=3)
+    futures = [pipeline.submit(i) for i in range(10)]
+    for future in futures:
+        future.result()
+    pipeline.close()
+    assert 1 < active['max'] <= 3  # Several stages at work, never more frames than max_in_flight
+
+
+def test_errors_are_reported_per_frame():
+    def fail_on_odd(x):
+        if x % 2:
+            raise ValueError(x)
+        return x
+
+    pipeline = StagedPipeline([('check', fail_on_odd, 2), ('identity', lambda x: x, 1)])
+    futures = [pipeline.submit(i) for i in range(6)]
+    for i, future in enumerate(futures):
+        if i % 2:
+            with pytest.raises(ValueError):
+                future.result()
+        else:
+            assert future.result() == i
+    pipeline.close()
+
+
+def test_file_capture_reads_directory(tmp_path):
+    cv2 = pytest.importorskip('cv2')
+    for i in range(3):
+        image = np.zeros((64, 96, 3), np.uint8)
+        image[..., 2] = 50 * i  # Red in BGR
+        cv2.imwrite(str(tmp_path / f'frame_{i}.png'), image)
+    capture = FileCapture(str(tmp_path))
+    frames = []
+    while (frame := capture.preview()) is not None:
+        assert capture.capture() is frame
+        frames.append(frame)
+    assert [int(frame[0, 0, 0]) for frame in frames] == [0, 50, 100]  # RGB
+
+
+class ListCapture:
+    def __init__(self, frames):
+        self.frames = list(frames)
+        self.frame = None
+
+    def preview(self):
+        self.frame = self.frames.pop(0) if self.frames else None
+        return self.frame
+
+    def capture(self):
+        return self.frame
+
+
+def test_capture_thread_submits_scene_changes_in_order():
+    rng = np.random.default_rng(0)
+    scenes = [rng.integers(0, 255, (12, 16, 3)).repeat(8, 0).repeat(8, 1).astype(np.uint8) for _ in range(3)]
+    frames = [scenes[0]] * 3 + [scenes[1]] * 2 + [scenes[2]] + [scenes[0]] * 2
+    pipeline = StagedPipeline([('mean', lambda frame: float(frame.mean()), 2)])
+    results = queue.Queue(maxsize=2)
+    thread = CaptureThread(ListCapture(frames), SceneChangeGate(), pipeline, results, idle_interval=0)
+    thread.start()
+    means = []
+    while (result := results.get()) is not None:
+        frame, future = result
+        means.append(future.result())
+    thread.join()
+    pipeline.close()
+    assert means == [float(scene.mean()) for scene in (scenes[0], scenes[1], scenes[2], scenes[0])]
+    assert (thread.captures, thread.skipped) == (4, 4)
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from scene_change import SceneChangeGate, scene_difference, thumbnail
+
+
+def make_scene(rng, height=480, width=640):
+    blocks = rng.uniform(40, 220, (12, 16, 3))
+    return np.kron(blocks, np.ones((height // 12, width // 16, 1)))
+
+
+def capture(rng, scene, noise=6):
+    return np.clip(scene + rng.normal(0, noise, scene.shape), 0, 255).astype(np.uint8)
+
+
+def test_thumbnail_is_block_mean():
+    frame = np.arange(96 * 128, dtype=np.float64).reshape(96, 128) % 256
+    expected = frame.reshape(48, 2, 64, 2).mean(axis=(1, 3)) / 255
+    assert np.allclose(thumbnail(frame.astype(np.uint8)), expected, atol=1e-6)
+    assert thumbnail(np.zeros((2464, 3280, 3), np.uint8)).shape == (48, 64)
+    with pytest.raises(ValueError):
+        thumbnail(np.zeros((20, 20), np.uint8))
+
+
+def test_gate_ignores_noise_and_exposure():
+    rng = np.random.default_rng(0)
+    scene = make_scene(rng)
+    gate = SceneChangeGate()
+    assert gate.changed(capture(rng, scene))  # No reference yet
+    gate.update()
+    for _ in range(5):
+        assert not gate.changed(capture(rng, scene))
+    assert not gate.changed(capture(rng, scene + 25))
+
+
+def test_gate_detects_new_object():
+    rng = np.random.default_rng(1)
+    scene = make_scene(rng)
+    gate = SceneChangeGate()
+    gate.update(capture(rng, scene))
+    changed = scene.copy()
+    changed[100:250, 200:350] = (250, 20, 20)  # An object covering 7% of the view
+    assert gate.changed(capture(rng, changed))
+    gate.update()
+    assert not gate.changed(capture(rng, changed))
+    assert gate.changed(capture(rng, scene))
+
+
+def test_scene_difference_is_symmetric():
+    rng = np.random.default_rng(2)
+    a, b = thumbnail(capture(rng, make_scene(rng))), thumbnail(capture(rng, make_scene(rng)))
+    assert scene_difference(a, a) == 0
+    assert scene_difference(a, b) == pytest.approx(scene_difference(b, a))
@@ -0,0 +1,82 @@
+import zlib
+import numpy as np
+import pytest
+from text_embeddings import KnownEvents, TextEmbeddingCache
+
+
+class FakeEncoder:
+    """Word-bag embeddings: texts sharing words are similar. Records the texts it encodes."""
+
+    def __init__(self, dim=64):
+        self.dim = dim
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        embeddings = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for word in text.split():
+                embeddings[i] += np.random.default_rng(zlib.crc32(word.encode())).standard_normal(self.dim)
+        return embeddings * 3  # Not normalized
+
+
+def test_cache_encodes_each_text_once():
+    encoder = FakeEncoder()
+    cache = TextEmbeddingCache(encoder)
+    first = cache.get('a dog on a couch')
+    assert first.dtype == np.float16 and np.linalg.norm(first.astype(np.float32)) == pytest.approx(1, abs=1e-3)
+    cache.similarity('a dog on a couch', 'a cat on a couch')
+    cache.similarity('a cat on a couch', 'a man at a desk')
+    assert encoder.calls == [['a dog on a couch'], ['a cat on a couch'], ['a man at a desk']]
+    assert (cache.hits, cache.misses) == (2, 3)
+
+
+def test_cache_batches_misses_and_evicts_least_recently_used():
+    encoder = FakeEncoder()
+    cache = TextEmbeddingCache(encoder, capacity=2)
+    embeddings = cache.get_many(['one', 'two', 'one'])
+    assert encoder.calls == [['one', 'two']]
+    assert np.array_equal(embeddings[0], embeddings[2])
+    cache.get('one')
+    cache.get('three')  # Evicts 'two'
+    assert 'one' in cache and 'three' in cache and 'two' not in cache
+    cache.get('two')
+    assert encoder.calls[-1] == ['two']
+
+
+def test_similarity_matches_float32():
+    encoder = FakeEncoder()
+    cache = TextEmbeddingCache(encoder)
+    a, b = encoder(['a dog on a couch', 'a cat on a couch'])
+    expected = a @ b / np.linalg.norm(a) / np.linalg.norm(b)
+    assert cache.similarity('a dog on a couch', 'a cat on a couch') == pytest.approx(expected, abs=2e-3)
+    assert cache.similarity('a dog on a couch', 'a dog on a couch') == pytest.approx(1, abs=2e-3)
+
+
+def test_known_events_nearest_and_persistence(tmp_path):
+    path = str(tmp_path / 'events.npz')
+    cache = TextEmbeddingCache(FakeEncoder())
+    events = KnownEvents(cache, path)
+    assert events.nearest('anything') == (None, -1.0)
+    captions = [f'event number {i} with word{i}' for i in range(40)]  # Grows the matrix past 16 rows
+    for caption in captions:
+        events.add(caption)
+    assert events.nearest('with word7 event')[0] == captions[7]
+    caption, similarity = events.nearest(captions[30])
+    assert caption == captions[30] and similarity == pytest.approx(1, abs=2e-3)
+    events.save()
+
+    loaded = KnownEvents(TextEmbeddingCache(FakeEncoder()), path)
+    assert loaded.captions == captions
+    assert np.array_equal(loaded.embeddings, events.embeddings)
+    loaded.add('a new event')
+    assert loaded.nearest('a new event')[0] == 'a new event'
+
+
+def test_empty_known_events_round_trip(tmp_path):
+    path = str(tmp_path / 'events.npz')
+    KnownEvents(TextEmbeddingCache(FakeEncoder()), path).save()
+    events = KnownEvents(TextEmbeddingCache(FakeEncoder()), path)
+    assert len(events) == 0
+    events.add('first')
+    assert events.nearest('first')[0] == 'first'
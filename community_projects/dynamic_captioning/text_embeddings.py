@@ -0,0 +1,108 @@
+import os
+from collections import OrderedDict
+import numpy as np
+
+
+def _normalize(embeddings):
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    return embeddings / np.maximum(np.linalg.norm(embeddings, axis=-1, keepdims=True), 1e-12)
+
+
+class TextEmbeddingCache:
+    """
+    Normalized text embeddings by text, kept as float16 NumPy vectors, with LRU eviction.
+
+    encode is called with a list of texts and returns their (N, D) embeddings (NumPy, or anything
+    np.asarray accepts, e.g. a CPU torch tensor). Texts that are not cached are encoded in one batch.
+    """
+
+    def __init__(self, encode, capacity=256):
+        self.encode = encode
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._embeddings = OrderedDict()
+
+    def __len__(self):
+        return len(self._embeddings)
+
+    def __contains__(self, text):
+        return text in self._embeddings
+
+    def get_many(self, texts):
+        """(N, D) float16 embeddings of texts."""
+        missing = list(dict.fromkeys(text for text in texts if text not in self._embeddings))
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            for text, embedding in zip(missing, _normalize(self.encode(missing)).astype(np.float16)):
+                self._embeddings[text] = embedding
+        embeddings = []
+        for text in texts:
+            self._embeddings.move_to_end(text)
+            embeddings.append(self._embeddings[text])
+        while len(self._embeddings) > self.capacity:
+            self._embeddings.popitem(last=False)
+        return np.stack(embeddings)
+
+    def get(self, text):
+        return self.get_many([text])[0]
+
+    def similarity(self, text1, text2):
+        """Cosine similarity of two texts."""
+        embeddings = self.get_many([text1, text2]).astype(np.float32)
+        return float(embeddings[0] @ embeddings[1])
+
+
+class KnownEvents:
+    """
+    Captions of the events seen so far and their embeddings (from a TextEmbeddingCache), in one (N, D)
+    float16 matrix, optionally persisted to an .npz file. nearest() finds the most similar known event
+    of a caption with one matrix-vector product, instead of comparing captions pairwise.
+    """
+
+    def __init__(self, cache, path=None):
+        self.cache = cache
+        self.path = path
+        self.captions = []
+        self._embeddings = None
+        if path is not None and os.path.exists(path):
+            with np.load(path) as data:
+                if len(data['captions']):
+                    self.captions = [str(caption) for caption in data['captions']]
+                    self._embeddings = data['embeddings'].astype(np.float16)
+
+    def __len__(self):
+        return len(self.captions)
+
+    @property
+    def embeddings(self):
+        if self._embeddings is None:
+            return np.zeros((0, 0), dtype=np.float16)
+        return self._embeddings[:len(self.captions)]
+
+    def add(self, caption):
+        embedding = self.cache.get(caption)
+        if self._embeddings is None:
+            self._embeddings = np.zeros((16, len(embedding)), dtype=np.float16)
+        elif len(self.captions) == len(self._embeddings):
+            grown = np.zeros((2 * len(self._embeddings), self._embeddings.shape[1]), dtype=np.float16)
+            grown[:len(self.captions)] = self._embeddings[:len(self.captions)]
+            self._embeddings = grown
+        self._embeddings[len(self.captions)] = embedding
+        self.captions.append(caption)
+
+    def nearest(self, caption):
+        """The most similar known event as (caption, cosine similarity), or (None, -1.0) if there is none."""
+        if not self.captions:
+            return None, -1.0
+        scores = self.embeddings @ self.cache.get(caption).astype(np.float32)
+        best = int(np.argmax(scores))
+        return self.captions[best], float(scores[best])
+
+    def save(self, path=None):
+        """Write the known events to path (default: the path they were loaded from), atomically."""
+        path = path or self.path
+        temp_path = f"{path}.tmp.npz"
+        np.savez(temp_path, captions=np.array(self.captions, dtype=str), embeddings=self.embeddings)
+        os.replace(temp_path, path)
@@ -4,7 +4,9 @@ from gi.repository import Gst, GLib
 import numpy as np
 import hailo
 import multiprocessing as mp
+import os
 import queue
+import sys
 import time
 
 from hailo_apps.hailo_app_python.core.gstreamer.gstreamer_app import app_callback_class
@@ -13,6 +15,9 @@ from hailo_apps.hailo_app_python.apps.pose_estimation.pose_estimation_pipeline i
 
 from community_projects.fruit_ninja.pygame_fruit_ninja import PygameFruitNinja
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'basic_pipelines'))
+from pose_geometry import PoseBatch
+
 CONFIDENCE_THRESHOLD = 0.5  # Minimum confidence for wrist keypoints
 
 """
@@ -79,45 +84,23 @@ def app_callback(pad: any, info: any, user_data: 'user_app_callback_class') -> G
         return Gst.PadProbeReturn.OK
 
     roi = hailo.get_roi_from_buffer(buffer)
-    detections = roi.get_objects_typed(hailo.HAILO_DETECTION)
 
     # Extract hand positions from pose estimation
+    # Wrists of all persons are converted from bbox-relative to global frame coordinates at once
+    wrists = PoseBatch.from_roi(roi, user_data.frame_width, user_data.frame_height,
+                                keypoint_names=['left_wrist', 'right_wrist'], min_confidence=CONFIDENCE_THRESHOLD)
+    wrist_pixels = wrists.to_int().tolist()
     hand_positions = {}
-    for detection in detections:
-        if detection.get_label() != "person":
-            continue
-
-        # Get tracking ID for this person
-        track_objects = detection.get_objects_typed(hailo.HAILO_UNIQUE_ID)
-        if not track_objects:
-            continue
-        track_id = track_objects[0].get_id()
-
-        # Get pose landmarks
-        landmark_objects = detection.get_objects_typed(hailo.HAILO_LANDMARKS)
-        if not landmark_objects:
+    for person, track_id in enumerate(wrists.track_ids.tolist()):
+        # Only tracked persons get stable hand IDs
+        if track_id == 0:
             continue
-        landmarks = landmark_objects[0].get_points()
-
-        # Get bbox for this detection
-        bbox = detection.get_bbox()
-        # bbox.xmin(), bbox.ymin(), bbox.width(), bbox.height() are normalized (0-1)
-
-        # Extract wrist positions (left_wrist: index 9, right_wrist: index 10)
-        for i, wrist in enumerate(['left_wrist', 'right_wrist']):
-            keypoint_index = {'left_wrist': 9, 'right_wrist': 10}[wrist]
-            if keypoint_index < len(landmarks):
-                point = landmarks[keypoint_index]
-                # Reason: Only use keypoints with sufficient confidence
-                if hasattr(point, 'confidence') and callable(point.confidence):
-                    if point.confidence() < CONFIDENCE_THRESHOLD:
-                        continue
-                # Convert from bbox-relative to global frame coordinates
-                x = int((point.x() * bbox.width() + bbox.xmin()) * user_data.frame_width)
-                y = int((point.y() * bbox.height() + bbox.ymin()) * user_data.frame_height)
+        for i in range(2):
+            # Reason: Only use keypoints with sufficient confidence
+            if wrists.visible[person, i]:
                 # Create unique ID for each hand: (track_id << 1) + hand_index
                 hand_id = (track_id << 1) + i
-                hand_positions[hand_id] = (x, y)
+                hand_positions[hand_id] = tuple(wrist_pixels[person][i])
 
     # Send hand positions to pygame (non-blocking)
     try:
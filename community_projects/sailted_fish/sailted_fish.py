@@ -18,6 +18,9 @@ from hailo_apps.hailo_app_python.core.common.buffer_utils import get_caps_from_p
 from hailo_apps.hailo_app_python.core.gstreamer.gstreamer_app import app_callback_class
 from hailo_apps.hailo_app_python.apps.pose_estimation.pose_estimation_pipeline import GStreamerPoseEstimationApp
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'basic_pipelines'))
+from pose_geometry import PoseBatch
+
 # -----------------------------------------------------------------------------------------------
 # User-defined class to be used in the callback function
 # -----------------------------------------------------------------------------------------------
@@ -151,56 +154,41 @@ def app_callback(pad, info, user_data):
     if user_data.use_frame and format and width and height:
         frame = get_numpy_from_buffer(buffer, format, width, height)
 
-    # Get the detections from the buffer
+    # Get the persons from the buffer, with all keypoints converted to frame coordinates at once
     roi = hailo.get_roi_from_buffer(buffer)
-    detections = roi.get_objects_typed(hailo.HAILO_DETECTION)
-
-    # Keypoints for COCO body parts
-    keypoints = get_keypoints()
+    poses = PoseBatch.from_roi(roi, width, height)
+    pixel_points = poses.to_int().tolist()
 
     # Process detections
-    for detection in detections:
-        if detection.get_label() == "person":
-            track_id = 0
-            track = detection.get_objects_typed(hailo.HAILO_UNIQUE_ID)
-            if len(track) == 1:
-                track_id = track[0].get_id()
-
-            person_id = track_id  # Unique ID for each detection
-            all_players.add(person_id)  # Add to the set of all players
-
-            # Get bounding box and landmarks
-            bbox = detection.get_bbox()
-            landmarks = detection.get_objects_typed(hailo.HAILO_LANDMARKS)
-            if landmarks:
-                points = landmarks[0].get_points()
-                if person_id not in frame_history:
-                    frame_history[person_id] = []
-
-                # Extract keypoint coordinates
-                keypoint_coords = [
-                    (int((point.x() * bbox.width() + bbox.xmin()) * width),
-                     int((point.y() * bbox.height() + bbox.ymin()) * height))
-                    for point in points
-                ]
-
-                frame_history[person_id].append(keypoint_coords)
-
-                # Detect movement during "Red Light"
-                if game_state == "Red Light" and person_id not in moved_players:
-                    if len(frame_history[person_id]) > 1:
-                        prev_coords = frame_history[person_id][-2]
-                        curr_coords = frame_history[person_id][-1]
-
-                        # Calculate movement by summing the distance between keypoints
-                        movement = sum(np.linalg.norm(np.array(curr) - np.array(prev))
-                                       for prev, curr in zip(prev_coords, curr_coords))
-                        if movement > threshold:
-                            moved_players.add(person_id)
-                            print(f"\033[41mPlayer {person_id} moved during Red Light!\033[0m")  # Red background
-                            # tts_engine.say(f"Player {person_id} moved you salted fish")
-                            # tts_engine.runAndWait()
-                            # tts_engine.stop()
+    for person, track_id in enumerate(poses.track_ids.tolist()):
+        person_id = track_id  # Unique ID for each detection
+        all_players.add(person_id)  # Add to the set of all players
+
+        # Landmarks (if available)
+        if poses.has_landmarks[person]:
+            if person_id not in frame_history:
+                frame_history[person_id] = []
+
+            # Extract keypoint coordinates
+            keypoint_coords = [tuple(point) for point in pixel_points[person]]
+
+            frame_history[person_id].append(keypoint_coords)
+
+            # Detect movement during "Red Light"
+            if game_state == "Red Light" and person_id not in moved_players:
+                if len(frame_history[person_id]) > 1:
+                    prev_coords = frame_history[person_id][-2]
+                    curr_coords = frame_history[person_id][-1]
+
+                    # Calculate movement by summing the distance between keypoints
+                    movement = sum(np.linalg.norm(np.array(curr) - np.array(prev))
+                                   for prev, curr in zip(prev_coords, curr_coords))
+                    if movement > threshold:
+                        moved_players.add(person_id)
+                        print(f"\033[41mPlayer {person_id} moved during Red Light!\033[0m")  # Red background
+                        # tts_engine.say(f"Player {person_id} moved you salted fish")
+                        # tts_engine.runAndWait()
+                        # tts_engine.stop()
 
     # Draw keypoints on the frame (optional visualisation)
     if user_data.use_frame and frame is not None:
@@ -5,35 +5,48 @@ import os
 import threading
 import asyncio
 import pathlib
-import csv
 import hailo
 from hailo_apps.hailo_app_python.core.gstreamer.gstreamer_app import app_callback_class
 from hailo_apps.hailo_app_python.apps.detection.detection_pipeline import GStreamerDetectionApp
 from get_usb_gps import get_usb_gps_devices
-from gps_calculations import gps_task, latest_gps_data
+from gps_calculations import gps_task, gps_state
+from gps_state import pts_to_monotonic
+from mapping_writer import MappingWriter
 
 
 # User-defined class to be used in the callback function: Inheritance from the app_callback_class
 class user_app_callback_class(app_callback_class):
     def __init__(self):
         super().__init__()
-        self.save_csv_path = os.path.join(pathlib.Path(__file__).parent.resolve(), 'tsr_mapping.csv')
+        project_dir = pathlib.Path(__file__).parent.resolve()
+        self.save_csv_path = os.path.join(project_dir, 'tsr_mapping.csv')
         print(self.save_csv_path)
-        with open(self.save_csv_path, 'a', newline='') as fd:
-            writer = csv.writer(fd)
-            writer.writerow(['id', 'latitude', 'longitude', 'altitude'])
-
+        # Fixes are written on a background thread, which also keeps the deduplicated CSV and GeoJSON up to date
+        self.mapping_writer = MappingWriter(
+            self.save_csv_path,
+            processed_csv_path=os.path.join(project_dir, 'tsr_mapping_processed.csv'),
+            geojson_path=os.path.join(project_dir, 'tsr_mapping.geojson'),
+        )
+        self.live_source = None  # Whether buffer timestamps follow the clock, found on the first detection
 
     def start_gps_task(self):
         def run_gps_task():
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
-            loop.run_until_complete(gps_task(get_usb_gps_devices()))
+            # GPS_DEVICE selects a serial port or a recorded NMEA log to replay instead of searching /dev
+            loop.run_until_complete(gps_task(os.environ.get('GPS_DEVICE') or get_usb_gps_devices()))
 
         gps_thread = threading.Thread(target=run_gps_task)
         gps_thread.daemon = True
         gps_thread.start()
 
+def is_live(element):
+    """Whether the pipeline holding element has a live source (queried once, the answer does not change)."""
+    while element.get_parent() is not None:
+        element = element.get_parent()
+    query = Gst.Query.new_latency()
+    return bool(element.query(query) and query.parse_latency()[0])
+
 # User-defined callback function: This is the callback function that will be called when data is available from the pipeline
 def app_callback(pad, info, user_data):
     buffer = info.get_buffer()  # Get the GstBuffer from the probe info
@@ -46,6 +59,9 @@ def app_callback(pad, info, user_data):
     roi = hailo.get_roi_from_buffer(buffer)
     detections = roi.get_objects_typed(hailo.HAILO_DETECTION)
 
+    # Position of the vehicle when the frame was captured, interpolated between the GPS fixes around it
+    position = None
+
     # Parse the detections
     for detection in detections:
         class_id = detection.get_class_id()
@@ -54,9 +70,15 @@ def app_callback(pad, info, user_data):
         if len(track) > 0:
             track_id = track[0].get_id()
         if class_id == 12:  # COCO 1 based, 12 - stop sign
-            with open(user_data.save_csv_path, 'a', newline='') as fd:
-                writer = csv.writer(fd)
-                writer.writerow([track_id, latest_gps_data['latitude'], latest_gps_data['longitude'], latest_gps_data['altitude']])
+            if position is None:
+                element = pad.get_parent_element()
+                if user_data.live_source is None:
+                    user_data.live_source = is_live(element)
+                capture_time = pts_to_monotonic(buffer.pts, element.get_base_time(), user_data.live_source)
+                # Without a capture time (no PTS, or a file source), use the latest fix
+                position = gps_state.position_at(capture_time) if capture_time is not None else gps_state.latest()
+            if position is not None:
+                user_data.mapping_writer.submit(track_id, round(position.latitude, 6), round(position.longitude, 6), int(position.altitude))
 
     return Gst.PadProbeReturn.OK
 
@@ -67,4 +89,6 @@ if __name__ == "__main__":
     hailotracker = app.pipeline.get_by_name("hailo_tracker")
     # set the tracker to track
     hailotracker.set_property("class-id", 12)  # for what COCO class id (1 based) across frames will be tracked (12=stop sign)
+    user_data.start_gps_task()
     app.run()
+    user_data.mapping_writer.close()
@@ -1,26 +1,29 @@
 import pynmea2
-import serial
 import time
 import os
-import io
+from nmea_replay import open_gps_port, read_sentence
 
-def get_usb_gps_devices():
+def get_usb_gps_devices(devices=None):
     """
     Get a list of GPS devices that are connected via USB.
+    devices overrides the candidates found in /dev, and may include recorded NMEA logs to replay.
     """
-    for device in [f'/dev/{device}' for device in os.listdir('/dev') if 'USB' in device]:
+    if devices is None:
+        devices = [f'/dev/{device}' for device in os.listdir('/dev') if 'USB' in device]
+    for device in devices:
         try:
-            ser = serial.Serial(device, 9600, timeout=1.0)  # parse data, wait & collect new data for 1 second timeout, then parse buffered
-            sio = io.TextIOWrapper(io.BufferedRWPair(ser, ser))
+            ser = open_gps_port(device)  # readline waits up to 1 second for new data
             start_time = time.time()
-            while time.time() - start_time < 10000:  # wait up to 10 seconds to get a GPS fix
+            while time.time() - start_time < 10 and ser.is_open:  # wait up to 10 seconds to get a GPS fix
                 try:
-                    line = sio.readline()
+                    line = read_sentence(ser)
                     msg = pynmea2.parse(line)
                     if hasattr(msg, 'latitude') or hasattr(msg, 'longitude'):
+                        ser.close()
                         return device
                 except Exception as e:
                     continue
+            ser.close()
         except Exception as e:
             continue
     return None  # no GPS devices found
@@ -1,7 +1,8 @@
 import asyncio
 import pynmea2
 import serial
-import io
+from gps_state import GPSState
+from nmea_replay import open_gps_port, read_sentence
 
 latest_gps_data = {
     'latitude': 0,
@@ -9,30 +10,56 @@ latest_gps_data = {
     'altitude': 0
 }
 
-async def gps_task(usb_path):
+# Timestamped fixes for looking up the position at the capture time of a frame (see GPSState.position_at)
+gps_state = GPSState()
+
+def handle_sentence(line, state=gps_state):
+    """
+    Parse one NMEA sentence and record its position in latest_gps_data and state.
+    GGA and RMC sentences of the same UTC time describe one fix and are recorded once.
+    """
+    msg = pynmea2.parse(line)
+    altitude = int(msg.altitude) if getattr(msg, 'altitude', None) is not None else None
+    if getattr(msg, 'latitude', None) is not None and getattr(msg, 'longitude', None) is not None:
+        latest_gps_data['latitude'] = round(msg.latitude, 6)
+        latest_gps_data['longitude'] = round(msg.longitude, 6)
+        state.update(latest_gps_data['latitude'], latest_gps_data['longitude'], altitude,
+                     epoch=getattr(msg, 'timestamp', None))
+    elif altitude is not None:
+        state.update_altitude(altitude)
+    if altitude is not None:
+        latest_gps_data['altitude'] = altitude
+
+async def gps_task(usb_path, state=gps_state):
+    """
+    Read NMEA sentences from usb_path (a serial port, or a recorded NMEA log to replay) and keep
+    latest_gps_data and state up to date. Returns when a replayed log ends.
+    """
     global latest_gps_data
     try:
-        ser = serial.Serial(usb_path, 9600, timeout=1.0)  # parse data, wait & collect new data for 1 second, then parse buffered
-        sio = io.TextIOWrapper(io.BufferedRWPair(ser, ser))
+        ser = open_gps_port(usb_path)  # readline waits up to 1 second for new data
     except serial.SerialException as e:
         # print(f"Error opening serial port: {e}")
         ser = None
+    was_open = bool(ser and ser.is_open)
 
     while True:
         try:
             if ser and ser.is_open:
-                line = sio.readline()
-                msg = pynmea2.parse(line)
-                if hasattr(msg, 'latitude') and msg.latitude is not None and hasattr(msg, 'longitude') and msg.longitude is not None:
-                    latest_gps_data['latitude'] = round(msg.latitude, 6)
-                    latest_gps_data['longitude'] = round(msg.longitude, 6)
-                if hasattr(msg, 'altitude') and msg.altitude is not None:
-                    latest_gps_data['altitude'] = int(msg.altitude)
-            else:
-                # Set default values if serial data is not available
-                latest_gps_data['latitude'] = 0
-                latest_gps_data['longitude'] = 0
-                latest_gps_data['altitude'] = 0
+                line = read_sentence(ser)
+                if line:
+                    handle_sentence(line, state)
+                await asyncio.sleep(0)  # readline already blocks, only let other tasks run
+                continue
+            if was_open:
+                return  # End of a replayed log
+            # Set default values if serial data is not available
+            latest_gps_data['latitude'] = 0
+            latest_gps_data['longitude'] = 0
+            latest_gps_data['altitude'] = 0
+        except pynmea2.ParseError:
+            await asyncio.sleep(0)  # Skip a corrupted sentence, the next one follows shortly
+            continue
         except Exception as e:
             # print(f"Error reading from serial port: {e}")
             # Set default values in case of an error
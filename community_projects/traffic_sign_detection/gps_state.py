@@ -0,0 +1,100 @@
+import bisect
+import time
+from collections import namedtuple
+
+GPSFix = namedtuple('GPSFix', ['timestamp', 'latitude', 'longitude', 'altitude'])
+
+CLOCK_TIME_NONE = 2 ** 64 - 1  # Gst.CLOCK_TIME_NONE, a buffer without a timestamp
+
+
+def pts_to_monotonic(pts, base_time, live=True):
+    """
+    Convert a buffer PTS (nanoseconds of running time) to time.monotonic() seconds.
+    The GStreamer system clock runs on CLOCK_MONOTONIC, so clock time = base_time + running time
+    (for a pipeline playing from the start of its segment).
+    Returns None if the buffer has no PTS, or if the source is not live: the PTS of a file is its position
+    in the file, not the time the frame was captured. Callers then use the latest fix.
+    """
+    if not live or pts is None or pts == CLOCK_TIME_NONE:
+        return None
+    return (base_time + pts) / 1e9
+
+
+class GPSState:
+    """
+    Timestamped cache of the latest GPS fixes, shared between the GPS reader and the pipeline callback.
+
+    The history is an immutable (timestamps, fixes, epoch) tuple that the single writer replaces as a whole on
+    every update, so readers never take a lock and always see a consistent set of fixes.
+    position_at() interpolates between the two fixes around a timestamp, or extrapolates from the last
+    two fixes for up to max_extrapolation seconds, so a detection gets the position of the vehicle at the
+    time its frame was captured instead of the position of the last NMEA sentence.
+    """
+
+    def __init__(self, history_size=32, max_extrapolation=1.0):
+        self.history_size = history_size
+        self.max_extrapolation = max_extrapolation
+        self._history = ((), (), None)  # (timestamps, fixes, epoch of the latest fix)
+
+    def update(self, latitude, longitude, altitude=None, timestamp=None, epoch=None):
+        """
+        Add a fix. A missing altitude keeps the previous one. Fixes must arrive in time order.
+        epoch identifies the GPS measurement (the UTC time of the NMEA sentence): sentences of the same
+        epoch (GGA and RMC) are merged into one fix, which keeps the arrival time of the first one.
+        """
+        times, fixes, latest_epoch = self._history
+        if altitude is None:
+            altitude = fixes[-1].altitude if fixes else 0
+        if epoch is not None and epoch == latest_epoch:
+            fix = fixes[-1]._replace(latitude=latitude, longitude=longitude, altitude=altitude)
+            self._history = (times, fixes[:-1] + (fix,), epoch)
+            return
+        if timestamp is None:
+            timestamp = time.monotonic()
+        keep = self.history_size - 1
+        fix = GPSFix(timestamp, latitude, longitude, altitude)
+        self._history = (times[-keep:] + (timestamp,), fixes[-keep:] + (fix,), epoch)
+
+    def update_altitude(self, altitude):
+        """Update the altitude of the latest fix (GGA sentences carry it, RMC sentences do not)."""
+        times, fixes, epoch = self._history
+        if fixes:
+            self._history = (times, fixes[:-1] + (fixes[-1]._replace(altitude=altitude),), epoch)
+
+    def snapshot(self):
+        """Return the fixes in the history, oldest first."""
+        return self._history[1]
+
+    def latest(self):
+        """Return the latest fix, or None before the first fix."""
+        fixes = self._history[1]
+        return fixes[-1] if fixes else None
+
+    def position_at(self, timestamp):
+        """Return the estimated GPSFix at a time.monotonic() timestamp, or None before the first fix."""
+        times, fixes, _ = self._history
+        if not fixes:
+            return None
+        index = bisect.bisect_left(times, timestamp)
+        if index == 0:
+            return fixes[0]  # Older than the history, no extrapolation backwards
+        if index < len(fixes):
+            return _interpolate(fixes[index - 1], fixes[index], timestamp)
+        if len(fixes) < 2:
+            return fixes[-1]
+        # Past the latest fix: extrapolate along the last segment, but not too far
+        before, after = fixes[-2], fixes[-1]
+        return _interpolate(before, after, min(timestamp, after.timestamp + self.max_extrapolation))
+
+
+def _interpolate(before, after, timestamp):
+    span = after.timestamp - before.timestamp
+    if span <= 0:
+        return after._replace(timestamp=timestamp)
+    ratio = (timestamp - before.timestamp) / span
+    return GPSFix(
+        timestamp,
+        before.latitude + (after.latitude - before.latitude) * ratio,
+        before.longitude + (after.longitude - before.longitude) * ratio,
+        before.altitude + (after.altitude - before.altitude) * ratio,
+    )
@@ -0,0 +1,171 @@
+import atexit
+import csv
+import json
+import os
+import queue
+import threading
+import time
+
+from post_process_csv import geojson_feature, write_processed_csv, write_geojson
+
+FIELDNAMES = ['id', 'latitude', 'longitude', 'altitude']
+FSYNC_POLICIES = ('never', 'batch', 'close')
+GEOJSON_HEADER = b'{"type": "FeatureCollection", "features": [\n'
+GEOJSON_TRAILER = b'\n]}\n'
+
+
+class MappingWriter:
+    """
+    Background writer for the traffic sign mapping results.
+
+    submit() only puts the fix on a bounded queue, so it is safe to call from the GStreamer streaming
+    thread. A writer thread drains the queue in batches (up to batch_size rows or flush_interval
+    seconds), appends them to the CSV log and keeps the latest fix per track id in memory.
+
+    While running, the GeoJSON grows by one feature per track updated in each batch: the features are
+    written over the closing ']}' of the FeatureCollection, which is written again after them, so the file
+    stays valid and its last feature of a track is the latest fix. close() replaces it with the
+    deduplicated GeoJSON and writes the deduplicated CSV, the same files post_process_csv.py produces
+    from the log.
+
+    fsync policy: 'never' leaves flushing to the OS, 'batch' fsyncs the log after every batch and
+    'close' fsyncs once on close().
+    """
+
+    def __init__(self, csv_path, processed_csv_path=None, geojson_path=None, max_queue_size=10000,
+                 batch_size=256, flush_interval=1.0, fsync='batch'):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, got {fsync!r}")
+        self.csv_path = csv_path
+        self.processed_csv_path = processed_csv_path
+        self.geojson_path = geojson_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.latest = {}          # track id -> latest row (dict with FIELDNAMES keys)
+        self.written_rows = 0
+        self.dropped_rows = 0     # Rows rejected because the queue was full
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+        # Only write the header for a new log, appending to an existing log keeps it readable by process_csv
+        write_header = not os.path.exists(csv_path) or os.path.getsize(csv_path) == 0
+        self._file = open(csv_path, 'a', newline='')
+        self._csv = csv.writer(self._file)
+        if write_header:
+            self._csv.writerow(FIELDNAMES)
+            self._file.flush()
+
+        self._geojson = None
+        if geojson_path:
+            self._geojson = open(geojson_path, 'wb')
+            self._geojson.write(GEOJSON_HEADER + GEOJSON_TRAILER[1:])
+            self._geojson.flush()
+            self._geojson_end = len(GEOJSON_HEADER)  # Offset of the trailer
+            self._geojson_empty = True
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, track_id, latitude, longitude, altitude):
+        """Queue a fix without blocking. Returns False if the queue is full and the fix was dropped."""
+        try:
+            self._queue.put_nowait((track_id, latitude, longitude, altitude))
+            return True
+        except queue.Full:
+            self.dropped_rows += 1
+            return False
+
+    def get_latest(self):
+        """Return a copy of the latest fix per track id."""
+        with self._lock:
+            return dict(self.latest)
+
+    def _next_batch(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:  # Woken up by close()
+                return batch
+            batch.append(item)
+        return batch + self._queued(self.batch_size - len(batch))
+
+    def _queued(self, max_items):
+        """Take up to max_items already queued fixes without waiting."""
+        items = []
+        while len(items) < max_items:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                items.append(item)
+        return items
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._write_batch(self._next_batch())
+        # Drain what is left after close()
+        batch = self._queued(self.batch_size)
+        while batch:
+            self._write_batch(batch)
+            batch = self._queued(self.batch_size)
+
+    def _write_batch(self, batch):
+        if not batch:
+            return
+        self._csv.writerows(batch)
+        self._file.flush()
+        if self.fsync == 'batch':
+            os.fsync(self._file.fileno())
+
+        updated = {}
+        with self._lock:
+            for track_id, latitude, longitude, altitude in batch:
+                updated[track_id] = self.latest[track_id] = {'id': track_id, 'latitude': latitude,
+                                                             'longitude': longitude, 'altitude': altitude}
+        if self._geojson:
+            self._append_features(updated.values())
+        self.written_rows += len(batch)
+
+    def _append_features(self, rows):
+        features = ',\n'.join(json.dumps(geojson_feature(row)) for row in rows).encode()
+        separator = b'' if self._geojson_empty else b',\n'
+        self._geojson.seek(self._geojson_end)
+        self._geojson.write(separator + features + GEOJSON_TRAILER)
+        self._geojson.flush()
+        self._geojson_end += len(separator) + len(features)
+        self._geojson_empty = False
+
+    def _write_outputs(self):
+        # Write to a temporary file and rename, so readers never see a partially written file
+        for path, write in ((self.processed_csv_path, write_processed_csv), (self.geojson_path, write_geojson)):
+            if path:
+                write(self.latest, path + '.tmp')
+                os.replace(path + '.tmp', path)
+
+    def close(self):
+        """Write all queued fixes and stop the writer thread."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        try:
+            self._queue.put_nowait(None)  # Wake up the writer thread
+        except queue.Full:
+            pass
+        self._thread.join()
+        if self.fsync in ('batch', 'close'):
+            os.fsync(self._file.fileno())
+        self._file.close()
+        if self._geojson:
+            self._geojson.close()
+        self._write_outputs()
@@ -0,0 +1,83 @@
+import os
+import time
+
+import serial
+
+
+class NMEAReplay:
+    """
+    Stand-in for serial.Serial that replays a recorded NMEA log, one sentence per readline().
+
+    With realtime=True, replay is paced by the UTC time of the GGA/RMC sentences, so a recorded drive
+    plays back at the rate the receiver produced it. loop=True restarts the log at the end, otherwise
+    readline() returns b'' (like a serial read timeout) and is_open becomes False.
+    """
+
+    def __init__(self, path, realtime=True, loop=False):
+        self.path = path
+        self.realtime = realtime
+        self.loop = loop
+        self._file = open(path, 'rb')
+        self._last_sentence_time = None
+        self._last_wall_time = None
+
+    @property
+    def is_open(self):
+        return not self._file.closed
+
+    def readline(self):
+        if self._file.closed:
+            return b''
+        line = self._file.readline()
+        if not line and self.loop:
+            self._file.seek(0)
+            self._last_sentence_time = None
+            line = self._file.readline()
+        if not line:
+            self.close()
+            return b''
+        if self.realtime:
+            self._pace(sentence_time(line))
+        return line
+
+    def _pace(self, seconds):
+        if seconds is None or seconds == self._last_sentence_time:
+            return
+        now = time.monotonic()
+        if self._last_sentence_time is not None:
+            delay = (seconds - self._last_sentence_time) % 86400  # Wraps at midnight UTC
+            time.sleep(max(0.0, self._last_wall_time + delay - now))
+            now = time.monotonic()
+        self._last_sentence_time = seconds
+        self._last_wall_time = now
+
+    def close(self):
+        self._file.close()
+
+
+def sentence_time(line):
+    """Return the UTC time of day in seconds of a GGA or RMC sentence, or None."""
+    if isinstance(line, bytes):
+        line = line.decode('ascii', errors='replace')
+    fields = line.split(',', 2)
+    if len(fields) < 3 or fields[0][-3:] not in ('GGA', 'RMC') or len(fields[1]) < 6:
+        return None
+    try:
+        return int(fields[1][0:2]) * 3600 + int(fields[1][2:4]) * 60 + float(fields[1][4:])
+    except ValueError:
+        return None
+
+
+def open_gps_port(path, baudrate=9600, timeout=1.0):
+    """Open a GPS serial port, or replay an NMEA log if path is a regular file."""
+    if path and os.path.isfile(path):
+        return NMEAReplay(path)
+    return serial.Serial(path, baudrate, timeout=timeout)
+
+
+def read_sentence(port):
+    """Read one NMEA sentence from a serial port or NMEAReplay as a str ('' on timeout)."""
+    line = port.readline()
+    if isinstance(line, bytes):
+        line = line.decode('ascii', errors='replace')
+    return line.strip()
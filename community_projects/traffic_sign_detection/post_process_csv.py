@@ -9,8 +9,14 @@ def process_csv(input_csv_path, output_csv_path, output_geojson_path):
     with open(input_csv_path, 'r') as infile:
         reader = csv.DictReader(infile)
         for row in reader:
+            if row['id'] == 'id':  # Header repeated by an earlier run appending to the same log
+                continue
             last_rows[row['id']] = row
 
+    write_processed_csv(last_rows, output_csv_path)
+    write_geojson(last_rows, output_geojson_path)
+
+def write_processed_csv(last_rows, output_csv_path):
     # Write the last rows to the output CSV file
     with open(output_csv_path, 'w', newline='') as outfile:
         fieldnames = ['id', 'latitude', 'longitude', 'altitude']
@@ -19,20 +25,21 @@ def process_csv(input_csv_path, output_csv_path, output_geojson_path):
         for row in last_rows.values():
             writer.writerow(row)
 
-    # Write the last rows to the GeoJSON file
-    features = []
-    for row in last_rows.values():
-        feature = {
-            "type": "Feature",
-            "geometry": {
-                "type": "Point",
-                "coordinates": [float(row['longitude']), float(row['latitude']), float(row['altitude'])]
-            },
-            "properties": {
-                "id": row['id']
-            }
+def geojson_feature(row):
+    return {
+        "type": "Feature",
+        "geometry": {
+            "type": "Point",
+            "coordinates": [float(row['longitude']), float(row['latitude']), float(row['altitude'])]
+        },
+        "properties": {
+            "id": row['id']
         }
-        features.append(feature)
+    }
+
+def write_geojson(last_rows, output_geojson_path):
+    # Write the last rows to the GeoJSON file
+    features = [geojson_feature(row) for row in last_rows.values()]
 
     geojson_data = {
         "type": "FeatureCollection",
@@ -0,0 +1,136 @@
+import asyncio
+import threading
+import time
+from functools import reduce
+
+import pytest
+from gps_state import CLOCK_TIME_NONE, GPSState, GPSFix, pts_to_monotonic
+from nmea_replay import NMEAReplay, sentence_time
+from gps_calculations import gps_task, latest_gps_data
+from get_usb_gps import get_usb_gps_devices
+
+
+def nmea(body):
+    checksum = reduce(lambda a, b: a ^ b, body.encode('ascii'), 0)
+    return f'${body}*{checksum:02X}\n'
+
+
+def write_log(path, seconds=3):
+    """A drive north along a meridian, one GGA and one RMC sentence per second."""
+    lines = []
+    for i in range(seconds):
+        minutes = 10.0 + i * 0.06  # 0.001 degrees per second
+        lines.append(nmea(f'GPGGA,12000{i}.00,32{minutes:08.5f},N,03448.00000,E,1,08,0.9,{100 + i}.0,M,17.0,M,,'))
+        lines.append(nmea(f'GPRMC,12000{i}.00,A,32{minutes:08.5f},N,03448.00000,E,10.0,0.0,010125,,,A'))
+    path.write_text(''.join(lines))
+    return str(path)
+
+
+def test_interpolates_between_fixes():
+    state = GPSState()
+    state.update(32.0, 34.0, 100, timestamp=10.0)
+    state.update(32.001, 34.002, 110, timestamp=11.0)
+    fix = state.position_at(10.25)
+    assert fix.timestamp == 10.25
+    assert fix.latitude == pytest.approx(32.00025)
+    assert fix.longitude == pytest.approx(34.0005)
+    assert fix.altitude == pytest.approx(102.5)
+    assert state.position_at(11.0).latitude == pytest.approx(32.001)
+
+
+def test_extrapolation_is_limited():
+    state = GPSState(max_extrapolation=0.5)
+    state.update(32.0, 34.0, 100, timestamp=10.0)
+    state.update(32.001, 34.0, 100, timestamp=11.0)
+    assert state.position_at(11.2).latitude == pytest.approx(32.0012)
+    assert state.position_at(20.0).latitude == pytest.approx(32.0015)
+
+
+def test_single_fix_and_empty_state():
+    state = GPSState()
+    assert state.position_at(1.0) is None
+    state.update(32.0, 34.0, timestamp=5.0)
+    assert state.position_at(1.0) == GPSFix(5.0, 32.0, 34.0, 0)
+    assert state.position_at(9.0) == GPSFix(5.0, 32.0, 34.0, 0)
+
+
+def test_history_is_bounded_and_altitude_is_kept():
+    state = GPSState(history_size=4)
+    for i in range(10):
+        state.update(32.0 + i, 34.0, 100 if i == 0 else None, timestamp=float(i))
+    fixes = state.snapshot()
+    assert [fix.timestamp for fix in fixes] == [6.0, 7.0, 8.0, 9.0]
+    assert all(fix.altitude == 100 for fix in fixes)
+    state.update_altitude(120)
+    assert state.latest().altitude == 120
+
+
+def test_readers_see_consistent_snapshots():
+    state = GPSState(history_size=8)
+    stop = threading.Event()
+
+    def writer():
+        i = 0
+        while not stop.is_set():
+            state.update(float(i), float(i), i, timestamp=float(i))
+            i += 1
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        deadline = time.monotonic() + 0.5
+        while time.monotonic() < deadline:
+            fixes = state.snapshot()
+            times = [fix.timestamp for fix in fixes]
+            assert times == sorted(times)
+            assert all(fix.latitude == fix.timestamp for fix in fixes)
+    finally:
+        stop.set()
+        thread.join()
+
+
+def test_pts_to_monotonic():
+    assert pts_to_monotonic(500_000_000, 2_000_000_000) == pytest.approx(2.5)
+    assert pts_to_monotonic(CLOCK_TIME_NONE, 2_000_000_000) is None
+    assert pts_to_monotonic(500_000_000, 2_000_000_000, live=False) is None
+
+
+def test_sentences_of_one_epoch_are_one_fix():
+    state = GPSState()
+    state.update(32.0, 34.0, 100, timestamp=10.0, epoch='120000')
+    state.update(32.0, 34.0, timestamp=10.1, epoch='120000')  # RMC after GGA: no altitude
+    state.update(32.001, 34.0, 101, timestamp=11.0, epoch='120001')
+    assert state.snapshot() == (GPSFix(10.0, 32.0, 34.0, 100), GPSFix(11.0, 32.001, 34.0, 101))
+    # Without an epoch every sentence is a fix
+    state.update(32.002, 34.0, timestamp=12.0)
+    state.update(32.002, 34.0, timestamp=12.1)
+    assert len(state.snapshot()) == 4
+
+
+def test_replay_paces_by_sentence_time(tmp_path):
+    path = write_log(tmp_path / 'drive.nmea', seconds=2)
+    assert sentence_time(nmea('GPGGA,120001.50,3210.0,N,03448.0,E,1,08,0.9,100.0,M,17.0,M,,')) == pytest.approx(43201.5)
+    replay = NMEAReplay(path)
+    start = time.monotonic()
+    lines = [replay.readline() for _ in range(4)]
+    assert time.monotonic() - start == pytest.approx(1.0, abs=0.2)
+    assert all(lines)
+    assert replay.readline() == b''
+    assert not replay.is_open
+
+
+def test_gps_task_replays_log(tmp_path):
+    path = write_log(tmp_path / 'drive.nmea')
+    state = GPSState()
+    asyncio.run(asyncio.wait_for(gps_task(path, state), timeout=10))
+    fixes = state.snapshot()
+    assert len(fixes) == 3
+    assert [fix.altitude for fix in fixes] == [100, 101, 102]
+    assert fixes[-1].latitude == pytest.approx(32.168667)
+    assert fixes[-1].altitude == 102
+    assert latest_gps_data == {'latitude': pytest.approx(32.168667), 'longitude': pytest.approx(34.8), 'altitude': 102}
+
+
+def test_get_usb_gps_devices_from_log(tmp_path):
+    path = write_log(tmp_path / 'drive.nmea', seconds=1)
+    assert get_usb_gps_devices([str(tmp_path / 'missing.nmea'), path]) == path
@@ -0,0 +1,84 @@
+import csv
+import json
+import time
+
+import pytest
+from mapping_writer import MappingWriter
+from post_process_csv import process_csv
+
+
+def read_rows(path):
+    with open(path, 'r') as csvfile:
+        return list(csv.DictReader(csvfile))
+
+
+def test_latest_fix_per_track(tmp_path):
+    log_path = tmp_path / 'tsr_mapping.csv'
+    processed_path = tmp_path / 'tsr_mapping_processed.csv'
+    geojson_path = tmp_path / 'tsr_mapping.geojson'
+    writer = MappingWriter(str(log_path), str(processed_path), str(geojson_path), flush_interval=0.05)
+    writer.submit(1, 12.34, 56.78, 90)
+    writer.submit(1, 12.35, 56.79, 91)
+    writer.submit(2, 22.34, 66.78, 100)
+    writer.close()
+
+    assert len(read_rows(log_path)) == 3
+    rows = read_rows(processed_path)
+    assert [(row['id'], row['latitude']) for row in rows] == [('1', '12.35'), ('2', '22.34')]
+    with open(geojson_path, 'r') as geojson_file:
+        features = json.load(geojson_file)['features']
+    assert features[0]['geometry']['coordinates'] == [56.79, 12.35, 91.0]
+    # The incremental output matches what the offline post processing produces from the log
+    process_csv(log_path, tmp_path / 'offline.csv', tmp_path / 'offline.geojson')
+    assert read_rows(tmp_path / 'offline.csv') == rows
+
+
+def test_geojson_is_appended_while_running(tmp_path):
+    geojson_path = tmp_path / 'tsr_mapping.geojson'
+    writer = MappingWriter(str(tmp_path / 'tsr_mapping.csv'), str(tmp_path / 'processed.csv'), str(geojson_path),
+                           flush_interval=0.05)
+    fixes = [(1, 12.34, 56.78, 90), (2, 22.34, 66.78, 100), (1, 12.35, 56.79, 91)]
+    for written, fix in enumerate(fixes, start=1):
+        writer.submit(*fix)
+        deadline = time.monotonic() + 5
+        while writer.written_rows < written and time.monotonic() < deadline:  # One batch per fix
+            time.sleep(0.01)
+    with open(geojson_path, 'r') as geojson_file:
+        features = json.load(geojson_file)['features']
+    assert [feature['properties']['id'] for feature in features] == [1, 2, 1]  # The last one of a track wins
+    assert not (tmp_path / 'processed.csv').exists()  # Written once, on close
+    writer.close()
+    with open(geojson_path, 'r') as geojson_file:
+        features = json.load(geojson_file)['features']
+    assert [feature['geometry']['coordinates'] for feature in features] == [[56.79, 12.35, 91.0], [66.78, 22.34, 100.0]]
+    assert [row['id'] for row in read_rows(tmp_path / 'processed.csv')] == ['1', '2']
+
+
+def test_header_written_once_across_runs(tmp_path):
+    log_path = tmp_path / 'tsr_mapping.csv'
+    for track_id in (1, 2):
+        writer = MappingWriter(str(log_path), flush_interval=0.05)
+        writer.submit(track_id, 1.0, 2.0, 3)
+        writer.close()
+    assert [row['id'] for row in read_rows(log_path)] == ['1', '2']
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path):
+    writer = MappingWriter(str(tmp_path / 'tsr_mapping.csv'), max_queue_size=1, batch_size=1, flush_interval=0.05)
+    results = [writer.submit(i, 0.0, 0.0, 0) for i in range(1000)]
+    writer.close()
+    assert results.count(False) == writer.dropped_rows
+    assert writer.written_rows + writer.dropped_rows == 1000
+
+
+@pytest.mark.parametrize("fsync", ['never', 'batch', 'close'])
+def test_many_detections_are_all_written(tmp_path, fsync):
+    detections = 20000
+    writer = MappingWriter(str(tmp_path / 'tsr_mapping.csv'), str(tmp_path / 'processed.csv'),
+                           str(tmp_path / 'tsr_mapping.geojson'), max_queue_size=detections, fsync=fsync)
+    for i in range(detections):
+        writer.submit(i % 50, 32.0 + i * 1e-6, 34.8, 10)
+    writer.close()
+    assert writer.dropped_rows == 0
+    assert writer.written_rows == detections
+    assert len(writer.get_latest()) == 50
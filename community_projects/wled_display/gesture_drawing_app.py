@@ -9,6 +9,8 @@ the logic is identical: left wrist must be inside a shrunk bounding box
 (shoulders & hips) to enable drawing.
 """
 
+import os
+import sys
 import gi
 gi.require_version('Gst', '1.0')
 from gi.repository import Gst, GLib
@@ -21,13 +23,13 @@ from hailo_apps.hailo_app_python.core.common.core import get_default_parser
 from wled_display import WLEDDisplay, add_parser_args
 from drawing_board import DrawingBoard
 
-# Typical body indices in your pose model (COCO-like)
-LEFT_WRIST_IDX = 9
-RIGHT_WRIST_IDX = 10
-LEFT_SHOULDER_IDX = 5
-RIGHT_SHOULDER_IDX = 6
-LEFT_HIP_IDX = 11
-RIGHT_HIP_IDX = 12
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'basic_pipelines'))
+from pose_geometry import PoseBatch
+
+# Body keypoints used by the DrawingBoard (COCO names, see pose_geometry.get_keypoints)
+POSE_KEYPOINTS = ['left_wrist', 'right_wrist', 'left_shoulder', 'right_shoulder', 'left_hip', 'right_hip']
+# The same keypoints with left and right swapped, used when mirror_hands is set
+MIRRORED_POSE_KEYPOINTS = ['right_wrist', 'left_wrist', 'right_shoulder', 'left_shoulder', 'right_hip', 'left_hip']
 
 
 class GestureDrawingCallback(app_callback_class):
@@ -71,57 +73,24 @@ def app_callback(pad, info, user_data):
         return Gst.PadProbeReturn.OK
 
     roi = hailo.get_roi_from_buffer(buffer)
-    detections = roi.get_objects_typed(hailo.HAILO_DETECTION)
-
-    for detection in detections:
-        if detection.get_label() != "person":
-            continue
 
-        # Track ID (for multi-person)
-        track_id_obj = detection.get_objects_typed(hailo.HAILO_UNIQUE_ID)
-        track_id = track_id_obj[0].get_id() if track_id_obj else 0
+    # Swap left<->right if mirror_hands=True
+    keypoint_names = MIRRORED_POSE_KEYPOINTS if user_data.mirror_hands else POSE_KEYPOINTS
 
-        # The detection bounding box in [0..1]
-        bbox = detection.get_bbox()
+    # Convert detection-local coords [0..1] of all persons to total LED coords at once,
+    # keypoints with confidence below 0.5 are not visible
+    poses = PoseBatch.from_roi(roi, user_data.drawing_board.width, user_data.drawing_board.height,
+                               keypoint_names=keypoint_names, min_confidence=0.5)
+    pixels = poses.to_int().tolist()
 
-        # Landmarks in [0..1] relative to the detection box
-        landmarks_obj = detection.get_objects_typed(hailo.HAILO_LANDMARKS)
-        if not landmarks_obj:
+    for person, track_id in enumerate(poses.track_ids.tolist()):
+        if not poses.has_landmarks[person]:
             continue
-        points = landmarks_obj[0].get_points()
-
-        # Swap left<->right if mirror_hands=True
-        if user_data.mirror_hands:
-            lw_idx = RIGHT_WRIST_IDX
-            rw_idx = LEFT_WRIST_IDX
-            ls_idx = RIGHT_SHOULDER_IDX
-            rs_idx = LEFT_SHOULDER_IDX
-            lh_idx = RIGHT_HIP_IDX
-            rh_idx = LEFT_HIP_IDX
-        else:
-            lw_idx = LEFT_WRIST_IDX
-            rw_idx = RIGHT_WRIST_IDX
-            ls_idx = LEFT_SHOULDER_IDX
-            rs_idx = RIGHT_SHOULDER_IDX
-            lh_idx = LEFT_HIP_IDX
-            rh_idx = RIGHT_HIP_IDX
-
-        # Convert detection-local coords [0..1] to total LED coords
-        def to_panel_coords(pt):
-            # check pt confidence
-            if pt.confidence() < 0.5:
-                return None
-            x_glob = (pt.x() * bbox.width() + bbox.xmin()) * user_data.drawing_board.width
-            y_glob = (pt.y() * bbox.height() + bbox.ymin()) * user_data.drawing_board.height
-            return int(x_glob), int(y_glob)
 
         # Extract final pixel coords
-        left_wrist_px     = to_panel_coords(points[lw_idx])
-        right_wrist_px    = to_panel_coords(points[rw_idx])
-        left_shoulder_px  = to_panel_coords(points[ls_idx])
-        right_shoulder_px = to_panel_coords(points[rs_idx])
-        left_hip_px       = to_panel_coords(points[lh_idx])
-        right_hip_px      = to_panel_coords(points[rh_idx])
+        left_wrist_px, right_wrist_px, left_shoulder_px, right_shoulder_px, left_hip_px, right_hip_px = [
+            tuple(point) if visible else None for point, visible in zip(pixels[person], poses.visible[person])
+        ]
 
         # Update the DrawingBoard with these pixel coords
         user_data.drawing_board.update_player_pose(
@@ -137,7 +106,7 @@ def app_callback(pad, info, user_data):
     # Once all detections processed, update + get final frame
     user_data.drawing_board.update()
     final_frame = user_data.drawing_board.get_frame()
-    user_data.wled.frame_queue.put(final_frame)
+    user_data.wled.put_frame(final_frame)
 
     return Gst.PadProbeReturn.OK
 
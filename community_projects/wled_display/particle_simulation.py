@@ -12,6 +12,11 @@ COLORS = [
     (255, 0, 255),  # Magenta
 ]
 
+def _last_occurrences(values):
+    """Indices of the last occurrence of every distinct value, in increasing order."""
+    _, first_reversed = np.unique(values[::-1], return_index=True)
+    return np.sort(len(values) - 1 - first_reversed)
+
 class ParticleSimulation:
     def __init__(self, screen_width=20, screen_height=20, max_particles=200, particle_lifetime=10,
                  particle_speed_decay=0.8, glitter_probability=0.01, player_timeout=60, particle_size=1):
@@ -32,6 +37,7 @@ class ParticleSimulation:
             "start_colors": np.zeros((self.MAX_PARTICLES, 3)),
             "end_colors": np.zeros((self.MAX_PARTICLES, 3)),
         }
+        self.head = 0  # Index of the oldest active particle
         self.active_particles = 0
         self.frame_count = 0
         self.color_schemes = {}  # Color schemes for each player
@@ -77,22 +83,44 @@ class ParticleSimulation:
             del self.players[player_id]
             del self.color_schemes[player_id]
 
+    def _active_slices(self):
+        """
+        Slices of the particle arrays holding the active particles, oldest first.
+        The arrays are a ring buffer: all particles live for PARTICLE_LIFETIME frames, so they die in the
+        order they were emitted and the active particles always follow each other from head (wrapping around).
+        """
+        end = self.head + self.active_particles
+        if end <= self.MAX_PARTICLES:
+            return [slice(self.head, end)]
+        return [slice(self.head, self.MAX_PARTICLES), slice(0, end - self.MAX_PARTICLES)]
+
+    def _active(self, name):
+        """Copy of an array of the active particles, oldest first."""
+        return np.concatenate([self.particles[name][s] for s in self._active_slices()])
+
     def emit_particles(self):
         """
         Emit particles for each active player.
         """
-        for player_id, player in self.players.items():
-            if self.active_particles >= self.MAX_PARTICLES:
-                break
-            count = min(self.MAX_PARTICLES - self.active_particles, 5)  # Emit up to 5 particles per player
-            indices = np.arange(self.active_particles, self.active_particles + count)
-            self.particles["positions"][indices] = player["position"]
-            random_velocity = np.random.uniform(-1, 1, (count, 2))
-            self.particles["velocities"][indices] = player["velocity"] * 0.1 + random_velocity * 0.5
-            self.particles["lifetimes"][indices] = self.PARTICLE_LIFETIME
-            self.particles["start_colors"][indices] = self.color_schemes[player_id]["start"]
-            self.particles["end_colors"][indices] = self.color_schemes[player_id]["end"]
-            self.active_particles += count
+        # Up to 5 particles per player, in player order, until the pool is full
+        count = min(self.MAX_PARTICLES - self.active_particles, 5 * len(self.players))
+        if count <= 0:
+            return
+        players = list(self.players.items())
+        owner = np.repeat(np.arange(len(players)), 5)[:count]
+        player_positions = np.array([player["position"] for _, player in players])
+        player_velocities = np.array([player["velocity"] for _, player in players])
+        start_colors = np.array([self.color_schemes[player_id]["start"] for player_id, _ in players], dtype=float)
+        end_colors = np.array([self.color_schemes[player_id]["end"] for player_id, _ in players], dtype=float)
+
+        indices = (self.head + self.active_particles + np.arange(count)) % self.MAX_PARTICLES
+        self.particles["positions"][indices] = player_positions[owner]
+        random_velocity = np.random.uniform(-1, 1, (count, 2))
+        self.particles["velocities"][indices] = player_velocities[owner] * 0.1 + random_velocity * 0.5
+        self.particles["lifetimes"][indices] = self.PARTICLE_LIFETIME
+        self.particles["start_colors"][indices] = start_colors[owner]
+        self.particles["end_colors"][indices] = end_colors[owner]
+        self.active_particles += count
 
     def update_particles(self):
         """
@@ -101,46 +129,57 @@ class ParticleSimulation:
         if self.active_particles == 0:
             return
 
-        positions = self.particles["positions"][:self.active_particles]
-        velocities = self.particles["velocities"][:self.active_particles]
-        lifetimes = self.particles["lifetimes"][:self.active_particles]
-        start_colors = self.particles["start_colors"][:self.active_particles]
-        end_colors = self.particles["end_colors"][:self.active_particles]
-
-        velocities *= self.PARTICLE_SPEED_DECAY
-        positions += velocities
-        lifetimes -= 1
+        dead = 0
+        for active in self._active_slices():
+            velocities = self.particles["velocities"][active]
+            velocities *= self.PARTICLE_SPEED_DECAY
+            self.particles["positions"][active] += velocities
+            lifetimes = self.particles["lifetimes"][active]
+            lifetimes -= 1
+            dead += np.count_nonzero(lifetimes <= 0)
 
-        alive = lifetimes > 0
-        self.active_particles = np.sum(alive)
-        self.particles["positions"][:self.active_particles] = positions[alive]
-        self.particles["velocities"][:self.active_particles] = velocities[alive]
-        self.particles["lifetimes"][:self.active_particles] = lifetimes[alive]
-        self.particles["start_colors"][:self.active_particles] = start_colors[alive]
-        self.particles["end_colors"][:self.active_particles] = end_colors[alive]
+        # The dead particles are the oldest ones, drop them from the head of the ring
+        self.head = (self.head + dead) % self.MAX_PARTICLES
+        self.active_particles -= dead
 
     def draw_particles(self, frame):
         """
-        Draw particles as single pixels on the frame.
+        Draw particles as single pixels (or squares of PARTICLE_SIZE) on the frame.
+        Newer particles are drawn over older ones.
         """
-        for i in range(self.active_particles):
-            x, y = self.particles["positions"][i]
-            if np.random.random() < self.GLITTER_PROBABILITY:
-                color = (255, 255, 255)  # Glitter: Bright white
-            else:
-                start_color = self.particles["start_colors"][i]
-                end_color = self.particles["end_colors"][i]
-                fraction = 1 - (self.particles["lifetimes"][i] / self.PARTICLE_LIFETIME)
-                color = start_color + (end_color - start_color) * fraction
-                color = tuple(map(int, color))  # Convert to tuple of integers
-
-            if 0 <= int(x) < frame.shape[1] and 0 <= int(y) < frame.shape[0]:
-                if self.PARTICLE_SIZE > 1:
-                    top_left = (int(x) - self.PARTICLE_SIZE // 2, int(y) - self.PARTICLE_SIZE // 2)
-                    bottom_right = (int(x) + self.PARTICLE_SIZE // 2, int(y) + self.PARTICLE_SIZE // 2)
-                    cv2.rectangle(frame, top_left, bottom_right, color, -1)
-                else:
-                    frame[int(y), int(x)] = color  # Draw particle as a single pixel
+        if self.active_particles == 0:
+            return
+        lifetimes = self._active("lifetimes")
+        start_colors = self._active("start_colors")
+        end_colors = self._active("end_colors")
+        fraction = (1 - lifetimes / self.PARTICLE_LIFETIME)[:, np.newaxis]
+        colors = (start_colors + (end_colors - start_colors) * fraction).astype(np.uint8)
+        colors[np.random.random(len(colors)) < self.GLITTER_PROBABILITY] = 255  # Glitter: Bright white
+
+        # Truncated like int(), so particles just outside the top/left border still land on row/column 0
+        positions = self._active("positions").astype(np.int64)
+        x, y = positions[:, 0], positions[:, 1]
+        height, width = frame.shape[:2]
+        visible = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+        x, y, colors = x[visible], y[visible], colors[visible]
+
+        if self.PARTICLE_SIZE > 1:
+            # Particles on the same pixel draw the same square, only the newest one is visible
+            keep = _last_occurrences(y * width + x)
+            x, y, colors = x[keep], y[keep], colors[keep]
+            # Splat every particle as a square, clipped to the frame (like a filled cv2.rectangle)
+            offsets = np.arange(-(self.PARTICLE_SIZE // 2), self.PARTICLE_SIZE // 2 + 1)
+            kernel_x, kernel_y = np.meshgrid(offsets, offsets)
+            x = (x[:, np.newaxis] + kernel_x.reshape(1, -1)).reshape(-1)
+            y = (y[:, np.newaxis] + kernel_y.reshape(1, -1)).reshape(-1)
+            colors = colors.repeat(kernel_x.size, axis=0)
+            inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+            x, y, colors = x[inside], y[inside], colors[inside]
+
+        # NumPy does not define which value a repeated index gets, so keep the last (newest) particle per pixel
+        keep = _last_occurrences(y * width + x)
+        frame[y[keep], x[keep]] = colors[keep]
+
     def get_frame(self, width, height):
         """
         Generate the current particle frame as a NumPy array.
@@ -156,4 +195,4 @@ class ParticleSimulation:
         self.frame_count += 1
         self.remove_inactive_players()
         self.emit_particles()
-        self.update_particles()
\ No newline at end of file
+        self.update_particles()
@@ -0,0 +1,33 @@
+"""
+CPU benchmark for ParticleSimulation (particle_simulation.py).
+Compares the original per-particle renderer and compacting particle pool with the vectorized renderer
+and ring-buffer pool, for max_particles from 200 to 50k, with single pixel particles on 8 panels and
+10 pixel particles on the 640x360 debug display. No WLED device needed.
+
+Usage: python tests/benchmark_particle_simulation.py
+"""
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from particle_simulation import ParticleSimulation
+from wled_helpers import LegacyParticleSimulation, run
+
+MAX_PARTICLES = [200, 1000, 5000, 20000, 50000]
+SETUPS = [(160, 20, 1), (640, 360, 10)]  # (width, height, particle size)
+
+
+def main():
+    print(f"{'screen':>8} {'size':>4} {'particles':>9} {'legacy ms':>10} {'numpy ms':>9} {'speedup':>8}")
+    for width, height, particle_size in SETUPS:
+        for max_particles in MAX_PARTICLES:
+            legacy_frames, legacy_ms = run(LegacyParticleSimulation, max_particles, width, height, particle_size)
+            frames, numpy_ms = run(ParticleSimulation, max_particles, width, height, particle_size)
+            assert all(np.array_equal(a, b) for a, b in zip(legacy_frames, frames)), "rendered frames differ"
+            print(f"{width}x{height:<4} {particle_size:>4} {max_particles:>9} {legacy_ms:>10.2f} {numpy_ms:>9.2f} {legacy_ms / numpy_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+CPU benchmark for the WLED DNRGB encoder (wled_display.DNRGBEncoder).
+Compares the original per-pixel encoder (image_to_led_data + convert_to_dnrgb_chunks) with the NumPy
+encoder for 1-8 panels of 20x20 LEDs, after checking that both produce the same packets byte for byte.
+No WLED device needed.
+
+Usage: python tests/benchmark_wled_encoder.py
+"""
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wled_display import DNRGBEncoder
+from wled_helpers import PANEL_HEIGHT, PANEL_WIDTH, legacy_encode
+
+ITERATIONS = 50
+
+
+def time_it(function, *args):
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        function(*args)
+    return (time.perf_counter() - start) / ITERATIONS * 1000
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'panels':>6} {'LEDs':>6} {'packets':>8} {'legacy ms':>10} {'numpy ms':>9} {'speedup':>8}")
+    for panels in range(1, 9):
+        frame = rng.integers(0, 256, (PANEL_HEIGHT, PANEL_WIDTH * panels, 3), dtype=np.uint8)
+        encoder = DNRGBEncoder(PANEL_WIDTH * panels, PANEL_HEIGHT, panels)
+        packets = [bytes(packet) for packet in encoder.encode(frame)]
+        assert packets == [bytes(packet) for packet in legacy_encode(frame, panels)], f"output differs for {panels} panels"
+        legacy_ms = time_it(legacy_encode, frame, panels)
+        numpy_ms = time_it(encoder.encode, frame)
+        print(f"{panels:>6} {PANEL_WIDTH * PANEL_HEIGHT * panels:>6} {len(packets):>8} {legacy_ms:>10.3f} {numpy_ms:>9.3f} {legacy_ms / numpy_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+End-to-end benchmark of the WLEDDisplay transports against a loopback UDP receiver standing in for WLED.
+A producer publishes frames faster than an emulated link can carry them (the display process sleeps for
+the airtime of every packet it sends). For each transport, prints how many frames reached the receiver,
+their latency from put_frame() to the arrival of their first packet, and the bytes per second sent.
+No WLED device needed.
+
+Usage: python tests/benchmark_wled_transport.py
+"""
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wled_display import WLEDDisplay
+from wled_helpers import LoopbackWLED
+
+PANELS = 8
+PANEL_SIZE = 20
+PRODUCER_FPS = 120
+DURATION = 3.0
+LINK_BYTES_PER_SECOND = 200_000  # A busy WiFi link to an ESP32
+
+
+class ThrottledWLEDDisplay(WLEDDisplay):
+    """Emulates a slow link by sleeping for the airtime of the bytes sent."""
+
+    def send_frame(self, frame, changed_only=False):
+        sent = super().send_frame(frame, changed_only)
+        time.sleep(sent / LINK_BYTES_PER_SECOND)
+        return sent
+
+
+def make_frames(count, height, width, rng):
+    """A static background with a moving sprite, frame id in the first LED (BGR, so red is channel 2)."""
+    background = rng.integers(0, 64, (height, width, 3), dtype=np.uint8)
+    frames = []
+    for i in range(count):
+        frame = background.copy()
+        x = (i * 2) % (width - 6)
+        frame[7:13, x:x + 6] = (0, 255, 255)
+        frame[0, 0] = (0, i & 0xFF, i >> 8)
+        frames.append(frame)
+    return frames
+
+
+def run(transport, frames, display_class=ThrottledWLEDDisplay):
+    receiver = LoopbackWLED(PANEL_SIZE * PANEL_SIZE * PANELS)
+    wled = display_class(ip='127.0.0.1', port=receiver.port, panel_width=PANEL_SIZE, panel_height=PANEL_SIZE,
+                         panels=PANELS, wled_enabled=True, transport=transport, show_debug=False)
+    put_times = {}
+    start = time.monotonic()
+    for i, frame in enumerate(frames):
+        time.sleep(max(0.0, start + i / PRODUCER_FPS - time.monotonic()))
+        put_times[i] = time.monotonic()
+        wled.put_frame(frame)
+    time.sleep(0.5)  # Let the last frames arrive
+    elapsed = time.monotonic() - start
+    wled.frame_queue.cancel_join_thread()  # The queue transport may still hold a backlog
+    wled.terminate()
+    receiver.close()
+    latencies = np.array([receiver.arrivals[i] - put_times[i] for i in receiver.arrivals if i in put_times]) * 1000
+    return receiver, latencies, elapsed
+
+
+def main():
+    rng = np.random.default_rng(0)
+    frames = make_frames(int(PRODUCER_FPS * DURATION), PANEL_SIZE, PANEL_SIZE * PANELS, rng)
+    print(f"{PANELS} panels, producer {PRODUCER_FPS} fps, link {LINK_BYTES_PER_SECOND / 1000:.0f} kB/s")
+    print(f"{'transport':>10} {'frames shown':>13} {'mean latency ms':>16} {'p95 latency ms':>15} {'max latency ms':>15} {'kB/s':>8}")
+    for transport in ('queue', 'latest'):
+        receiver, latencies, elapsed = run(transport, frames)
+        print(f"{transport:>10} {len(latencies):>6}/{len(frames):<6} {latencies.mean():>16.1f} {np.percentile(latencies, 95):>15.1f} "
+              f"{latencies.max():>15.1f} {receiver.bytes_received / elapsed / 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+from particle_simulation import ParticleSimulation
+from wled_helpers import LegacyParticleSimulation, run
+
+
+@pytest.mark.parametrize("width, height, particle_size", [(20, 20, 1), (40, 20, 3), (64, 36, 10)])
+def test_renders_like_legacy(width, height, particle_size):
+    legacy_frames, _ = run(LegacyParticleSimulation, 300, width, height, particle_size, frames=30)
+    frames, _ = run(ParticleSimulation, 300, width, height, particle_size, frames=30)
+    for legacy_frame, frame in zip(legacy_frames, frames):
+        np.testing.assert_array_equal(frame, legacy_frame)
+
+
+def test_ring_buffer_wraps_around():
+    simulation = ParticleSimulation(max_particles=15, particle_lifetime=3)
+    simulation.update_player_positions({0: (5, 5)})
+    simulation.update()
+    heads = set()
+    for _ in range(10):
+        simulation.update()
+        heads.add(simulation.head)
+        assert simulation.active_particles == 10  # The last two frames of 5 particles each
+        assert (simulation._active("lifetimes") == [1] * 5 + [2] * 5).all()
+    assert heads == {0, 5, 10}
+
+
+def test_full_pool_stops_emitting():
+    simulation = ParticleSimulation(max_particles=7, particle_lifetime=100)
+    simulation.update_player_positions({0: (5, 5), 1: (10, 10)})
+    simulation.update()
+    simulation.update()
+    assert simulation.active_particles == 7
+
+
+def test_newest_particle_wins_on_shared_pixels():
+    simulation = ParticleSimulation(screen_width=4, screen_height=4, max_particles=6, glitter_probability=0)
+    simulation.update_player_positions({0: (1, 1), 1: (1, 1)})
+    simulation.emit_particles()  # 5 particles of player 0, then 1 of player 1, all on pixel (1, 1)
+    frame = np.zeros((4, 4, 3), dtype=np.uint8)
+    simulation.draw_particles(frame)
+    assert tuple(frame[1, 1]) == simulation.color_schemes[1]["start"]
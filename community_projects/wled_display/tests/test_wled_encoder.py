@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+from wled_display import DNRGBEncoder
+from wled_helpers import legacy_encode
+
+
+@pytest.mark.parametrize("panels", [1, 2, 3, 8])
+def test_matches_legacy_encoder(panels):
+    frame = np.random.default_rng(panels).integers(0, 256, (20, 20 * panels, 3), dtype=np.uint8)
+    packets = DNRGBEncoder(20 * panels, 20, panels).encode(frame)
+    assert [bytes(packet) for packet in packets] == [bytes(packet) for packet in legacy_encode(frame, panels)]
+
+
+def test_multiple_chunks_per_panel():
+    # 32x32 panels do not fit in a single 489 LED packet
+    frame = np.random.default_rng(0).integers(0, 256, (32, 64, 3), dtype=np.uint8)
+    packets = DNRGBEncoder(64, 32, 2).encode(frame)
+    assert len(packets) == 6
+    assert [bytes(packet) for packet in packets] == [bytes(packet) for packet in legacy_encode(frame, 2, 32, 32)]
+
+
+def test_packets_are_reused():
+    encoder = DNRGBEncoder(4, 2)
+    first = encoder.encode(np.zeros((2, 4, 3), dtype=np.uint8))
+    frame = np.zeros((2, 4, 3), dtype=np.uint8)
+    frame[0, 1] = (1, 2, 3)  # BGR
+    second = encoder.encode(frame)
+    assert first[0] is second[0]
+    assert bytes(second[0][:4]) == bytes([4, 1, 0, 0])
+    assert bytes(second[0][7:10]) == bytes([3, 2, 1])
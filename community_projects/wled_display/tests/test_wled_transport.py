@@ -0,0 +1,60 @@
+import time
+import numpy as np
+import pytest
+from wled_display import DNRGBEncoder, WLEDDisplay
+from wled_helpers import LoopbackWLED
+
+
+def test_changed_only_returns_changed_packets():
+    encoder = DNRGBEncoder(32, 32, 2)  # 512 LEDs per panel, 2 packets each
+    frame = np.zeros((32, 32, 3), dtype=np.uint8)
+    assert len(encoder.encode(frame, changed_only=True)) == 0
+    frame[31, 31] = 255  # Last LED, last packet
+    changed = encoder.encode(frame, changed_only=True)
+    assert changed == [encoder.packets[-1]]
+    assert encoder.encode(frame, changed_only=True) == []
+    assert len(encoder.encode(frame)) == 4
+
+
+@pytest.mark.parametrize("transport", ["latest", "queue"])
+def test_frames_reach_the_receiver(transport):
+    receiver = LoopbackWLED(2 * 20 * 20)
+    wled = WLEDDisplay(ip='127.0.0.1', port=receiver.port, panels=2, wled_enabled=True,
+                       transport=transport, show_debug=False)
+    try:
+        rng = np.random.default_rng(0)
+        for _ in range(5):
+            frame = rng.integers(0, 256, (20, 40, 3), dtype=np.uint8)
+            wled.put_frame(frame)
+            time.sleep(0.02)
+        expected = frame[:, :, ::-1].reshape(-1, 3)
+        deadline = time.monotonic() + 2
+        while not np.array_equal(receiver.leds, expected) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert np.array_equal(receiver.leds, expected)
+    finally:
+        wled.terminate()
+        receiver.close()
+
+
+def test_queue_is_the_default_transport():
+    wled = WLEDDisplay(wled_enabled=False, show_debug=False)
+    try:
+        assert wled.transport == 'queue'
+    finally:
+        wled.terminate()
+
+
+def test_latest_transport_skips_unchanged_packets():
+    receiver = LoopbackWLED(20 * 20)
+    wled = WLEDDisplay(ip='127.0.0.1', port=receiver.port, wled_enabled=True, show_debug=False,
+                       transport='latest', keyframe_interval=60)
+    try:
+        frame = np.zeros((20, 20, 3), dtype=np.uint8)
+        for _ in range(5):
+            wled.put_frame(frame)
+            time.sleep(0.05)
+        assert receiver.packets_received == 1  # Only the first (key) frame
+    finally:
+        wled.terminate()
+        receiver.close()
@@ -0,0 +1,184 @@
+"""
+Fixtures for the wled_display tests: LegacyParticleSimulation and legacy_encode are the per-pixel renderer
+and DNRGB packet builder the vectorized ones are checked against, run() drives a simulation with moving
+players, and LoopbackWLED receives the UDP packets of a WLEDDisplay on localhost.
+"""
+import os
+import socket
+import sys
+import threading
+import time
+import numpy as np
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from particle_simulation import ParticleSimulation
+
+FRAMES = 20
+PANEL_WIDTH = 20
+PANEL_HEIGHT = 20
+PROTOCOL = 4
+TIMEOUT = 1
+
+
+class LegacyParticleSimulation(ParticleSimulation):
+    """The original particle pool (compacted every frame) and per-particle renderer."""
+
+    def emit_particles(self):
+        for player_id, player in self.players.items():
+            if self.active_particles >= self.MAX_PARTICLES:
+                break
+            count = min(self.MAX_PARTICLES - self.active_particles, 5)  # Emit up to 5 particles per player
+            indices = np.arange(self.active_particles, self.active_particles + count)
+            self.particles["positions"][indices] = player["position"]
+            random_velocity = np.random.uniform(-1, 1, (count, 2))
+            self.particles["velocities"][indices] = player["velocity"] * 0.1 + random_velocity * 0.5
+            self.particles["lifetimes"][indices] = self.PARTICLE_LIFETIME
+            self.particles["start_colors"][indices] = self.color_schemes[player_id]["start"]
+            self.particles["end_colors"][indices] = self.color_schemes[player_id]["end"]
+            self.active_particles += count
+
+    def update_particles(self):
+        if self.active_particles == 0:
+            return
+
+        positions = self.particles["positions"][:self.active_particles]
+        velocities = self.particles["velocities"][:self.active_particles]
+        lifetimes = self.particles["lifetimes"][:self.active_particles]
+        start_colors = self.particles["start_colors"][:self.active_particles]
+        end_colors = self.particles["end_colors"][:self.active_particles]
+
+        velocities *= self.PARTICLE_SPEED_DECAY
+        positions += velocities
+        lifetimes -= 1
+
+        alive = lifetimes > 0
+        self.active_particles = np.sum(alive)
+        self.particles["positions"][:self.active_particles] = positions[alive]
+        self.particles["velocities"][:self.active_particles] = velocities[alive]
+        self.particles["lifetimes"][:self.active_particles] = lifetimes[alive]
+        self.particles["start_colors"][:self.active_particles] = start_colors[alive]
+        self.particles["end_colors"][:self.active_particles] = end_colors[alive]
+
+    def draw_particles(self, frame):
+        for i in range(self.active_particles):
+            x, y = self.particles["positions"][i]
+            if np.random.random() < self.GLITTER_PROBABILITY:
+                color = (255, 255, 255)  # Glitter: Bright white
+            else:
+                start_color = self.particles["start_colors"][i]
+                end_color = self.particles["end_colors"][i]
+                fraction = 1 - (self.particles["lifetimes"][i] / self.PARTICLE_LIFETIME)
+                color = start_color + (end_color - start_color) * fraction
+                color = tuple(map(int, color))  # Convert to tuple of integers
+
+            if 0 <= int(x) < frame.shape[1] and 0 <= int(y) < frame.shape[0]:
+                if self.PARTICLE_SIZE > 1:
+                    top_left = (int(x) - self.PARTICLE_SIZE // 2, int(y) - self.PARTICLE_SIZE // 2)
+                    bottom_right = (int(x) + self.PARTICLE_SIZE // 2, int(y) + self.PARTICLE_SIZE // 2)
+                    cv2.rectangle(frame, top_left, bottom_right, color, -1)
+                else:
+                    frame[int(y), int(x)] = color  # Draw particle as a single pixel
+
+
+def player_positions(frame_number, players, width, height):
+    """Hands moving on circles, enough players to keep the particle pool full."""
+    angles = frame_number * 0.1 + np.arange(players)
+    return {player_id: (width / 2 + np.cos(angle) * width / 3, height / 2 + np.sin(angle) * height / 3)
+            for player_id, angle in enumerate(angles)}
+
+
+def run(simulation_class, max_particles, width, height, particle_size, frames=FRAMES, seed=0):
+    """Run the simulation, returns the rendered frames and the mean update + draw time in ms."""
+    np.random.seed(seed)
+    simulation = simulation_class(screen_width=width, screen_height=height, max_particles=max_particles,
+                                  particle_size=particle_size, glitter_probability=0.05)
+    # 5 particles per player and frame, living 10 frames
+    players = max(1, max_particles // 50)
+    rendered, elapsed = [], 0.0
+    for frame_number in range(frames):
+        simulation.update_player_positions(player_positions(frame_number, players, width, height))
+        start = time.perf_counter()
+        simulation.update()
+        frame = np.zeros((height, width, 3), dtype=np.uint8)
+        simulation.draw_particles(frame)
+        elapsed += time.perf_counter() - start
+        rendered.append(frame)
+    return rendered, elapsed / frames * 1000
+
+
+def legacy_image_to_led_data(image, width, height):
+    led_data = []
+    for y in range(height):
+        for x in range(width):
+            color = image[y, x]
+            led_data.append((color[0], color[1], color[2]))
+    return led_data
+
+
+def legacy_convert_to_dnrgb_chunks(colors, panels, num_leds_per_panel, chunk_size=489):
+    chunks = []
+    for panel in range(panels):
+        start_led = panel * num_leds_per_panel
+        end_led = start_led + num_leds_per_panel
+        panel_colors = colors[start_led:end_led]
+        for start in range(0, num_leds_per_panel, chunk_size):
+            chunk = panel_colors[start:start + chunk_size]
+            data = bytearray([PROTOCOL, TIMEOUT])
+            data.append(((start + start_led) >> 8) & 0xFF)
+            data.append((start + start_led) & 0xFF)
+            for color in chunk:
+                data += bytearray([color[2], color[1], color[0]])  # Convert to RGB
+            chunks.append(data)
+    return chunks
+
+
+def legacy_encode(frame, panels, panel_width=PANEL_WIDTH, panel_height=PANEL_HEIGHT, chunk_size=489):
+    width = panel_width * panels
+    led_data = legacy_image_to_led_data(frame, width, panel_height)
+    return legacy_convert_to_dnrgb_chunks(led_data, panels, panel_width * panel_height, chunk_size)
+
+
+class LoopbackWLED:
+    """
+    Minimal WLED stand-in: receives DNRGB packets on 127.0.0.1 and decodes them into an LED buffer.
+    The first LED of a frame carries its frame id (red * 256 + green), the arrival time of the packet
+    holding it is recorded per frame id.
+    """
+
+    def __init__(self, num_leds):
+        self.leds = np.zeros((num_leds, 3), dtype=np.uint8)
+        self.arrivals = {}
+        self.bytes_received = 0
+        self.packets_received = 0
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.settimeout(0.1)
+        self.port = self.sock.getsockname()[1]
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                packet = self.sock.recv(2048)
+            except socket.timeout:
+                continue
+            now = time.monotonic()
+            if len(packet) < 4 or packet[0] != 4:
+                continue  # Connection test or another protocol
+            self.bytes_received += len(packet)
+            self.packets_received += 1
+            start = (packet[2] << 8) | packet[3]
+            pixels = np.frombuffer(packet, dtype=np.uint8, offset=4).reshape(-1, 3)
+            self.leds[start:start + len(pixels)] = pixels
+            if start == 0:
+                self.arrivals.setdefault(int(pixels[0, 0]) * 256 + int(pixels[0, 1]), now)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        self.sock.close()
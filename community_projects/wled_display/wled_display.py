@@ -1,9 +1,17 @@
+import os
+import queue
 import socket
+import sys
 import time
 import cv2
 import numpy as np
 from multiprocessing import Process, Queue, Event
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'basic_pipelines'))
+from frame_sink import SharedFrameRing
+
+WLED_TRANSPORTS = ('queue', 'latest')
+
 # Centralized default values
 WLED_DEFAULTS = {
     'wled_enabled': True,
@@ -11,7 +19,8 @@ WLED_DEFAULTS = {
     'wled_panel_height': 20,
     'wled_ip': '4.3.2.1',
     'wled_port': 21324,
-    'wled_panels': 1
+    'wled_panels': 1,
+    'wled_transport': 'queue',
 }
 
 def add_parser_args(parser):
@@ -24,6 +33,54 @@ def add_parser_args(parser):
     wled_group.add_argument('--wled-ip', type=str, default=WLED_DEFAULTS['wled_ip'], help='WLED IP address')
     wled_group.add_argument('--wled-port', type=int, default=WLED_DEFAULTS['wled_port'], help='WLED port')
     wled_group.add_argument('--wled-panels', type=int, default=WLED_DEFAULTS['wled_panels'], help='Number of WLED panels')
+    wled_group.add_argument('--wled-transport', choices=WLED_TRANSPORTS, default=WLED_DEFAULTS['wled_transport'],
+                            help='queue: send every frame (default), latest: send only the newest frame and only the packets that changed')
+
+class DNRGBEncoder:
+    """
+    Encode frames into WLED DNRGB UDP packets.
+
+    The frame is flattened row by row into LED indexes, split into panels of width * height / panels
+    LEDs and each panel into chunks of up to chunk_size LEDs. Every chunk is a preallocated bytearray
+    holding the header (protocol, timeout, 16-bit start index), which is written once, followed by the
+    RGB payload. encode() only copies the channel-swapped pixels into the payloads, so the returned
+    packets are reused and must be sent before the next call.
+    """
+
+    def __init__(self, width, height, panels=1, chunk_size=489, protocol=4, timeout=1):
+        self.width = width
+        self.height = height
+        self.num_leds_per_panel = width * height // panels
+        self.packets = []
+        self._payloads = []  # (first LED, last LED, uint8 (n, 3) view of the packet payload)
+        for panel in range(panels):
+            start_led = panel * self.num_leds_per_panel
+            for start in range(0, self.num_leds_per_panel, chunk_size):
+                count = min(chunk_size, self.num_leds_per_panel - start)
+                index = (start_led + start) & 0xFFFF
+                packet = bytearray(4 + 3 * count)
+                packet[:4] = bytes([protocol, timeout, index >> 8, index & 0xFF])
+                self.packets.append(packet)
+                payload = np.frombuffer(memoryview(packet)[4:], dtype=np.uint8).reshape(count, 3)
+                self._payloads.append((start_led + start, start_led + start + count, payload))
+
+    def encode(self, frame, changed_only=False):
+        """
+        Encode a (height, width, 3) BGR frame, returns the list of packets (as sent by WLED in RGB order).
+        With changed_only, only the packets whose pixels differ from the previous frame are returned.
+        """
+        leds = np.asarray(frame[:self.height, :self.width, ::-1], dtype=np.uint8).reshape(-1, 3)  # RGB view
+        if not changed_only:
+            for start, end, payload in self._payloads:
+                np.copyto(payload, leds[start:end])
+            return self.packets
+        changed = []
+        for packet, (start, end, payload) in zip(self.packets, self._payloads):
+            if not np.array_equal(payload, leds[start:end]):
+                np.copyto(payload, leds[start:end])
+                changed.append(packet)
+        return changed
+
 
 class WLEDDisplay:
     """
@@ -34,6 +91,12 @@ class WLEDDisplay:
     - Send frame data via UDP to WLED devices
     - Display debug visualization
     - Handle frame processing in a separate process
+
+    Frames are handed to the display process with put_frame(). The default 'queue' transport sends every
+    frame through frame_queue, which grows without bound if frames are produced faster than they are sent.
+    With the 'latest' transport they go through a shared-memory slot where the newest frame wins, the
+    display process sleeps until a frame is published and only sends the packets that changed (all of
+    them every keyframe_interval seconds, so WLED does not time out and lost packets are repaired).
     """
 
     def __init__(
@@ -45,6 +108,9 @@ class WLEDDisplay:
             panels=None,
             wled_enabled=None,
             parser=None,
+            transport=None,
+            keyframe_interval=0.5,
+            show_debug=True,
     ):
         """
         Initialize the WLED display controller.
@@ -57,6 +123,9 @@ class WLEDDisplay:
             panels (int): Number of LED panels to control (default: 1)
             wled_enabled (bool): Enable/disable WLED output (default: True)
             parser (argparse.ArgumentParser): Argument parser to use for configuration
+            transport (str): 'queue' (default) or 'latest', see the class description
+            keyframe_interval (float): Seconds between full frames with the 'latest' transport
+            show_debug (bool): Show the debug window (default: True)
         """
         self.PROTOCOL = 4
         self.TIMEOUT = 1
@@ -91,6 +160,11 @@ class WLEDDisplay:
         self.ip = ip if ip is not None else options.get('wled_ip', WLED_DEFAULTS['wled_ip'])
         self.port = port if port is not None else options.get('wled_port', WLED_DEFAULTS['wled_port'])
         self.panels = panels if panels is not None else options.get('wled_panels', WLED_DEFAULTS['wled_panels'])
+        self.transport = transport if transport is not None else options.get('wled_transport', WLED_DEFAULTS['wled_transport'])
+        if self.transport not in WLED_TRANSPORTS:
+            raise ValueError(f"transport must be one of {WLED_TRANSPORTS}, got {self.transport!r}")
+        self.keyframe_interval = keyframe_interval
+        self.show_debug = show_debug
 
         # Derived properties
         self.num_leds_per_panel = self.panel_width * self.panel_height
@@ -98,8 +172,10 @@ class WLEDDisplay:
         self.width = self.panel_width * self.panels
         self.height = self.panel_height
 
-        # Initialize frame queue
+        # Initialize frame queue and the shared-memory frame slot
         self.frame_queue = Queue()
+        self.frame_ring = SharedFrameRing()
+        self.encoder = DNRGBEncoder(self.width, self.height, self.panels, protocol=self.PROTOCOL, timeout=self.TIMEOUT)
 
         # Initialize UDP socket with mDNS support
         if self.wled_enabled:
@@ -142,78 +218,54 @@ class WLEDDisplay:
                     pattern[y, x + panel * self.panel_width] = color
         return pattern
 
-    def image_to_led_data(self, image):
+    def put_frame(self, frame):
         """
-        Convert an image array to LED data format.
-
-        Transforms a numpy image array into a list of RGB tuples suitable
-        for LED control.
+        Hand a frame to the display process using the configured transport.
 
         Args:
-            image (numpy.ndarray): Input image of shape (height, width, 3)
-
-        Returns:
-            list: List of RGB tuples [(r,g,b), ...] for each LED
+            frame (numpy.ndarray): BGR image array of shape (height, width, 3)
         """
-        led_data = []
-        for y in range(self.height):
-            for x in range(self.width):
-                color = image[y, x]
-                led_data.append((color[0], color[1], color[2]))
-        return led_data
-
-    def convert_to_dnrgb_chunks(self, colors, chunk_size=489):
-        """
-        Convert RGB colors to WLED UDP protocol chunks.
-
-        Splits the LED data into manageable chunks and formats them according
-        to the WLED UDP protocol specification.
-
-        Args:
-            colors (list): List of RGB tuples [(r,g,b), ...]
-            chunk_size (int): Maximum number of LEDs per chunk (default: 489)
-
-        Returns:
-            list: List of bytearray chunks formatted for WLED UDP protocol
-        """
-        chunks = []
-        for panel in range(self.panels):
-            start_led = panel * self.num_leds_per_panel
-            end_led = start_led + self.num_leds_per_panel
-            panel_colors = colors[start_led:end_led]
-            for start in range(0, self.num_leds_per_panel, chunk_size):
-                chunk = panel_colors[start:start + chunk_size]
-                data = bytearray([self.PROTOCOL, self.TIMEOUT])
-                data.append(((start + start_led) >> 8) & 0xFF)
-                data.append((start + start_led) & 0xFF)
-                for color in chunk:
-                    data += bytearray([color[2], color[1], color[0]]) # Convert to RGB
-                chunks.append(data)
-        return chunks
+        if self.transport == 'latest':
+            self.frame_ring.publish(frame)
+        else:
+            self.frame_queue.put(frame)
 
     def run(self):
         """
         Main display loop running in a separate process.
 
-        Continuously monitors the frame queue and sends new frames to the
-        LED display when available. This method is automatically started
-        by the process created in __init__.
+        Waits for new frames and sends them to the LED display when available.
+        This method is automatically started by the process created in __init__.
         """
         try:
+            last_keyframe = 0
             while not self.stop_event.is_set():  # Check stop flag
-                if not self.frame_queue.empty():
-                    frame = self.frame_queue.get()
-                    self.send_frame(frame)
+                if self.transport == 'latest':
+                    # Wake up on a new frame, or periodically to check the stop flag
+                    if not self.frame_ring.wait(timeout=0.1):
+                        continue
+                    _, frame = self.frame_ring.read()
+                    if frame is None:
+                        continue
+                    keyframe = time.monotonic() - last_keyframe >= self.keyframe_interval
+                    if keyframe:
+                        last_keyframe = time.monotonic()
+                    self.send_frame(frame, changed_only=not keyframe)
                 else:
-                    time.sleep(0.01)  # Add a short sleep to prevent busy-waiting
+                    try:
+                        frame = self.frame_queue.get(timeout=0.1)
+                    except queue.Empty:
+                        continue
+                    self.send_frame(frame)
         except Exception as e:
             print(f"An error occurred in the display process: {e}")
         finally:
             if hasattr(self, 'sock') and self.sock:
                 self.sock.close()
-            cv2.destroyAllWindows()
+            if self.show_debug:
+                cv2.destroyAllWindows()
 
-    def send_frame(self, frame):
+    def send_frame(self, frame, changed_only=False):
         """
         Send a frame to the LED display.
 
@@ -222,22 +274,28 @@ class WLEDDisplay:
 
         Args:
             frame (numpy.ndarray): RGB image array of shape (height, width, 3)
+            changed_only (bool): Only send the packets that changed since the previous frame
+
+        Returns:
+            int: Number of bytes sent
         """
+        sent = 0
         # Send LED data via UDP if enabled
         if self.wled_enabled and self.sock:
             # Convert to LED data
-            led_data = self.image_to_led_data(frame)
-            data_chunks = self.convert_to_dnrgb_chunks(led_data)
-            for chunk in data_chunks:
-                self.sock.sendto(chunk, (self.ip, self.port))
+            for chunk in self.encoder.encode(frame, changed_only):
+                sent += self.sock.sendto(chunk, (self.ip, self.port))
 
-        # Always display the frame
+        if not self.show_debug:
+            return sent
+        # Display the frame
         duplicate_pixels = 10 if self.wled_enabled else 1 # Duplicate pixels for better visibility
         debug_display = cv2.resize(frame,
                                    (self.width * duplicate_pixels, self.height * duplicate_pixels),
                                    interpolation=cv2.INTER_NEAREST)
         cv2.imshow("Debug Display", debug_display)
         cv2.waitKey(1)  # Prevent window from freezing
+        return sent
 
     def terminate(self):
         """Gracefully stop the display process"""
@@ -274,8 +332,8 @@ if __name__ == "__main__":
             # Generate debug pattern
             debug_frame = wled.create_debug_pattern(frame_number)
 
-            # Enqueue the frame for the display process
-            wled.frame_queue.put(debug_frame)
+            # Hand the frame to the display process
+            wled.put_frame(debug_frame)
 
             frame_number += 1
             time.sleep(1 / 30)  # 30 FPS
@@ -125,7 +125,7 @@ def app_callback(pad, info, user_data):
 
     # Resize the frame to the WLED size for display
     final_frame = cv2.resize(reduced_frame, (user_data.wled.width, user_data.wled.height))
-    user_data.wled.frame_queue.put(final_frame)
+    user_data.wled.put_frame(final_frame)
 
     print(string_to_print)
     return Gst.PadProbeReturn.OK
@@ -58,7 +58,7 @@ def app_callback(pad, info, user_data):
     frame = user_data.particle_simulation.get_frame(
         user_data.wled.width, user_data.wled.height
     )
-    user_data.wled.frame_queue.put(frame)
+    user_data.wled.put_frame(frame)
 
     return Gst.PadProbeReturn.OK
 
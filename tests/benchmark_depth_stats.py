@@ -0,0 +1,51 @@
+"""
+CPU benchmark for basic_pipelines/depth_stats.py.
+Compares the original calculate_average_depth (list -> np.array -> np.percentile) with the
+np.partition based trimmed mean, with and without subsampling, on synthetic depth maps.
+No Hailo device needed.
+
+Usage: python tests/benchmark_depth_stats.py
+"""
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'basic_pipelines'))
+
+from depth_stats import TrackDepthEstimator, trimmed_mean_depth
+from pipeline_helpers import SyntheticDepthMask, legacy_average_depth, synthetic_depth_map
+
+ITERATIONS = 50
+SIZES = [(64, 64), (128, 160), (256, 320)]  # scdepthv3 outputs 256x320
+
+
+def time_it(function, *args):
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        result = function(*args)
+    return (time.perf_counter() - start) / ITERATIONS * 1000, result
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'size':>8} {'input':>6} {'legacy ms':>10} {'partition ms':>13} {'4096 samples ms':>16} {'sampled error %':>16}")
+    for height, width in SIZES:
+        depth_map = synthetic_depth_map(height, width, rng)
+        for name, data in [("list", depth_map.ravel().tolist()), ("array", depth_map)]:
+            legacy_ms, exact = time_it(legacy_average_depth, data)
+            partition_ms, _ = time_it(trimmed_mean_depth, data)
+            sampled_ms, sampled = time_it(trimmed_mean_depth, data, 95, 4096)
+            error = abs(sampled - exact) / exact * 100
+            print(f"{height}x{width:<4} {name:>6} {legacy_ms:>10.3f} {partition_ms:>13.3f} {sampled_ms:>16.3f} {error:>16.3f}")
+
+    # 10 tracked detections per frame, refreshed every 3rd frame
+    masks = [SyntheticDepthMask(synthetic_depth_map(96, 64, rng).ravel().tolist()) for _ in range(10)]
+    estimator = TrackDepthEstimator(refresh_interval=3)
+    legacy_ms, _ = time_it(lambda: [legacy_average_depth(mask.get_data()) for mask in masks])
+    tracked_ms, _ = time_it(lambda: [estimator.average_depth(mask, track_id + 1) for track_id, mask in enumerate(masks)])
+    print(f"\n10 tracked crops per frame: legacy {legacy_ms:.3f} ms, TrackDepthEstimator {tracked_ms:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+CPU benchmark for basic_pipelines/detection_snapshot.py.
+Compares the per-object getter loop used in the callbacks with DetectionSnapshot plus vectorized
+filters, using the fake ROI stand-ins (no Hailo device needed). The fake getters are plain Python
+calls, so the numbers are a lower bound of the cost of the real pybind crossings.
+
+Usage: python tests/benchmark_detection_snapshot.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'basic_pipelines'))
+
+from detection_snapshot import DetectionSnapshot, HAILO_DETECTION, HAILO_UNIQUE_ID
+from fake_roi import make_fake_roi
+
+ITERATIONS = 500
+
+
+def legacy_filter(roi):
+    """Confident persons in the left half of the frame, the way the callbacks walk the ROI."""
+    selected = []
+    for detection in roi.get_objects_typed(HAILO_DETECTION):
+        label = detection.get_label()
+        bbox = detection.get_bbox()
+        confidence = detection.get_confidence()
+        if label == "person" and confidence >= 0.5:
+            center_x = bbox.xmin() + bbox.width() / 2
+            if center_x <= 0.5:
+                track_id = 0
+                track = detection.get_objects_typed(HAILO_UNIQUE_ID)
+                if len(track) == 1:
+                    track_id = track[0].get_id()
+                selected.append((track_id, confidence))
+    return selected
+
+
+def snapshot_filter(roi):
+    snapshot = DetectionSnapshot.from_roi(roi, labels=("person",))
+    snapshot = snapshot.filter_by_confidence(0.5).filter_by_region(0, 0, 0.5, 1)
+    return list(zip(snapshot.track_ids, snapshot.scores))
+
+
+def time_it(function, roi):
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        function(roi)
+    return (time.perf_counter() - start) / ITERATIONS * 1e6
+
+
+def main():
+    print(f"{'detections':>10} {'legacy us':>10} {'snapshot us':>12} {'snapshot + 3 more filters us':>29}")
+    for count in [5, 20, 50, 100, 200]:
+        roi = make_fake_roi(count)
+        legacy_us = time_it(legacy_filter, roi)
+        snapshot_us = time_it(snapshot_filter, roi)
+        # Once taken, more queries on the same frame cost only NumPy work
+        snapshot = DetectionSnapshot.from_roi(roi)
+        start = time.perf_counter()
+        for _ in range(ITERATIONS):
+            snapshot.filter_by_label("car").filter_by_confidence(0.3).filter_by_region(0.25, 0.25, 0.75, 0.75)
+        queries_us = (time.perf_counter() - start) / ITERATIONS * 1e6
+        print(f"{count:>10} {legacy_us:>10.1f} {snapshot_us:>12.1f} {snapshot_us + queries_us:>29.1f}")
+
+
+if __name__ == "__main__":
+    main()
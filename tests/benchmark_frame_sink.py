@@ -0,0 +1,115 @@
+"""
+CPU benchmark for basic_pipelines/frame_sink.py.
+Compares the default frame handoff (cv2.cvtColor + multiprocessing.Queue to the display process)
+with the shared-memory SharedFrameRing at 720p and 1080p. No Hailo device needed.
+
+Full-frame passes per frame:
+    queue: cvtColor output + pickle into the pipe + unpickle in the display process = 3
+    ring:  cvtColor written straight into a shared slot = 1
+
+Usage: python tests/benchmark_frame_sink.py
+"""
+import multiprocessing
+import os
+import queue
+import sys
+import time
+import numpy as np
+import cv2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'basic_pipelines'))
+
+from frame_sink import SharedFrameRing
+
+FRAMES = 60
+FPS = 30
+RESOLUTIONS = {"720p": (720, 1280), "1080p": (1080, 1920)}
+
+
+def stamp(frame):
+    frame.reshape(-1)[:8].view(np.float64)[0] = time.perf_counter()
+
+
+def read_stamp(frame):
+    return frame.reshape(-1)[:8].view(np.float64)[0]
+
+
+def queue_consumer(frame_queue, results):
+    latencies = []
+    while True:
+        frame = frame_queue.get()
+        if frame is None:
+            break
+        latencies.append(time.perf_counter() - read_stamp(frame))
+    results.put(latencies)
+
+
+def ring_consumer(ring, running, results):
+    latencies = []
+    while running.value:
+        _, frame = ring.read()
+        if frame is None:
+            time.sleep(0.001)
+            continue
+        latencies.append(time.perf_counter() - read_stamp(frame))
+    results.put(latencies)
+
+
+def run_queue(source):
+    frame_queue = multiprocessing.Queue(maxsize=3)
+    results = multiprocessing.Queue()
+    consumer = multiprocessing.Process(target=queue_consumer, args=(frame_queue, results))
+    consumer.start()
+    producer_time, dropped = 0.0, 0
+    for _ in range(FRAMES):
+        start = time.perf_counter()
+        frame = cv2.cvtColor(source, cv2.COLOR_RGB2BGR)
+        stamp(frame)
+        # Same policy as app_callback_class.set_frame: drop when the queue is full
+        try:
+            frame_queue.put_nowait(frame)
+        except queue.Full:
+            dropped += 1
+        producer_time += time.perf_counter() - start
+        time.sleep(max(0.0, 1 / FPS - (time.perf_counter() - start)))
+    frame_queue.put(None)
+    latencies = results.get()
+    consumer.join()
+    return producer_time / FRAMES, latencies, dropped
+
+
+def run_ring(source):
+    ring = SharedFrameRing()
+    running = multiprocessing.Value('b', True)
+    results = multiprocessing.Queue()
+    consumer = multiprocessing.Process(target=ring_consumer, args=(ring, running, results))
+    consumer.start()
+    producer_time = 0.0
+    for _ in range(FRAMES):
+        start = time.perf_counter()
+        frame = ring.write_bgr(source)
+        stamp(frame)
+        ring.publish(frame)
+        producer_time += time.perf_counter() - start
+        time.sleep(max(0.0, 1 / FPS - (time.perf_counter() - start)))
+    time.sleep(0.1)
+    running.value = False
+    latencies = results.get()
+    consumer.join()
+    dropped = ring.get_dropped()
+    ring.close()
+    return producer_time / FRAMES, latencies, dropped
+
+
+def main():
+    print(f"{'resolution':>10} {'path':>6} {'copies':>7} {'producer ms':>12} {'latency ms (p50/p95)':>22} {'received':>9} {'dropped':>8}")
+    for name, (height, width) in RESOLUTIONS.items():
+        source = np.random.default_rng(0).integers(0, 255, (height, width, 3), dtype=np.uint8)
+        for path, copies, runner in [("queue", 3, run_queue), ("ring", 1, run_ring)]:
+            producer_s, latencies, dropped = runner(source)
+            p50, p95 = np.percentile(np.array(latencies) * 1000, [50, 95])
+            print(f"{name:>10} {path:>6} {copies:>7} {producer_s * 1000:>12.3f} {p50:>10.3f} / {p95:<9.3f} {len(latencies):>9} {dropped:>8}")
+
+
+if __name__ == "__main__":
+    main()
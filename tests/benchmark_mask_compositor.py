@@ -0,0 +1,49 @@
+"""
+CPU benchmark for basic_pipelines/mask_compositor.py.
+Feeds synthetic instance masks (no Hailo device needed) and compares the original per-person
+full-frame blend with the single-pass MaskCompositor.
+
+Usage: python tests/benchmark_mask_compositor.py
+"""
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'basic_pipelines'))
+
+from mask_compositor import MaskCompositor
+from pipeline_helpers import MASK_SIZE, legacy_composite, make_instances
+
+ITERATIONS = 50
+
+
+def compositor_composite(compositor, frame, instances):
+    compositor.begin(frame)
+    for data, bbox, track_id in instances:
+        compositor.add_mask(data, MASK_SIZE, MASK_SIZE, bbox, track_id)
+    return compositor.composite(frame)
+
+
+def time_it(function):
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        function()
+    return (time.perf_counter() - start) / ITERATIONS * 1000
+
+
+def main():
+    rng = np.random.default_rng(0)
+    compositor = MaskCompositor()
+    print(f"{'resolution':>12} {'persons':>8} {'legacy ms':>10} {'compositor ms':>14} {'speedup':>8}")
+    for width, height in [(320, 180), (640, 360), (1280, 720)]:
+        frame = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+        for persons in [1, 5, 10, 20]:
+            instances = make_instances(persons, rng)
+            legacy_ms = time_it(lambda: legacy_composite(frame.copy(), instances))
+            compositor_ms = time_it(lambda: compositor_composite(compositor, frame.copy(), instances))
+            print(f"{width}x{height:<7} {persons:>8} {legacy_ms:>10.3f} {compositor_ms:>14.3f} {legacy_ms / compositor_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+CPU benchmark for basic_pipelines/pose_geometry.py.
+Compares the per-point keypoint projection loop used in the pose callbacks with PoseBatch for
+1-30 persons x 17 keypoints, using the fake ROI stand-ins (no Hailo device needed).
+'projection only' isolates the geometry: the per-point loop vs project_keypoints on arrays
+that were already read.
+
+Usage: python tests/benchmark_pose_geometry.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'basic_pipelines'))
+
+from detection_snapshot import DetectionSnapshot
+from fake_roi import make_fake_roi
+from pose_geometry import PoseBatch, project_keypoints
+from pipeline_helpers import HEIGHT, WIDTH, legacy_projection
+
+ITERATIONS = 200
+
+
+def batch_projection(roi):
+    return PoseBatch.from_roi(roi, WIDTH, HEIGHT).to_int()
+
+
+def legacy_projection_only(boxes, landmarks):
+    return [[(int((x * (box[2] - box[0]) + box[0]) * WIDTH), int((y * (box[3] - box[1]) + box[1]) * HEIGHT))
+             for x, y, _ in person] for box, person in zip(boxes.tolist(), landmarks.tolist())]
+
+
+def time_it(function, *args):
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        function(*args)
+    return (time.perf_counter() - start) / ITERATIONS * 1e6
+
+
+def main():
+    print(f"{'persons':>8} {'loop us':>9} {'PoseBatch us':>13} {'projection only: loop us':>25} {'vectorized us':>14}")
+    for persons in [1, 2, 5, 10, 20, 30]:
+        roi = make_fake_roi(persons, labels=("person",), num_keypoints=17)
+        snapshot = DetectionSnapshot.from_roi(roi, with_landmarks=True)
+        print(f"{persons:>8} {time_it(legacy_projection, roi):>9.1f} {time_it(batch_projection, roi):>13.1f} "
+              f"{time_it(legacy_projection_only, snapshot.boxes, snapshot.landmarks):>25.1f} "
+              f"{time_it(project_keypoints, snapshot.landmarks, snapshot.boxes, WIDTH, HEIGHT):>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
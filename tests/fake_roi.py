@@ -0,0 +1,118 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'basic_pipelines'))
+
+from detection_snapshot import HAILO_DETECTION, HAILO_UNIQUE_ID, HAILO_LANDMARKS
+
+# -----------------------------------------------------------------------------------------------
+# Fake ROI stand-ins
+# -----------------------------------------------------------------------------------------------
+# Minimal pure-Python objects exposing the same getters as the hailo bindings used by the callbacks
+# (get_objects_typed, get_bbox, get_label, ...). They allow unit testing and benchmarking callback
+# helpers such as DetectionSnapshot on a machine without the hailo runtime.
+class FakeBBox:
+    def __init__(self, xmin, ymin, width, height):
+        self._xmin, self._ymin, self._width, self._height = xmin, ymin, width, height
+
+    def xmin(self):
+        return self._xmin
+
+    def ymin(self):
+        return self._ymin
+
+    def width(self):
+        return self._width
+
+    def height(self):
+        return self._height
+
+
+class FakePoint:
+    def __init__(self, x, y, confidence=1.0):
+        self._x, self._y, self._confidence = x, y, confidence
+
+    def x(self):
+        return self._x
+
+    def y(self):
+        return self._y
+
+    def confidence(self):
+        return self._confidence
+
+
+class FakeUniqueID:
+    def __init__(self, track_id):
+        self._id = track_id
+
+    def get_id(self):
+        return self._id
+
+
+class FakeLandmarks:
+    def __init__(self, points):
+        self._points = points
+
+    def get_points(self):
+        return self._points
+
+
+class FakeObjectContainer:
+    def __init__(self, objects=None):
+        self._objects = objects or {}
+
+    def add_object(self, object_type, obj):
+        self._objects.setdefault(object_type, []).append(obj)
+
+    def get_objects_typed(self, object_type):
+        return list(self._objects.get(object_type, []))
+
+
+class FakeDetection(FakeObjectContainer):
+    def __init__(self, label, bbox, confidence, class_id=0, track_id=None, landmarks=None):
+        super().__init__()
+        self._label, self._bbox, self._confidence, self._class_id = label, bbox, confidence, class_id
+        if track_id is not None:
+            self.add_object(HAILO_UNIQUE_ID, FakeUniqueID(track_id))
+        if landmarks is not None:
+            self.add_object(HAILO_LANDMARKS, FakeLandmarks([FakePoint(*p) for p in landmarks]))
+
+    def get_label(self):
+        return self._label
+
+    def get_bbox(self):
+        return self._bbox
+
+    def get_confidence(self):
+        return self._confidence
+
+    def get_class_id(self):
+        return self._class_id
+
+
+class FakeROI(FakeObjectContainer):
+    def __init__(self, detections=()):
+        super().__init__()
+        for detection in detections:
+            self.add_object(HAILO_DETECTION, detection)
+
+
+def make_fake_roi(num_detections, labels=("person", "car", "dog"), num_keypoints=0, seed=0):
+    """
+    Build a FakeROI with random detections, every other one tracked, optionally with keypoints.
+    Coordinates are float32 values, as hailo stores them.
+    """
+    rng = np.random.default_rng(seed)
+    detections = []
+    for i in range(num_detections):
+        width, height = rng.uniform(0.05, 0.4, 2).astype(np.float32)
+        xmin, ymin = np.float32(rng.uniform(0, 1 - width)), np.float32(rng.uniform(0, 1 - height))
+        class_id = int(rng.integers(len(labels)))
+        landmarks = rng.uniform(0, 1, (num_keypoints, 3)).astype(np.float32).tolist() if num_keypoints else None
+        bbox = FakeBBox(float(xmin), float(ymin), float(width), float(height))
+        detections.append(FakeDetection(
+            labels[class_id], bbox, float(rng.uniform(0.2, 1.0)),
+            class_id=class_id, track_id=i + 1 if i % 2 == 0 else None, landmarks=landmarks))
+    return FakeROI(detections)
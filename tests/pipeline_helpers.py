@@ -0,0 +1,89 @@
+"""
+Instance masks, depth maps and the per-object loops of the example callbacks, for test_mask_compositor,
+test_depth_stats and test_pose_geometry (and the matching benchmarks). legacy_composite, legacy_average_depth
+and legacy_projection are the loop versions MaskCompositor, trimmed_mean_depth and PoseBatch must reproduce.
+"""
+import os
+import sys
+import numpy as np
+import cv2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'basic_pipelines'))
+
+from detection_snapshot import HAILO_DETECTION, HAILO_LANDMARKS
+from fake_roi import FakeBBox
+from mask_compositor import COLORS
+
+MASK_SIZE = 160  # yolov5 seg masks are 160x160 before resizing
+WIDTH, HEIGHT = 1280, 720
+
+
+def make_instances(count, rng):
+    """Create (mask list, bbox, track id) tuples; masks are Python lists like mask.get_data()."""
+    instances = []
+    yy, xx = np.mgrid[0:MASK_SIZE, 0:MASK_SIZE]
+    for track_id in range(count):
+        cx, cy = rng.uniform(0.3, 0.7, 2) * MASK_SIZE
+        mask = np.exp(-((xx - cx) ** 2 + (yy - cy) ** 2) / (2 * (MASK_SIZE / 4) ** 2)).astype(np.float32)
+        width, height = rng.uniform(0.1, 0.3), rng.uniform(0.3, 0.6)
+        bbox = FakeBBox(rng.uniform(-0.05, 1 - width), rng.uniform(-0.05, 1 - height), width, height)
+        instances.append((mask.ravel().tolist(), bbox, track_id))
+    return instances
+
+
+def legacy_composite(frame, instances):
+    """The per-person blend previously done in instance_segmentation.app_callback."""
+    frame_height, frame_width = frame.shape[:2]
+    for data, bbox, track_id in instances:
+        data = np.array(data).reshape((MASK_SIZE, MASK_SIZE))
+        roi_width = int(bbox.width() * frame_width)
+        roi_height = int(bbox.height() * frame_height)
+        resized_mask_data = cv2.resize(data, (roi_width, roi_height), interpolation=cv2.INTER_LINEAR)
+        x_min, y_min = int(bbox.xmin() * frame_width), int(bbox.ymin() * frame_height)
+        x_max, y_max = x_min + roi_width, y_min + roi_height
+        y_min, x_min = max(y_min, 0), max(x_min, 0)
+        y_max, x_max = min(y_max, frame_height), min(x_max, frame_width)
+        if x_max > x_min and y_max > y_min:
+            mask_overlay = np.zeros_like(frame)
+            color = COLORS[track_id % len(COLORS)]
+            mask_overlay[y_min:y_max, x_min:x_max] = (resized_mask_data[:y_max-y_min, :x_max-x_min, np.newaxis] > 0.5) * color
+            frame = cv2.addWeighted(frame, 1, mask_overlay, 0.5, 0)
+    return frame
+
+
+def legacy_average_depth(depth_mat):
+    depth_values = np.array(depth_mat).flatten()
+    m_depth_values = depth_values[depth_values <= np.percentile(depth_values, 95)]
+    return np.mean(m_depth_values) if len(m_depth_values) > 0 else 0
+
+
+def synthetic_depth_map(height, width, rng):
+    """Smooth ramp with noise and a few far-away outliers."""
+    yy, xx = np.mgrid[0:height, 0:width]
+    depth = 1.0 + 2.0 * yy / height + 0.5 * xx / width + rng.normal(0, 0.05, (height, width))
+    outliers = rng.random((height, width)) < 0.02
+    depth[outliers] = rng.uniform(20, 50, outliers.sum())
+    return depth.astype(np.float32)
+
+
+class SyntheticDepthMask:
+    def __init__(self, data):
+        self.data = data
+
+    def get_data(self):
+        return self.data
+
+
+def legacy_projection(roi):
+    persons = []
+    for detection in roi.get_objects_typed(HAILO_DETECTION):
+        if detection.get_label() == "person":
+            bbox = detection.get_bbox()
+            landmarks = detection.get_objects_typed(HAILO_LANDMARKS)
+            if len(landmarks) != 0:
+                persons.append([
+                    (int((point.x() * bbox.width() + bbox.xmin()) * WIDTH),
+                     int((point.y() * bbox.height() + bbox.ymin()) * HEIGHT))
+                    for point in landmarks[0].get_points()
+                ])
+    return persons
@@ -0,0 +1,69 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'basic_pipelines'))
+
+from depth_stats import TrackDepthEstimator, get_depth_values, trimmed_mean_depth
+from pipeline_helpers import SyntheticDepthMask, legacy_average_depth, synthetic_depth_map
+
+
+def test_outliers_are_dropped():
+    assert trimmed_mean_depth([1, 2, 3, 4, 5, 100]) == pytest.approx(3.0)
+
+
+def test_empty_mask():
+    assert trimmed_mean_depth([]) == 0
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("percentile", [50, 90, 95, 100])
+def test_matches_percentile_implementation(seed, percentile):
+    rng = np.random.default_rng(seed)
+    values = rng.integers(0, 20, 1001).astype(np.float32)  # Many ties around the threshold
+    expected = values[values <= np.percentile(values, percentile)].mean()
+    assert trimmed_mean_depth(values, percentile) == pytest.approx(expected, rel=1e-6)
+
+
+@pytest.mark.parametrize("as_list", [True, False])
+def test_subsampling_error_is_small(as_list):
+    depth_map = synthetic_depth_map(256, 320, np.random.default_rng(0))
+    data = depth_map.ravel().tolist() if as_list else depth_map
+    exact = legacy_average_depth(data)
+    assert trimmed_mean_depth(data, max_samples=4096) == pytest.approx(exact, rel=0.01)
+    assert get_depth_values(data, max_samples=4096).size <= 4096
+
+
+def test_default_is_exact():
+    depth_map = synthetic_depth_map(256, 320, np.random.default_rng(1))
+    data = depth_map.ravel().tolist()
+    assert get_depth_values(data).size == depth_map.size
+    assert trimmed_mean_depth(data) == pytest.approx(legacy_average_depth(data), rel=1e-6)
+    assert TrackDepthEstimator().average_depth(SyntheticDepthMask(data)) == pytest.approx(trimmed_mean_depth(data))
+
+
+def test_buffer_input_is_not_copied():
+    data = np.arange(10, dtype=np.float32)
+    values = get_depth_values(memoryview(data))
+    assert np.shares_memory(values, data)
+
+
+def test_tracked_objects_skip_recomputation():
+    mask = SyntheticDepthMask([2.0] * 10)
+    estimator = TrackDepthEstimator(alpha=0.5, refresh_interval=3)
+    assert estimator.average_depth(mask, track_id=1) == pytest.approx(2.0)
+    mask.data = [4.0] * 10
+    # Cached for the next two calls, then refreshed through the moving average
+    assert estimator.average_depth(mask, track_id=1) == pytest.approx(2.0)
+    assert estimator.average_depth(mask, track_id=1) == pytest.approx(2.0)
+    assert estimator.average_depth(mask, track_id=1) == pytest.approx(3.0)
+    # Untracked detections are always recomputed
+    assert estimator.average_depth(mask, track_id=0) == pytest.approx(4.0)
+
+
+def test_track_cache_is_bounded():
+    estimator = TrackDepthEstimator(max_tracks=4)
+    for track_id in range(1, 10):
+        estimator.average_depth(SyntheticDepthMask([1.0]), track_id)
+    assert len(estimator._tracks) == 4
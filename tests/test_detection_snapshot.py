@@ -0,0 +1,72 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'basic_pipelines'))
+
+from detection_snapshot import DetectionSnapshot
+from fake_roi import FakeBBox, FakeDetection, FakeROI, make_fake_roi
+
+
+def make_roi():
+    return FakeROI([
+        FakeDetection("person", FakeBBox(0.1, 0.1, 0.2, 0.4), 0.9, class_id=1, track_id=7),
+        FakeDetection("car", FakeBBox(0.6, 0.5, 0.3, 0.2), 0.4, class_id=3),
+        FakeDetection("person", FakeBBox(0.7, 0.2, 0.1, 0.3), 0.3, class_id=1, track_id=9,
+                      landmarks=[(0.5, 0.5, 0.9)] * 17),
+    ])
+
+
+def test_snapshot_holds_all_fields():
+    snapshot = DetectionSnapshot.from_roi(make_roi())
+    assert len(snapshot) == 3
+    np.testing.assert_allclose(snapshot.boxes[0], [0.1, 0.1, 0.3, 0.5], rtol=1e-6)
+    np.testing.assert_allclose(snapshot.scores, [0.9, 0.4, 0.3], rtol=1e-6)
+    assert snapshot.class_ids.tolist() == [1, 3, 1]
+    assert snapshot.track_ids.tolist() == [7, 0, 9]
+    assert snapshot.labels.tolist() == ["person", "car", "person"]
+    assert snapshot.landmarks is None
+
+
+def test_landmarks_are_nan_for_detections_without_them():
+    snapshot = DetectionSnapshot.from_roi(make_roi(), with_landmarks=True)
+    assert snapshot.landmarks.shape == (3, 17, 3)
+    assert np.isnan(snapshot.landmarks[0]).all()
+    np.testing.assert_allclose(snapshot.landmarks[2, 0], [0.5, 0.5, 0.9])
+
+
+def test_filters_compose():
+    snapshot = DetectionSnapshot.from_roi(make_roi())
+    persons = snapshot.filter_by_label("person")
+    assert persons.track_ids.tolist() == [7, 9]
+    assert snapshot.filter_by_label("person", "car").filter_by_confidence(0.35).track_ids.tolist() == [7, 0]
+    left = persons.filter_by_region(0, 0, 0.5, 1)
+    assert left.track_ids.tolist() == [7]
+    assert left.detections[0].get_label() == "person"
+    assert len(snapshot.filter_by_region(0.5, 0.4, 1, 1, use_center=False)) == 1
+
+
+def test_label_filter_while_taking_the_snapshot_matches_filter_by_label():
+    roi = make_fake_roi(40)
+    direct = DetectionSnapshot.from_roi(roi, labels=("person", "dog"))
+    filtered = DetectionSnapshot.from_roi(roi).filter_by_label("person", "dog")
+    np.testing.assert_array_equal(direct.boxes, filtered.boxes)
+    np.testing.assert_array_equal(direct.track_ids, filtered.track_ids)
+
+
+def test_filter_by_no_label_keeps_nothing():
+    snapshot = DetectionSnapshot.from_roi(make_roi())
+    assert len(snapshot.filter_by_label()) == 0
+    assert len(DetectionSnapshot.from_roi(FakeROI()).filter_by_label()) == 0
+
+
+def test_empty_roi():
+    snapshot = DetectionSnapshot.from_roi(FakeROI())
+    assert len(snapshot) == 0
+    assert snapshot.boxes.shape == (0, 4)
+    assert len(snapshot.filter_by_label("person").filter_by_region(0, 0, 1, 1)) == 0
+
+
+def test_to_pixels():
+    snapshot = DetectionSnapshot.from_roi(make_roi())
+    assert snapshot.to_pixels(640, 480)[0].tolist() == [64, 48, 192, 240]
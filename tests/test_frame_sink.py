@@ -0,0 +1,95 @@
+import multiprocessing
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'basic_pipelines'))
+
+from frame_sink import SharedFrameMixin, SharedFrameRing
+
+
+def test_write_bgr_swaps_channels_in_place():
+    ring = SharedFrameRing()
+    rgb = np.zeros((4, 6, 3), dtype=np.uint8)
+    rgb[..., 0] = 255
+    frame = ring.write_bgr(rgb)
+    ring.publish(frame)
+    seq, read = ring.read()
+    assert seq == 1
+    assert np.all(read[..., 2] == 255) and not read[..., :2].any()
+    ring.close()
+
+
+def test_consumer_gets_newest_frame_and_drops_the_rest():
+    ring = SharedFrameRing()
+    for value in range(5):
+        ring.acquire(2, 2)[...] = value
+        ring.publish()
+    seq, frame = ring.read()
+    assert seq == 5 and np.all(frame == 4)
+    assert ring.get_dropped() == 4
+    assert ring.read() == (None, None)
+    ring.close()
+
+
+def test_slot_held_by_consumer_is_not_overwritten():
+    ring = SharedFrameRing()
+    ring.acquire(2, 2)[...] = 1
+    ring.publish()
+    _, held = ring.read()
+    for value in range(2, 10):
+        ring.acquire(2, 2)[...] = value
+        ring.publish()
+    assert np.all(held == 1)
+    ring.close()
+
+
+def test_foreign_frame_is_copied_into_the_ring():
+    ring = SharedFrameRing()
+    ring.publish(np.full((3, 3, 3), 7, dtype=np.uint8))
+    _, frame = ring.read()
+    assert frame.shape == (3, 3, 3) and np.all(frame == 7)
+    ring.close()
+
+
+class CallbackBase:
+    def __init__(self):
+        self.use_frame = False
+
+
+class Callback(SharedFrameMixin, CallbackBase):
+    pass
+
+
+def test_mixin_hands_frames_over_through_the_ring():
+    user_data = Callback()
+    assert user_data.use_frame is False  # The base class is still initialized
+    assert user_data.get_frame() is None
+    user_data.set_frame(user_data.frame_sink.write_bgr(np.full((2, 3, 3), 9, dtype=np.uint8)))
+    frame = user_data.get_frame()
+    assert frame.shape == (2, 3, 3) and np.all(frame == 9)
+    user_data.frame_sink.close()
+
+
+def _read_in_child(ring, published, results):
+    published.wait()
+    seq, frame = ring.read()
+    results.put((seq, frame.shape, int(frame.sum())))
+
+
+def test_frames_are_shared_with_another_process():
+    ring = SharedFrameRing()
+    published = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    # The consumer is started before any frame exists, like the display process
+    process = multiprocessing.Process(target=_read_in_child, args=(ring, published, results))
+    process.start()
+    # Resolution changes reallocate the ring; the consumer must follow the newest generation
+    ring.acquire(2, 2)[...] = 1
+    ring.publish()
+    ring.acquire(4, 8)[...] = 1
+    ring.publish()
+    published.set()
+    process.join()
+    assert results.get() == (2, (4, 8, 3), 4 * 8 * 3)
+    ring.close()
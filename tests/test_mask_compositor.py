@@ -0,0 +1,53 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'basic_pipelines'))
+
+from mask_compositor import MaskCompositor, COLORS
+from fake_roi import FakeBBox
+from pipeline_helpers import MASK_SIZE, legacy_composite, make_instances
+
+
+def test_single_mask_matches_legacy_blend():
+    rng = np.random.default_rng(1)
+    frame = rng.integers(0, 255, (180, 320, 3), dtype=np.uint8)
+    instances = make_instances(1, rng)
+    compositor = MaskCompositor()
+    compositor.begin(frame)
+    data, bbox, track_id = instances[0]
+    compositor.add_mask(data, MASK_SIZE, MASK_SIZE, bbox, track_id)
+    result = compositor.composite(frame.copy())
+    assert np.array_equal(result, legacy_composite(frame.copy(), instances))
+
+
+def test_overlay_is_cleared_between_frames():
+    frame = np.zeros((100, 100, 3), dtype=np.uint8)
+    compositor = MaskCompositor()
+    compositor.begin(frame)
+    compositor.add_mask(np.ones(16), 4, 4, FakeBBox(0.1, 0.1, 0.5, 0.5), track_id=1)
+    first = compositor.composite(frame.copy())
+    assert first.any()
+    compositor.begin(frame)
+    second = compositor.composite(frame.copy())
+    assert not second.any()
+
+
+def test_mask_outside_frame_is_clipped():
+    frame = np.zeros((50, 50, 3), dtype=np.uint8)
+    compositor = MaskCompositor()
+    compositor.begin(frame)
+    compositor.add_mask(np.ones(16), 4, 4, FakeBBox(-0.5, 0.8, 0.7, 0.5), track_id=0)
+    result = compositor.composite(frame)
+    expected = (np.array(COLORS[0]) * 0.5).round().astype(np.uint8)
+    assert np.array_equal(result[49, 0], expected)
+    assert not result[:40].any()
+    assert not result[:, 10:].any()
+
+
+@pytest.mark.parametrize("track_id", [0, 3, 13])
+def test_color_cache_follows_track_id(track_id):
+    compositor = MaskCompositor()
+    assert tuple(compositor.get_color(track_id)) == COLORS[track_id % len(COLORS)]
+    assert compositor.get_color(track_id) is compositor.get_color(track_id)
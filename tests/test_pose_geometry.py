@@ -0,0 +1,39 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'basic_pipelines'))
+
+from fake_roi import FakeBBox, FakeDetection, FakeROI, make_fake_roi
+from pose_geometry import PoseBatch, get_keypoints
+from pipeline_helpers import HEIGHT, WIDTH, legacy_projection
+
+
+def test_projection_matches_per_point_loop():
+    roi = make_fake_roi(12, labels=("person", "dog"), num_keypoints=17, seed=3)
+    expected = np.array(legacy_projection(roi))
+    projected = PoseBatch.from_roi(roi, WIDTH, HEIGHT).to_int()
+    np.testing.assert_array_equal(projected, expected)
+
+
+def test_named_keypoints_and_confidence():
+    landmarks = [(0.5, 0.5, 0.9)] * 17
+    landmarks[get_keypoints()['left_wrist']] = (0.0, 1.0, 0.2)
+    roi = FakeROI([
+        FakeDetection("person", FakeBBox(0.25, 0.5, 0.5, 0.5), 0.9, track_id=4, landmarks=landmarks),
+        FakeDetection("person", FakeBBox(0.0, 0.0, 1.0, 1.0), 0.8, track_id=5),
+    ])
+    poses = PoseBatch.from_roi(roi, 100, 200, keypoint_names=['nose', 'left_wrist'])
+    assert len(poses) == 2
+    np.testing.assert_allclose(poses.keypoint('nose')[0], [50, 150])
+    np.testing.assert_allclose(poses.keypoints(['left_wrist'])[0, 0], [25, 200])
+    assert poses.visible[0].tolist() == [True, False]
+    assert poses.has_landmarks.tolist() == [True, False]
+    assert not poses.visible[1].any()
+    assert poses.to_int()[1].tolist() == [[-1, -1], [-1, -1]]
+
+
+def test_empty_frame():
+    poses = PoseBatch.from_roi(FakeROI(), WIDTH, HEIGHT)
+    assert len(poses) == 0
+    assert poses.points.shape == (0, 17, 2)